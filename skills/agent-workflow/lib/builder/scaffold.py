@@ -54,6 +54,10 @@ def _count_nodes(nodes: list[dict[str, Any]]) -> int:
         total += 1
         if node.get("type") == "loop":
             total += _count_nodes(node.get("body") or [])
+        elif node.get("type") == "parallel":
+            total += _count_nodes(node.get("branches") or [])
+        elif node.get("type") == "map" and node.get("body"):
+            total += 1
     return total
 
 
@@ -105,10 +109,10 @@ def _scaffold(params: dict[str, Any]) -> dict[str, Any]:
         if not isinstance(node, dict):
             raise WorkflowError(ErrorCode.PARAMS_INVALID, f"nodes[{idx}] must be an object")
         ntype = node.get("type")
-        if ntype not in ("agent_call", "wait_user", "loop", "sleep"):
+        if ntype not in ("agent_call", "wait_user", "loop", "sleep", "parallel", "map"):
             raise WorkflowError(
                 ErrorCode.PARAMS_INVALID,
-                f"nodes[{idx}].type must be one of agent_call/wait_user/loop/sleep",
+                f"nodes[{idx}].type must be one of agent_call/wait_user/loop/sleep/parallel/map",
             )
         cleaned_nodes.append(node)
     workflow: dict[str, Any] = {
@@ -0,0 +1,320 @@
+"""run 目录索引：runs/ 同级的 catalog.sqlite，一行一个 run 的摘要。
+
+list / view 只查这张表，不再逐个解析 state.json（含整段 history）。
+
+维护协议：
+    create_run / write_state 每次落盘后 upsert(run_dir, state)（单条 UPSERT 事务）
+    purge_run 删除目录后 delete(runs_dir, run_id)
+    catalog 缺失 / schema 版本不符 → 首次打开时从磁盘全量重建
+    query 发现 run 目录已不存在 → 顺手删掉该行
+    每行记录 state.json 的 mtime；query 发现文件比行新 → 重新摘要该行
+
+catalog 只是加速索引，绝不影响 run 本身：
+    文件损坏 → 删掉文件，下次读取自动重建
+    锁竞争（database is locked）→ 跳过本次写入并留下 catalog.sqlite.dirty 标记，
+        下次 query 按 mtime 对账全部 run；仍被锁住时 query 退回逐个扫描 state.json
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+CATALOG_FILE = "catalog.sqlite"
+DIRTY_SUFFIX = ".dirty"
+SCHEMA_VERSION = 1
+BUSY_TIMEOUT_S = 5.0
+
+_COLUMNS = (
+    "run_id",
+    "workflow_name",
+    "status",
+    "caller",
+    "created_at",
+    "updated_at",
+    "history_count",
+    "last_alias",
+)
+
+# 逐条执行（executescript 会隐式提交 BEGIN IMMEDIATE 开启的事务）
+_SCHEMA = (
+    """CREATE TABLE runs (
+        run_id        TEXT PRIMARY KEY,
+        workflow_name TEXT,
+        status        TEXT,
+        caller        TEXT,
+        created_at    TEXT,
+        updated_at    TEXT,
+        history_count INTEGER NOT NULL DEFAULT 0,
+        last_alias    TEXT,
+        mtime         REAL NOT NULL
+    )""",
+    "CREATE INDEX idx_runs_mtime ON runs(mtime DESC)",
+    "CREATE INDEX idx_runs_status ON runs(status, mtime DESC)",
+    "CREATE INDEX idx_runs_workflow ON runs(workflow_name, mtime DESC)",
+)
+
+
+def catalog_path(runs_dir: Path) -> Path:
+    return Path(runs_dir).parent / CATALOG_FILE
+
+
+def _dirty_path(runs_dir: Path) -> Path:
+    return Path(runs_dir).parent / (CATALOG_FILE + DIRTY_SUFFIX)
+
+
+def _mark_dirty(runs_dir: Path) -> None:
+    """写入因锁竞争被跳过：留下标记，下次 query 先对账。"""
+    try:
+        _dirty_path(runs_dir).touch()
+    except OSError:
+        pass
+
+
+def _state_mtime(run_dir: Path) -> float | None:
+    try:
+        return (run_dir / "state.json").stat().st_mtime
+    except OSError:
+        return None
+
+
+def summarize(state: dict[str, Any]) -> dict[str, Any]:
+    """state → catalog 行（不含 mtime）。"""
+    history = state.get("history_summary") or {}
+    return {
+        "run_id": state.get("run_id"),
+        "workflow_name": state.get("workflow_name"),
+        "status": state.get("status"),
+        "caller": state.get("caller"),
+        "created_at": state.get("created_at"),
+        "updated_at": state.get("updated_at"),
+        "history_count": history.get("count") or 0,
+        "last_alias": history.get("last_alias"),
+    }
+
+
+def _insert(conn: sqlite3.Connection, row: dict[str, Any], mtime: float) -> None:
+    cols = (*_COLUMNS, "mtime")
+    updates = ", ".join(f"{c} = excluded.{c}" for c in cols[1:])
+    conn.execute(
+        f"INSERT INTO runs ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+        f"ON CONFLICT(run_id) DO UPDATE SET {updates}",
+        [*(row.get(c) for c in _COLUMNS), mtime],
+    )
+
+
+def _load_row(run_dir: Path) -> tuple[dict[str, Any], float] | None:
+    """解析一个 run 的 state.json，返回 (catalog 行, mtime)；缺失或损坏时返回 None。"""
+    # 延迟 import 避免循环依赖
+    from lib.errors import WorkflowError
+    from lib.store import read_state
+
+    # 先取 mtime 再读：读取期间被改写时行的 mtime 偏旧，下次 query 会再刷新
+    mtime = _state_mtime(run_dir)
+    if mtime is None:
+        return None
+    try:
+        state = read_state(run_dir)
+    except (WorkflowError, OSError):
+        return None
+    state.setdefault("run_id", run_dir.name)
+    return summarize(state), mtime
+
+
+def _scan_disk(runs_dir: Path) -> Iterator[tuple[dict[str, Any], float]]:
+    """逐个解析磁盘上的 state.json，产出 (catalog 行, state.json mtime)。"""
+    if not runs_dir.exists():
+        return
+    for child in runs_dir.iterdir():
+        if child.is_dir() and (loaded := _load_row(child)) is not None:
+            yield loaded
+
+
+def _rebuild(conn: sqlite3.Connection, runs_dir: Path) -> int:
+    """在调用方事务内清表并按磁盘上的 state.json 重建。"""
+    conn.execute("DELETE FROM runs")
+    count = 0
+    for row, mtime in _scan_disk(runs_dir):
+        _insert(conn, row, mtime)
+        count += 1
+    return count
+
+
+def _open(runs_dir: Path) -> sqlite3.Connection:
+    """打开 catalog；不存在或版本不符时建表并全量重建（BEGIN IMMEDIATE 防并发重复重建）。"""
+    path = catalog_path(runs_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT_S, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS runs")
+            for stmt in _SCHEMA:
+                conn.execute(stmt)
+            _rebuild(conn, runs_dir)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+def _is_corrupt(e: sqlite3.Error) -> bool:
+    """OperationalError（锁竞争、磁盘满等）是暂时性的，其余 DatabaseError 视为文件损坏。"""
+    return isinstance(e, sqlite3.DatabaseError) and not isinstance(e, sqlite3.OperationalError)
+
+
+def _reconcile(conn: sqlite3.Connection, runs_dir: Path) -> None:
+    """按 state.json mtime 对账：只重新解析 mtime 变化或新增的 run，删掉目录已不存在的行。"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        known = dict(conn.execute("SELECT run_id, mtime FROM runs"))
+        seen: set[str] = set()
+        children = runs_dir.iterdir() if runs_dir.exists() else ()
+        for child in children:
+            mtime = _state_mtime(child)
+            if mtime is None:
+                continue
+            seen.add(child.name)
+            if known.get(child.name) != mtime and (loaded := _load_row(child)) is not None:
+                _insert(conn, *loaded)
+        conn.executemany("DELETE FROM runs WHERE run_id = ?", [(rid,) for rid in known.keys() - seen])
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+
+def _discard(runs_dir: Path) -> None:
+    """catalog 文件损坏：删掉整个文件（连同 dirty 标记），下次打开时重建。"""
+    path = catalog_path(runs_dir)
+    for suffix in ("", "-wal", "-shm", DIRTY_SUFFIX):
+        try:
+            os.unlink(f"{path}{suffix}")
+        except OSError:
+            pass
+
+
+def upsert(run_dir: Path, state: dict[str, Any]) -> None:
+    """run 状态落盘后同步一行；文件损坏时丢弃 catalog，锁竞争时跳过，均不向上抛。"""
+    runs_dir = Path(run_dir).parent
+    try:
+        conn = _open(runs_dir)
+        try:
+            _insert(conn, summarize(state), _state_mtime(Path(run_dir)) or time.time())
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        if _is_corrupt(e):
+            _discard(runs_dir)
+        else:
+            _mark_dirty(runs_dir)
+
+
+def delete(runs_dir: Path, run_id: str) -> None:
+    try:
+        conn = _open(Path(runs_dir))
+        try:
+            conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        if _is_corrupt(e):
+            _discard(Path(runs_dir))
+        else:
+            _mark_dirty(Path(runs_dir))
+
+
+def rebuild(runs_dir: Path) -> int:
+    """强制从磁盘全量重建，返回收录的 run 数。"""
+    _discard(Path(runs_dir))
+    conn = _open(Path(runs_dir))
+    try:
+        return conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def query(
+    runs_dir: Path,
+    *,
+    status: list[str] | None = None,
+    workflow_name: str | None = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> list[dict[str, Any]]:
+    """按最近写入时间倒序分页查询；目录已被删除的 run 会被剔除并从 catalog 清掉。
+
+    catalog 损坏时丢弃重建一次；仍不可用（如被长时间锁住）时退回扫描磁盘，不向上抛。
+    """
+    runs_dir = Path(runs_dir)
+    limit, offset = max(int(limit), 0), max(int(offset), 0)
+    where: list[str] = []
+    args: list[Any] = []
+    if status:
+        where.append(f"status IN ({', '.join('?' * len(status))})")
+        args.extend(status)
+    if workflow_name:
+        where.append("workflow_name = ?")
+        args.append(workflow_name)
+    sql = (
+        f"SELECT {', '.join(_COLUMNS)}, mtime FROM runs"
+        + (f" WHERE {' AND '.join(where)}" if where else "")
+        + " ORDER BY mtime DESC LIMIT ? OFFSET ?"
+    )
+    try:
+        return _select(runs_dir, sql, [*args, limit, offset])
+    except sqlite3.Error as e:
+        if _is_corrupt(e):
+            _discard(runs_dir)
+            try:
+                return _select(runs_dir, sql, [*args, limit, offset])
+            except sqlite3.Error:
+                pass
+    rows = [
+        (row, mtime)
+        for row, mtime in _scan_disk(runs_dir)
+        if (not status or row["status"] in status)
+        and (not workflow_name or row["workflow_name"] == workflow_name)
+    ]
+    rows.sort(key=lambda item: item[1], reverse=True)
+    return [row for row, _ in rows[offset:offset + limit]]
+
+
+def _select(runs_dir: Path, sql: str, args: list[Any]) -> list[dict[str, Any]]:
+    conn = _open(runs_dir)
+    try:
+        dirty = _dirty_path(runs_dir)
+        if dirty.exists():
+            dirty.unlink(missing_ok=True)  # 先删标记：对账期间再被跳过的写入会重新标记
+            try:
+                _reconcile(conn, runs_dir)
+            except BaseException:
+                _mark_dirty(runs_dir)
+                raise
+        while True:
+            rows = [dict(zip((*_COLUMNS, "mtime"), r)) for r in conn.execute(sql, args)]
+            gone: list[str] = []
+            fresh: list[tuple[dict[str, Any], float]] = []
+            for row in rows:
+                mtime = _state_mtime(runs_dir / row["run_id"])
+                if mtime == row["mtime"]:
+                    continue
+                loaded = None if mtime is None else _load_row(runs_dir / row["run_id"])
+                if loaded is None:
+                    gone.append(row["run_id"])
+                else:
+                    fresh.append(loaded)
+            if not gone and not fresh:
+                return [{c: row[c] for c in _COLUMNS} for row in rows]
+            conn.executemany("DELETE FROM runs WHERE run_id = ?", [(rid,) for rid in gone])
+            for row, mtime in fresh:
+                _insert(conn, row, mtime)
+    finally:
+        conn.close()
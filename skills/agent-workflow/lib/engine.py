@@ -6,6 +6,8 @@
     - 节点执行后调 _advance_cursor：同层 +1，越界则弹出上层；上层是 loop 时决定 continue/exit
     - chain_timeout（默认 25s）保护：内部链式执行超时 → 返回 action="continue"，
       caller 重新调 advance 让 CLI 接着推进，避免 IDE shell 超时
+    - parallel 节点不展开 cursor：分支在线程池内并发，进度记在 state.parallel_progress[<id>]
+    - map 节点同样不展开 cursor：逐元素结果记在 state.map_progress[<id>]，跨 advance / retry 保留
 
 action 返回结构（统一）：
     execute_agent  : 把 prompt 抛给 caller agent，下次调 advance 带 result
@@ -17,13 +19,20 @@ action 返回结构（统一）：
 """
 from __future__ import annotations
 
+import contextvars
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
 from typing import Any
 
+from lib import catalog
 from lib.errors import ErrorCode, WorkflowError
+from lib.executors.base import ExecutionOutcome
 from lib.logger import read_events, write_audit, write_event
 from lib.nodes import loop as loop_node
+from lib.nodes import map as map_node
+from lib.nodes import parallel as parallel_node
 from lib.nodes import sleep as sleep_node
 from lib.nodes import wait_user as wait_user_node
 from lib.nodes.agent_call import execute_agent_call
@@ -33,11 +42,15 @@ from lib.store import (
     append_history,
     create_run,
     get_run_dir,
+    history_summary,
     list_runs,
     list_workflows,
     load_workflow_snapshot,
+    read_history,
     read_state,
     render_runs_table,
+    runs_root,
+    truncate_history,
     write_state,
 )
 
@@ -382,6 +395,437 @@ def _execute_sleep(
     return {"action": "node_completed"}
 
 
+def _execute_parallel(
+    node: dict[str, Any],
+    state: dict[str, Any],
+    workflow: dict[str, Any],
+    run_dir: Path,
+    *,
+    deadline: float,
+) -> dict[str, Any]:
+    """并发执行 parallel.branches，按 join 策略汇合。
+
+    - 分支在线程池里用进入节点时的 vars 快照渲染 prompt；vars / history / cursor 只在主线程改写
+    - 已结束分支记在 state.parallel_progress[<internal_id>]，每批完成后立即落盘；
+      chain_timeout 到期后不再派发新分支，等在途分支结束后返回 continue，下次 advance 只跑剩余分支
+    - join 决出（已满足或不可能满足）后置位 cancel_event：spawn 分支被终止，未派发分支跳过
+    - 分支抛出非 WorkflowError 的异常按 INTERNAL 失败记录，同样立即置位 cancel_event 后由 join 决出
+    """
+    parallel_id = node.get("_internal_id")
+    branches: list[dict[str, Any]] = node.get("branches") or []
+    join = node.get("join") or "all"
+    required = parallel_node.resolve_required(node)
+    limit = parallel_node.resolve_max_concurrency(node)
+    label = node.get("alias") or parallel_id
+
+    progress = state.setdefault("parallel_progress", {})
+    record = progress.setdefault(parallel_id, {"started_at": _utc_iso(), "elapsed_ms": 0, "branches": {}})
+    finished: dict[str, dict[str, Any]] = record["branches"]
+    queue = [b for b in branches if b.get("_internal_id") not in finished]
+    call_started = time.monotonic()
+    write_event(
+        run_dir,
+        "node_start",
+        internal_id=parallel_id,
+        alias=node.get("alias"),
+        node_type="parallel",
+        join=join,
+        required=required,
+        max_concurrency=limit,
+        pending=len(queue),
+    )
+
+    def succeeded() -> int:
+        return sum(1 for r in finished.values() if r["status"] == "completed")
+
+    def decided() -> bool:
+        remaining = len(branches) - len(finished)
+        return succeeded() >= required or succeeded() + remaining < required
+
+    vars_snapshot = dict(state.get("vars") or {})
+    cancel_event = threading.Event()
+    run_context = {**_build_run_context(state), "cancel_event": cancel_event}
+
+    def run_branch(
+        branch: dict[str, Any],
+    ) -> tuple[str, float, ExecutionOutcome | None, WorkflowError | None]:
+        started_at = _utc_iso()
+        start_mono = time.monotonic()
+        write_event(
+            run_dir,
+            "node_start",
+            internal_id=branch.get("_internal_id"),
+            alias=branch.get("alias"),
+            node_type="agent_call",
+            executor=branch.get("executor") or "caller",
+            parallel=label,
+        )
+        try:
+            outcome = parallel_node.execute_branch(
+                branch,
+                vars_snapshot,
+                run_context,
+                workflow_executors=workflow.get("executors"),
+                config=workflow.get("config"),
+            )
+        except WorkflowError as exc:
+            return started_at, start_mono, None, exc
+        return started_at, start_mono, outcome, None
+
+    def record_branch(
+        branch: dict[str, Any],
+        started_at: str,
+        start_mono: float,
+        outcome: ExecutionOutcome | None,
+        exc: WorkflowError | None,
+    ) -> None:
+        duration_ms = (outcome.duration_ms if outcome else 0) or int((time.monotonic() - start_mono) * 1000)
+        output_name = branch.get("output")
+        entry: dict[str, Any] = {
+            "internal_id": branch.get("_internal_id"),
+            "alias": branch.get("alias"),
+            "type": "agent_call",
+            "executor": branch.get("executor") or "caller",
+            "parallel": label,
+            "started_at": started_at,
+            "ended_at": _utc_iso(),
+            "duration_ms": duration_ms,
+        }
+        if exc is None:
+            if output_name:
+                state.setdefault("vars", {})[output_name] = outcome.output
+            status = "completed"
+            entry.update(status=status, output=output_name, result=outcome.output)
+        else:
+            status = "cancelled" if exc.code == ErrorCode.NODE_CANCELLED else "failed"
+            entry.update(status=status, error=exc.to_dict())
+        append_history(state, entry, run_dir=run_dir)
+        write_event(
+            run_dir,
+            "node_end",
+            internal_id=branch.get("_internal_id"),
+            alias=branch.get("alias"),
+            status=status,
+            duration_ms=duration_ms,
+            output=output_name if exc is None else None,
+            error_code=exc.code if exc is not None else None,
+            parallel=label,
+        )
+        finished[branch["_internal_id"]] = {
+            "status": status,
+            "error_code": exc.code if exc is not None else None,
+        }
+
+    dispatched = 0
+    in_flight: dict[Future, dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"parallel-{label}") as pool:
+        while True:
+            # 每次调用至少派发一波，之后 chain_timeout 到期即停止派发
+            while (
+                queue
+                and len(in_flight) < limit
+                and not cancel_event.is_set()
+                and (dispatched == 0 or time.monotonic() < deadline)
+            ):
+                branch = queue.pop(0)
+                # 工作线程不继承 contextvars，显式拷贝以保留 secrets 脱敏
+                future = pool.submit(contextvars.copy_context().run, run_branch, branch)
+                in_flight[future] = branch
+                dispatched += 1
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                branch = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exc:  # noqa: BLE001 — 分支内的意外异常不能绕过取消与记录
+                    cancel_event.set()
+                    result = (_utc_iso(), time.monotonic(), None, WorkflowError(
+                        ErrorCode.INTERNAL,
+                        f"parallel branch {branch.get('alias') or branch.get('output')!r} crashed: "
+                        f"{type(exc).__name__}: {exc}",
+                        location={"alias": branch.get("alias"), "internal_id": branch.get("_internal_id")},
+                    ))
+                record_branch(branch, *result)
+            if decided():
+                cancel_event.set()
+            # 逐批落盘（仍持有 state 锁），进程中途退出也不丢已结束分支
+            write_state(run_dir, state)
+
+    record["elapsed_ms"] += int((time.monotonic() - call_started) * 1000)
+    if queue and not cancel_event.is_set():
+        write_event(
+            run_dir,
+            "parallel_deferred",
+            internal_id=parallel_id,
+            alias=node.get("alias"),
+            pending=len(queue),
+            reason="chain_timeout",
+        )
+        return {"action": "continue"}
+
+    progress.pop(parallel_id, None)
+    if not progress:
+        state.pop("parallel_progress", None)
+
+    def names(status: str) -> list[str]:
+        return [
+            b.get("alias") or b.get("output")
+            for b in branches
+            if (finished.get(b.get("_internal_id")) or {}).get("status") == status
+        ]
+
+    completed_names = names("completed")
+    status = "completed" if len(completed_names) >= required else "failed"
+    output_name = node.get("output")
+    if status == "completed" and output_name:
+        vars_ = state.setdefault("vars", {})
+        vars_[output_name] = {
+            b["output"]: vars_.get(b["output"])
+            for b in branches
+            if (finished.get(b.get("_internal_id")) or {}).get("status") == "completed"
+        }
+    append_history(
+        state,
+        {
+            "internal_id": parallel_id,
+            "alias": node.get("alias"),
+            "type": "parallel",
+            "status": status,
+            "started_at": record["started_at"],
+            "ended_at": _utc_iso(),
+            "duration_ms": record["elapsed_ms"],
+            "join": join,
+            "required": required,
+            "succeeded": completed_names,
+            "failed": names("failed"),
+            "cancelled": names("cancelled") + [b.get("alias") or b.get("output") for b in queue],
+            "output": output_name if status == "completed" else None,
+        },
+        run_dir=run_dir,
+    )
+    write_event(
+        run_dir,
+        "node_end",
+        internal_id=parallel_id,
+        alias=node.get("alias"),
+        status=status,
+        duration_ms=record["elapsed_ms"],
+        succeeded=len(completed_names),
+        output=output_name if status == "completed" else None,
+    )
+    if status == "failed":
+        raise WorkflowError(
+            ErrorCode.PARALLEL_JOIN_FAILED,
+            f"parallel {label!r} join={join} needs {required}/{len(branches)} branches, "
+            f"{len(completed_names)} succeeded",
+            location={"alias": node.get("alias"), "internal_id": parallel_id},
+            branch_errors={
+                (b.get("alias") or b.get("output")): finished[b["_internal_id"]]["error_code"]
+                for b in branches
+                if (finished.get(b.get("_internal_id")) or {}).get("status") == "failed"
+            },
+        )
+    return {"action": "node_completed"}
+
+
+def _execute_map(
+    node: dict[str, Any],
+    state: dict[str, Any],
+    workflow: dict[str, Any],
+    run_dir: Path,
+    *,
+    deadline: float,
+) -> dict[str, Any]:
+    """对 items 中每个元素渲染 body 并发执行，按原顺序收集结果写入 vars[output]。
+
+    - 已完成元素记在 state.map_progress[<internal_id>]（结果 + 渲染后 prompt 的指纹），
+      每批完成后立即落盘：advance 中途被杀、失败后 retry 都只重跑缺失 / 指纹变化的元素
+    - chain_timeout 到期后不再派发，等在途元素结束后返回 continue
+    - 任一元素失败即停止派发，在途元素跑完（结果保留），以该元素的错误码让 run 失败
+    """
+    map_id = node.get("_internal_id")
+    label = node.get("alias") or map_id
+    body = node.get("body") or {}
+    vars_snapshot = dict(state.get("vars") or {})
+    items = map_node.resolve_items(node, vars_snapshot)
+    limit = map_node.resolve_max_concurrency(node, len(items))
+    scoped = [map_node.item_vars(node, vars_snapshot, item, idx) for idx, item in enumerate(items)]
+    prints = [map_node.fingerprint(node, v) for v in scoped]
+
+    progress = state.setdefault("map_progress", {})
+    record = progress.setdefault(map_id, {"started_at": _utc_iso(), "elapsed_ms": 0, "done": {}})
+    # 元素列表或 prompt 变了的旧结果一律作废
+    record["done"] = {
+        key: value
+        for key, value in record["done"].items()
+        if key.isdigit() and int(key) < len(items) and value.get("fingerprint") == prints[int(key)]
+    }
+    done: dict[str, dict[str, Any]] = record["done"]
+    queue = [idx for idx in range(len(items)) if str(idx) not in done]
+    call_started = time.monotonic()
+    write_event(
+        run_dir,
+        "node_start",
+        internal_id=map_id,
+        alias=node.get("alias"),
+        node_type="map",
+        items=len(items),
+        pending=len(queue),
+        max_concurrency=limit,
+    )
+
+    run_context = _build_run_context(state)
+
+    def run_item(idx: int) -> tuple[str, float, ExecutionOutcome | None, WorkflowError | None]:
+        started_at = _utc_iso()
+        start_mono = time.monotonic()
+        write_event(
+            run_dir,
+            "node_start",
+            internal_id=body.get("_internal_id"),
+            alias=body.get("alias"),
+            node_type="agent_call",
+            executor=body.get("executor") or "caller",
+            map=label,
+            item_index=idx,
+        )
+        try:
+            outcome = map_node.execute_item(
+                node,
+                scoped[idx],
+                run_context,
+                workflow_executors=workflow.get("executors"),
+                config=workflow.get("config"),
+            )
+        except WorkflowError as exc:
+            return started_at, start_mono, None, exc
+        return started_at, start_mono, outcome, None
+
+    def record_item(
+        idx: int,
+        started_at: str,
+        start_mono: float,
+        outcome: ExecutionOutcome | None,
+        exc: WorkflowError | None,
+    ) -> None:
+        duration_ms = (outcome.duration_ms if outcome else 0) or int((time.monotonic() - start_mono) * 1000)
+        status = "completed" if exc is None else "failed"
+        entry: dict[str, Any] = {
+            "internal_id": body.get("_internal_id"),
+            "alias": body.get("alias"),
+            "type": "agent_call",
+            "executor": body.get("executor") or "caller",
+            "map": label,
+            "item_index": idx,
+            "status": status,
+            "started_at": started_at,
+            "ended_at": _utc_iso(),
+            "duration_ms": duration_ms,
+        }
+        if exc is None:
+            done[str(idx)] = {"fingerprint": prints[idx], "result": outcome.output}
+            entry["result"] = outcome.output
+        else:
+            entry["error"] = exc.to_dict()
+        append_history(state, entry, run_dir=run_dir)
+        write_event(
+            run_dir,
+            "node_end",
+            internal_id=body.get("_internal_id"),
+            alias=body.get("alias"),
+            status=status,
+            duration_ms=duration_ms,
+            error_code=exc.code if exc is not None else None,
+            map=label,
+            item_index=idx,
+        )
+
+    failure: tuple[int, WorkflowError] | None = None
+    dispatched = 0
+    in_flight: dict[Future, int] = {}
+    with ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"map-{label}") as pool:
+        while True:
+            # 每次调用至少派发一波，之后 chain_timeout 到期即停止派发
+            while (
+                queue
+                and len(in_flight) < limit
+                and failure is None
+                and (dispatched == 0 or time.monotonic() < deadline)
+            ):
+                idx = queue.pop(0)
+                # 工作线程不继承 contextvars，显式拷贝以保留 secrets 脱敏
+                future = pool.submit(contextvars.copy_context().run, run_item, idx)
+                in_flight[future] = idx
+                dispatched += 1
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                idx = in_flight.pop(future)
+                result = future.result()
+                record_item(idx, *result)
+                if result[3] is not None and failure is None:
+                    failure = (idx, result[3])
+            # 逐批落盘（仍持有 state 锁），进程中途退出也不丢已完成元素
+            write_state(run_dir, state)
+
+    record["elapsed_ms"] += int((time.monotonic() - call_started) * 1000)
+    output_name = node.get("output")
+    if failure is None and queue:
+        write_event(
+            run_dir,
+            "map_deferred",
+            internal_id=map_id,
+            alias=node.get("alias"),
+            pending=len(queue),
+            reason="chain_timeout",
+        )
+        return {"action": "continue"}
+
+    status = "completed" if failure is None else "failed"
+    if failure is None:
+        state.setdefault("vars", {})[output_name] = [done[str(idx)]["result"] for idx in range(len(items))]
+        progress.pop(map_id, None)
+        if not progress:
+            state.pop("map_progress", None)
+    append_history(
+        state,
+        {
+            "internal_id": map_id,
+            "alias": node.get("alias"),
+            "type": "map",
+            "status": status,
+            "started_at": record["started_at"],
+            "ended_at": _utc_iso(),
+            "duration_ms": record["elapsed_ms"],
+            "items": len(items),
+            "completed": len(done),
+            "output": output_name if failure is None else None,
+        },
+        run_dir=run_dir,
+    )
+    write_event(
+        run_dir,
+        "node_end",
+        internal_id=map_id,
+        alias=node.get("alias"),
+        status=status,
+        duration_ms=record["elapsed_ms"],
+        items=len(items),
+        output=output_name if failure is None else None,
+    )
+    if failure is not None:
+        idx, exc = failure
+        raise WorkflowError(
+            exc.code,
+            f"map {label!r} item {idx} failed: {exc.message}",
+            **{**exc.extras, "location": {"alias": node.get("alias"), "internal_id": map_id, "item_index": idx}},
+        )
+    return {"action": "node_completed"}
+
+
 # ---------------------------------------------------------------------------
 # chain 主循环
 # ---------------------------------------------------------------------------
@@ -429,6 +873,14 @@ def _chain(
                 step_result = _execute_wait_user(node, state, run_dir)
             elif ntype == "sleep":
                 step_result = _execute_sleep(node, state, run_dir)
+            elif ntype == "parallel":
+                step_result = _execute_parallel(
+                    node, state, workflow, run_dir, deadline=chain_started + chain_timeout_s
+                )
+            elif ntype == "map":
+                step_result = _execute_map(
+                    node, state, workflow, run_dir, deadline=chain_started + chain_timeout_s
+                )
             else:
                 raise WorkflowError(
                     ErrorCode.WORKFLOW_INVALID,
@@ -457,6 +909,9 @@ def _chain(
                 "status": "waiting_user",
                 "payload": step_result["payload"],
             }
+        if step_result["action"] == "continue":
+            # parallel / map 在 chain_timeout 到期时仍有未派发项：cursor 不动，下次 advance 接着跑
+            return _chain_timeout_result(state)
         # node_completed → 推进 cursor，继续链式执行
         try:
             still_running = _advance_cursor(workflow, cursor, state.get("vars") or {})
@@ -469,15 +924,19 @@ def _chain(
             return _finalise_result(state)
 
         if (time.monotonic() - chain_started) > chain_timeout_s:
-            state["status"] = "awaiting_agent"  # caller 应再次 advance
-            state["last_payload"] = None
-            return {
-                "action": "continue",
-                "run_id": state.get("run_id"),
-                "status": "awaiting_agent",
-                "reason": "chain_timeout",
-                "next_hint": "call advance again to resume internal chaining",
-            }
+            return _chain_timeout_result(state)
+
+
+def _chain_timeout_result(state: dict[str, Any]) -> dict[str, Any]:
+    state["status"] = "awaiting_agent"  # caller 应再次 advance
+    state["last_payload"] = None
+    return {
+        "action": "continue",
+        "run_id": state.get("run_id"),
+        "status": "awaiting_agent",
+        "reason": "chain_timeout",
+        "next_hint": "call advance again to resume internal chaining",
+    }
 
 
 def _fail(state: dict[str, Any], run_dir: Path, exc: WorkflowError) -> dict[str, Any]:
@@ -747,7 +1206,14 @@ def status_action(params: dict[str, Any]) -> dict[str, Any]:
         raise WorkflowError(ErrorCode.PARAMS_INVALID, "run_id is required")
     include_events = bool(params.get("include_events", False))
     include_history = bool(params.get("include_history", True))
+    # 不传分页参数时返回完整 history
+    history_offset = int(params.get("history_offset", 0))
+    history_limit = params.get("history_limit")
+    history_limit = None if history_limit is None else int(history_limit)
     event_limit = int(params.get("event_limit", 20))
+    event_types = params.get("event_types")
+    if isinstance(event_types, str):
+        event_types = [event_types]
     run_dir = get_run_dir(run_id)
     state = read_state(run_dir)
     payload: dict[str, Any] = {
@@ -759,7 +1225,7 @@ def status_action(params: dict[str, Any]) -> dict[str, Any]:
         "project_root_source": state.get("project_root_source"),
         "created_at": state.get("created_at"),
         "updated_at": state.get("updated_at"),
-        "history_count": len(state.get("history") or []),
+        "history_count": history_summary(state)["count"],
         "cursor": state.get("cursor"),
         "vars": {k: v for k, v in (state.get("vars") or {}).items() if k != "_secrets"},
     }
@@ -768,9 +1234,16 @@ def status_action(params: dict[str, Any]) -> dict[str, Any]:
     if state.get("status") == "failed":
         payload["error"] = state.get("error")
     if include_history:
-        payload["history"] = state.get("history") or []
+        payload["history"] = read_history(run_dir, state, offset=history_offset, limit=history_limit)
+        payload["history_offset"] = history_offset
     if include_events:
-        payload["events"] = read_events(run_dir, limit=event_limit)
+        payload["events"] = read_events(
+            run_dir,
+            limit=event_limit,
+            types=event_types,
+            since=params.get("event_since"),
+            until=params.get("event_until"),
+        )
     return payload
 
 
@@ -780,13 +1253,18 @@ def list_action(params: dict[str, Any]) -> dict[str, Any]:
         status_filter = [status_filter]
     workflow_name = params.get("workflow_name")
     limit = int(params.get("limit", 50))
+    offset = int(params.get("offset", 0))
     fmt = params.get("format") or "json"
+    rebuilt = catalog.rebuild(runs_root()) if params.get("rebuild") else None
     runs = list_runs(
         status=status_filter,
         workflow_name=workflow_name,
         limit=limit,
+        offset=offset,
     )
-    out: dict[str, Any] = {"runs": runs, "count": len(runs)}
+    out: dict[str, Any] = {"runs": runs, "count": len(runs), "offset": offset}
+    if rebuilt is not None:
+        out["rebuilt"] = rebuilt
     if fmt == "table":
         out["table"] = render_runs_table(runs)
     return out
@@ -875,10 +1353,9 @@ def _last_failed_alias(state: dict[str, Any]) -> tuple[str | None, list[int] | N
         2. state["pending_node"]（awaiting_agent / waiting_user 卡住）
         3. cursor.path 当前指向（兜底）
     """
-    history = state.get("history") or []
-    for entry in reversed(history):
-        if entry.get("status") == "failed" and entry.get("alias"):
-            return entry["alias"], None
+    failed_alias = history_summary(state).get("last_failed_alias")
+    if failed_alias:
+        return failed_alias, None
     pending = state.get("pending_node")
     if pending and pending.get("alias"):
         return pending["alias"], None
@@ -887,22 +1364,16 @@ def _last_failed_alias(state: dict[str, Any]) -> tuple[str | None, list[int] | N
     return None, list(path) if path else None
 
 
-def _trim_history_from(state: dict[str, Any], alias: str) -> int:
+def _trim_history_from(state: dict[str, Any], alias: str, run_dir: Path) -> int:
     """删除 history 中从 alias 节点（含）开始的所有记录。
 
-    返回被裁掉的条数。仅删 state 内存中的，不动 events.ndjson（审计保留）。
+    返回被裁掉的条数。history 日志按偏移截断，不动 events.ndjson（审计保留）。
     """
-    history: list[dict[str, Any]] = state.get("history") or []
-    cut_index = None
-    for idx, entry in enumerate(history):
-        if entry.get("alias") == alias:
-            cut_index = idx
-            break
-    if cut_index is None:
-        return 0
-    removed = len(history) - cut_index
-    state["history"] = history[:cut_index]
-    return removed
+    for idx, entry in enumerate(read_history(run_dir, state)):
+        # parallel 分支记录带 parallel=<父 alias>，与父节点一并裁掉
+        if entry.get("alias") == alias or entry.get("parallel") == alias:
+            return truncate_history(run_dir, state, idx)
+    return 0
 
 
 def _deep_merge_vars(target: dict[str, Any], patch: dict[str, Any]) -> None:
@@ -992,13 +1463,15 @@ def retry_action(params: dict[str, Any]) -> dict[str, Any]:
             _deep_merge_vars(state.setdefault("vars", {}), vars_patch)
 
         # 4) 裁剪 history（从该节点开始的旧记录全部丢弃，避免审计串位）
-        removed = _trim_history_from(state, resolved_alias)
+        removed = _trim_history_from(state, resolved_alias, run_dir)
 
         # 5) 重置 cursor / 清理 in-flight 状态
         state["cursor"] = {
             "path": list(new_path),
             "iteration_counts": (state.get("cursor") or {}).get("iteration_counts") or {},
         }
+        # parallel 分支按进入节点时的 vars 渲染，重跑时不沿用旧进度（map 按 prompt 指纹自行甄别）
+        state.pop("parallel_progress", None)
         state["error"] = None
         state["last_payload"] = None
         state["pending_node"] = None
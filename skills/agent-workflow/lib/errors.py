@@ -17,6 +17,7 @@ class ErrorCode:
     NODE_OUTPUT_REQUIRED: Final[str] = "NODE_OUTPUT_REQUIRED"
     NODE_TIMEOUT: Final[str] = "NODE_TIMEOUT"
     NODE_EMPTY_OUTPUT: Final[str] = "NODE_EMPTY_OUTPUT"
+    NODE_CANCELLED: Final[str] = "NODE_CANCELLED"
 
     RUN_NOT_FOUND: Final[str] = "RUN_NOT_FOUND"
     RUN_ALREADY_TERMINAL: Final[str] = "RUN_ALREADY_TERMINAL"
@@ -27,6 +28,7 @@ class ErrorCode:
     EXECUTOR_STALLED: Final[str] = "EXECUTOR_STALLED"
 
     LOOP_EXCEEDED: Final[str] = "LOOP_EXCEEDED"
+    PARALLEL_JOIN_FAILED: Final[str] = "PARALLEL_JOIN_FAILED"
     SCHEMA_VIOLATION: Final[str] = "SCHEMA_VIOLATION"
     VAR_NOT_IN_SCOPE: Final[str] = "VAR_NOT_IN_SCOPE"
     CALLER_ERROR: Final[str] = "CALLER_ERROR"
@@ -62,6 +64,10 @@ _DEFAULTS: dict[str, dict[str, Any]] = {
         "retryable": False,
         "suggestion": "executor stdout was empty; check the prompt or executor configuration",
     },
+    ErrorCode.NODE_CANCELLED: {
+        "retryable": False,
+        "suggestion": "branch was cancelled after its parallel join was already decided; no action needed",
+    },
     ErrorCode.RUN_NOT_FOUND: {
         "retryable": False,
         "suggestion": "verify the run_id; use `list` to enumerate known runs",
@@ -90,6 +96,10 @@ _DEFAULTS: dict[str, dict[str, Any]] = {
         "retryable": False,
         "suggestion": "loop reached max_iterations; raise the cap or refine the condition",
     },
+    ErrorCode.PARALLEL_JOIN_FAILED: {
+        "retryable": False,
+        "suggestion": "inspect branch_errors; fix the failing branches or relax join/quorum, then retry",
+    },
     ErrorCode.SCHEMA_VIOLATION: {
         "retryable": True,
         "suggestion": "input does not match wait_user.input_schema; collect user input again",
@@ -255,11 +255,18 @@ class SpawnExecutor(BaseExecutor):
         t_out.start()
         t_err.start()
 
+        # parallel 节点 join 已决出时置位，用于提前终止仍在跑的分支
+        cancel_event = run_context.get("cancel_event")
         stalled = False
         timed_out = False
+        cancelled = False
         while True:
             if proc.poll() is not None:
                 break
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                _terminate_process(proc)
+                break
             now = time.monotonic()
             elapsed_ms = (now - start) * 1000
             stall_ms = (now - activity["last"]) * 1000
@@ -282,6 +289,13 @@ class SpawnExecutor(BaseExecutor):
         exit_code = proc.returncode if proc.returncode is not None else -1
         stderr_tail = stderr[-STDERR_TAIL_MAX:]
 
+        if cancelled:
+            raise WorkflowError(
+                ErrorCode.NODE_CANCELLED,
+                f"executor {self.name!r} cancelled after {duration_ms}ms",
+                location={"executor": self.name, "cmd": cmd[0]},
+                duration_ms=duration_ms,
+            )
         if stalled:
             raise WorkflowError(
                 ErrorCode.EXECUTOR_STALLED,
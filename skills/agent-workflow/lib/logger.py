@@ -7,16 +7,22 @@
 对外协议（与设计文档 §4.16 对齐）：
     write_event(run_dir, type, **fields)
     write_audit(run_dir, action, **fields)
+    read_events(run_dir, limit, types=, since=, until=)   # 从文件尾部倒读
 """
 from __future__ import annotations
 
 import contextvars
 import json
 import os
-from datetime import datetime, timezone
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any
 
+READ_BLOCK_BYTES = 64 * 1024
+# 多线程写入时 ts 与落盘顺序可能有秒级错位；倒读越过 since 这么多秒后才停止
+SINCE_SLACK_S = 5
+
 # 当前 chain 上下文中的 secret 值。engine._chain 入口通过 set_run_secrets() 设置。
 _SECRETS_CTX: contextvars.ContextVar[list[str]] = contextvars.ContextVar("agent_workflow_secrets", default=[])
 
@@ -58,7 +64,7 @@ def write_event(
 
     支持的 event_type（设计文档 §4.16）：
         run_start / node_start / spawn / sleep_start / sleep_end
-        node_end / error / pause / resume / run_end / abort
+        node_end / parallel_deferred / map_deferred / error / pause / resume / run_end / abort
 
     secrets：若提供则递归对 fields 做脱敏（仅落盘，不影响内存）。
     """
@@ -126,21 +132,66 @@ def _make_redactor(secrets: list[str] | None):
     return _redact
 
 
-def read_events(run_dir: Path | str, limit: int | None = None) -> list[dict[str, Any]]:
-    """读取 events.ndjson 全部或最近 N 条事件（status 命令用）。"""
+def _iter_lines_reversed(path: Path, block_size: int = READ_BLOCK_BYTES) -> Iterator[bytes]:
+    """从文件末尾按块向前读，逐行倒序产出（按换行字节切分对 UTF-8 安全）。"""
+    with path.open("rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        head = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + head).split(b"\n")
+            # 块首行可能不完整，拼到下一块末尾再切
+            head = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if head.strip():
+            yield head
+
+
+def _shift_iso(ts: str, seconds: int) -> str:
+    try:
+        moment = datetime.strptime(ts[:19], "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        return ts
+    return (moment + timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def read_events(
+    run_dir: Path | str,
+    limit: int | None = None,
+    *,
+    types: list[str] | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> list[dict[str, Any]]:
+    """读取 events.ndjson 中最近 N 条事件（按写入顺序返回，status / view 用）。
+
+    从文件尾部倒读，只解析需要的记录：凑满 limit 条，或 ts 早于 since 即停止。
+    types 按事件类型过滤；since / until 为 ISO-8601 UTC 时间（含端点），与事件 ts 同格式。
+    """
     path = Path(run_dir) / "events.ndjson"
-    if not path.exists():
+    if not path.exists() or (limit is not None and limit <= 0):
         return []
+    wanted = set(types) if types else None
+    stop_before = _shift_iso(since, -SINCE_SLACK_S) if since else None
     events: list[dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                events.append(json.loads(line))
-            except json.JSONDecodeError:
-                continue
-    if limit is not None and len(events) > limit:
-        return events[-limit:]
+    for raw in _iter_lines_reversed(path):
+        try:
+            event = json.loads(raw)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+        ts = event.get("ts") or ""
+        if stop_before and ts < stop_before:
+            break
+        if (since and ts < since) or (until and ts > until):
+            continue
+        if wanted is not None and event.get("type") not in wanted:
+            continue
+        events.append(event)
+        if limit is not None and len(events) >= limit:
+            break
+    events.reverse()
     return events
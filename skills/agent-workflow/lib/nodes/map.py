@@ -0,0 +1,89 @@
+"""map 节点：解析 items 列表，为每个元素渲染 body 并执行。
+
+并发调度、history / events、进度断点由 engine.py 负责；本模块只提供单次判断与单元素执行工具。
+
+元素变量：body 渲染时额外注入 `{{<as>}}`（默认 item）与 `{{<as>_index}}`（从 0 开始）。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any
+
+from lib.errors import ErrorCode, WorkflowError
+from lib.executors.base import ExecutionOutcome
+from lib.nodes.agent_call import execute_agent_call
+from lib.nodes.parallel import MAX_CONCURRENCY_CAP
+from lib.template import render, resolve_ref
+
+MAX_ITEMS_CAP = 1000
+DEFAULT_ITEM_VAR = "item"
+
+
+def resolve_items(node: dict[str, Any], vars_: dict[str, Any]) -> list[Any]:
+    """items 引用的 var 必须是 list；字符串按 JSON 解析（兼容 agent 以文本返回的数组）。"""
+    value = resolve_ref(node.get("items") or "", vars_)
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    if not isinstance(value, list):
+        raise WorkflowError(
+            ErrorCode.PARAMS_INVALID,
+            f"map.items must resolve to a list, got {type(value).__name__}",
+            location={"alias": node.get("alias"), "items": node.get("items")},
+        )
+    if len(value) > MAX_ITEMS_CAP:
+        raise WorkflowError(
+            ErrorCode.PARAMS_INVALID,
+            f"map.items has {len(value)} elements, exceeds cap {MAX_ITEMS_CAP}",
+            location={"alias": node.get("alias")},
+        )
+    return value
+
+
+def resolve_max_concurrency(node: dict[str, Any], count: int) -> int:
+    """并发上限：默认 4，封顶 MAX_CONCURRENCY_CAP 与元素数。"""
+    raw = node.get("max_concurrency")
+    value = int(raw) if isinstance(raw, int) else 4
+    return max(1, min(value, count, MAX_CONCURRENCY_CAP))
+
+
+def item_vars(node: dict[str, Any], vars_: dict[str, Any], item: Any, index: int) -> dict[str, Any]:
+    name = node.get("as") or DEFAULT_ITEM_VAR
+    return {**vars_, name: item, f"{name}_index": index}
+
+
+def fingerprint(node: dict[str, Any], vars_: dict[str, Any]) -> str:
+    """渲染后的 prompt + executor 的摘要；断点续跑时只复用指纹一致的元素结果。"""
+    body = node.get("body") or {}
+    prompt = render(body.get("prompt") or "", vars_, strict_vars=True)
+    raw = f"{body.get('executor') or 'caller'}\0{prompt}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def execute_item(
+    node: dict[str, Any],
+    vars_: dict[str, Any],
+    run_context: dict[str, Any],
+    *,
+    workflow_executors: dict[str, Any] | None = None,
+    config: dict[str, Any] | None = None,
+) -> ExecutionOutcome:
+    """在工作线程中对一个元素执行 body（vars_ 为 item_vars 结果，不直接改 state）。"""
+    body = node.get("body") or {}
+    outcome = execute_agent_call(
+        {**body, "alias": body.get("alias") or node.get("alias")},
+        {"vars": vars_},
+        run_context,
+        workflow_executors=workflow_executors,
+        config=config,
+    )
+    if outcome.kind == "needs_caller":
+        raise WorkflowError(
+            ErrorCode.WORKFLOW_INVALID,
+            f"map {node.get('alias')!r} body uses a caller executor; map needs spawn executors",
+            location={"alias": node.get("alias"), "executor": body.get("executor") or "caller"},
+        )
+    return outcome
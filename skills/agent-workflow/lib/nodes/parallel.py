@@ -0,0 +1,76 @@
+"""parallel 节点：解析 join / max_concurrency，执行单个分支。
+
+branches 为 agent_call 列表，由 engine.py 放进线程池并发执行、写 history / events、
+按 join 策略汇合；本模块只提供单次判断与单分支执行工具。
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from lib.errors import ErrorCode, WorkflowError
+from lib.executors.base import ExecutionOutcome
+from lib.nodes.agent_call import execute_agent_call
+
+JOIN_POLICIES = ("all", "any", "quorum")
+MAX_CONCURRENCY_CAP = 16
+
+
+def resolve_required(node: dict[str, Any]) -> int:
+    """join 策略 → 需要成功的分支数。all=全部，any=1，quorum=node.quorum。"""
+    branches = node.get("branches") or []
+    join = node.get("join") or "all"
+    if join not in JOIN_POLICIES:
+        raise WorkflowError(
+            ErrorCode.PARAMS_INVALID,
+            f"parallel.join must be one of {'/'.join(JOIN_POLICIES)}, got {join!r}",
+            location={"alias": node.get("alias")},
+        )
+    if join == "all":
+        return len(branches)
+    if join == "any":
+        return 1
+    quorum = node.get("quorum")
+    if not isinstance(quorum, int) or not 1 <= quorum <= len(branches):
+        raise WorkflowError(
+            ErrorCode.PARAMS_INVALID,
+            f"parallel.quorum out of range [1, {len(branches)}]: {quorum!r}",
+            location={"alias": node.get("alias")},
+        )
+    return quorum
+
+
+def resolve_max_concurrency(node: dict[str, Any]) -> int:
+    """并发上限：默认等于分支数，封顶 MAX_CONCURRENCY_CAP。"""
+    branches = node.get("branches") or []
+    raw = node.get("max_concurrency")
+    value = int(raw) if isinstance(raw, int) else len(branches)
+    return max(1, min(value, len(branches), MAX_CONCURRENCY_CAP))
+
+
+def execute_branch(
+    branch: dict[str, Any],
+    vars_snapshot: dict[str, Any],
+    run_context: dict[str, Any],
+    *,
+    workflow_executors: dict[str, Any] | None = None,
+    config: dict[str, Any] | None = None,
+) -> ExecutionOutcome:
+    """在工作线程中执行一个分支。
+
+    vars_snapshot 是进入 parallel 时的 vars 副本：分支之间互不可见，也不直接改 state。
+    caller executor 需要把 prompt 交回 IDE agent，无法并发，视为配置错误。
+    """
+    outcome = execute_agent_call(
+        branch,
+        {"vars": vars_snapshot},
+        run_context,
+        workflow_executors=workflow_executors,
+        config=config,
+    )
+    if outcome.kind == "needs_caller":
+        raise WorkflowError(
+            ErrorCode.WORKFLOW_INVALID,
+            f"parallel branch {branch.get('alias')!r} uses a caller executor; branches need spawn executors",
+            location={"alias": branch.get("alias"), "executor": branch.get("executor") or "caller"},
+        )
+    return outcome
@@ -163,6 +163,12 @@ def _collect_producible_vars(nodes: list[dict[str, Any]]) -> set[str]:
                 out.add(key)
         elif ntype == "loop":
             out |= _collect_producible_vars(node.get("body") or [])
+        elif ntype == "parallel":
+            out |= _collect_producible_vars(node.get("branches") or [])
+            if node.get("output"):
+                out.add(node["output"])
+        elif ntype == "map" and node.get("output"):
+            out.add(node["output"])
     return out
 
 
@@ -170,6 +176,110 @@ def _validate_references(data: dict[str, Any]) -> list[dict[str, Any]]:
     initial_vars = set((data.get("vars") or {}).keys())
     violations: list[dict[str, Any]] = []
 
+    def check_refs(tmpl: Any, visible: set[str], loc: str, fname: str) -> None:
+        for ref in _collect_template_refs(tmpl):
+            if ref not in visible:
+                violations.append(
+                    {
+                        "level": "L3",
+                        "code": ErrorCode.VAR_NOT_IN_SCOPE,
+                        "message": f"reference {{{{{ref}.*}}}} not in scope (field={fname})",
+                        "location": {
+                            "path": loc,
+                            "field": fname,
+                            "ref": ref,
+                        },
+                        "suggestion": (
+                            f"declare {ref!r} as workflow.vars, "
+                            "or move a producer node before this one"
+                        ),
+                    }
+                )
+
+    def check_parallel(
+        node: dict[str, Any], visible: set[str], aliases_in_scope: set[str], loc: str
+    ) -> None:
+        """分支共享同一个 alias 作用域；prompt 只能引用进入 parallel 前可见的变量。"""
+        branches = node.get("branches") or []
+        if node.get("join") == "quorum" and (node.get("quorum") or 0) > len(branches):
+            violations.append(
+                {
+                    "level": "L3",
+                    "code": ErrorCode.WORKFLOW_INVALID,
+                    "message": f"quorum={node.get('quorum')} exceeds branch count {len(branches)}",
+                    "location": {"path": loc, "field": "quorum"},
+                }
+            )
+        outputs: set[str] = set()
+        for bidx, branch in enumerate(branches):
+            balias = branch.get("alias")
+            bloc = f"{loc}.branches[{bidx}]" + (f".{balias}" if balias else "")
+            if balias and balias in aliases_in_scope:
+                violations.append(
+                    {
+                        "level": "L3",
+                        "code": ErrorCode.WORKFLOW_INVALID,
+                        "message": f"duplicate alias {balias!r} in same scope",
+                        "location": {"path": bloc, "alias": balias},
+                    }
+                )
+            if balias:
+                aliases_in_scope.add(balias)
+            boutput = branch.get("output")
+            if boutput in outputs:
+                violations.append(
+                    {
+                        "level": "L3",
+                        "code": ErrorCode.WORKFLOW_INVALID,
+                        "message": f"parallel branches write the same output {boutput!r}",
+                        "location": {"path": bloc, "output": boutput},
+                    }
+                )
+            outputs.add(boutput)
+            if (branch.get("executor") or "caller") == "caller":
+                violations.append(
+                    {
+                        "level": "L3",
+                        "code": ErrorCode.WORKFLOW_INVALID,
+                        "message": "parallel branches cannot use the caller executor",
+                        "location": {"path": bloc, "field": "executor"},
+                        "suggestion": "set executor to a spawn executor (claude / codex / custom)",
+                    }
+                )
+            check_refs(branch.get("prompt"), visible, bloc, "prompt")
+
+    def check_map(
+        node: dict[str, Any], visible: set[str], aliases_in_scope: set[str], loc: str
+    ) -> None:
+        """body prompt 额外可见 <as> 与 <as>_index；body 必须用 spawn executor。"""
+        body = node.get("body") or {}
+        bloc = f"{loc}.body"
+        balias = body.get("alias")
+        if balias and balias in aliases_in_scope:
+            violations.append(
+                {
+                    "level": "L3",
+                    "code": ErrorCode.WORKFLOW_INVALID,
+                    "message": f"duplicate alias {balias!r} in same scope",
+                    "location": {"path": bloc, "alias": balias},
+                }
+            )
+        if balias:
+            aliases_in_scope.add(balias)
+        if (body.get("executor") or "caller") == "caller":
+            violations.append(
+                {
+                    "level": "L3",
+                    "code": ErrorCode.WORKFLOW_INVALID,
+                    "message": "map body cannot use the caller executor",
+                    "location": {"path": bloc, "field": "executor"},
+                    "suggestion": "set executor to a spawn executor (claude / codex / custom)",
+                }
+            )
+        item = node.get("as") or "item"
+        check_refs(node.get("items"), visible, loc, "items")
+        check_refs(body.get("prompt"), visible | {item, f"{item}_index"}, bloc, "prompt")
+
     def walk(nodes: list[dict[str, Any]], parent_scope: set[str], path_prefix: str) -> None:
         aliases_in_scope: set[str] = set()
         visible: set[str] = set(initial_vars) | set(parent_scope)
@@ -209,24 +319,7 @@ def _validate_references(data: dict[str, Any]) -> list[dict[str, Any]]:
                     template_fields.append(("seconds", seconds))
 
             for fname, tmpl in template_fields:
-                for ref in _collect_template_refs(tmpl):
-                    if ref not in template_visible:
-                        violations.append(
-                            {
-                                "level": "L3",
-                                "code": ErrorCode.VAR_NOT_IN_SCOPE,
-                                "message": f"reference {{{{{ref}.*}}}} not in scope (field={fname})",
-                                "location": {
-                                    "path": loc,
-                                    "field": fname,
-                                    "ref": ref,
-                                },
-                                "suggestion": (
-                                    f"declare {ref!r} as workflow.vars, "
-                                    "or move a producer node before this one"
-                                ),
-                            }
-                        )
+                check_refs(tmpl, template_visible, loc, fname)
 
             if ntype == "agent_call" and output:
                 visible.add(output)
@@ -234,6 +327,13 @@ def _validate_references(data: dict[str, Any]) -> list[dict[str, Any]]:
                 key = node.get("output") or alias
                 if key:
                     visible.add(key)
+            if ntype == "parallel":
+                check_parallel(node, visible, aliases_in_scope, loc)
+                # 分支产出在 join 之后对后续节点可见
+                visible |= _collect_producible_vars([node])
+            if ntype == "map":
+                check_map(node, visible, aliases_in_scope, loc)
+                visible |= _collect_producible_vars([node])
             if ntype == "loop":
                 child_scope = set(visible)
                 if alias:
@@ -255,6 +355,10 @@ def _collect_executors_used(data: dict[str, Any]) -> set[str]:
                 used.add(node.get("executor") or "caller")
             elif node.get("type") == "loop":
                 walk(node.get("body") or [])
+            elif node.get("type") == "parallel":
+                walk(node.get("branches") or [])
+            elif node.get("type") == "map":
+                used.add((node.get("body") or {}).get("executor") or "caller")
 
     walk(data.get("nodes") or [])
     return used
@@ -318,6 +422,10 @@ def _count_nodes(data: dict[str, Any]) -> int:
             total += 1
             if node.get("type") == "loop":
                 walk(node.get("body") or [])
+            elif node.get("type") == "parallel":
+                walk(node.get("branches") or [])
+            elif node.get("type") == "map" and node.get("body"):
+                total += 1
 
     walk(data.get("nodes") or [])
     return total
@@ -332,6 +440,10 @@ def assign_internal_ids(data: dict[str, Any]) -> dict[str, Any]:
                 node["_internal_id"] = uuid.uuid4().hex[:8]
             if node.get("type") == "loop":
                 walk(node.get("body") or [])
+            elif node.get("type") == "parallel":
+                walk(node.get("branches") or [])
+            elif node.get("type") == "map" and isinstance(node.get("body"), dict):
+                walk([node["body"]])
 
     walk(data.get("nodes") or [])
     return data
@@ -4,9 +4,12 @@
     ~/.config/agent-workflow/
     ├── workflows/              # workflow 定义（YAML）
     │   └── <name>.yaml
+    ├── catalog.sqlite          # run 摘要索引（catalog.py 维护，丢失可重建）
     └── runs/                   # 运行实例
         └── <run_id>/
-            ├── state.json      # 唯一可变状态（带 filelock）
+            ├── state.json      # 唯一可变状态（带 filelock）：cursor / vars / history_summary
+            ├── history.ndjson  # history 追加日志，一行一条
+            ├── history.idx     # 每条 history 在日志中的起始偏移（8 字节大端定长）
             ├── workflow.yaml   # 启动时快照（含分配的 _internal_id）
             ├── events.ndjson   # logger.py 维护
             ├── audit.log       # logger.py 维护
@@ -20,7 +23,9 @@
 from __future__ import annotations
 
 import json
+import os
 import shutil
+import struct
 import sys
 import uuid
 from datetime import datetime, timezone
@@ -30,12 +35,16 @@ from typing import Any
 import yaml
 from filelock import FileLock, Timeout
 
+from lib import catalog
 from lib.errors import ErrorCode, WorkflowError
 
 GLOBAL_BASE = Path.home() / ".config" / "agent-workflow"
 RUNS_SUBDIR = "runs"
 WORKFLOWS_SUBDIR = "workflows"
 LARGE_RESULT_BYTES = 10 * 1024  # >10KB 自动落盘到 outputs/
+HISTORY_FILE = "history.ndjson"
+HISTORY_INDEX_FILE = "history.idx"
+_INDEX_ENTRY = struct.Struct(">Q")
 
 
 def _utc_iso() -> str:
@@ -135,13 +144,14 @@ def create_run(
         "status": "awaiting_agent",
         "cursor": {"path": [0], "iteration_counts": {}},
         "vars": dict(initial_vars or {}),
-        "history": [],
+        "history_summary": _empty_history_summary(),
         "last_payload": None,
         "error": None,
         "created_at": _utc_iso(),
         "updated_at": _utc_iso(),
     }
     _atomic_write_json(run_dir / "state.json", state)
+    catalog.upsert(run_dir, state)
     return run_id, run_dir
 
 
@@ -174,17 +184,24 @@ def read_state(run_dir: Path) -> dict[str, Any]:
             ErrorCode.RUN_NOT_FOUND, f"state.json missing in {run_dir}"
         )
     try:
-        return json.loads(path.read_text("utf-8"))
+        state = json.loads(path.read_text("utf-8"))
     except json.JSONDecodeError as exc:
         raise WorkflowError(
             ErrorCode.WORKFLOW_SNAPSHOT_CORRUPTED,
             f"state.json corrupted: {exc}",
         ) from exc
+    if "history" in state and "history_summary" not in state:
+        # 旧版内嵌 history：读路径只在内存里补摘要，不落盘（迁移在持锁的写路径上做）
+        state["history_summary"] = _summarize_legacy(state["history"])
+    return state
 
 
 def write_state(run_dir: Path, state: dict[str, Any]) -> None:
+    if "history" in state:
+        _migrate_history(run_dir, state)
     state["updated_at"] = _utc_iso()
     _atomic_write_json(run_dir / "state.json", state)
+    catalog.upsert(run_dir, state)
 
 
 class StateTransaction:
@@ -217,6 +234,163 @@ class StateTransaction:
                 pass
 
 
+# ---------------------------------------------------------------------------
+# history：追加日志 + 偏移索引
+#
+# state.json 只存 history_summary（条数 / 最后节点 / 按 alias 聚合的计数与耗时），
+# 每条 history 追加到 history.ndjson，history.idx 记录第 i 条的起始偏移。
+# 以 history_summary.count 为准：事务异常退出时日志里多出的尾巴不可见，
+# 下次追加时截掉。
+# ---------------------------------------------------------------------------
+
+
+def _empty_history_summary() -> dict[str, Any]:
+    return {
+        "count": 0,
+        "last_alias": None,
+        "last_failed_alias": None,
+        "duration_ms": 0,
+        "timed_count": 0,
+        "by_alias": {},
+    }
+
+
+def _summarize_entry(summary: dict[str, Any], entry: dict[str, Any]) -> None:
+    alias = entry.get("alias")
+    status = entry.get("status")
+    duration = entry.get("duration_ms")
+    summary["count"] += 1
+    summary["last_alias"] = alias
+    if status == "failed" and alias:
+        summary["last_failed_alias"] = alias
+    if duration is not None:
+        summary["duration_ms"] += duration
+        summary["timed_count"] += 1
+    if not alias:
+        return
+    stats = summary["by_alias"].setdefault(
+        alias, {"count": 0, "duration_ms": None, "status": None, "last_ts": None}
+    )
+    stats["count"] += 1
+    if duration is not None:
+        stats["duration_ms"] = (stats["duration_ms"] or 0) + duration
+    if status:
+        stats["status"] = status
+    stats["last_ts"] = entry.get("ended_at") or entry.get("started_at")
+
+
+def history_summary(state: dict[str, Any]) -> dict[str, Any]:
+    """state 中的 history 聚合计数（旧 state 缺失时返回空摘要）。"""
+    return state.get("history_summary") or _empty_history_summary()
+
+
+def _entry_offset(idx_f: Any, index: int) -> int | None:
+    idx_f.seek(index * _INDEX_ENTRY.size)
+    raw = idx_f.read(_INDEX_ENTRY.size)
+    if len(raw) < _INDEX_ENTRY.size:
+        return None
+    return _INDEX_ENTRY.unpack(raw)[0]
+
+
+def _append_history_line(run_dir: Path, count: int, entry: dict[str, Any]) -> None:
+    """把第 count 条写到日志末尾；先写索引再写日志，崩溃残留总能由索引定位截断点。"""
+    line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+    with open(run_dir / HISTORY_INDEX_FILE, "a+b") as idx_f, open(run_dir / HISTORY_FILE, "a+b") as log_f:
+        end = _entry_offset(idx_f, count)
+        if end is None:
+            end = os.fstat(log_f.fileno()).st_size
+        else:
+            log_f.truncate(end)
+        idx_f.truncate(count * _INDEX_ENTRY.size)
+        idx_f.write(_INDEX_ENTRY.pack(end))
+        idx_f.flush()
+        log_f.write(line)
+
+
+def read_history(
+    run_dir: Path,
+    state: dict[str, Any],
+    *,
+    offset: int = 0,
+    limit: int | None = None,
+) -> list[dict[str, Any]]:
+    """按索引 seek 读取 history[offset:offset+limit]，只解析这一段。
+
+    offset 为负数时从末尾倒数（-20 = 最近 20 条）。
+    """
+    count = history_summary(state)["count"]
+    start = max(count + offset, 0) if offset < 0 else min(offset, count)
+    stop = count if limit is None else min(count, start + max(int(limit), 0))
+    if "history" in state:  # 尚未迁移的旧版 state
+        return list((state["history"] or [])[start:stop])
+    if start >= stop or not (run_dir / HISTORY_INDEX_FILE).exists():
+        return []
+    with open(run_dir / HISTORY_INDEX_FILE, "rb") as idx_f:
+        begin = _entry_offset(idx_f, start)
+        end = _entry_offset(idx_f, stop)
+    if begin is None:
+        return []
+    with open(run_dir / HISTORY_FILE, "rb") as log_f:
+        log_f.seek(begin)
+        chunk = log_f.read() if end is None else log_f.read(end - begin)
+    lines = chunk.decode("utf-8").split("\n")[: stop - start]
+    return [json.loads(line) for line in lines if line]
+
+
+def truncate_history(run_dir: Path, state: dict[str, Any], keep: int) -> int:
+    """只保留前 keep 条：日志与索引按偏移截断，摘要由保留部分重算。返回裁掉的条数。"""
+    if "history" in state:
+        _migrate_history(run_dir, state)
+    count = history_summary(state)["count"]
+    keep = max(0, min(keep, count))
+    if keep == count:
+        return 0
+    with open(run_dir / HISTORY_INDEX_FILE, "r+b") as idx_f:
+        end = _entry_offset(idx_f, keep)
+        idx_f.truncate(keep * _INDEX_ENTRY.size)
+    with open(run_dir / HISTORY_FILE, "r+b") as log_f:
+        log_f.truncate(end or 0)
+    summary = _empty_history_summary()
+    state["history_summary"] = summary
+    for entry in read_history(run_dir, {"history_summary": {"count": keep}}):
+        _summarize_entry(summary, entry)
+    return count - keep
+
+
+def _summarize_legacy(legacy: list[dict[str, Any]] | None) -> dict[str, Any]:
+    summary = _empty_history_summary()
+    for entry in legacy or []:
+        _summarize_entry(summary, entry)
+    return summary
+
+
+def _migrate_history(run_dir: Path, state: dict[str, Any]) -> None:
+    """旧版 state.json 内嵌 history 列表转成日志 + 索引。
+
+    只由持有 run 锁的写路径（write_state / append_history / truncate_history）调用，
+    随后的 write_state 落盘精简后的 state。
+    """
+    legacy = state.pop("history") or []
+    state["history_summary"] = _summarize_legacy(legacy)
+    if (run_dir / HISTORY_FILE).exists():
+        return
+    offsets: list[int] = []
+    lines: list[bytes] = []
+    pos = 0
+    for entry in legacy:
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        offsets.append(pos)
+        lines.append(line)
+        pos += len(line)
+    for name, data in (
+        (HISTORY_INDEX_FILE, b"".join(_INDEX_ENTRY.pack(o) for o in offsets)),
+        (HISTORY_FILE, b"".join(lines)),
+    ):
+        tmp = run_dir / f"{name}.tmp"
+        tmp.write_bytes(data)
+        tmp.replace(run_dir / name)
+
+
 def append_history(
     state: dict[str, Any],
     entry: dict[str, Any],
@@ -252,54 +426,29 @@ def append_history(
             "result_head": head,
         }
         entry.pop("result", None)
-    state.setdefault("history", []).append(entry)
+    if "history" in state:
+        _migrate_history(run_dir, state)
+    summary = state.setdefault("history_summary", _empty_history_summary())
+    _append_history_line(run_dir, summary["count"], entry)
+    _summarize_entry(summary, entry)
     return entry
 
 
-def _gather_run_dirs() -> list[Path]:
-    """收集全局 runs 目录下所有 run。"""
-    here = runs_root()
-    if not here.exists():
-        return []
-    run_dirs: list[Path] = []
-    for child in here.iterdir():
-        if child.is_dir() and (child / "state.json").exists():
-            run_dirs.append(child)
-    return sorted(run_dirs, key=lambda p: p.stat().st_mtime, reverse=True)
-
-
 def list_runs(
     *,
     status: list[str] | None = None,
     workflow_name: str | None = None,
     limit: int = 50,
+    offset: int = 0,
 ) -> list[dict[str, Any]]:
-    runs: list[dict[str, Any]] = []
-    for run_dir in _gather_run_dirs():
-        try:
-            state = read_state(run_dir)
-        except WorkflowError:
-            continue
-        if status and state.get("status") not in status:
-            continue
-        if workflow_name and state.get("workflow_name") != workflow_name:
-            continue
-        history = state.get("history") or []
-        runs.append(
-            {
-                "run_id": state.get("run_id"),
-                "workflow_name": state.get("workflow_name"),
-                "status": state.get("status"),
-                "caller": state.get("caller"),
-                "created_at": state.get("created_at"),
-                "updated_at": state.get("updated_at"),
-                "history_count": len(history),
-                "last_alias": history[-1].get("alias") if history else None,
-            }
-        )
-        if len(runs) >= limit:
-            break
-    return runs
+    """按最近更新倒序列出 run 摘要；走 catalog.sqlite，不解析各 run 的 state.json。"""
+    return catalog.query(
+        runs_root(),
+        status=status,
+        workflow_name=workflow_name,
+        limit=limit,
+        offset=offset,
+    )
 
 
 _TABLE_COLUMNS: list[tuple[str, str, int]] = [
@@ -395,6 +544,10 @@ def _count_workflow_nodes(nodes: list[dict[str, Any]]) -> int:
         total += 1
         if node.get("type") == "loop":
             total += _count_workflow_nodes(node.get("body") or [])
+        elif node.get("type") == "parallel":
+            total += _count_workflow_nodes(node.get("branches") or [])
+        elif node.get("type") == "map" and node.get("body"):
+            total += 1
     return total
 
 
@@ -402,6 +555,7 @@ def purge_run(run_dir: Path) -> None:
     """删除整个 run 目录（abort 后清理用，v1 暂不开放给 CLI）。"""
     if run_dir.exists():
         shutil.rmtree(run_dir)
+    catalog.delete(run_dir.parent, run_dir.name)
 
 
 def write_state_force(run_dir: Path, state: dict[str, Any]) -> None:
@@ -414,17 +568,22 @@ __all__ = [
     "RUNS_SUBDIR",
     "WORKFLOWS_SUBDIR",
     "LARGE_RESULT_BYTES",
+    "HISTORY_FILE",
+    "HISTORY_INDEX_FILE",
     "StateTransaction",
     "append_history",
     "create_run",
     "get_run_dir",
+    "history_summary",
     "list_runs",
     "list_workflows",
     "load_workflow_snapshot",
+    "read_history",
     "read_state",
     "render_runs_table",
     "resolve_workflow_by_name",
     "runs_root",
+    "truncate_history",
     "workflows_root",
     "write_state",
     "write_state_force",
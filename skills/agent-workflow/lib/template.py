@@ -2,6 +2,7 @@
 
 对外：
     render(text, vars, strict_vars=True)        # 渲染 {{var.path}}
+    resolve_ref(text, vars)                      # 整串为单个 {{var.path}} 时取原始对象
     evaluate_condition(expr, vars)               # 评估白名单表达式
     redact_secrets(text, secrets)                # 把 secret 在文本中替换为 ***REDACTED***
     expand_env_in_vars(vars_)                    # 把 vars 中的 "$ENV:NAME" 展开为环境变量值
@@ -66,6 +67,24 @@ def render(text: str, vars_: dict[str, Any], *, strict_vars: bool = True) -> str
     return VAR_PATTERN.sub(repl, text)
 
 
+def resolve_ref(text: str, vars_: dict[str, Any]) -> Any:
+    """整串恰为单个 `{{path}}` 时返回 vars 中的原始对象（list / dict 不转字符串）。
+
+    其他形态退化为 render(strict_vars=True)。
+    """
+    match = VAR_PATTERN.fullmatch(text.strip()) if isinstance(text, str) else None
+    if match is None:
+        return render(text, vars_, strict_vars=True)
+    try:
+        return _lookup(match.group(1), vars_)
+    except KeyError:
+        raise WorkflowError(
+            ErrorCode.VAR_NOT_IN_SCOPE,
+            f"undefined variable: {{{{{match.group(1)}}}}}",
+            location={"path": match.group(1)},
+        ) from None
+
+
 def redact_secrets(text: str, secrets: list[str] | None) -> str:
     """把 text 中出现的 secret 值替换为 ***REDACTED***（仅用于 events/audit 写盘）。"""
     if not secrets or not isinstance(text, str):
@@ -4,7 +4,8 @@
     - ``data.js`` 只承载**纯 JSON 数据**，不含任何 HTML 字符串
     - 浏览器侧 JS 负责所有 DOM 构造与格式化
     - Python 端做的事：从 ``.agent-workflow/runs/`` 收集 state/workflow/events，
-      把 nodes 打平、关联 history、解析 cursor，输出干净的结构化数据
+      把 nodes 打平、关联 history 摘要、解析 cursor，输出干净的结构化数据
+    - 节点统计只用 state.history_summary 的按 alias 聚合，不读 history.ndjson
 
 输出 (``.agent-workflow/views/`` 下，固定每次覆盖):
     index.html        — overview SPA shell
@@ -32,6 +33,7 @@ from lib.store import (
     GLOBAL_BASE,
     RUNS_SUBDIR,
     get_run_dir,
+    history_summary,
     list_runs,
     read_state,
     runs_root,
@@ -40,6 +42,7 @@ from lib.store import (
 from . import templates as T
 
 LIVE_STATUSES = {"running", "awaiting_agent", "waiting_user"}
+DEFAULT_EVENT_LIMIT = 200  # 每个 run 只倒读最近这么多条事件
 
 ASSETS_DIRNAME = "_assets"
 STATIC_ASSET_FILES = (
@@ -110,7 +113,7 @@ def _open_url(url: str) -> bool:
 
 
 def _flatten_nodes(workflow: dict[str, Any]) -> list[tuple[dict[str, Any], int]]:
-    """把 nodes（含 loop.body）打平为 (node, indent_level) 列表。"""
+    """把 nodes（含 loop.body / parallel.branches）打平为 (node, indent_level) 列表。"""
     out: list[tuple[dict[str, Any], int]] = []
 
     def walk(nodes: list[dict[str, Any]], level: int) -> None:
@@ -118,6 +121,8 @@ def _flatten_nodes(workflow: dict[str, Any]) -> list[tuple[dict[str, Any], int]]
             out.append((node, level))
             if node.get("type") == "loop" and isinstance(node.get("body"), list):
                 walk(node["body"], level + 1)
+            elif node.get("type") == "parallel" and isinstance(node.get("branches"), list):
+                walk(node["branches"], level + 1)
 
     walk(workflow.get("nodes") or [], 0)
     return out
@@ -146,23 +151,6 @@ def _resolve_cursor_alias(state: dict[str, Any], workflow: dict[str, Any]) -> st
         return None
 
 
-def _group_history_by_alias(history: list[dict[str, Any]]) -> dict[str, list[dict[str, Any]]]:
-    grouped: dict[str, list[dict[str, Any]]] = {}
-    for entry in history:
-        alias = entry.get("alias")
-        if not alias:
-            continue
-        grouped.setdefault(alias, []).append(entry)
-    return grouped
-
-
-def _last_status_for_alias(entries: list[dict[str, Any]]) -> str | None:
-    for entry in reversed(entries):
-        if entry.get("status"):
-            return entry["status"]
-    return None
-
-
 # ---------------------------------------------------------------------------
 # 单 run 数据构造
 # ---------------------------------------------------------------------------
@@ -171,14 +159,10 @@ def _last_status_for_alias(entries: list[dict[str, Any]]) -> str | None:
 def _node_summary(
     node: dict[str, Any],
     indent: int,
-    entries: list[dict[str, Any]],
+    stats: dict[str, Any],
     is_cursor: bool,
 ) -> dict[str, Any]:
-    """把单个 node + 其历史浓缩为前端友好的结构化数据。"""
-    durations = [e.get("duration_ms") for e in entries if e.get("duration_ms") is not None]
-    total_ms = sum(durations) if durations else None
-    last = entries[-1] if entries else None
-    last_ts = (last.get("ended_at") or last.get("started_at")) if last else None
+    """把单个 node + 其 history 聚合（history_summary.by_alias）浓缩为前端友好的结构化数据。"""
     ntype = node.get("type") or "?"
 
     summary: dict[str, Any] = {
@@ -188,10 +172,10 @@ def _node_summary(
         "is_loop": ntype == "loop",
         "is_cursor": is_cursor,
         "description": node.get("description"),
-        "status": _last_status_for_alias(entries) or ("running" if is_cursor else ""),
-        "iter_count": len(entries),
-        "total_duration_ms": total_ms,
-        "last_ts": last_ts,
+        "status": stats.get("status") or ("running" if is_cursor else ""),
+        "iter_count": stats.get("count") or 0,
+        "total_duration_ms": stats.get("duration_ms"),
+        "last_ts": stats.get("last_ts"),
     }
     if ntype == "agent_call":
         summary["executor"] = node.get("executor")
@@ -201,6 +185,13 @@ def _node_summary(
     elif ntype == "loop":
         summary["max_iterations"] = node.get("max_iterations")
         summary["condition"] = node.get("condition")
+    elif ntype == "parallel":
+        summary["join"] = node.get("join") or "all"
+        summary["max_concurrency"] = node.get("max_concurrency")
+    elif ntype == "map":
+        summary["executor"] = (node.get("body") or {}).get("executor")
+        summary["items"] = node.get("items")
+        summary["output"] = node.get("output")
     return summary
 
 
@@ -210,8 +201,8 @@ def build_run_data(
     events: list[dict[str, Any]],
 ) -> dict[str, Any]:
     """单 run 的纯 JSON 数据。供 ``data.js`` payload 用。"""
-    history = state.get("history") or []
-    history_by_alias = _group_history_by_alias(history)
+    history = history_summary(state)
+    by_alias = history["by_alias"]
     cursor_alias = _resolve_cursor_alias(state, workflow)
     flat_nodes = _flatten_nodes(workflow)
 
@@ -219,21 +210,16 @@ def build_run_data(
         _node_summary(
             node,
             indent,
-            history_by_alias.get(node.get("alias") or "", []),
+            by_alias.get(node.get("alias") or "", {}),
             bool((node.get("alias") or "") and node.get("alias") == cursor_alias),
         )
         for node, indent in flat_nodes
     ]
 
     vars_view = {k: v for k, v in (state.get("vars") or {}).items() if k != "_secrets"}
-    last_alias = history[-1].get("alias") if history else None
-
-    history_durations = [
-        e.get("duration_ms") for e in history if e.get("duration_ms") is not None
-    ]
     avg_step_ms = (
-        int(sum(history_durations) / len(history_durations))
-        if history_durations
+        int(history["duration_ms"] / history["timed_count"])
+        if history["timed_count"]
         else None
     )
 
@@ -244,14 +230,14 @@ def build_run_data(
         "caller": state.get("caller"),
         "created_at": state.get("created_at"),
         "updated_at": state.get("updated_at"),
-        "history_count": len(history),
+        "history_count": history["count"],
         "event_count": len(events),
         "node_count_top": len(workflow.get("nodes") or []),
         "node_count_total": len(flat_nodes),
         "runtime_ms": _runtime_ms(state.get("created_at"), state.get("updated_at")),
         "avg_step_ms": avg_step_ms,
         "cursor_alias": cursor_alias,
-        "last_alias": last_alias,
+        "last_alias": history["last_alias"],
         "vars": vars_view,
         "last_payload": state.get("last_payload"),
         "error": state.get("error"),
@@ -260,7 +246,7 @@ def build_run_data(
     }
 
 
-def _load_run_data(run_id: str) -> dict[str, Any] | None:
+def _load_run_data(run_id: str, *, event_limit: int = DEFAULT_EVENT_LIMIT) -> dict[str, Any] | None:
     try:
         run_dir = get_run_dir(run_id)
         state = read_state(run_dir)
@@ -274,7 +260,7 @@ def _load_run_data(run_id: str) -> dict[str, Any] | None:
             workflow = yaml.safe_load(workflow_path.read_text("utf-8")) or {}
         except Exception:  # noqa: BLE001
             workflow = {}
-    events = read_events(run_dir, limit=200)
+    events = read_events(run_dir, limit=event_limit)
     return build_run_data(state, workflow, events)
 
 
@@ -288,6 +274,7 @@ def build_data_payload(
     *,
     project_root: str | None,
     extra_run_ids: list[str] | None = None,
+    event_limit: int = DEFAULT_EVENT_LIMIT,
 ) -> dict[str, Any]:
     """把 runs 完整 detail 数据汇总成 ``window.__AW_DATA__`` payload（纯 JSON）。
 
@@ -295,6 +282,7 @@ def build_data_payload(
     project_root   : project root（footer/cmdbar 展示）
     extra_run_ids  : 单 run 模式时若该 run 不在 runs_meta（被 limit 截断），
                      额外补充加载
+    event_limit    : 每个 run 读取的最近事件条数
     """
     target_ids: list[str] = []
     seen: set[str] = set()
@@ -310,7 +298,7 @@ def build_data_payload(
 
     runs_data: list[dict[str, Any]] = []
     for rid in target_ids:
-        data = _load_run_data(rid)
+        data = _load_run_data(rid, event_limit=event_limit)
         if data is not None:
             runs_data.append(data)
 
@@ -380,12 +368,14 @@ def view_action(params: dict[str, Any]) -> dict[str, Any]:
         open   : 可选 bool，默认 true
         scope  : 'current'|'all'，默认 'current'
         limit  : int，默认 50
+        event_limit : int，每个 run 展示的最近事件数，默认 200
     """
     run_id = params.get("run_id")
     out_param = params.get("out")
     auto_open = params.get("open")
     auto_open = True if auto_open is None else bool(auto_open)
     limit = int(params.get("limit") or 50)
+    event_limit = int(params.get("event_limit") or DEFAULT_EVENT_LIMIT)
 
     views_dir = _resolve_views_dir(out_param)
     views_dir.mkdir(parents=True, exist_ok=True)
@@ -395,7 +385,7 @@ def view_action(params: dict[str, Any]) -> dict[str, Any]:
 
     extra_ids = [run_id] if run_id else None
     payload = build_data_payload(
-        runs_meta, project_root=project_root, extra_run_ids=extra_ids
+        runs_meta, project_root=project_root, extra_run_ids=extra_ids, event_limit=event_limit
     )
 
     _install_static(views_dir)
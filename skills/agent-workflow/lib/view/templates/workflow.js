@@ -140,6 +140,22 @@
           '</span></span>'
         );
       }
+    } else if (ntype === 'map') {
+      tokens.push(
+        '<span class="flow">' +
+          '<span class="val">' + esc(n.items) + '</span>' +
+          ' <span class="arr">→</span> ' +
+          '<span class="val">' + esc(n.output) + '</span>' +
+        '</span>'
+      );
+      if (n.executor) tokens.push('<span class="val">' + esc(n.executor) + '</span>');
+    } else if (ntype === 'parallel') {
+      tokens.push('<span class="kv">join <span class="val">' + esc(n.join) + '</span></span>');
+      if (n.max_concurrency != null) {
+        tokens.push(
+          '<span class="kv">max <span class="val">' + esc(n.max_concurrency) + '</span></span>'
+        );
+      }
     }
 
     var sub = '';
@@ -0,0 +1,195 @@
+"""
+近似重复检测索引：用于 MEMORY.md 条目去重，避免每个候选事实都逐条扫描全部已有条目。
+
+四层判定（任一命中即视为重复）：
+1. 精确匹配：strip + lower 后相同（集合查找）
+2. 子串包含：双方中较长的一方超过 20 字符且一方包含另一方。
+   通过字符 n-gram 倒排表只对共享 n-gram 的条目做子串校验
+3. 模糊重复：字符 shingle 的 Jaccard 相似度 ≥ jaccard_threshold。
+   MinHash 签名分段 LSH 找候选，再按精确 Jaccard 校验
+4. 语义重复（可选）：传入 embed_func 时，余弦相似度 ≥ embed_threshold
+
+索引只在内存中构建，每次提炼重建一次，不做持久化。
+"""
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SHINGLE_SIZE = 3
+NUM_BINS = 64                 # 签名长度（2 的幂）
+LSH_BANDS = 16                # 每段 NUM_BINS / LSH_BANDS = 4 个分桶，候选阈值约 0.5
+MIN_CONTAIN_LEN = 20          # 与旧版 _is_duplicate 一致：短条目不做子串判定
+_BIN_BITS = NUM_BINS.bit_length() - 1
+_EMPTY = 1 << 32
+
+
+def normalize(text):
+    return (text or "").strip().lower()
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """字符 shingle 集合；短于 size 的文本整体作为一个 shingle"""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(grams):
+    """
+    shingle 集合的 MinHash 签名（单次哈希分桶 + 循环填充空桶）。
+
+    每个 shingle 只计算一次 crc32：低位选桶、高位为桶内取值，桶内取最小值；
+    空桶沿环向借用右侧第一个非空桶的值，保证两组签名逐位相等的概率仍近似 Jaccard。
+    """
+    sig = [_EMPTY] * NUM_BINS
+    for g in grams:
+        h = (zlib.crc32(g.encode("utf-8")) * 0x9E3779B1) & 0xFFFFFFFF
+        b = h & (NUM_BINS - 1)
+        v = h >> _BIN_BITS
+        if v < sig[b]:
+            sig[b] = v
+    if _EMPTY in sig and any(v != _EMPTY for v in sig):
+        filled = list(sig)
+        for b in range(NUM_BINS):
+            step = 1
+            while filled[b] == _EMPTY:
+                src = sig[(b + step) % NUM_BINS]
+                if src != _EMPTY:
+                    filled[b] = src + step * _EMPTY  # 加偏移区分借来的值与原值
+                step += 1
+        sig = filled
+    return tuple(sig)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class DedupIndex:
+    """MEMORY.md 条目的近似重复索引"""
+
+    def __init__(self, items=(), jaccard_threshold=0.8, embed_func=None, embed_threshold=0.92):
+        self.jaccard_threshold = jaccard_threshold
+        self.embed_func = embed_func
+        self.embed_threshold = embed_threshold
+        self._items = []          # 条目序号 → 规范化文本
+        self._grams = []          # 条目序号 → shingle 集合
+        self._exact = set()
+        self._postings = {}       # shingle → 长条目序号集合（子串判定用）
+        self._buckets = {}        # (段号, 段签名) → 条目序号列表
+        self._vectors = []        # 条目序号 → 归一化向量（启用语义判定时）
+        self.add_many(items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, text):
+        return normalize(text) in self._exact
+
+    def _bands(self, sig):
+        rows = NUM_BINS // LSH_BANDS
+        return [(i, sig[i * rows:(i + 1) * rows]) for i in range(LSH_BANDS)]
+
+    def add_many(self, texts):
+        texts = [t for t in (normalize(x) for x in texts) if t and t not in self._exact]
+        vectors = self._embed(texts) if texts else None
+        for i, text in enumerate(texts):
+            self._add(text, vectors[i] if vectors else None)
+
+    def add(self, text):
+        self.add_many([text])
+
+    def _add(self, text, vector):
+        if text in self._exact:
+            return
+        idx = len(self._items)
+        grams = shingles(text)
+        self._items.append(text)
+        self._grams.append(grams)
+        self._exact.add(text)
+        if len(text) > MIN_CONTAIN_LEN:
+            for g in grams:
+                self._postings.setdefault(g, set()).add(idx)
+        for key in self._bands(minhash(grams)):
+            self._buckets.setdefault(key, []).append(idx)
+        if self.embed_func is not None:
+            self._vectors.append(vector)
+
+    def _embed(self, texts):
+        if self.embed_func is None:
+            return None
+        try:
+            vectors = self.embed_func(texts)
+        except Exception:
+            vectors = None
+        return vectors if vectors and len(vectors) == len(texts) else [None] * len(texts)
+
+    # --- 查询 ---
+
+    def _contains_match(self, text, grams):
+        """已有长条目包含 text，或 text 包含已有长条目"""
+        if len(text) < SHINGLE_SIZE:
+            # 极短文本没有完整 shingle，直接扫描长条目
+            return any(text in self._items[i] for i in set().union(*self._postings.values()))
+        postings = [self._postings.get(g) for g in grams]
+        if any(p is None for p in postings):
+            supersets = set()
+        else:
+            # 包含 text 的条目必然拥有 text 的全部 shingle：从最短倒排表开始求交
+            postings.sort(key=len)
+            supersets = set(postings[0])
+            for p in postings[1:]:
+                supersets &= p
+                if not supersets:
+                    break
+        if any(text in self._items[i] for i in supersets):
+            return True
+        if len(text) <= MIN_CONTAIN_LEN:
+            return False
+        # 被 text 包含的条目，其全部 shingle 都出现在 text 中
+        shared = {}
+        for p in postings:
+            for i in p or ():
+                shared[i] = shared.get(i, 0) + 1
+        return any(n == len(self._grams[i]) and self._items[i] in text for i, n in shared.items())
+
+    def _fuzzy_match(self, grams):
+        seen = set()
+        for key in self._bands(minhash(grams)):
+            for i in self._buckets.get(key, ()):
+                if i not in seen:
+                    seen.add(i)
+                    if jaccard(grams, self._grams[i]) >= self.jaccard_threshold:
+                        return True
+        return False
+
+    def _semantic_match(self, text):
+        if self.embed_func is None or not any(v is not None for v in self._vectors):
+            return False
+        vec = self._embed([text])[0]
+        if vec is None:
+            return False
+        rows = [v for v in self._vectors if v is not None and len(v) == len(vec)]
+        if not rows:
+            return False
+        if np is not None:
+            return float((np.asarray(rows, dtype=np.float32) @ np.asarray(vec, dtype=np.float32)).max()) \
+                >= self.embed_threshold
+        return max(sum(x * y for x, y in zip(r, vec)) for r in rows) >= self.embed_threshold
+
+    def is_duplicate(self, text):
+        """text 是否与索引中任一条目重复；空文本没有可提炼的内容，视为重复"""
+        text = normalize(text)
+        if not text or text in self._exact:
+            return True
+        grams = shingles(text)
+        if self._contains_match(text, grams):
+            return True
+        if self.jaccard_threshold and self._fuzzy_match(grams):
+            return True
+        return self._semantic_match(text)
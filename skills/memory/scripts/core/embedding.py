@@ -8,7 +8,7 @@
 import os
 import time
 from service.config import _DEFAULTS
-from service.logger import get_logger
+from service.logger import get_logger, tracing
 
 log = get_logger("embedding")
 
@@ -39,12 +39,13 @@ def _load_model(model_name=None):
         local_path = os.path.join(_MODEL_CACHE, cache_dir_name)
         t0 = time.time()
         os.makedirs(_MODEL_CACHE, exist_ok=True)
-        if os.path.isdir(local_path):
-            log.info("从本地缓存加载模型 %s", local_path)
-            _model = SentenceTransformer(name, cache_folder=_MODEL_CACHE, local_files_only=True)
-        else:
-            log.info("本地缓存未命中，首次下载 %s 到 %s", name, _MODEL_CACHE)
-            _model = SentenceTransformer(name, cache_folder=_MODEL_CACHE)
+        with tracing.span("model_load", model=name):
+            if os.path.isdir(local_path):
+                log.info("从本地缓存加载模型 %s", local_path)
+                _model = SentenceTransformer(name, cache_folder=_MODEL_CACHE, local_files_only=True)
+            else:
+                log.info("本地缓存未命中，首次下载 %s 到 %s", name, _MODEL_CACHE)
+                _model = SentenceTransformer(name, cache_folder=_MODEL_CACHE)
         elapsed = time.time() - t0
         dim = _model.get_sentence_embedding_dimension()
         log.info("模型加载完成 dim=%d (耗时 %.1fs)", dim, elapsed)
@@ -63,6 +64,11 @@ def is_available(model_name=None):
     return _load_model(model_name) is not None
 
 
+def is_loaded(model_name=None):
+    """模型是否已在本进程加载（不触发加载）"""
+    return _model is not None and _model_name == (model_name or _EMB_MODEL)
+
+
 def embed_text(text, model_name=None):
     """将单条文本转换为归一化向量，返回 list[float] 或 None"""
     model = _load_model(model_name)
@@ -70,18 +76,22 @@ def embed_text(text, model_name=None):
         return None
     t0 = time.time()
     vec = model.encode(text, normalize_embeddings=True)
+    tracing.add(embeddings=1)
     elapsed = time.time() - t0
     log.debug("生成向量 dim=%d, 文本长度=%d (耗时 %.3fs)", len(vec), len(text), elapsed)
     return vec.tolist()
 
 
-def embed_batch(texts, model_name=None):
-    """批量将文本转换为向量，batch_size=32"""
+def embed_batch(texts, model_name=None, batch_size=32):
+    """批量将文本转换为归一化向量，返回 list[list[float]] 或 None"""
     model = _load_model(model_name)
     if model is None:
         return None
+    if not texts:
+        return []
     t0 = time.time()
-    vecs = model.encode(texts, normalize_embeddings=True, batch_size=32)
+    vecs = model.encode(texts, normalize_embeddings=True, batch_size=batch_size)
+    tracing.add(embeddings=len(texts))
     elapsed = time.time() - t0
     log.info("批量生成向量 %d 条, dim=%d (耗时 %.2fs)", len(texts), len(vecs[0]), elapsed)
     return [v.tolist() for v in vecs]
@@ -10,7 +10,9 @@ from typing import Any, Callable
 from .defaults import (
     _DEFAULTS, _get_dotpath,
     DAILY_DIR_NAME, MEMORY_MD, NOTES_MD, SESSIONS_FILE, INDEX_DB, FACTS_FILE,
-    CURRENT_SESSION_FILE,
+    EMBEDDINGS_FILE, ANN_FILE, EMBED_CACHE_DB, FACTS_SNAPSHOT_FILE,
+    CURRENT_SESSION_FILE, JOBS_DIR_NAME, SESSIONS_DIR_NAME, SESSIONS_INDEX_FILE,
+    SESSION_STATE_DB,
     get_project_path,
 )
 from .manager import Config
@@ -133,7 +135,15 @@ def require_hook_memory(disabled_output=None):
         disabled_output = {}
 
     def decorator(main_fn: Callable[..., Any]) -> Callable[[], None]:
+        # 整个 Hook 记为一个计时 span：hook.<脚本名>
+        hook_name = os.path.splitext(os.path.basename(main_fn.__code__.co_filename))[0]
+
         def wrapper() -> None:
+            from service.logger import tracing
+            with tracing.span(f"hook.{hook_name}"):
+                _run()
+
+        def _run() -> None:
             import datetime as _dt
             with open("/tmp/memory_hook_debug.log", "a") as _f:
                 _f.write(f"{_dt.datetime.now()} {main_fn.__name__} called\n")
@@ -149,8 +159,9 @@ def require_hook_memory(disabled_output=None):
             project_path = init_hook_context(event)
 
             if not is_memory_enabled(project_path):
-                from service.logger import get_logger
+                from service.logger import get_logger, tracing
                 get_logger("hook").info("Memory 已禁用（.memory-disable），跳过")
+                tracing.set_attrs(disabled=True)
                 print(json.dumps(disabled_output))
                 return
 
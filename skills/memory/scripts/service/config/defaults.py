@@ -22,14 +22,22 @@ _DEFAULTS = {
     "embedding": {
         "model": "BAAI/bge-small-zh-v1.5",
         "cache_dir": os.path.join("~", ".memory", "models"),
+        "batch_size": 32,
+        "cache_max_entries": 20000,
     },
     "index": {
         "chunk_tokens": 400,
         "chunk_overlap": 80,
+        "vector_engine": "brute",
+        "ivf_nprobe": 8,
+    },
+    "search": {
+        "cache_max_entries": 200,
     },
     "log": {
         "level": "INFO",
         "retain_days": 7,
+        "spans": True,
     },
     "paths": {
         "data_dir": os.path.join(".cursor", "skills", "memory-data"),
@@ -38,6 +46,18 @@ _DEFAULTS = {
         "auto_cleanup_days": 90,
         "backup_retain_days": 30,
     },
+    "daemon": {
+        "autostart": False,
+        "idle_timeout": 600,
+    },
+    "jobs": {
+        "background": False,
+        "max_workers": 2,
+    },
+    "sessions": {
+        "segment_entries": 100,
+        "keep_last": 500,
+    },
 }
 
 # 字段校验规则
@@ -48,12 +68,24 @@ _SCHEMA = {
     "memory.partial_per_day":       {"type": int,   "min": 1,   "max": 100},
     "memory.important_confidence":  {"type": float, "min": 0.0, "max": 1.0},
     "memory.facts_limit":           {"type": int,   "min": 1,   "max": 500},
+    "embedding.batch_size":         {"type": int,   "min": 1,   "max": 1024},
+    "embedding.cache_max_entries":  {"type": int,   "min": 0,   "max": 10000000},
     "index.chunk_tokens":           {"type": int,   "min": 50,  "max": 2000},
     "index.chunk_overlap":          {"type": int,   "min": 0,   "max": 500},
+    "index.vector_engine":          {"type": str,   "enum": ["brute", "ivf"]},
+    "index.ivf_nprobe":             {"type": int,   "min": 1,   "max": 1024},
+    "search.cache_max_entries":     {"type": int,   "min": 0,   "max": 100000},
     "log.level":                    {"type": str,   "enum": ["DEBUG", "INFO", "WARNING", "ERROR"]},
     "log.retain_days":              {"type": int,   "min": 1,   "max": 365},
+    "log.spans":                    {"type": bool},
     "cleanup.auto_cleanup_days":    {"type": int,   "min": 0,   "max": 3650},
     "cleanup.backup_retain_days":   {"type": int,   "min": 1,   "max": 365},
+    "daemon.autostart":             {"type": bool},
+    "daemon.idle_timeout":          {"type": int,   "min": 10,  "max": 86400},
+    "jobs.background":              {"type": bool},
+    "jobs.max_workers":             {"type": int,   "min": 1,   "max": 8},
+    "sessions.segment_entries":     {"type": int,   "min": 1,   "max": 100000},
+    "sessions.keep_last":           {"type": int,   "min": 1,   "max": 1000000},
 }
 
 # 环境变量 → 配置路径映射
@@ -142,8 +174,16 @@ MEMORY_MD = "MEMORY.md"
 NOTES_MD = "NOTES.md"
 FACTS_FILE = "facts.jsonl"
 SESSIONS_FILE = "sessions.jsonl"
+SESSIONS_DIR_NAME = "sessions"
+SESSIONS_INDEX_FILE = "segments.json"
 INDEX_DB = "index.sqlite"
+EMBEDDINGS_FILE = "embeddings.f32"
+ANN_FILE = "vectors.ivf"
+EMBED_CACHE_DB = "embedding_cache.sqlite"
+SESSION_STATE_DB = "session_state.sqlite"
+FACTS_SNAPSHOT_FILE = "recent_facts.json"
 CURRENT_SESSION_FILE = "current_session.txt"
+JOBS_DIR_NAME = "jobs"
 
 
 def get_project_path(event: dict) -> str:
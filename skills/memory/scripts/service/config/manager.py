@@ -20,6 +20,13 @@ from .defaults import (
 )
 
 
+def _in_enum(val, enum) -> bool:
+    """枚举校验，字符串忽略大小写"""
+    if isinstance(val, str):
+        return val.upper() in {e.upper() for e in enum}
+    return val in enum
+
+
 class Config:
     """
     分层配置加载器。
@@ -93,10 +100,8 @@ class Config:
                 valid = False
             if valid and "max" in rule and val > rule["max"]:
                 valid = False
-            if valid and "enum" in rule:
-                check_val = val.upper() if isinstance(val, str) else val
-                if check_val not in rule["enum"]:
-                    valid = False
+            if valid and "enum" in rule and not _in_enum(val, rule["enum"]):
+                valid = False
             if not valid:
                 default_val = _get_dotpath(_DEFAULTS, dotpath)
                 _set_dotpath(self._config, dotpath, default_val)
@@ -196,8 +201,6 @@ class Config:
                 issues.append(f"{dotpath}: 值 {val} 小于最小值 {rule['min']}")
             elif "max" in rule and val > rule["max"]:
                 issues.append(f"{dotpath}: 值 {val} 大于最大值 {rule['max']}")
-            elif "enum" in rule:
-                check_val = val.upper() if isinstance(val, str) else val
-                if check_val not in rule["enum"]:
-                    issues.append(f"{dotpath}: 值 {val!r} 不在允许范围 {rule['enum']}")
+            elif "enum" in rule and not _in_enum(val, rule["enum"]):
+                issues.append(f"{dotpath}: 值 {val!r} 不在允许范围 {rule['enum']}")
         return issues
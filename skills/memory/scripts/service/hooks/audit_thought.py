@@ -16,6 +16,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../
 
 from service.config import require_hook_memory, get_memory_dir
 from core.utils import iso_now, today_str, ts_id
+from storage.jsonl import append_jsonl
 from service.logger import get_logger
 
 log = get_logger("audit_thought")
@@ -68,8 +69,7 @@ def main(event, project_path):
         "timestamp": iso_now(),
     }
 
-    with open(daily_file, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    append_jsonl(daily_file, entry)
 
     log.info("思考信号 %s (前60字: %s)", signal_types, snippet[:60])
     print(json.dumps({}))
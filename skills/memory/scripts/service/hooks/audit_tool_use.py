@@ -16,6 +16,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../
 
 from service.config import require_hook_memory, get_memory_dir
 from core.utils import iso_now, today_str, ts_id
+from storage.jsonl import append_jsonl
 from service.logger import get_logger
 
 log = get_logger("audit_tool")
@@ -109,8 +110,7 @@ def main(event, project_path):
     if extracted:
         entry["extracted"] = [x for x in extracted if x]
 
-    with open(daily_file, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    append_jsonl(daily_file, entry)
 
     log.info("捕获操作 %s: %s", action_type, command[:60])
     print(json.dumps({}))
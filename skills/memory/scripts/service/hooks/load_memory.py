@@ -13,15 +13,18 @@ import argparse
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
 
-from service.config import MEMORY_MD, NOTES_MD, SESSIONS_FILE, DAILY_DIR_NAME, CURRENT_SESSION_FILE
+from service.config import MEMORY_MD, NOTES_MD, CURRENT_SESSION_FILE
 from service.config import get_memory_dir, is_memory_enabled, init_hook_context, ensure_memory_dir
-from storage.jsonl import read_recent_facts_from_daily, read_last_entry
+from storage.session_log import last_session as read_last_session
+from storage.facts_snapshot import load_recent_facts
+from storage.jsonl import append_jsonl
 from core.utils import iso_now, today_str, ts_id
-from service.logger import get_logger, redirect_to_project
+from service.logger import get_logger, redirect_to_project, tracing
 
 log = get_logger("load")
 
 
+@tracing.traced("load_context")
 def load_context(project_path):
     """加载所有记忆数据，返回格式化的上下文文本"""
     memory_dir = get_memory_dir(project_path)
@@ -32,6 +35,7 @@ def load_context(project_path):
     if os.path.exists(memory_md_path):
         with open(memory_md_path, "r", encoding="utf-8") as f:
             content = f.read().strip()
+            tracing.add(bytes_read=os.fstat(f.fileno()).st_size)
         if content:
             context_parts.append(f"## 核心记忆\n\n{content}")
             log.info("加载 MEMORY.md (%d 字符)", len(content))
@@ -40,14 +44,15 @@ def load_context(project_path):
     if os.path.exists(notes_path):
         with open(notes_path, "r", encoding="utf-8") as f:
             notes_content = f.read().strip()
+            tracing.add(bytes_read=os.fstat(f.fileno()).st_size)
         if notes_content:
             context_parts.append(f"## 用户笔记\n\n{notes_content}")
             log.info("加载 NOTES.md (%d 字符)", len(notes_content))
 
-    daily_dir = os.path.join(memory_dir, DAILY_DIR_NAME)
-    recent_facts = read_recent_facts_from_daily(daily_dir)
+    recent_facts = load_recent_facts(memory_dir)
     recent_facts = [f for f in recent_facts if f.get("memory_type") != "S"]
     fact_count = len(recent_facts) if recent_facts else 0
+    tracing.add(facts=fact_count)
     log.info("加载近期事实 %d 条（从 daily/ 目录）", fact_count)
     if recent_facts:
         for i, fact in enumerate(recent_facts):
@@ -64,8 +69,8 @@ def load_context(project_path):
             lines.append(f"- [{mtype}][{ts}] {content}")
         context_parts.append("## 近期事实\n\n" + "\n".join(lines))
 
-    sessions_path = os.path.join(memory_dir, SESSIONS_FILE)
-    last_session = read_last_entry(sessions_path)
+    last_session = read_last_session(memory_dir)
+    tracing.set_attrs(last_session=bool(last_session))
     if last_session:
         topic = last_session.get("topic", "未知")
         summary = last_session.get("summary", "无")
@@ -85,20 +90,16 @@ def log_session_start(memory_dir: str, workspace: str, conv_id: str):
     daily_dir = os.path.join(memory_dir, "daily")
     os.makedirs(daily_dir, exist_ok=True)
     daily_file = os.path.join(daily_dir, f"{today_str()}.jsonl")
-    entry = json.dumps(
-        {
-            "id": f"log-{ts_id()}",
-            "type": "session_start",
-            "timestamp": iso_now(),
-            "workspace": workspace,
-            "session_id": conv_id,
-        },
-        ensure_ascii=False,
-    )
-    with open(daily_file, "a", encoding="utf-8") as f:
-        f.write(entry + "\n")
+    append_jsonl(daily_file, {
+        "id": f"log-{ts_id()}",
+        "type": "session_start",
+        "timestamp": iso_now(),
+        "workspace": workspace,
+        "session_id": conv_id,
+    })
 
 
+@tracing.traced("hook.load_memory")
 def main():
     import tempfile, datetime
     with open("/tmp/memory_hook_debug.log", "a") as f:
@@ -2,11 +2,13 @@
 """
 会话结束 Hook 脚本（sessionEnd）
 
-在 Composer 会话彻底关闭后触发（stop 之后），执行后台清理任务：
-1. 增量同步 JSONL → SQLite 索引（此时 Agent 已完成所有写入）
-2. 检测本次会话是否成功保存了摘要（兜底检测）
-3. 记录会话元数据（结束原因、持续时间）到 daily.jsonl
-4. 清理超期日志文件
+在 Composer 会话彻底关闭后触发（stop 之后）。Hook 内只执行轻量步骤：
+1. 兜底自动生成会话摘要，并检测本次会话是否成功保存了摘要
+2. 记录会话指标与元数据（结束原因、持续时间）到 daily.jsonl
+
+重任务提交到后台任务队列后立即返回，由 worker 去重后异步执行：
+增量同步 JSONL → SQLite 索引、封存 sessions.jsonl 并按段淘汰、刷新近期事实快照、
+清理超期日志与会话状态。
 
 这是 fire-and-forget Hook，输出不被使用。
 """
@@ -14,41 +16,28 @@ import sys
 import json
 import os
 import glob
-import subprocess
 from datetime import datetime, timedelta, timezone
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
 
-from service.config import _DEFAULTS, SESSIONS_FILE, require_hook_memory
+from service.config import _DEFAULTS, Config, require_hook_memory
 from service.config import get_memory_dir
-from storage.jsonl import read_last_entry, read_jsonl
-from core.utils import iso_now, today_str, ts_id, utcnow, parse_iso
-from service.memory.session_state import is_summary_saved, mark_summary_saved, read_session_state
+from storage.jsonl import append_jsonl, iter_jsonl, daily_files_between
+from storage.session_log import (
+    SEGMENT_ENTRIES, KEEP_LAST, append_session, enforce_retention, last_session, rotate, sessions_lock_path,
+)
+from core.file_lock import FileLock
+from core.utils import iso_now, today_str, ts_id, utcnow
+from service.memory.session_state import (
+    is_summary_saved, mark_summary_saved, read_session_state, delete_states_before,
+)
+from service.memory.job_queue import submit
 from service.logger import get_logger
 
 log = get_logger("end_session")
 
-_MEMORY_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "memory"))
-
-
-def sync_index(project_path: str):
-    """调用 sync_index.py 增量同步 JSONL 到 SQLite"""
-    sync_script = os.path.join(_MEMORY_DIR, "sync_index.py")
-    try:
-        env = os.environ.copy()
-        env["MEMORY_PROJECT_PATH"] = project_path
-        proc = subprocess.run(
-            [sys.executable, sync_script, "--project-path", project_path],
-            capture_output=True, text=True, timeout=25, env=env,
-        )
-        if proc.returncode == 0:
-            log.info("索引同步完成")
-        else:
-            log.warning("索引同步失败 (exit=%d): %s", proc.returncode, proc.stderr[:200])
-    except subprocess.TimeoutExpired:
-        log.warning("索引同步超时")
-    except Exception as e:
-        log.warning("索引同步异常: %s", e)
+# 提交给后台任务队列的重任务（见 service/memory/job_queue.py）
+SESSION_END_JOBS = ("sync_index", "truncate_sessions", "refresh_snapshot", "clean_logs", "clean_session_states")
 
 
 def check_summary_saved(memory_dir: str, event: dict):
@@ -58,8 +47,7 @@ def check_summary_saved(memory_dir: str, event: dict):
     if not conv_id or reason not in ("completed", "user_close"):
         return
 
-    sessions_path = os.path.join(memory_dir, SESSIONS_FILE)
-    last = read_last_entry(sessions_path)
+    last = last_session(memory_dir)
     if last and last.get("session_id") == conv_id:
         log.info("摘要已保存 session_id=%s", conv_id)
         return
@@ -75,8 +63,7 @@ def check_summary_saved(memory_dir: str, event: dict):
         "session_id": conv_id,
         "timestamp": iso_now(),
     }
-    with open(daily_file, "a", encoding="utf-8") as f:
-        f.write(json.dumps(warning, ensure_ascii=False) + "\n")
+    append_jsonl(daily_file, warning)
 
 
 def log_session_end(memory_dir: str, event: dict):
@@ -97,8 +84,7 @@ def log_session_end(memory_dir: str, event: dict):
     if error_msg:
         entry["error"] = error_msg
 
-    with open(daily_file, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    append_jsonl(daily_file, entry)
 
     log.info("记录会话结束 reason=%s duration=%sms",
              entry["reason"], entry.get("duration_ms"))
@@ -126,25 +112,25 @@ def clean_old_logs(project_path: str):
         log.info("清理过期日志 %d 个", removed)
 
 
-def truncate_sessions(memory_dir: str, keep_last: int = 500):
-    """保留最近 N 条摘要，截断旧数据。历史摘要已被 sync_index 同步到 SQLite。"""
-    sessions_path = os.path.join(memory_dir, SESSIONS_FILE)
-    if not os.path.exists(sessions_path):
-        return
+def truncate_sessions(memory_dir: str, keep_last: int = KEEP_LAST, segment_entries: int = SEGMENT_ENTRIES):
+    """
+    封存写满的活动段，并整段删除最旧的封存段，保留至少最近 keep_last 条摘要。
 
-    entries = read_jsonl(sessions_path)
-    if len(entries) <= keep_last:
+    只改名和删除段文件，不重写数据。历史摘要已被 sync_index 同步到 SQLite。
+    其他写入方长时间持锁时跳过本次整理，留给下一次 sessionEnd。
+    """
+    try:
+        with FileLock(sessions_lock_path(memory_dir), timeout=5):
+            sealed = rotate(memory_dir, segment_entries)
+            removed = enforce_retention(memory_dir, keep_last)
+    except TimeoutError as e:
+        log.warning("sessions 分段跳过: %s", e)
         return
+    if sealed or removed:
+        log.info("sessions 分段: 新封存 %d 段, 淘汰 %d 条", sealed, removed)
 
-    kept = entries[-keep_last:]
-    with open(sessions_path, "w", encoding="utf-8") as f:
-        for e in kept:
-            f.write(json.dumps(e, ensure_ascii=False) + "\n")
 
-    log.info("截断 sessions.jsonl: %d → %d 条", len(entries), len(kept))
-
-
-def auto_generate_summary(memory_dir: str, event: dict):
+def auto_generate_summary(memory_dir: str, event: dict, segment_entries: int = SEGMENT_ENTRIES):
     """从本会话的 fact 和阶段摘要中自动聚合生成最终会话摘要。仅在前两层均未保存摘要时执行。"""
     conv_id = event.get("conversation_id", "")
     if not conv_id:
@@ -162,20 +148,21 @@ def auto_generate_summary(memory_dir: str, event: dict):
     session_summaries = []
     MAX_SCAN_FILES = 30
 
-    for f in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl")), reverse=True)[:MAX_SCAN_FILES]:
-        with open(f, "r", encoding="utf-8") as fh:
-            for line in fh:
-                try:
-                    entry = json.loads(line.strip())
-                except json.JSONDecodeError:
-                    continue
-                source = entry.get("source", {})
-                if not isinstance(source, dict) or source.get("session") != conv_id:
-                    continue
-                if entry.get("memory_type") == "S":
-                    session_summaries.append(entry.get("content", ""))
-                elif entry.get("type") == "fact":
-                    session_facts.append(entry.get("content", ""))
+    # 会话状态记录了开始时间时，只扫描会话开始之后的 daily 文件
+    started = ((read_session_state(memory_dir, conv_id) or {}).get("created_at") or "")[:10]
+    if started:
+        files = daily_files_between(daily_dir, date_from=started)
+    else:
+        files = sorted(glob.glob(os.path.join(daily_dir, "*.jsonl")))
+    for f in list(reversed(files))[:MAX_SCAN_FILES]:
+        for entry in iter_jsonl(f):
+            source = entry.get("source", {})
+            if not isinstance(source, dict) or source.get("session") != conv_id:
+                continue
+            if entry.get("memory_type") == "S":
+                session_summaries.append(entry.get("content", ""))
+            elif entry.get("type") == "fact":
+                session_facts.append(entry.get("content", ""))
 
     if not session_facts and not session_summaries:
         log.info("本会话无 fact/阶段摘要，跳过自动生成 conv_id=%s", conv_id[:12])
@@ -201,9 +188,12 @@ def auto_generate_summary(memory_dir: str, event: dict):
         "auto_generated": True,
     }
 
-    sessions_path = os.path.join(memory_dir, SESSIONS_FILE)
-    with open(sessions_path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    try:
+        with FileLock(sessions_lock_path(memory_dir), timeout=5):
+            append_session(memory_dir, entry, segment_entries)
+    except TimeoutError as e:
+        log.warning("[Layer3] 自动摘要跳过 conv_id=%s: %s", conv_id[:12], e)
+        return
 
     mark_summary_saved(memory_dir, conv_id, source="layer3_auto")
 
@@ -212,48 +202,11 @@ def auto_generate_summary(memory_dir: str, event: dict):
 
 
 def clean_old_session_states(memory_dir: str, retain_days: int = 2):
-    """清理超过保留天数的会话状态文件及其 lock 文件"""
-    state_dir = os.path.join(memory_dir, "session_state")
-    if not os.path.isdir(state_dir):
-        return
-
-    cutoff = utcnow() - timedelta(days=retain_days)
-    removed = 0
-    active_sessions = set()
-
-    for f in os.listdir(state_dir):
-        if not f.endswith(".json"):
-            continue
-        fpath = os.path.join(state_dir, f)
-        try:
-            with open(fpath, "r") as fh:
-                state = json.load(fh)
-            created = parse_iso(state.get("created_at", ""))
-            if created < cutoff:
-                os.remove(fpath)
-                lock = os.path.join(state_dir, f".{f.replace('.json', '')}.lock")
-                if os.path.exists(lock):
-                    os.remove(lock)
-                removed += 1
-            else:
-                active_sessions.add(f.replace(".json", ""))
-        except (json.JSONDecodeError, OSError):
-            continue
-
-    orphan_locks = 0
-    for f in os.listdir(state_dir):
-        if not f.startswith(".") or not f.endswith(".lock"):
-            continue
-        session_id = f[1:].replace(".lock", "")
-        if session_id not in active_sessions:
-            try:
-                os.remove(os.path.join(state_dir, f))
-                orphan_locks += 1
-            except OSError:
-                continue
-
-    if removed or orphan_locks:
-        log.info("清理过期会话状态 %d 个, 孤立锁文件 %d 个", removed, orphan_locks)
+    """清理创建时间超过保留天数的会话状态（按 created_at 索引一次删除）"""
+    cutoff = (utcnow() - timedelta(days=retain_days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    removed = delete_states_before(memory_dir, cutoff)
+    if removed:
+        log.info("清理过期会话状态 %d 个", removed)
 
 
 def log_session_metrics(memory_dir: str, event: dict):
@@ -281,8 +234,7 @@ def log_session_metrics(memory_dir: str, event: dict):
         "timestamp": iso_now(),
     }
 
-    with open(daily_file, "a", encoding="utf-8") as f:
-        f.write(json.dumps(metrics_entry, ensure_ascii=False) + "\n")
+    append_jsonl(daily_file, metrics_entry)
 
 
 @require_hook_memory()
@@ -291,14 +243,15 @@ def main(event, project_path):
 
     log.info("sessionEnd 触发 reason=%s", event.get("reason", "unknown"))
 
-    sync_index(project_path)
-    truncate_sessions(memory_dir)
-    auto_generate_summary(memory_dir, event)
+    auto_generate_summary(memory_dir, event, Config(project_path).get("sessions.segment_entries"))
     check_summary_saved(memory_dir, event)
     log_session_metrics(memory_dir, event)
     log_session_end(memory_dir, event)
-    clean_old_logs(project_path)
-    clean_old_session_states(memory_dir)
+    try:
+        mode = submit(project_path, SESSION_END_JOBS)
+        log.info("后台任务已提交 mode=%s", mode)
+    except Exception as e:
+        log.warning("提交后台任务失败: %s", e)
 
     print(json.dumps({}))
 
@@ -1,2 +1,4 @@
-"""日志服务：提供统一的日志器。"""
+"""日志服务：提供统一的日志器与结构化计时 span。"""
 from .logger import get_logger, redirect_to_project
+from . import tracing
+from .tracing import span, traced
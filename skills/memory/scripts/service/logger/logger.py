@@ -4,7 +4,7 @@ Memory Skill 统一日志模块
 特点：
 - 按天自动创建日志文件（memory-data/logs/YYYY-MM-DD.log）
 - 同时输出到 stderr（不污染 stdout 的 JSON 输出）
-- 自动清理超过保留天数的旧日志
+- 自动清理超过保留天数的旧日志（含 tracing.py 写入的 span 文件）
 - 通过环境变量 MEMORY_LOG_LEVEL 控制日志级别
 """
 import os
@@ -22,7 +22,7 @@ _initialized = False
 def _get_log_dir():
     """日志目录优先级：MEMORY_LOG_DIR > MEMORY_PROJECT_PATH/data_dir/logs > cwd/data_dir/logs
 
-    只计算路径不创建目录，目录创建延迟到 _ensure_stream() 或 redirect_to_project()。
+    只计算路径不创建目录，目录创建延迟到首次写入（见 ensure_log_dir）。
     """
     global _LOG_DIR
     if _LOG_DIR:
@@ -38,6 +38,21 @@ def _get_log_dir():
     return _LOG_DIR
 
 
+def ensure_log_dir(log_dir) -> bool:
+    """
+    确保日志目录可写入，可用返回 True。
+
+    只在所属的数据目录（logs 的上一级）已存在时补建 logs/；数据目录不存在
+    （项目路径有误或项目已删除）时返回 False，调用方丢弃本次写入，不重新建出目录树。
+    """
+    if os.path.isdir(log_dir):
+        return True
+    if not os.path.isdir(os.path.dirname(os.path.abspath(log_dir))):
+        return False
+    os.makedirs(log_dir, exist_ok=True)
+    return True
+
+
 def _cleanup_old_logs():
     """清理超过保留天数的旧日志文件"""
     log_dir = _get_log_dir()
@@ -45,8 +60,9 @@ def _cleanup_old_logs():
         return
     cutoff = datetime.now(timezone.utc) - timedelta(days=_DEFAULTS["log"]["retain_days"])
     cutoff_str = cutoff.strftime("%Y-%m-%d")
-    for f in glob.glob(os.path.join(log_dir, "*.log")):
-        basename = os.path.splitext(os.path.basename(f))[0]
+    # 日志 YYYY-MM-DD.log 与计时 span YYYY-MM-DD.spans.jsonl 按文件名日期清理
+    for f in glob.glob(os.path.join(log_dir, "*.log")) + glob.glob(os.path.join(log_dir, "*.spans.jsonl")):
+        basename = os.path.basename(f)[:10]
         if basename < cutoff_str:
             try:
                 os.remove(f)
@@ -86,17 +102,20 @@ class _DailyFileHandler(logging.Handler):
         self._current_date = today
         return os.path.join(self._log_dir, f"{today}.log")
 
-    def _ensure_stream(self):
+    def _ensure_stream(self) -> bool:
         if self._stream is None or self._stream.closed:
-            os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+            if not ensure_log_dir(os.path.dirname(self.baseFilename)):
+                return False
             self._stream = open(self.baseFilename, "a", encoding="utf-8")
+        return True
 
     def emit(self, record):
         today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
         if today != self._current_date:
             self.close()
             self.baseFilename = self._today_path()
-        self._ensure_stream()
+        if not self._ensure_stream():
+            return  # 数据目录不存在：只保留 stderr 输出
         try:
             msg = self.format(record)
             self._stream.write(msg + "\n")
@@ -126,7 +145,7 @@ def redirect_to_project(project_path: str):
     解决全局 Hook 启动时 cwd 不是项目目录导致日志写入错误位置的问题。
 
     由于 _DailyFileHandler 延迟初始化，如果在 redirect 之前没有实际写入日志，
-    则不会在错误目录创建任何文件。
+    则不会在错误目录创建任何文件；项目数据目录不存在时同样不创建。
     """
     global _LOG_DIR, _file_handler
     data_dir = _DEFAULTS["paths"]["data_dir"]
@@ -134,7 +153,7 @@ def redirect_to_project(project_path: str):
     if _LOG_DIR == new_dir:
         return
     _LOG_DIR = new_dir
-    os.makedirs(_LOG_DIR, exist_ok=True)
+    ensure_log_dir(_LOG_DIR)
     if _file_handler is not None:
         _file_handler.close()
         _file_handler._log_dir = _LOG_DIR
@@ -0,0 +1,153 @@
+"""
+结构化计时 span：记录操作名、耗时与属性（扫描行数、读取字节、生成向量数、缓存命中等）。
+
+- span(name, **attrs) 上下文管理器 / traced(name) 装饰器，可嵌套，子 span 记录父 span 名
+- add(**counts) 向当前 span 累加计数，set_attrs(**attrs) 覆盖属性；不在 span 内时为空操作
+- 最外层 span 结束时把本线程积攒的记录一次追加到日志目录的 YYYY-MM-DD.spans.jsonl，
+  每行一条紧凑 JSON：{"ts", "name", "ms", "pid", "parent"?, "attrs"?}
+- 配置 log.spans 为 false 时不记录；写入失败静默忽略，不影响业务流程
+- manage.py spans 按操作名聚合为延迟直方图
+"""
+import os
+import json
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from time import perf_counter
+
+from .logger import _get_log_dir, ensure_log_dir
+
+SPANS_SUFFIX = ".spans.jsonl"
+
+_local = threading.local()
+_state = {}
+
+
+def spans_path(log_dir, day):
+    """某天的 span 文件路径"""
+    return os.path.join(log_dir, f"{day}{SPANS_SUFFIX}")
+
+
+def _enabled():
+    if "enabled" not in _state:
+        try:
+            from service.config import Config
+            _state["enabled"] = bool(Config(os.environ.get("MEMORY_PROJECT_PATH") or None).get("log.spans"))
+        except Exception:
+            _state["enabled"] = True
+    return _state["enabled"]
+
+
+class Span:
+    __slots__ = ("name", "attrs", "parent", "ms")
+
+    def __init__(self, name, attrs, parent):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.ms = None
+
+    def add(self, **counts):
+        for key, n in counts.items():
+            self.attrs[key] = self.attrs.get(key, 0) + n
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    def add(self, **counts):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL = _NullSpan()
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+        _local.pending = []
+    return stack
+
+
+@contextmanager
+def span(name, **attrs):
+    """记录一段代码的耗时；yield 的 Span 可用 add/set 补充属性"""
+    stack = _stack()
+    sp = Span(name, attrs, stack[-1].name if stack else None)
+    stack.append(sp)
+    t0 = perf_counter()
+    try:
+        yield sp
+    except Exception as e:
+        sp.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        sp.ms = (perf_counter() - t0) * 1000
+        stack.pop()
+        _local.pending.append(_record(sp))
+        if not stack:
+            _flush()
+
+
+def traced(name=None):
+    """装饰器形式的 span，name 缺省为函数名"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current():
+    """当前线程最内层的 span，不在 span 内时返回空操作对象"""
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else _NULL
+
+
+def add(**counts):
+    current().add(**counts)
+
+
+def set_attrs(**attrs):
+    current().set(**attrs)
+
+
+def _record(sp):
+    rec = {
+        "ts": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")[:-4] + "Z",
+        "name": sp.name,
+        "ms": round(sp.ms, 3),
+        "pid": os.getpid(),
+    }
+    if sp.parent:
+        rec["parent"] = sp.parent
+    if sp.attrs:
+        rec["attrs"] = sp.attrs
+    return rec
+
+
+def _flush():
+    """把本线程积攒的 span 一次追加写入（单次 write，多进程并发追加互不穿插）"""
+    pending, _local.pending = _local.pending, []
+    # 写入时才读取开关：Hook 在进入 span 后才解析出项目路径（MEMORY_PROJECT_PATH）
+    if not _enabled():
+        return
+    try:
+        log_dir = _get_log_dir()
+        if not ensure_log_dir(log_dir):
+            return
+        data = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+                       for r in pending)
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        with open(spans_path(log_dir, day), "a", encoding="utf-8") as f:
+            f.write(data)
+    except Exception:
+        pass
@@ -4,17 +4,19 @@ import os
 import json
 import time
 import shutil
-import subprocess
+import sqlite3
+from contextlib import contextmanager
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../.."))
 
 from service.config import get_config
 from service.config import _DEFAULTS, _get_dotpath, SESSIONS_FILE, INDEX_DB, MEMORY_MD, DAILY_DIR_NAME
 from storage.jsonl_manage import write_audit_entry
+from storage.session_log import resolve_source
+from storage.sqlite_store import SQLiteStore
+from storage.entry_index import managed_files, refresh as refresh_entry_index
 from core.utils import iso_now, ts_id
 
-_SCRIPTS_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..")
-
 
 def _json_out(status, command, data=None, error=None):
     out = {"status": status, "command": command}
@@ -40,22 +42,29 @@ def _lock_path(memory_dir):
 
 
 def _backup(memory_dir, affected_files, daily_dir, sessions_path):
-    """自动备份受影响的文件到 backups/ 目录"""
+    """
+    自动备份受影响的文件到 backups/ 目录。
+
+    会话段文件按相对路径备份（sessions.jsonl、sessions/seg-*.jsonl），daily 文件备份到 daily/。
+    """
     ts = time.strftime("%Y-%m-%d-%H%M%S")
     backup_dir = os.path.join(memory_dir, "backups", ts)
     os.makedirs(backup_dir, exist_ok=True)
     for fname in affected_files:
-        if fname == SESSIONS_FILE:
-            src = sessions_path
-        else:
-            src = os.path.join(daily_dir, fname)
+        src = _source_path(memory_dir, daily_dir, fname)
         if os.path.isfile(src):
-            dst_dir = backup_dir if fname == SESSIONS_FILE else os.path.join(backup_dir, "daily")
-            os.makedirs(dst_dir, exist_ok=True)
-            shutil.copy2(src, os.path.join(dst_dir, os.path.basename(fname)))
+            rel = fname if resolve_source(memory_dir, fname) else os.path.join(DAILY_DIR_NAME, fname)
+            dst = os.path.join(backup_dir, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(src, dst)
     return backup_dir
 
 
+def _source_path(memory_dir, daily_dir, source_file):
+    """条目 _source_file 对应的文件路径：会话段文件或 daily 文件"""
+    return resolve_source(memory_dir, source_file) or os.path.join(daily_dir, source_file)
+
+
 def _audit(memory_dir, command, scope, before_count, after_count, backup_path=None, success=True, error_msg=None):
     write_audit_entry(memory_dir, {
         "op_id": f"op-{ts_id()}",
@@ -72,18 +81,48 @@ def _audit(memory_dir, command, scope, before_count, after_count, backup_path=No
 
 
 def _sync_index(project_path, full=False):
-    """触发索引同步"""
-    sync_script = os.path.join(_SCRIPTS_ROOT, "service", "memory", "sync_index.py")
-    cmd = [sys.executable, sync_script, "--project-path", project_path]
-    if full:
-        cmd.append("--rebuild")
+    """在进程内触发索引同步（批量写入路径），无 60 秒子进程超时限制"""
+    from service.memory.sync_index import sync_all
+    from service.logger import redirect_to_project
+
+    memory_dir, _, _ = _paths(project_path)
+    if not os.path.isdir(memory_dir):
+        return False
+    redirect_to_project(project_path)
     try:
-        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        return proc.returncode == 0
+        sync_all(memory_dir, rebuild=full, project_path=project_path)
+        return True
     except Exception:
         return False
 
 
+@contextmanager
+def _stats_store(memory_dir, daily_dir):
+    """
+    打开带最新 entry_stats 汇总的 SQLiteStore：只重扫指纹变化的文件。
+
+    index.sqlite 不存在或无法打开时在内存库中全量统计，不在磁盘上创建索引。
+    """
+    files = managed_files(memory_dir, daily_dir)
+    idx_path = os.path.join(memory_dir, INDEX_DB)
+    store = None
+    if os.path.isfile(idx_path):
+        try:
+            store = SQLiteStore(idx_path)
+            refresh_entry_index(store, files)
+        except sqlite3.DatabaseError:
+            if store is not None:
+                store.close()
+            store = None
+    if store is None:
+        store = SQLiteStore(":memory:")
+        refresh_entry_index(store, files)
+    try:
+        yield store
+    finally:
+        store.close()
+
+
 def _parse_value(raw):
     if raw.lower() in ("true", "false"):
         return raw.lower() == "true"
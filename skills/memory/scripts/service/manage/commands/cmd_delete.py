@@ -5,8 +5,8 @@ import shutil
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../.."))
 
-from service.config import SESSIONS_FILE
-from storage.jsonl_manage import read_all_entries, filter_entries, soft_delete_entries, restore_entries, purge_entries
+from service.config import SESSIONS_FILE, SESSIONS_DIR_NAME
+from storage.jsonl_manage import read_all_entries, filter_entries, date_bounds, soft_delete_entries, restore_entries, purge_entries
 from core.file_lock import FileLock
 
 from ._helpers import _json_out, _paths, _lock_path, _backup, _audit, _sync_index
@@ -18,13 +18,16 @@ def cmd_delete(args):
     scope = args.scope or "daily"
     include_deleted = False
 
-    entries = read_all_entries(daily_dir, sessions_path, scope=scope, include_deleted=include_deleted)
+    date_from, date_to = (None, None) if args.all_flag else \
+        date_bounds(getattr(args, "from_date", None), args.to, args.before)
+    entries = read_all_entries(daily_dir, sessions_path, scope=scope, include_deleted=include_deleted,
+                               date_from=date_from, date_to=date_to)
     if args.all_flag:
         matched = entries
     else:
         matched = filter_entries(
             entries, keyword=args.keyword, entry_id=args.id, entry_type=args.type,
-            date_from=getattr(args, "from_date", None), date_to=args.to, before=args.before,
+            date_from=date_from, date_to=date_to,
         )
 
     if not matched:
@@ -59,7 +62,8 @@ def cmd_delete(args):
             mode = "soft"
             count = result["deleted"]
 
-        after_entries = read_all_entries(daily_dir, sessions_path, scope=scope, include_deleted=False)
+        after_entries = read_all_entries(daily_dir, sessions_path, scope=scope, include_deleted=False,
+                                         date_from=date_from, date_to=date_to)
 
     synced = False
     if not args.no_sync:
@@ -98,6 +102,13 @@ def cmd_restore(args):
             if os.path.isfile(sess_bk):
                 shutil.copy2(sess_bk, sessions_path)
                 restored += 1
+            seg_bk = os.path.join(backup_dir, SESSIONS_DIR_NAME)
+            if os.path.isdir(seg_bk):
+                seg_dir = os.path.join(memory_dir, SESSIONS_DIR_NAME)
+                os.makedirs(seg_dir, exist_ok=True)
+                for f in os.listdir(seg_bk):
+                    shutil.copy2(os.path.join(seg_bk, f), os.path.join(seg_dir, f))
+                    restored += 1
         synced = _sync_index(project_path)
         _audit(memory_dir, "restore(backup)", "all", 0, 0, args.from_backup)
         _json_out("ok", "restore", {"restored_files": restored, "mode": "from-backup", "index_synced": synced})
@@ -6,13 +6,13 @@ from datetime import datetime, timedelta
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../.."))
 
-from service.config import SESSIONS_FILE, MEMORY_MD
+from service.config import MEMORY_MD
 from storage.jsonl import read_jsonl
 from storage.jsonl_manage import read_all_entries, _rewrite_jsonl, soft_delete_entries, purge_entries
 from core.utils import iso_now
 from core.file_lock import FileLock
 
-from ._helpers import _json_out, _paths, _lock_path, _backup, _audit, _sync_index
+from ._helpers import _json_out, _paths, _lock_path, _backup, _source_path, _audit, _sync_index
 
 
 def cmd_edit(args):
@@ -58,19 +58,12 @@ def cmd_edit(args):
     with FileLock(_lock_path(memory_dir)):
         _backup(memory_dir, [source_file], daily_dir, sessions_path)
 
-        if source_file == SESSIONS_FILE:
-            all_entries = read_jsonl(sessions_path)
-            for e in all_entries:
-                if e.get("id") == args.id:
-                    e.update(updates)
-            _rewrite_jsonl(sessions_path, all_entries)
-        else:
-            fpath = os.path.join(daily_dir, source_file)
-            all_entries = read_jsonl(fpath)
-            for e in all_entries:
-                if e.get("id") == args.id:
-                    e.update(updates)
-            _rewrite_jsonl(fpath, all_entries)
+        fpath = _source_path(memory_dir, daily_dir, source_file)
+        all_entries = read_jsonl(fpath)
+        for e in all_entries:
+            if e.get("id") == args.id:
+                e.update(updates)
+        _rewrite_jsonl(fpath, all_entries)
 
     synced = _sync_index(project_path) if not args.no_sync else False
     _audit(memory_dir, "edit", "daily", 1, 1)
@@ -1,17 +1,18 @@
-"""rebuild-index / doctor 子命令"""
+"""rebuild-index / doctor / vector-eval 子命令"""
 import sys
 import os
-import json
 import glob
 import sqlite3
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../.."))
 
 from service.config import get_config
-from service.config import INDEX_DB
-from storage.jsonl import read_jsonl
+from service.config import INDEX_DB, DAILY_DIR_NAME
+from storage.entry_index import rollup, id_counts, file_counts
+from storage.sqlite_store import SQLiteStore
+from storage.ann_index import evaluate_engine
 
-from ._helpers import _json_out, _paths, _sync_index
+from ._helpers import _json_out, _paths, _sync_index, _stats_store
 
 
 def cmd_rebuild_index(args):
@@ -30,37 +31,13 @@ def cmd_doctor(args):
 
     checks = []
 
-    jsonl_total = 0
-    jsonl_errors = 0
-    all_ids = []
-    if os.path.isdir(daily_dir):
-        for fpath in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl"))):
-            with open(fpath, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    jsonl_total += 1
-                    try:
-                        e = json.loads(line)
-                        if "id" in e:
-                            all_ids.append(e["id"])
-                    except json.JSONDecodeError:
-                        jsonl_errors += 1
-
-    if os.path.isfile(sessions_path):
-        with open(sessions_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                jsonl_total += 1
-                try:
-                    e = json.loads(line)
-                    if "id" in e:
-                        all_ids.append(e["id"])
-                except json.JSONDecodeError:
-                    jsonl_errors += 1
+    # 解析错误、ID 集合与单日条目数来自增量维护的 entry_stats / entry_locations，只重扫变化的文件
+    with _stats_store(memory_dir, daily_dir) as store:
+        counts = rollup(store)
+        id_total, id_unique = id_counts(store)
+        per_file = file_counts(store, "entries")
+    jsonl_errors = counts.get("parse_errors", 0)
+    jsonl_total = counts.get("entries", 0) + jsonl_errors
 
     checks.append({
         "name": "JSONL 可解析性",
@@ -68,12 +45,12 @@ def cmd_doctor(args):
         "detail": f"{jsonl_total} 条, {jsonl_errors} 解析错误" if jsonl_errors else f"{jsonl_total} 条全部有效",
     })
 
-    dup_ids = len(all_ids) - len(set(all_ids))
-    dup_pct = round(dup_ids / max(len(all_ids), 1) * 100, 1)
+    dup_ids = id_total - id_unique
+    dup_pct = round(dup_ids / max(id_total, 1) * 100, 1)
     checks.append({
         "name": "ID 唯一性",
         "status": "pass" if dup_pct < 1 else "warn",
-        "detail": f"{len(set(all_ids))} 个 ID, {dup_ids} 重复 ({dup_pct}%)" if dup_ids else f"{len(set(all_ids))} 个 ID 无重复",
+        "detail": f"{id_unique} 个 ID, {dup_ids} 重复 ({dup_pct}%)" if dup_ids else f"{id_unique} 个 ID 无重复",
     })
 
     idx_path = os.path.join(memory_dir, INDEX_DB)
@@ -122,11 +99,7 @@ def cmd_doctor(args):
         "detail": f"{model_name} {'存在' if model_exists else '不存在'}",
     })
 
-    daily_counts = {}
-    if os.path.isdir(daily_dir):
-        for fpath in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl"))):
-            day = os.path.basename(fpath).replace(".jsonl", "")
-            daily_counts[day] = len(read_jsonl(fpath))
+    daily_counts = {key: n for key, n in per_file.items() if key.startswith(DAILY_DIR_NAME + "/")}
     max_daily = max(daily_counts.values()) if daily_counts else 0
     checks.append({
         "name": "单日写入异常",
@@ -139,3 +112,25 @@ def cmd_doctor(args):
         summary[c["status"]] = summary.get(c["status"], 0) + 1
 
     _json_out("ok", "doctor", {"checks": checks, "summary": summary})
+
+
+def cmd_vector_eval(args):
+    """对比当前向量引擎与精确检索的 recall@k 与延迟，确认切换引擎不损失召回质量"""
+    project_path = args.project_path
+    memory_dir, _, _ = _paths(project_path)
+    idx_path = os.path.join(memory_dir, INDEX_DB)
+    if not os.path.isfile(idx_path):
+        _json_out("error", "vector-eval", error={"code": "INDEX_NOT_FOUND", "message": "index.sqlite 不存在"})
+        sys.exit(2)
+
+    cfg = get_config(project_path)
+    engine = args.engine or cfg.get("index.vector_engine")
+    store = SQLiteStore(idx_path, vector_engine=engine, ivf_nprobe=args.nprobe or cfg.get("index.ivf_nprobe"))
+    try:
+        vectors = store.vector_index()
+        report = evaluate_engine(vectors, k=args.k, samples=args.samples)
+        report["engine"] = engine
+        report["ann_loaded"] = vectors._ann is not None
+    finally:
+        store.close()
+    _json_out("ok", "vector-eval", report)
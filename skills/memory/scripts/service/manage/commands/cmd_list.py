@@ -3,14 +3,14 @@ import sys
 import os
 import glob
 import sqlite3
-from datetime import datetime, timedelta
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../.."))
 
 from service.config import get_config
-from service.config import SESSIONS_FILE, INDEX_DB, MEMORY_MD
+from service.config import INDEX_DB, MEMORY_MD
 from storage.jsonl import read_jsonl
-from storage.jsonl_manage import read_all_entries, filter_entries
+from storage.jsonl_manage import read_all_entries, filter_entries, date_bounds
+from storage.session_log import count_sessions, last_session, sealed_segments
 
 from ._helpers import _json_out, _paths
 
@@ -21,22 +21,20 @@ def cmd_list(args):
     scope = args.scope or "all"
     include_deleted = getattr(args, "include_deleted", False)
 
-    entries = read_all_entries(daily_dir, sessions_path, scope=scope, include_deleted=include_deleted)
+    # 日期条件下推到读取层：范围外的 daily 文件不会被打开
+    date_from, date_to = date_bounds(getattr(args, "from_date", None), args.to, args.before,
+                                     getattr(args, "days", None))
+    entries = read_all_entries(daily_dir, sessions_path, scope=scope, include_deleted=include_deleted,
+                               date_from=date_from, date_to=date_to)
     entries = filter_entries(
         entries,
         keyword=args.keyword,
         entry_id=args.id,
         entry_type=args.type,
-        date_from=getattr(args, "from_date", None),
-        date_to=args.to,
-        before=args.before,
+        date_from=date_from,
+        date_to=date_to,
     )
 
-    days = getattr(args, "days", None)
-    if days:
-        cutoff = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
-        entries = [e for e in entries if (e.get("timestamp", "") or "")[:10] >= cutoff]
-
     entries.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
     total = len(entries)
 
@@ -95,10 +93,9 @@ def cmd_stats(args):
             else:
                 daily_data["system_events"] += 1
 
-    sess_entries = read_jsonl(sessions_path) if os.path.isfile(sessions_path) else []
-    sess_data = {"count": len(sess_entries)}
-    if sess_entries:
-        last = sess_entries[-1]
+    sess_data = {"count": count_sessions(memory_dir), "segments": len(sealed_segments(memory_dir))}
+    last = last_session(memory_dir)
+    if last:
         sess_data["latest_topic"] = last.get("topic", "")
 
     memory_md_path = os.path.join(memory_dir, MEMORY_MD)
@@ -1,11 +1,10 @@
 """metrics 子命令：统计 Memory Save 各层命中率"""
 import os
-import json
-import glob
 from datetime import timedelta
 
-from ._helpers import _json_out, _paths
-from core.utils import utcnow, parse_iso
+from ._helpers import _json_out, _paths, _stats_store
+from storage.entry_index import rollup
+from core.utils import utcnow
 
 
 def cmd_metrics(args):
@@ -16,7 +15,10 @@ def cmd_metrics(args):
         _json_out("ok", "metrics", data={"error": "daily 目录不存在"})
         return
 
-    cutoff = utcnow() - timedelta(days=days)
+    # 按天汇总计数（entry_stats），统计 cutoff 当天及之后的条目
+    day_from = (utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+    with _stats_store(memory_dir, daily_dir) as store:
+        counts = rollup(store, day_from=day_from, file_prefix="daily/")
 
     layer_counts = {
         "layer1_rules": 0,
@@ -25,36 +27,21 @@ def cmd_metrics(args):
         "layer4_stop": 0,
         "none": 0,
     }
-    total_sessions = 0
-    duplicates_blocked = 0
-
-    for fpath in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl"))):
-        with open(fpath, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    entry = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-
-                ts = parse_iso(entry.get("timestamp", ""))
-                if ts < cutoff:
-                    continue
-
-                if entry.get("type") == "session_metrics":
-                    total_sessions += 1
-                    source = entry.get("summary_source", "none")
-                    if source in layer_counts:
-                        layer_counts[source] += 1
-                    else:
-                        layer_counts["none"] += 1
+    facts = {}
+    for metric, n in counts.items():
+        kind, _, name = metric.partition(":")
+        if kind == "session":
+            key = name if name in layer_counts else "none"
+            layer_counts[key] += n
+        elif kind == "fact":
+            facts[name] = n
+    total_sessions = sum(layer_counts.values())
 
     summary = {
         "days": days,
         "total_sessions": total_sessions,
         "layers": layer_counts,
+        "facts": dict(sorted(facts.items())),
     }
 
     if total_sessions > 0:
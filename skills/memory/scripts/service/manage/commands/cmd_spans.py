@@ -0,0 +1,96 @@
+"""spans 子命令：把计时 span（logs/YYYY-MM-DD.spans.jsonl）按操作名汇总为延迟直方图"""
+import os
+import glob
+from datetime import timedelta
+
+from ._helpers import _json_out, _paths
+from service.logger.tracing import SPANS_SUFFIX
+from storage.jsonl import iter_jsonl
+from core.utils import utcnow
+
+# 直方图桶上界（毫秒），超出最后一个上界的计入 ">10000ms"
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+def _percentile(ordered, pct):
+    """最近秩百分位数，ordered 已升序"""
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[rank - 1]
+
+
+def _bucket(ms):
+    for bound in BUCKETS_MS:
+        if ms <= bound:
+            return f"<={bound}ms"
+    return f">{BUCKETS_MS[-1]}ms"
+
+
+def aggregate(records, name_prefix=None):
+    """
+    按 span 名聚合，返回按总耗时降序的操作列表。
+
+    每项含 count / errors / total_ms / mean_ms / p50_ms / p95_ms / p99_ms / max_ms、
+    非空桶组成的 histogram，以及 attrs：数值属性求和，布尔属性计为 true 的次数。
+    """
+    groups = {}
+    for rec in records:
+        name = rec.get("name")
+        ms = rec.get("ms")
+        if not isinstance(name, str) or not isinstance(ms, (int, float)):
+            continue
+        if name_prefix and not name.startswith(name_prefix):
+            continue
+        g = groups.setdefault(name, {"latencies": [], "errors": 0, "attrs": {}})
+        g["latencies"].append(ms)
+        attrs = rec.get("attrs") or {}
+        if "error" in attrs:
+            g["errors"] += 1
+        for key, value in attrs.items():
+            if isinstance(value, bool):
+                g["attrs"][key] = g["attrs"].get(key, 0) + int(value)
+            elif isinstance(value, (int, float)):
+                g["attrs"][key] = g["attrs"].get(key, 0) + value
+
+    operations = []
+    for name, g in groups.items():
+        ordered = sorted(g["latencies"])
+        total = sum(ordered)
+        histogram = {}
+        for ms in ordered:
+            label = _bucket(ms)
+            histogram[label] = histogram.get(label, 0) + 1
+        operations.append({
+            "name": name,
+            "count": len(ordered),
+            "errors": g["errors"],
+            "total_ms": round(total, 3),
+            "mean_ms": round(total / len(ordered), 3),
+            "p50_ms": _percentile(ordered, 50),
+            "p95_ms": _percentile(ordered, 95),
+            "p99_ms": _percentile(ordered, 99),
+            "max_ms": ordered[-1],
+            "histogram": histogram,
+            "attrs": {k: round(v, 3) for k, v in sorted(g["attrs"].items())},
+        })
+    operations.sort(key=lambda op: op["total_ms"], reverse=True)
+    return operations
+
+
+def cmd_spans(args):
+    memory_dir, _, _ = _paths(args.project_path)
+    days = getattr(args, "days", 7) or 7
+    log_dir = os.path.join(memory_dir, "logs")
+
+    # 与 metrics 一致按天统计：cutoff 当天及之后的 span 文件
+    day_from = (utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+    files = [f for f in sorted(glob.glob(os.path.join(log_dir, f"*{SPANS_SUFFIX}")))
+             if os.path.basename(f)[:10] >= day_from]
+    records = (rec for f in files for rec in iter_jsonl(f))
+    operations = aggregate(records, getattr(args, "name", None))
+
+    _json_out("ok", "spans", data={
+        "days": days,
+        "files": len(files),
+        "total_spans": sum(op["count"] for op in operations),
+        "operations": operations,
+    })
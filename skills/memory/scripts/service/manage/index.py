@@ -2,7 +2,7 @@
 """
 Memory Skill 统一管理工具
 
-子命令: list / stats / delete / restore / edit / export / cleanup / rebuild-index / doctor / config
+子命令: list / stats / delete / restore / edit / export / cleanup / rebuild-index / doctor / vector-eval / metrics / spans / config
 所有输出为 JSON（stdout），错误到 stderr。
 """
 import sys
@@ -19,8 +19,9 @@ from commands._helpers import _json_out
 from commands.cmd_list import cmd_list, cmd_stats
 from commands.cmd_delete import cmd_delete, cmd_restore
 from commands.cmd_edit import cmd_edit, cmd_export, cmd_cleanup
-from commands.cmd_index import cmd_rebuild_index, cmd_doctor
+from commands.cmd_index import cmd_rebuild_index, cmd_doctor, cmd_vector_eval
 from commands.cmd_metrics import cmd_metrics
+from commands.cmd_spans import cmd_spans
 from commands.cmd_config import (
     cmd_config_show,
     cmd_config_get,
@@ -115,10 +116,22 @@ def main():
     # doctor
     sub.add_parser("doctor")
 
+    # vector-eval
+    p = sub.add_parser("vector-eval")
+    p.add_argument("--engine", choices=["brute", "ivf"], help="默认取 index.vector_engine")
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--samples", type=int, default=50)
+    p.add_argument("--nprobe", type=int, help="默认取 index.ivf_nprobe")
+
     # metrics
     p = sub.add_parser("metrics")
     p.add_argument("--days", type=int, default=7, help="统计最近 N 天")
 
+    # spans
+    p = sub.add_parser("spans")
+    p.add_argument("--days", type=int, default=7, help="统计最近 N 天")
+    p.add_argument("--name", help="只统计名称以此开头的 span，如 hook. / search")
+
     # config
     cp = sub.add_parser("config")
     cs = cp.add_subparsers(dest="action")
@@ -166,7 +179,9 @@ def main():
         "cleanup": cmd_cleanup,
         "rebuild-index": cmd_rebuild_index,
         "doctor": cmd_doctor,
+        "vector-eval": cmd_vector_eval,
         "metrics": cmd_metrics,
+        "spans": cmd_spans,
     }
 
     if args.command == "config":
@@ -21,6 +21,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../
 from service.config import MEMORY_MD, get_memory_dir
 from service.config import require_memory_enabled
 from service.memory.session_state import update_session_state
+from service.memory.distill_to_memory import build_dedup_index
 from service.logger import get_logger, redirect_to_project
 
 log = get_logger("distill_refined")
@@ -53,6 +54,33 @@ def build_memory_md(sections: dict) -> str:
     return "\n".join(lines) + "\n"
 
 
+def dedupe_sections(sections: dict):
+    """
+    去掉与前面条目近似重复的条目（判定规则同 distill_to_memory），按写入顺序保留首次出现的条目。
+
+    返回 (去重后的章节字典, 去掉的条目数)。非列表的章节值原样保留。
+    """
+    index = build_dedup_index(())
+    order = [s for s in SECTION_ORDER if s in sections] + [s for s in sections if s not in SECTION_ORDER]
+    result, dropped = {}, 0
+    for section in order:
+        items = sections[section]
+        if not isinstance(items, list):
+            result[section] = items
+            continue
+        kept = []
+        for item in items:
+            text = item.strip() if isinstance(item, str) else ""
+            if text and index.is_duplicate(text):
+                dropped += 1
+                continue
+            if text:
+                index.add(text)
+            kept.append(item)
+        result[section] = kept
+    return result, dropped
+
+
 @require_memory_enabled
 def main():
     parser = argparse.ArgumentParser(description="Write refined memory to MEMORY.md")
@@ -82,6 +110,11 @@ def main():
         print(json.dumps({"status": "skipped", "reason": "empty content"}))
         return
 
+    sections, deduplicated = dedupe_sections(sections)
+    if deduplicated:
+        log.info("精炼内容去重: 去掉 %d 条近似重复条目", deduplicated)
+        total_items -= deduplicated
+
     memory_dir = get_memory_dir(args.project_path)
     memory_md_path = os.path.join(memory_dir, MEMORY_MD)
 
@@ -103,6 +136,7 @@ def main():
     print(json.dumps({
         "status": "ok",
         "total_items": total_items,
+        "deduplicated": deduplicated,
         "sections": {k: len(v) for k, v in sections.items() if isinstance(v, list)},
     }, ensure_ascii=False))
 
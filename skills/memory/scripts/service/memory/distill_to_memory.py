@@ -14,9 +14,10 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../
 
 from service.config import MEMORY_MD, get_memory_dir, get_daily_dir
 from storage.jsonl import read_daily_facts
+from core.dedup import DedupIndex
 from core.utils import utcnow, parse_iso
 from service.memory.session_state import read_session_state
-from service.logger import get_logger, redirect_to_project
+from service.logger import get_logger, redirect_to_project, tracing
 from datetime import timedelta
 
 log = get_logger("distill")
@@ -26,6 +27,10 @@ DISTILL_DEFAULTS = {
     "min_confidence": 0.85,
     "min_age_days": 1,
     "max_items_per_run": 15,
+    # 字符 shingle 的 Jaccard 相似度达到该值视为模糊重复，0 关闭
+    "near_dup_threshold": 0.8,
+    # 嵌入模型已在本进程加载时（如常驻守护进程），余弦相似度达到该值视为语义重复，0 关闭
+    "embedding_dup_threshold": 0.92,
     "keywords_rules": {
         "项目规范": ["原则", "规范", "规则", "必须", "不能", "禁止", "不允许", "约定"],
         "重要决策": ["决定", "选择", "使用", "采用", "方案", "替代", "改为", "切换"],
@@ -59,15 +64,32 @@ def _flatten_existing(sections):
     return items
 
 
+def build_dedup_index(existing, config=None):
+    """
+    为已有条目构建近似重复索引（见 core.dedup）。
+
+    嵌入模型已加载时附带语义相似度判定；不会为了去重而加载模型。
+    """
+    config = config or DISTILL_DEFAULTS
+    embed_func = None
+    threshold = config.get("embedding_dup_threshold", DISTILL_DEFAULTS["embedding_dup_threshold"])
+    if threshold:
+        from core import embedding
+        if embedding.is_loaded():
+            embed_func = embedding.embed_batch
+    return DedupIndex(
+        existing,
+        jaccard_threshold=config.get("near_dup_threshold", DISTILL_DEFAULTS["near_dup_threshold"]),
+        embed_func=embed_func,
+        embed_threshold=threshold,
+    )
+
+
 def _is_duplicate(content, existing_set):
-    """检查内容是否与已有条目重复（精确匹配 + 子串包含）"""
-    normalized = content.strip().lower()
-    if normalized in existing_set:
-        return True
-    for existing in existing_set:
-        if len(existing) > 20 and (normalized in existing or existing in normalized):
-            return True
-    return False
+    """检查内容是否与已有条目重复（精确匹配 + 子串包含 + 模糊匹配）"""
+    if not isinstance(existing_set, DedupIndex):
+        existing_set = build_dedup_index(existing_set)
+    return existing_set.is_duplicate(content)
 
 
 def _classify(fact, keywords_rules):
@@ -88,10 +110,16 @@ def _classify(fact, keywords_rules):
 
 
 def select_candidates(daily_dir, existing_set, config):
-    """从 daily 中筛选符合提炼条件的事实"""
+    """
+    从 daily 中筛选符合提炼条件的事实。
+
+    existing_set 可以是条目集合或 DedupIndex；入选的事实会加入索引，
+    同一批次内互相重复的事实只保留一条。
+    """
     all_facts = read_daily_facts(daily_dir)
     if not all_facts:
         return []
+    index = existing_set if isinstance(existing_set, DedupIndex) else build_dedup_index(existing_set, config)
 
     now = utcnow()
     min_age = timedelta(days=config["min_age_days"])
@@ -114,9 +142,10 @@ def select_candidates(daily_dir, existing_set, config):
         if (now - ts) < min_age:
             continue
 
-        if _is_duplicate(fact["content"], existing_set):
+        if index.is_duplicate(fact["content"]):
             continue
 
+        index.add(fact["content"])
         candidates.append(fact)
 
     candidates.sort(key=lambda x: (
@@ -173,6 +202,7 @@ def write_to_memory_md(path, section_items):
         f.writelines(lines)
 
 
+@tracing.traced("distill")
 def distill(project_path, config=None, session_id=None):
     """主入口：从 daily 提炼高价值事实到 MEMORY.md。
     如果当前会话已由 Agent 精炼（distilled=true），则跳过。"""
@@ -202,6 +232,7 @@ def distill(project_path, config=None, session_id=None):
     existing_set = _flatten_existing(sections)
 
     candidates = select_candidates(daily_dir, existing_set, config)
+    tracing.add(existing=len(existing_set), candidates=len(candidates))
     if not candidates:
         log.info("无新事实需要提炼")
         return 0
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+后台任务队列：Hook 把重任务写入 memory-data/jobs/ 后立即返回，由 worker 异步执行。
+
+- 去重：任务文件以 key 命名（默认即任务类型），重复入队只会覆盖同一个文件，
+  短时间内多次 sessionEnd 只触发一次索引同步。
+- worker：jobs.background 默认关闭，入队后在 Hook 进程内直接消费；开启后常驻守护进程
+  运行时由其后台线程消费，否则拉起一个独立 worker 进程。
+  消费前获取 jobs/.worker.lock，同一时刻只有一个 worker 在执行。
+- 并发：任务按 lane 分组，同一 lane 内按 order 顺序执行（如先同步索引再淘汰旧的会话段），
+  不同 lane 由线程池并行执行，最多 jobs.max_workers 个。
+- 崩溃恢复：worker 持锁后发现的 *.running 文件是上一个 worker 遗留的，重新放回队列。
+
+用法：
+    job_queue.py run|status|wait --project-path <项目路径>
+"""
+import sys
+import os
+import json
+import time
+import glob
+import argparse
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
+
+from core.file_lock import FileLock
+from core.utils import iso_now
+from service.config import JOBS_DIR_NAME, Config, get_memory_dir
+from service.logger import get_logger, redirect_to_project, tracing
+
+log = get_logger("jobs")
+
+LOCK_NAME = ".worker.lock"
+_RUNNING = ".running"
+
+
+# --- 任务定义 ---
+
+def _job_sync_index(project_path, memory_dir, payload):
+    from service.memory.sync_index import sync_all
+    return {"total": sync_all(memory_dir, project_path=project_path)}
+
+
+def _job_truncate_sessions(project_path, memory_dir, payload):
+    from service.hooks.sync_and_cleanup import truncate_sessions
+    cfg = Config(project_path)
+    truncate_sessions(memory_dir, cfg.get("sessions.keep_last"), cfg.get("sessions.segment_entries"))
+
+
+def _job_refresh_snapshot(project_path, memory_dir, payload):
+    from storage.facts_snapshot import refresh_snapshot
+    return {"reparsed": refresh_snapshot(memory_dir)}
+
+
+def _job_clean_logs(project_path, memory_dir, payload):
+    from service.hooks.sync_and_cleanup import clean_old_logs
+    clean_old_logs(project_path)
+
+
+def _job_clean_session_states(project_path, memory_dir, payload):
+    from service.hooks.sync_and_cleanup import clean_old_session_states
+    clean_old_session_states(memory_dir)
+
+
+# 任务类型 → (lane, lane 内顺序, 处理函数)
+JOBS = {
+    "sync_index": ("index", 0, _job_sync_index),
+    "truncate_sessions": ("index", 1, _job_truncate_sessions),
+    "refresh_snapshot": ("snapshot", 0, _job_refresh_snapshot),
+    "clean_logs": ("cleanup", 0, _job_clean_logs),
+    "clean_session_states": ("cleanup", 1, _job_clean_session_states),
+}
+
+
+# --- 入队 ---
+
+def jobs_dir(memory_dir):
+    return os.path.join(memory_dir, JOBS_DIR_NAME)
+
+
+def enqueue(memory_dir, kind, payload=None, key=None):
+    """写入一个任务文件并返回其路径；同一 key 已在队列中时覆盖（即去重）"""
+    if kind not in JOBS:
+        raise ValueError(f"未知任务类型: {kind}")
+    spool = jobs_dir(memory_dir)
+    os.makedirs(spool, exist_ok=True)
+    path = os.path.join(spool, f"{key or kind}.json")
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"kind": kind, "payload": payload or {}, "enqueued_at": iso_now()}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
+
+
+def pending(memory_dir):
+    """队列中等待执行的任务文件"""
+    return sorted(glob.glob(os.path.join(jobs_dir(memory_dir), "*.json")))
+
+
+def running(memory_dir):
+    return sorted(glob.glob(os.path.join(jobs_dir(memory_dir), "*.json" + _RUNNING)))
+
+
+# --- 执行 ---
+
+def _claim_all(memory_dir):
+    """把所有待执行任务改名为 *.running 后读出；改名之后再入队的同 key 任务会留到下一轮"""
+    claimed = []
+    for path in pending(memory_dir):
+        run_path = path + _RUNNING
+        try:
+            os.replace(path, run_path)
+            with open(run_path, "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("任务文件无效，丢弃 %s: %s", os.path.basename(path), e)
+            _remove(run_path)
+            continue
+        if job.get("kind") not in JOBS:
+            log.warning("未知任务类型，丢弃 %s", job.get("kind"))
+            _remove(run_path)
+            continue
+        job["_path"] = run_path
+        claimed.append(job)
+    return claimed
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _run_lane(project_path, memory_dir, jobs):
+    results = []
+    for job in sorted(jobs, key=lambda j: JOBS[j["kind"]][1]):
+        kind = job["kind"]
+        t0 = time.time()
+        try:
+            with tracing.span(f"job.{kind}"):
+                result = JOBS[kind][2](project_path, memory_dir, job.get("payload") or {})
+            results.append({"kind": kind, "ok": True, "result": result})
+            log.info("任务完成 %s (耗时 %.2fs)", kind, time.time() - t0)
+        except Exception as e:
+            results.append({"kind": kind, "ok": False, "error": f"{type(e).__name__}: {e}"})
+            log.exception("任务失败 %s", kind)
+        finally:
+            _remove(job["_path"])
+    return results
+
+
+def run_pending(project_path, max_workers=None):
+    """
+    持锁消费队列直到为空，返回执行结果列表；其他 worker 正在消费时立即返回 None。
+
+    队列目录不存在（从未入队，或项目已删除）时直接返回空列表，不为它建出目录。
+    """
+    memory_dir = get_memory_dir(project_path)
+    if not os.path.isdir(jobs_dir(memory_dir)):
+        return []
+    if max_workers is None:
+        max_workers = Config(project_path).get("jobs.max_workers")
+    lock = FileLock(os.path.join(jobs_dir(memory_dir), LOCK_NAME), timeout=0)
+    if not lock.acquire():
+        return None
+    try:
+        for path in running(memory_dir):
+            # 持锁时仍存在的 running 文件来自崩溃的 worker
+            log.warning("恢复中断的任务 %s", os.path.basename(path))
+            os.replace(path, path[:-len(_RUNNING)])
+
+        results = []
+        while True:
+            claimed = _claim_all(memory_dir)
+            if not claimed:
+                break
+            lanes = {}
+            for job in claimed:
+                lanes.setdefault(JOBS[job["kind"]][0], []).append(job)
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(lanes)))) as pool:
+                for lane_results in pool.map(lambda jobs: _run_lane(project_path, memory_dir, jobs),
+                                             lanes.values()):
+                    results.extend(lane_results)
+        return results
+    finally:
+        lock.release()
+
+
+def drain(project_path, max_workers=None):
+    """
+    消费队列直到为空。
+
+    释放锁之后再检查一次队列：入队方拉起的 worker 若因锁被占用而退出，
+    它入队的任务会在这里被看到，不会滞留到下一次 Hook。
+    """
+    memory_dir = get_memory_dir(project_path)
+    results = []
+    while True:
+        batch = run_pending(project_path, max_workers)
+        if batch is None:
+            return results  # 其他 worker 持锁，由它在释放后完成复查
+        results.extend(batch)
+        if not pending(memory_dir):
+            return results
+
+
+def spawn_worker(project_path):
+    """以独立会话后台启动 worker 进程，不等待其完成"""
+    cmd = [sys.executable, os.path.abspath(__file__), "run", "--project-path", project_path]
+    subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True, close_fds=True,
+    )
+
+
+def submit(project_path, kinds):
+    """
+    入队一组任务并安排执行，返回执行方式："daemon" / "worker" / "inline"。
+
+    jobs.background 关闭时在当前进程内立即执行。
+    """
+    from service.memory.memory_daemon import request as daemon_request
+
+    memory_dir = get_memory_dir(project_path)
+    for kind in kinds:
+        enqueue(memory_dir, kind)
+    if not Config(project_path).get("jobs.background"):
+        drain(project_path)
+        return "inline"
+    if daemon_request(memory_dir, {"op": "jobs"}, timeout=2.0) is not None:
+        return "daemon"
+    spawn_worker(project_path)
+    return "worker"
+
+
+def _worker_active(memory_dir):
+    """是否有 worker 持有 .worker.lock（队列清空后 worker 仍会做最后一次复查才退出）"""
+    path = os.path.join(jobs_dir(memory_dir), LOCK_NAME)
+    if not os.path.exists(path):
+        return False
+    lock = FileLock(path, timeout=0)
+    if not lock.acquire():
+        return True
+    lock.release()
+    return False
+
+
+def wait_idle(memory_dir, timeout=60.0, interval=0.1):
+    """等待队列清空、没有正在执行的任务且 worker 已释放锁；超时返回 False"""
+    deadline = time.monotonic() + timeout
+    while pending(memory_dir) or running(memory_dir) or _worker_active(memory_dir):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+
+@tracing.traced("cli.job_queue")
+def main():
+    """CLI 入口：run 消费队列 / status 查看队列 / wait 等待队列清空"""
+    parser = argparse.ArgumentParser(description="Memory job queue")
+    parser.add_argument("action", choices=["run", "status", "wait"])
+    parser.add_argument("--project-path", default=os.getcwd())
+    parser.add_argument("--timeout", type=float, default=60.0, help="wait 的超时秒数")
+    args = parser.parse_args()
+
+    project_path = os.path.abspath(args.project_path)
+    redirect_to_project(project_path)
+    memory_dir = get_memory_dir(project_path)
+
+    if args.action == "run":
+        results = drain(project_path)
+        print(json.dumps({"executed": len(results),
+                          "failed": sum(1 for r in results if not r["ok"])}, ensure_ascii=False))
+    elif args.action == "status":
+        print(json.dumps({
+            "pending": [os.path.basename(p)[:-len(".json")] for p in pending(memory_dir)],
+            "running": [os.path.basename(p)[:-len(".json" + _RUNNING)] for p in running(memory_dir)],
+        }, ensure_ascii=False))
+    elif args.action == "wait":
+        idle = wait_idle(memory_dir, args.timeout)
+        print(json.dumps({"idle": idle}))
+        sys.exit(0 if idle else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+常驻记忆守护进程：在 Unix socket 上提供 search / embed / sync，保持嵌入模型与向量矩阵常驻。
+
+使用场景：search_memory.py、sync_index.py 每次启动新解释器都要重新加载模型（数秒）。
+守护进程运行时，这些脚本作为瘦客户端把请求转发过来；未运行时自动回退进程内执行。
+空闲超过 daemon.idle_timeout 秒后自动退出。
+
+并发：daemon.lock（与 socket 同目录）在守护进程存活期间一直持有，启动互斥，
+只有持锁者才会清理残留 socket 并绑定。sync 在独立线程执行（同一时刻至多一个），
+不阻塞 search；其余请求在主线程串行处理，客户端等待超时后回退进程内执行。
+
+协议：每个连接一个请求，请求与响应各为一行 JSON。
+    请求 {"op": "search" | "embed" | "sync" | "jobs" | "ping" | "shutdown", ...参数}
+    响应 {"ok": true, "result": ...} 或 {"ok": false, "error": "..."}
+
+用法：
+    memory_daemon.py start|run|stop|status --project-path <项目路径>
+"""
+import sys
+import os
+import json
+import time
+import signal
+import socket
+import hashlib
+import tempfile
+import threading
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
+
+from core.file_lock import FileLock
+from service.config import INDEX_DB, Config, get_memory_dir
+from service.logger import get_logger, redirect_to_project, tracing
+
+log = get_logger("daemon")
+
+SOCKET_NAME = "daemon.sock"
+_BACKGROUND_OPS = {"sync"}  # 耗时操作，在独立线程执行
+_MAX_SOCKET_PATH = 100  # sockaddr_un.sun_path 上限约 104~108 字节
+_POLL_INTERVAL = 1.0
+
+
+def socket_path(memory_dir):
+    """守护进程 socket 路径：优先放在 memory-data 下，路径过长时退到临时目录"""
+    path = os.path.join(os.path.abspath(memory_dir), SOCKET_NAME)
+    if len(path.encode("utf-8")) <= _MAX_SOCKET_PATH:
+        return path
+    digest = hashlib.sha1(os.path.abspath(memory_dir).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"memory-{os.getuid()}-{digest}.sock")
+
+
+def lock_path(memory_dir):
+    """启动锁路径：与 socket 同目录同名，扩展名为 .lock"""
+    return os.path.splitext(socket_path(memory_dir))[0] + ".lock"
+
+
+# --- 客户端 ---
+
+def request(memory_dir, payload, timeout=30.0):
+    """
+    向守护进程发送一个请求并返回 result。
+
+    守护进程未运行、连接失败、超时或返回错误时返回 None，由调用方回退进程内执行。
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = socket_path(memory_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            sock.shutdown(socket.SHUT_WR)
+            chunks = []
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                chunks.append(data)
+        response = json.loads(b"".join(chunks).decode("utf-8"))
+    except (OSError, ValueError) as e:
+        log.debug("守护进程不可用，回退进程内执行: %s", e)
+        return None
+    if not response.get("ok"):
+        log.warning("守护进程处理 %s 失败: %s", payload.get("op"), response.get("error"))
+        return None
+    return response.get("result")
+
+
+def spawn(project_path):
+    """以独立会话后台启动守护进程，不等待其就绪"""
+    cmd = [sys.executable, os.path.abspath(__file__), "run", "--project-path", project_path]
+    subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True, close_fds=True,
+    )
+
+
+def maybe_autostart(project_path, cfg):
+    """daemon.autostart 开启且守护进程未运行时后台拉起，供下一次调用复用"""
+    if not cfg.get("daemon.autostart") or not hasattr(socket, "AF_UNIX"):
+        return
+    if request(get_memory_dir(project_path), {"op": "ping"}, timeout=1.0) is None:
+        log.info("守护进程未运行，后台启动")
+        spawn(project_path)
+
+
+# --- 服务端 ---
+
+class MemoryDaemon:
+    """
+    主线程串行处理请求，常驻的 SQLite 连接只在主线程使用；
+    sync 交给独立线程执行（自行打开连接），以 _sync_lock 保证同一时刻只有一个。
+    """
+
+    def __init__(self, project_path, idle_timeout=None):
+        self.project_path = project_path
+        self.memory_dir = get_memory_dir(project_path)
+        self.path = socket_path(self.memory_dir)
+        self.idle_timeout = idle_timeout
+        self._store = None
+        self._store_key = None
+        self._running = False
+        self._last_active = time.monotonic()
+        self._jobs_thread = None
+        self._lock = None
+        self._sync_lock = threading.Lock()
+        self._workers = []
+        self._reopen_store = False
+
+    def _config(self):
+        # 每个请求重新读取，配置修改无需重启守护进程
+        return Config(self.project_path)
+
+    def _get_store(self, cfg):
+        """常驻 SQLiteStore；索引文件被重建（inode 变化）或引擎配置变化时重新打开"""
+        from storage.sqlite_store import SQLiteStore
+
+        db_path = os.path.join(self.memory_dir, INDEX_DB)
+        key = (os.stat(db_path).st_ino, cfg.get("index.vector_engine"), cfg.get("index.ivf_nprobe"))
+        if self._store is None or self._store_key != key or self._reopen_store:
+            self._reopen_store = False
+            self._close_store()
+            self._store = SQLiteStore(db_path, vector_engine=key[1], ivf_nprobe=key[2])
+            self._store_key = key
+        return self._store
+
+    def _close_store(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    # --- 操作 ---
+
+    def op_search(self, req):
+        from service.memory.search_memory import run_search
+
+        if not os.path.exists(os.path.join(self.memory_dir, INDEX_DB)):
+            raise FileNotFoundError("index.sqlite 不存在")
+        cfg = self._config()
+        params = {k: req.get(k) for k in ("query", "method", "max_results", "include_stage",
+                                          "days", "from_date", "to_date") if k in req}
+        return run_search(self._get_store(cfg), self.memory_dir, cfg, **params)
+
+    def op_embed(self, req):
+        from service.memory.sync_index import _get_embed_func
+        from storage.embedding_cache import open_cache
+
+        cfg = self._config()
+        model = cfg.get("embedding.model")
+        cache = open_cache(self.memory_dir, model, cfg.get("embedding.cache_max_entries"))
+        try:
+            embed = _get_embed_func(model, cfg.get("embedding.batch_size"), cache)
+            return {"model": model, "vectors": embed(list(req.get("texts") or []))}
+        finally:
+            if cache:
+                cache.close()
+
+    def op_sync(self, req):
+        from service.memory.sync_index import sync_all
+
+        rebuild = bool(req.get("rebuild"))
+        with self._sync_lock:
+            total = sync_all(self.memory_dir, rebuild=rebuild, project_path=self.project_path)
+        if rebuild:
+            self._reopen_store = True  # 常驻连接属于主线程，由其下次使用时重新打开
+        return {"total": total}
+
+    def op_jobs(self, req):
+        """
+        在后台线程消费任务队列（见 job_queue），立即返回。
+
+        已有线程在消费时新线程拿不到 worker 锁会立即退出，新任务由持锁线程释放锁后的复查处理。
+        """
+        from service.memory.job_queue import drain
+
+        self._jobs_thread = threading.Thread(target=drain, args=(self.project_path,), daemon=True)
+        self._jobs_thread.start()
+        return {"started": True}
+
+    def op_ping(self, req):
+        return {"pid": os.getpid(), "project_path": self.project_path}
+
+    def op_shutdown(self, req):
+        self._running = False
+        return {"pid": os.getpid()}
+
+    def handle(self, req):
+        """分派一个请求，返回响应 dict"""
+        handler = getattr(self, f"op_{req.get('op')}", None) if isinstance(req, dict) else None
+        if handler is None:
+            return {"ok": False, "error": f"未知操作: {req.get('op') if isinstance(req, dict) else req!r}"}
+        try:
+            return {"ok": True, "result": handler(req)}
+        except Exception as e:
+            log.exception("处理 %s 失败", req.get("op"))
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    def _serve_connection(self, conn):
+        """读取一个请求；耗时操作交给独立线程应答，其余在当前线程应答"""
+        try:
+            conn.settimeout(30.0)
+            chunks = []
+            while True:
+                data = conn.recv(65536)
+                if not data:
+                    break
+                chunks.append(data)
+                if data.endswith(b"\n"):
+                    break
+            try:
+                req = json.loads(b"".join(chunks).decode("utf-8"))
+            except ValueError as e:
+                self._send(conn, {"ok": False, "error": f"请求不是合法 JSON: {e}"})
+                conn.close()
+                return
+        except BaseException:
+            conn.close()
+            raise
+        if isinstance(req, dict) and req.get("op") in _BACKGROUND_OPS:
+            worker = threading.Thread(target=self._respond, args=(conn, req), daemon=True)
+            self._workers = [t for t in self._workers if t.is_alive()] + [worker]
+            worker.start()
+        else:
+            self._respond(conn, req)
+
+    def _respond(self, conn, req):
+        with conn:
+            t0 = time.time()
+            op = req.get("op") if isinstance(req, dict) else None
+            with tracing.span(f"daemon.{op}") as sp:
+                response = self.handle(req)
+                sp.set(ok=response["ok"])
+            log.info("处理 op=%s ok=%s (耗时 %.3fs)", op, response["ok"], time.time() - t0)
+            try:
+                self._send(conn, response)
+            except OSError as e:
+                log.warning("发送 op=%s 的响应失败（客户端可能已超时回退）: %s", op, e)
+            self._last_active = time.monotonic()
+
+    @staticmethod
+    def _send(conn, response):
+        conn.sendall(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def _bind(self):
+        """
+        持 daemon.lock 绑定 socket；锁已被其他守护进程持有（启动中或运行中）时返回 None。
+
+        持锁后仍存在的 socket 文件是崩溃残留（或未持锁的旧版本守护进程），能 ping 通则让路，否则清理。
+        成功时锁一直持有到 serve 退出。
+        """
+        lock = FileLock(lock_path(self.memory_dir), timeout=0)
+        if not lock.acquire():
+            return None
+        try:
+            if os.path.exists(self.path):
+                if request(self.memory_dir, {"op": "ping"}, timeout=1.0) is not None:
+                    lock.release()
+                    return None
+                os.unlink(self.path)
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            old_umask = os.umask(0o177)  # socket 仅当前用户可连接
+            try:
+                server.bind(self.path)
+            finally:
+                os.umask(old_umask)
+            server.listen(16)
+            server.settimeout(_POLL_INTERVAL)
+        except BaseException:
+            lock.release()
+            raise
+        self._lock = lock
+        return server
+
+    def serve(self):
+        """主循环：逐个处理连接，空闲超时或收到 shutdown/SIGTERM 后退出。返回是否成功启动"""
+        server = self._bind()
+        if server is None:
+            log.info("守护进程已在运行 %s", self.path)
+            return False
+
+        self._running = True
+        try:
+            signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_running", False))
+        except ValueError:
+            pass  # 非主线程（如测试中）无法安装信号处理
+        log.info("守护进程启动 pid=%d socket=%s idle_timeout=%ss",
+                 os.getpid(), self.path, self.idle_timeout)
+        try:
+            while self._running:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    busy = any(t.is_alive() for t in self._workers)
+                    if self.idle_timeout and not busy and time.monotonic() - self._last_active > self.idle_timeout:
+                        log.info("空闲超过 %ss，守护进程退出", self.idle_timeout)
+                        break
+                    continue
+                except InterruptedError:
+                    continue
+                try:
+                    self._serve_connection(conn)
+                except OSError as e:
+                    log.warning("连接处理异常: %s", e)
+                self._last_active = time.monotonic()
+        finally:
+            server.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            for worker in self._workers:
+                worker.join(timeout=600)
+            if self._jobs_thread is not None:
+                self._jobs_thread.join(timeout=60)
+            self._close_store()
+            self._lock.release()
+        return True
+
+
+def main():
+    """CLI 入口：start 后台启动 / run 前台运行 / stop 停止 / status 查询状态"""
+    parser = argparse.ArgumentParser(description="Memory daemon")
+    parser.add_argument("action", choices=["start", "run", "stop", "status"])
+    parser.add_argument("--project-path", default=os.getcwd())
+    parser.add_argument("--idle-timeout", type=int, help="默认取 daemon.idle_timeout")
+    args = parser.parse_args()
+
+    project_path = os.path.abspath(args.project_path)
+    redirect_to_project(project_path)
+    memory_dir = get_memory_dir(project_path)
+    if not hasattr(socket, "AF_UNIX"):
+        print(json.dumps({"status": "error", "error": "当前平台不支持 Unix socket"}))
+        sys.exit(1)
+
+    if args.action == "run":
+        idle = args.idle_timeout or Config(project_path).get("daemon.idle_timeout")
+        started = MemoryDaemon(project_path, idle).serve()
+        sys.exit(0 if started else 1)
+
+    info = request(memory_dir, {"op": "ping"}, timeout=2.0)
+    if args.action == "status":
+        print(json.dumps({"running": info is not None, "socket": socket_path(memory_dir),
+                          **(info or {})}, ensure_ascii=False))
+    elif args.action == "stop":
+        if info is not None:
+            request(memory_dir, {"op": "shutdown"}, timeout=5.0)
+        print(json.dumps({"stopped": info is not None}))
+    elif args.action == "start":
+        if info is None:
+            spawn(project_path)
+        print(json.dumps({"started": info is None, "socket": socket_path(memory_dir)}))
+
+
+if __name__ == "__main__":
+    main()
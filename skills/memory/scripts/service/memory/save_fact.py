@@ -16,8 +16,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../
 from service.config import get_daily_dir
 from service.config import require_memory_enabled
 from core.utils import iso_now, today_str, ts_id
+from storage.jsonl import append_jsonl
 from service.memory.session_state import update_fact_count
-from service.logger import get_logger, redirect_to_project
+from service.logger import get_logger, redirect_to_project, tracing
 
 log = get_logger("save_fact")
 
@@ -56,6 +57,7 @@ def infer_memory_type(content: str, declared_type: str) -> str:
     return "W"
 
 
+@tracing.traced("cli.save_fact")
 @require_memory_enabled
 def main():
     """
@@ -100,9 +102,7 @@ def main():
         entry["source"] = {"session": args.session}
 
     daily_file = os.path.join(daily_dir, f"{today_str()}.jsonl")
-    line = json.dumps(entry, ensure_ascii=False)
-    with open(daily_file, "a", encoding="utf-8") as f:
-        f.write(line + "\n")
+    append_jsonl(daily_file, entry)
 
     log.info("保存事实 id=%s type=%s → %s", entry["id"], memory_type, daily_file)
 
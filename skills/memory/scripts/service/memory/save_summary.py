@@ -12,13 +12,14 @@ import argparse
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
 
-from service.config import get_memory_dir
+from service.config import Config, get_memory_dir
 from service.config import SESSIONS_FILE, CURRENT_SESSION_FILE
 from service.config import require_memory_enabled
 from core.utils import iso_now, ts_id
 from core.file_lock import FileLock
-from service.memory.session_state import save_summary_atomic, SaveResult, _sessions_lock_path, mark_summary_saved
-from service.logger import get_logger, redirect_to_project
+from storage.session_log import append_session, sessions_lock_path
+from service.memory.session_state import save_summary_atomic, SaveResult, mark_summary_saved
+from service.logger import get_logger, redirect_to_project, tracing
 
 log = get_logger("save_summary")
 
@@ -38,6 +39,7 @@ def _mark_real_conv_id(memory_dir: str, custom_session: str, source: str):
         pass
 
 
+@tracing.traced("cli.save_summary")
 @require_memory_enabled
 def main():
     """
@@ -92,10 +94,10 @@ def main():
     }
 
     sessions_file = os.path.join(memory_dir, SESSIONS_FILE)
+    segment_entries = Config(args.project_path).get("sessions.segment_entries")
 
     def do_write():
-        with open(sessions_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        append_session(memory_dir, entry, segment_entries)
 
     if args.session:
         result = save_summary_atomic(memory_dir, args.session, args.source, do_write)
@@ -109,7 +111,7 @@ def main():
             print(json.dumps({"status": "error", "reason": result.reason}))
             return
     else:
-        with FileLock(_sessions_lock_path(memory_dir), timeout=5):
+        with FileLock(sessions_lock_path(memory_dir), timeout=5):
             do_write()
 
     if args.session:
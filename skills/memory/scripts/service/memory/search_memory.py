@@ -4,6 +4,8 @@ Agent 搜索工具：在 SQLite 索引中检索历史记忆。
 
 使用场景：由 memory-rules 或 SKILL 引导 Agent 在需要时调用，支持 hybrid/FTS/vector
 三种检索方式。依赖 sync_index.py 预先构建的 index.sqlite。
+常驻守护进程运行时作为瘦客户端转发请求，省去每次查询的模型加载。
+同一索引版本下的重复查询命中结果缓存（storage/query_cache.py），不生成查询向量也不打分。
 """
 import sys
 import os
@@ -16,15 +18,119 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../
 from service.config import get_memory_dir
 from service.config import INDEX_DB, Config
 from storage.sqlite_store import SQLiteStore
-from service.logger import get_logger, redirect_to_project
+from storage.embedding_cache import open_cache
+from storage import query_cache
+from service.memory.memory_daemon import request as daemon_request, maybe_autostart
+from service.logger import get_logger, redirect_to_project, tracing
 
 log = get_logger("search")
 
 
+@tracing.traced("embed_query")
+def embed_query(memory_dir, cfg, query):
+    """
+    生成查询向量：先查嵌入缓存，命中则无需加载模型。
+
+    模型不可用或加载异常时返回 None。
+    """
+    emb_model = cfg.get("embedding.model")
+    cache = open_cache(memory_dir, emb_model, cfg.get("embedding.cache_max_entries"))
+    try:
+        from core.embedding import embed_text, is_available
+        query_embedding = cache.get_many([query])[0] if cache else None
+        tracing.set_attrs(cache_hit=query_embedding is not None)
+        if query_embedding is not None:
+            log.info("查询向量命中嵌入缓存")
+        elif is_available(emb_model):
+            query_embedding = embed_text(query, emb_model)
+            if cache and query_embedding:
+                cache.put_many([query], [query_embedding])
+            log.info("使用嵌入模型生成查询向量")
+        return query_embedding
+    except Exception as e:
+        log.warning("嵌入模型加载异常: %s，回退到 FTS", e)
+        return None
+    finally:
+        if cache:
+            cache.close()
+
+
+@tracing.traced("search")
+def run_search(store, memory_dir, cfg, query, method="hybrid", max_results=10,
+               include_stage=False, days=None, from_date=None, to_date=None):
+    """
+    执行一次检索，返回 {"results", "method", "total", "cache"}。
+
+    CLI 进程内执行与常驻守护进程共用此函数，保证两条路径输出一致。
+    cache 为 {"hit": 本次是否命中, "hits": 累计命中, "misses": 累计未命中}；
+    search.cache_max_entries 为 0 时不查缓存，hit 恒为 false。
+    """
+    t0 = time.time()
+
+    max_entries = cfg.get("search.cache_max_entries")
+    key = generation = None
+    if max_entries:
+        key = query_cache.cache_key(query, method, max_results, include_stage, days, from_date, to_date,
+                                    model=cfg.get("embedding.model"), engine=store.vector_engine)
+        generation = store.generation()
+        cached = query_cache.lookup(store, key, generation)
+        if cached is not None:
+            tracing.set_attrs(method=cached["method"], cache_hit=True, results=cached["total"])
+            log.info("搜索命中结果缓存 method=%s query='%s' results=%d (耗时 %.3fs)",
+                     cached["method"], query[:50], cached["total"], time.time() - t0)
+            return dict(cached, cache=dict(query_cache.stats(store), hit=True))
+
+    # hybrid/vector 需要嵌入向量，若模型不可用则回退到 FTS
+    query_embedding = None
+    actual_method = method
+
+    if method in ("hybrid", "vector"):
+        query_embedding = embed_query(memory_dir, cfg, query)
+        if query_embedding is None and method == "vector":
+            log.warning("嵌入模型不可用，回退到 FTS 搜索")
+            actual_method = "fts"
+
+    time_kwargs = dict(days=days, from_date=from_date, to_date=to_date)
+
+    if actual_method == "fts":
+        results = store.search_fts(query, limit=max_results, **time_kwargs)
+        for r in results:
+            r["score"] = round(abs(r.get("rank", 0)), 4)
+            r.pop("rank", None)
+    elif actual_method == "vector" and query_embedding:
+        results = store.search_vector(query_embedding, limit=max_results, **time_kwargs)
+    else:
+        results = store.hybrid_search(query, query_embedding, limit=max_results, **time_kwargs)
+
+    if not include_stage:
+        results = [r for r in results if r.get("memory_type") != "S"]
+
+    elapsed = time.time() - t0
+    tracing.set_attrs(method=actual_method, cache_hit=False, results=len(results))
+    log.info("搜索完成 method=%s query='%s' results=%d (耗时 %.3fs)",
+             actual_method, query[:50], len(results), elapsed)
+
+    output = {
+        "results": results,
+        "method": actual_method,
+        "total": len(results),
+    }
+    if key is not None:
+        # 模型不可用时的降级结果不写入缓存，模型恢复后仍走正常检索
+        if query_embedding is not None or method == "fts":
+            query_cache.save(store, key, generation, output, max_entries)
+        output["cache"] = dict(query_cache.stats(store), hit=False)
+    else:
+        output["cache"] = {"hit": False, "hits": 0, "misses": 0}
+    return output
+
+
+@tracing.traced("cli.search_memory")
 def main():
     """
     根据 query 在 index.sqlite 中搜索，输出 JSON 格式结果。
 
+    常驻守护进程（memory_daemon.py）运行时转发给它执行，否则在进程内检索。
     参数：query(必填)、--max-results、--method(hybrid/fts/vector)、--project-path
     退出码：0=有结果，1=无结果，2=索引不存在
     """
@@ -43,8 +149,6 @@ def main():
     redirect_to_project(args.project_path)
 
     cfg = Config(args.project_path)
-    emb_model = cfg.get("embedding.model")
-
     memory_dir = get_memory_dir(args.project_path)
     db_path = os.path.join(memory_dir, INDEX_DB)
 
@@ -54,55 +158,22 @@ def main():
                           "error": "Index not found. Run sync_index.py first."}))
         sys.exit(2)
 
-    store = SQLiteStore(db_path)
-    t0 = time.time()
+    params = dict(query=args.query, method=args.method, max_results=args.max_results,
+                  include_stage=args.include_stage, days=args.days,
+                  from_date=args.from_date, to_date=args.to)
 
-    # hybrid/vector 需要嵌入向量，若模型不可用则回退到 FTS
-    query_embedding = None
-    actual_method = args.method
-
-    if args.method in ("hybrid", "vector"):
+    output = daemon_request(memory_dir, dict(params, op="search"))
+    if output is None:
+        store = SQLiteStore(db_path, vector_engine=cfg.get("index.vector_engine"),
+                            ivf_nprobe=cfg.get("index.ivf_nprobe"))
         try:
-            from core.embedding import embed_text, is_available
-            if is_available(emb_model):
-                query_embedding = embed_text(args.query, emb_model)
-                log.info("使用嵌入模型生成查询向量")
-            elif args.method == "vector":
-                log.warning("嵌入模型不可用，回退到 FTS 搜索")
-                actual_method = "fts"
-        except Exception as e:
-            log.warning("嵌入模型加载异常: %s，回退到 FTS", e)
-            if args.method == "vector":
-                actual_method = "fts"
-
-    time_kwargs = dict(days=args.days, from_date=args.from_date, to_date=args.to)
+            output = run_search(store, memory_dir, cfg, **params)
+        finally:
+            store.close()
+        maybe_autostart(args.project_path, cfg)
 
-    if actual_method == "fts":
-        results = store.search_fts(args.query, limit=args.max_results, **time_kwargs)
-        for r in results:
-            r["score"] = round(abs(r.get("rank", 0)), 4)
-            r.pop("rank", None)
-    elif actual_method == "vector" and query_embedding:
-        results = store.search_vector(query_embedding, limit=args.max_results, **time_kwargs)
-    else:
-        results = store.hybrid_search(args.query, query_embedding, limit=args.max_results, **time_kwargs)
-
-    if not args.include_stage:
-        results = [r for r in results if r.get("memory_type") != "S"]
-
-    store.close()
-    elapsed = time.time() - t0
-
-    log.info("搜索完成 method=%s query='%s' results=%d (耗时 %.3fs)",
-             actual_method, args.query[:50], len(results), elapsed)
-
-    output = {
-        "results": results,
-        "method": actual_method,
-        "total": len(results),
-    }
     print(json.dumps(output, ensure_ascii=False))
-    sys.exit(0 if results else 1)
+    sys.exit(0 if output["results"] else 1)
 
 
 if __name__ == "__main__":
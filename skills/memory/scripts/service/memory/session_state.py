@@ -1,39 +1,152 @@
 """
 会话状态管理模块
 
-统一管理 session_state/ 目录下的会话状态文件，跟踪每个会话的保存状态。
-所有读写操作通过 FileLock 保护并发访问。
+会话状态保存在 memory-data/session_state.sqlite（WAL 模式）的 session_state 表中，
+每个会话一行，跟踪摘要保存状态与 fact/阶段摘要计数。
+
+- 计数与标记都是单条 UPSERT 语句（如 fact_count = fact_count + 1），由 SQLite 保证原子性，
+  高频 save_fact 不再经过文件锁的轮询等待
+- 列之外的字段（如 distilled）以 JSON 存在 extra 列，通用更新在写事务内合并
+- created_at 建有索引，过期清理是一条 DELETE
+- 旧版 session_state/ 目录下的 <session_id>.json 在首次访问时导入并删除
 """
 import os
 import json
+import sqlite3
+from contextlib import closing
 
 from core.file_lock import FileLock
-from core.utils import iso_now
+from core.utils import iso_now, parse_iso
+from service.config import SESSION_STATE_DB
 from service.logger import get_logger
+from storage.session_log import sessions_lock_path
 
 log = get_logger("session_state")
 
+_LEGACY_DIR = "session_state"
+
+_INIT_SQL = """
+CREATE TABLE IF NOT EXISTS session_state (
+    session_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,                     -- ISO 8601（UTC），保留期清理依据
+    updated_at TEXT,
+    summary_saved INTEGER NOT NULL DEFAULT 0,
+    summary_source TEXT,
+    fact_count INTEGER NOT NULL DEFAULT 0,
+    stage_summary_count INTEGER NOT NULL DEFAULT 0,
+    extra TEXT                                    -- 其他字段的 JSON 对象
+);
+CREATE INDEX IF NOT EXISTS idx_session_state_created ON session_state(created_at);
+"""
+
+_COLUMNS = ("session_id", "created_at", "updated_at", "summary_saved", "summary_source",
+            "fact_count", "stage_summary_count")
+
+
+def _db_path(memory_dir: str) -> str:
+    return os.path.join(memory_dir, SESSION_STATE_DB)
+
+
+def _has_state(memory_dir: str) -> bool:
+    """状态库或待导入的旧版目录是否存在（只读路径据此避免顺手建库）"""
+    return os.path.exists(_db_path(memory_dir)) or os.path.isdir(os.path.join(memory_dir, _LEGACY_DIR))
+
+
+def _is_lock_error(e: sqlite3.OperationalError) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
 
-def _state_path(memory_dir: str, session_id: str) -> str:
-    return os.path.join(memory_dir, "session_state", f"{session_id}.json")
 
+def _connect(memory_dir: str) -> sqlite3.Connection:
+    """打开状态库（自动提交模式，写事务显式 BEGIN IMMEDIATE），并导入旧版 JSON 状态文件"""
+    os.makedirs(memory_dir, exist_ok=True)
+    conn = sqlite3.connect(_db_path(memory_dir), timeout=5, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    except sqlite3.OperationalError:
+        pass
+    conn.executescript(_INIT_SQL)
+    if os.path.isdir(os.path.join(memory_dir, _LEGACY_DIR)):
+        _import_legacy(memory_dir, conn)
+    return conn
+
+
+def _normalize_ts(ts) -> str:
+    return parse_iso(ts or "").strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _row_params(session_id: str, state: dict) -> tuple:
+    extra = {k: v for k, v in state.items() if k not in _COLUMNS}
+    return (
+        session_id, _normalize_ts(state.get("created_at")), state.get("updated_at"),
+        1 if state.get("summary_saved") else 0, state.get("summary_source"),
+        int(state.get("fact_count") or 0), int(state.get("stage_summary_count") or 0),
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+    )
+
+
+def _import_legacy(memory_dir: str, conn: sqlite3.Connection):
+    """导入旧版 session_state/*.json（已存在的会话以库中为准），随后删除旧文件与 lock 文件"""
+    legacy_dir = os.path.join(memory_dir, _LEGACY_DIR)
+    rows = []
+    for name in sorted(os.listdir(legacy_dir)):
+        path = os.path.join(legacy_dir, name)
+        if name.endswith(".json") and not name.startswith("."):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                if isinstance(state, dict):
+                    rows.append(_row_params(name[:-len(".json")], state))
+            except (OSError, ValueError) as e:
+                log.warning("旧版会话状态无法解析，丢弃 %s: %s", name, e)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            "INSERT OR IGNORE INTO session_state VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+    for name in os.listdir(legacy_dir):
+        try:
+            os.remove(os.path.join(legacy_dir, name))
+        except OSError:
+            pass
+    try:
+        os.rmdir(legacy_dir)
+    except OSError:
+        pass
+    if rows:
+        log.info("已导入旧版会话状态 %d 个", len(rows))
 
-def _lock_path(memory_dir: str, session_id: str) -> str:
-    return os.path.join(memory_dir, "session_state", f".{session_id}.lock")
+
+def _row_to_state(row) -> dict:
+    state = json.loads(row["extra"]) if row["extra"] else {}
+    for col in _COLUMNS:
+        value = row[col]
+        if value is not None:
+            state[col] = bool(value) if col == "summary_saved" else value
+    return state
+
+
+def _get(conn, session_id: str) -> dict:
+    row = conn.execute("SELECT * FROM session_state WHERE session_id=?", (session_id,)).fetchone()
+    return _row_to_state(row) if row else {}
 
 
 # --- 读取操作（带降级）---
 
 def read_session_state(memory_dir: str, session_id: str) -> dict:
     """读取会话状态，不存在返回空 dict，异常时降级返回空 dict + 日志告警"""
-    path = _state_path(memory_dir, session_id)
-    if not os.path.exists(path):
+    if not _has_state(memory_dir):
         return {}
     try:
-        with FileLock(_lock_path(memory_dir, session_id), timeout=5):
-            with open(path, "r") as f:
-                return json.load(f)
-    except (TimeoutError, json.JSONDecodeError, OSError) as e:
+        with closing(_connect(memory_dir)) as conn:
+            return _get(conn, session_id)
+    except (sqlite3.Error, OSError, ValueError) as e:
         log.warning("读取会话状态失败 session=%s: %s（降级为空状态）", session_id[:12], e)
         return {}
 
@@ -44,86 +157,76 @@ def is_summary_saved(memory_dir: str, session_id: str) -> bool:
     return state.get("summary_saved", False)
 
 
-# --- 写入操作（加锁）---
+# --- 写入操作（单条语句原子更新）---
 
-def mark_summary_saved(memory_dir: str, session_id: str, source: str):
-    """标记该会话摘要已保存（加锁写入）"""
-    state_dir = os.path.join(memory_dir, "session_state")
-    os.makedirs(state_dir, exist_ok=True)
-    try:
-        with FileLock(_lock_path(memory_dir, session_id), timeout=5):
-            path = _state_path(memory_dir, session_id)
-            if os.path.exists(path):
-                with open(path, "r") as f:
-                    state = json.load(f)
-            else:
-                state = {"session_id": session_id, "created_at": iso_now()}
+_MARK_SAVED_SQL = """
+    INSERT INTO session_state(session_id, created_at, updated_at, summary_saved, summary_source)
+    VALUES (?, ?, ?, 1, ?)
+    ON CONFLICT(session_id) DO UPDATE SET
+        summary_saved = 1, summary_source = excluded.summary_source, updated_at = excluded.updated_at
+"""
 
-            state["summary_saved"] = True
-            state["summary_source"] = source
-            state["updated_at"] = iso_now()
 
-            with open(path, "w") as f:
-                json.dump(state, ensure_ascii=False, fp=f)
-    except (TimeoutError, OSError) as e:
+def mark_summary_saved(memory_dir: str, session_id: str, source: str):
+    """标记该会话摘要已保存"""
+    now = iso_now()
+    try:
+        with closing(_connect(memory_dir)) as conn:
+            conn.execute(_MARK_SAVED_SQL, (session_id, now, now, source))
+    except (sqlite3.Error, OSError) as e:
         log.warning("标记摘要已保存失败 session=%s: %s", session_id[:12], e)
 
 
 def update_fact_count(memory_dir: str, session_id: str, memory_type: str):
-    """更新会话状态中的 fact/阶段摘要计数（加锁写入）"""
+    """fact/阶段摘要计数加一（不存在时创建会话状态）"""
     if not session_id:
         return
-    state_dir = os.path.join(memory_dir, "session_state")
-    os.makedirs(state_dir, exist_ok=True)
+    column = "stage_summary_count" if memory_type == "S" else "fact_count"
+    now = iso_now()
     try:
-        with FileLock(_lock_path(memory_dir, session_id), timeout=5):
-            path = _state_path(memory_dir, session_id)
-            if os.path.exists(path):
-                with open(path, "r") as f:
-                    state = json.load(f)
-            else:
-                state = {"session_id": session_id, "summary_saved": False, "created_at": iso_now()}
-
-            if memory_type == "S":
-                state["stage_summary_count"] = state.get("stage_summary_count", 0) + 1
-            else:
-                state["fact_count"] = state.get("fact_count", 0) + 1
-            state["updated_at"] = iso_now()
-
-            with open(path, "w") as f:
-                json.dump(state, ensure_ascii=False, fp=f)
-    except (TimeoutError, OSError) as e:
+        with closing(_connect(memory_dir)) as conn:
+            conn.execute(f"""
+                INSERT INTO session_state(session_id, created_at, updated_at, {column})
+                VALUES (?, ?, ?, 1)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    {column} = {column} + 1, updated_at = excluded.updated_at
+            """, (session_id, now, now))
+    except (sqlite3.Error, OSError) as e:
         log.warning("更新 fact 计数失败 session=%s: %s", session_id[:12], e)
 
 
 def update_session_state(memory_dir: str, session_id: str, updates: dict):
-    """通用更新会话状态字段（加锁 merge 写入）"""
+    """通用更新会话状态字段（写事务内读取、合并、写回）"""
     if not session_id:
         return
-    state_dir = os.path.join(memory_dir, "session_state")
-    os.makedirs(state_dir, exist_ok=True)
     try:
-        with FileLock(_lock_path(memory_dir, session_id), timeout=5):
-            path = _state_path(memory_dir, session_id)
-            if os.path.exists(path):
-                with open(path, "r") as f:
-                    state = json.load(f)
-            else:
-                state = {"session_id": session_id, "created_at": iso_now()}
+        with closing(_connect(memory_dir)) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                state = _get(conn, session_id) or {"created_at": iso_now()}
+                state.update(updates)
+                state["updated_at"] = iso_now()
+                conn.execute("INSERT OR REPLACE INTO session_state VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             _row_params(session_id, state))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    except (sqlite3.Error, OSError) as e:
+        log.warning("更新会话状态失败 session=%s: %s", session_id[:12], e)
 
-            state.update(updates)
-            state["updated_at"] = iso_now()
 
-            with open(path, "w") as f:
-                json.dump(state, ensure_ascii=False, fp=f)
-    except (TimeoutError, OSError) as e:
-        log.warning("更新会话状态失败 session=%s: %s", session_id[:12], e)
+def delete_states_before(memory_dir: str, cutoff: str) -> int:
+    """删除 created_at 早于 cutoff（ISO 8601）的会话状态，返回删除条数"""
+    if not _has_state(memory_dir):
+        return 0
+    with closing(_connect(memory_dir)) as conn:
+        return conn.execute("DELETE FROM session_state WHERE created_at < ?", (cutoff,)).rowcount
 
 
 # --- 全局文件锁（sessions.jsonl 写入串行化）---
 
-def _sessions_lock_path(memory_dir: str) -> str:
-    return os.path.join(memory_dir, ".sessions.lock")
+_sessions_lock_path = sessions_lock_path
 
 
 # --- 原子操作 ---
@@ -152,43 +255,46 @@ class SaveResult:
 def save_summary_atomic(memory_dir: str, session_id: str, source: str,
                         write_fn) -> SaveResult:
     """
-    在会话锁 + 全局文件锁内完成"检查已保存 → 写 sessions.jsonl → 标记已保存"。
+    在状态库写事务 + 全局文件锁内完成"检查已保存 → 写 sessions.jsonl → 标记已保存"。
+
+    BEGIN IMMEDIATE 使同一时刻只有一个写入方能完成检查与标记；write_fn 失败时事务回滚，
+    会话仍保持未保存状态，允许下一层重试。
 
     参数：
         write_fn: callable，无参数，执行实际的 sessions.jsonl 写入。仅在未保存时调用。
     返回：
         SaveResult(status="saved|exists|error", reason="...")
     """
-    state_dir = os.path.join(memory_dir, "session_state")
-    os.makedirs(state_dir, exist_ok=True)
-
     try:
-        with FileLock(_lock_path(memory_dir, session_id), timeout=5):
-            path = _state_path(memory_dir, session_id)
-            if os.path.exists(path):
-                with open(path, "r") as f:
-                    state = json.load(f)
-                if state.get("summary_saved"):
+        with closing(_connect(memory_dir)) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if _get(conn, session_id).get("summary_saved"):
+                    conn.execute("ROLLBACK")
                     log.info("摘要已存在（原子检查），跳过 session=%s", session_id[:12])
                     return SaveResult(SaveResult.EXISTS, "already_saved")
-            else:
-                state = {"session_id": session_id, "created_at": iso_now()}
 
-            with FileLock(_sessions_lock_path(memory_dir), timeout=5):
-                write_fn()
+                with FileLock(sessions_lock_path(memory_dir), timeout=5):
+                    write_fn()
 
-            state["summary_saved"] = True
-            state["summary_source"] = source
-            state["updated_at"] = iso_now()
-
-            with open(path, "w") as f:
-                json.dump(state, ensure_ascii=False, fp=f)
-
-            return SaveResult(SaveResult.SAVED)
+                now = iso_now()
+                conn.execute(_MARK_SAVED_SQL, (session_id, now, now, source))
+                conn.execute("COMMIT")
+                return SaveResult(SaveResult.SAVED)
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
 
     except TimeoutError as e:
         log.warning("原子保存摘要锁超时 session=%s: %s", session_id[:12], e)
         return SaveResult(SaveResult.ERROR, f"lock_timeout: {e}")
-    except (OSError, json.JSONDecodeError) as e:
+    except sqlite3.OperationalError as e:
+        if _is_lock_error(e):
+            log.warning("原子保存摘要数据库锁超时 session=%s: %s", session_id[:12], e)
+            return SaveResult(SaveResult.ERROR, f"lock_timeout: {e}")
+        log.warning("原子保存摘要 I/O 异常 session=%s: %s", session_id[:12], e)
+        return SaveResult(SaveResult.ERROR, f"io_error: {e}")
+    except (OSError, sqlite3.Error) as e:
         log.warning("原子保存摘要 I/O 异常 session=%s: %s", session_id[:12], e)
         return SaveResult(SaveResult.ERROR, f"io_error: {e}")
@@ -1,27 +1,33 @@
 #!/usr/bin/env python3
 """
-JSONL → SQLite 增量同步：将 MEMORY.md、facts.jsonl、sessions.jsonl、daily/*.jsonl
+JSONL → SQLite 增量同步：将 MEMORY.md、facts.jsonl、sessions.jsonl（含 sessions/ 封存段）、daily/*.jsonl
 同步到 index.sqlite，生成 FTS 全文索引和可选向量嵌入，供 search_memory 检索。
+新条目按 embedding.batch_size 攒批，先查嵌入缓存（embedding_cache.sqlite），
+未命中部分再调用 embed_batch，经 upsert_chunks 批量写入，全部写入在一个事务内提交；
+同步结束后维护向量旁路文件 embeddings.f32，供搜索时 mmap 零拷贝打分。
 
 使用场景：安装后或定期执行，支持 --rebuild 全量重建。
 """
 import sys
 import os
-import json
 import glob
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
 
 import argparse
 
-from service.config import MEMORY_MD, FACTS_FILE, SESSIONS_FILE, INDEX_DB, DAILY_DIR_NAME, _DEFAULTS
+from service.config import MEMORY_MD, FACTS_FILE, INDEX_DB, DAILY_DIR_NAME, _DEFAULTS
+from service.config import EMBEDDINGS_FILE, ANN_FILE
 from service.config import get_memory_dir, Config
-from storage.sqlite_store import SQLiteStore
-from storage.chunker import chunk_markdown
-from storage.jsonl import read_jsonl
+from storage.sqlite_store import SQLiteStore, SQLITE_SIDE_FILES
+from storage.chunker import chunk_markdown, chunk_id
+from storage.jsonl import read_jsonl_from, boundary_hash
+from storage.session_log import segment_paths, source_name
+from storage.entry_index import chunk_from_entry, managed_files, refresh as refresh_locations
+from storage.embedding_cache import open_cache
+from service.memory.memory_daemon import request as daemon_request, maybe_autostart
 from core.utils import iso_now
-from core.embedding import is_available as embedding_is_available
-from service.logger import get_logger, redirect_to_project
+from service.logger import get_logger, redirect_to_project, tracing
 
 log = get_logger("sync")
 
@@ -34,64 +40,145 @@ def get_file_mtime(path):
         return 0
 
 
-def sync_file(store, memory_dir, rel_path, full_path, model_name=None):
+class ChunkWriter:
     """
-    增量同步单个 JSONL 文件到 SQLite。根据 mtime 和 last_line 跳过已同步内容。
+    收集待写入的 chunk，攒满 batch_size 条后一次批量生成向量并写入 store。
+
+    写入本身不提交，由调用方的 store.transaction() 统一提交。
+    """
+
+    def __init__(self, store, emb_func=None, batch_size=_DEFAULTS["embedding"]["batch_size"]):
+        self.store = store
+        self.emb_func = emb_func
+        self.batch_size = max(1, batch_size)
+        self.written = 0
+        self.embedded = 0
+        self._pending = []
+
+    def add(self, **fields):
+        """登记一条 chunk（upsert_chunk 的参数，不含 embedding）"""
+        self._pending.append(fields)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """为待写入的 chunk 批量生成向量并写入"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        vectors = self.emb_func([f["content"] for f in batch]) if self.emb_func else None
+        for fields, vec in zip(batch, vectors or []):
+            fields["embedding"] = vec
+        self.store.upsert_chunks(batch)
+        self.written += len(batch)
+        self.embedded += sum(1 for v in vectors or [] if v)
+        tracing.add(chunks_written=len(batch))
+        log.info("索引写入进度: %d 条 (含向量 %d 条)", self.written, self.embedded)
+
+
+def _run_with_writer(store, writer, model_name, fn):
+    """未传入 writer 时创建一个，并在单个事务内执行 fn(writer) 后落盘"""
+    if writer is not None:
+        return fn(writer)
+    writer = ChunkWriter(store, _get_embed_func(model_name))
+    with store.transaction():
+        count = fn(writer)
+        writer.flush()
+    return count
+
+
+def _resume_offset(state, full_path, st):
+    """
+    判断能否从上次的字节偏移续读：inode 未变、文件未截短、偏移前的字节未被改写。
+
+    Returns:
+        可续读时返回 (byte_offset, last_line)，需整文件重读时返回 (0, 0)
+    """
+    if not state or state.get("byte_offset") is None:
+        return 0, 0
+    offset = state["byte_offset"]
+    if state.get("inode") != st.st_ino or offset > st.st_size:
+        return 0, 0
+    if boundary_hash(full_path, offset) != state.get("boundary_hash"):
+        return 0, 0
+    return offset, state["last_line"]
+
+
+def sync_file(store, memory_dir, rel_path, full_path, model_name=None, writer=None):
+    """
+    增量同步单个 JSONL 文件到 SQLite。
+
+    从 sync_state 记录的字节偏移处流式解析新追加的行；文件被截断或原子重写
+    （inode/大小/边界摘要不符）时整文件重读，按 id 覆盖写入。
+    新条目交给 writer 批量嵌入写入；未传入 writer 时本函数自建并在返回前写完。
 
     Returns:
         本次新增的 chunk 数量
     """
-    mtime = get_file_mtime(full_path)
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        return 0
+    mtime = int(st.st_mtime)
     state = store.get_sync_state(rel_path)
 
-    if state and state["mtime"] == mtime:
+    if (state and state["mtime"] == mtime and state.get("size") == st.st_size
+            and state.get("inode") == st.st_ino):
         return 0
 
-    start_line = state["last_line"] if state else 0
-    entries = read_jsonl(full_path)
-    new_entries = entries[start_line:]
+    offset, start_line = _resume_offset(state, full_path, st)
+    if state and not offset and state.get("byte_offset"):
+        log.info("%s 已被截断或重写，整文件重新同步", rel_path)
+    new_entries, end_offset = read_jsonl_from(full_path, offset)
+    tracing.add(files_read=1, rows_scanned=len(new_entries), bytes_read=end_offset - offset)
+    last_line = start_line + len(new_entries)
+
+    def _save_state(last_id):
+        store.update_sync_state(rel_path, last_line, last_id, mtime, byte_offset=end_offset,
+                                inode=st.st_ino, size=st.st_size,
+                                boundary_hash=boundary_hash(full_path, end_offset))
 
     if not new_entries:
-        store.update_sync_state(rel_path, len(entries), "", mtime)
+        _save_state(state["last_id"] if state else "")
         return 0
 
-    emb_func = _get_embed_func(model_name)
-    count = 0
-    for entry in new_entries:
-        # session_start 无实质内容，跳过
-        if entry.get("type") == "session_start":
-            continue
-        content = entry.get("content") or entry.get("summary", "")
-        if not content:
-            continue
-
-        embedding = emb_func(content) if emb_func else None
-        store.upsert_chunk(
-            chunk_id=entry.get("id", f"{rel_path}-{start_line + count}"),
-            content=content,
-            chunk_type=entry.get("type", "fact"),
-            memory_type=entry.get("memory_type"),
-            entities=json.dumps(entry.get("entities", []), ensure_ascii=False),
-            confidence=entry.get("confidence", 0.8),
-            source_file=rel_path,
-            source_id=entry.get("id"),
-            timestamp=entry.get("timestamp", ""),
-            embedding=embedding,
-        )
-        count += 1
-
-    last_id = new_entries[-1].get("id", "") if new_entries else ""
-    store.update_sync_state(rel_path, len(entries), last_id, mtime)
-    return count
-
-
-def sync_memory_md(store, memory_dir, model_name=None):
+    def _collect(writer):
+        count = 0
+        deleted = []
+        for entry in new_entries:
+            # 软删除的条目移出索引（管理命令已同步删除，这里兜底文件被外部改写的情况）
+            if entry.get("deleted_at"):
+                deleted.append(entry.get("id"))
+                continue
+            # session_start 与无内容的条目不进入索引
+            chunk = chunk_from_entry(entry, rel_path, f"{rel_path}-{start_line + count}")
+            if chunk is None:
+                continue
+            writer.add(**chunk)
+            count += 1
+
+        store.delete_chunks(d for d in deleted if d)
+        _save_state(new_entries[-1].get("id", ""))
+        return count
+
+    return _run_with_writer(store, writer, model_name, _collect)
+
+
+def sync_memory_md(store, memory_dir, model_name=None, writer=None,
+                   max_tokens=_DEFAULTS["index"]["chunk_tokens"], overlap=_DEFAULTS["index"]["chunk_overlap"]):
     """
     将 MEMORY.md 切块后同步到 SQLite，chunk_type 为 core。
-    根据 mtime 判断是否需要重新同步。
+
+    根据 mtime 判断是否需要重新同步；chunk ID 由内容哈希得到，只写入（并嵌入）新出现的块，
+    删除已不存在的块（含旧版按序号命名的 core-N）。
+
+    Returns:
+        本次新写入的 chunk 数量
     """
     md_path = os.path.join(memory_dir, MEMORY_MD)
+    existing = set(store.chunk_ids_by_source(MEMORY_MD))
     if not os.path.exists(md_path):
+        store.delete_chunks(existing)
         return 0
 
     mtime = get_file_mtime(md_path)
@@ -101,49 +188,71 @@ def sync_memory_md(store, memory_dir, model_name=None):
 
     with open(md_path, "r", encoding="utf-8") as f:
         text = f.read().strip()
-    if not text:
-        return 0
-
-    chunks = chunk_markdown(text)
-    emb_func = _get_embed_func(model_name)
-    count = 0
-    for i, chunk in enumerate(chunks):
-        embedding = emb_func(chunk) if emb_func else None
-        store.upsert_chunk(
-            chunk_id=f"core-{i}",
-            content=chunk,
-            chunk_type="core",
-            source_file=MEMORY_MD,
-            timestamp="",
-            embedding=embedding,
-        )
-        count += 1
-
-    store.update_sync_state(MEMORY_MD, 0, "", mtime)
-    return count
-
-
-def _get_embed_func(model_name=None):
-    """获取嵌入函数，若 sentence-transformers 不可用则返回 None。"""
-    try:
-        from core.embedding import embed_text, is_available
-        if is_available(model_name):
-            log.info("嵌入模型可用，将生成向量索引")
-            return lambda text: embed_text(text, model_name)
-        else:
-            log.warning("嵌入模型不可用，仅建立 FTS 索引")
-    except Exception as e:
-        log.warning("嵌入模块加载异常: %s", e)
-    return None
-
+        tracing.add(files_read=1, bytes_read=os.fstat(f.fileno()).st_size)
+
+    chunks = {}
+    for chunk in chunk_markdown(text, max_tokens, overlap):
+        chunks.setdefault(chunk_id(chunk), chunk)
+    added = [(cid, content) for cid, content in chunks.items() if cid not in existing]
+
+    def _collect(writer):
+        for cid, content in added:
+            writer.add(
+                chunk_id=cid,
+                content=content,
+                chunk_type="core",
+                source_file=MEMORY_MD,
+                timestamp="",
+            )
+        removed = store.delete_chunks(existing - set(chunks))
+        store.update_sync_state(MEMORY_MD, 0, "", mtime)
+        if added or removed:
+            log.info("MEMORY.md 变化: 新增 %d 块, 移除 %d 块, 未变 %d 块",
+                     len(added), removed, len(chunks) - len(added))
+        return len(added)
+
+    return _run_with_writer(store, writer, model_name, _collect)
+
+
+def _get_embed_func(model_name=None, batch_size=_DEFAULTS["embedding"]["batch_size"], cache=None):
+    """
+    获取批量嵌入函数 texts → [vector|None]。
 
+    先查嵌入缓存，只有存在未命中项时才加载模型；sentence-transformers 不可用时
+    未命中项返回 None（仅建立 FTS 索引）。
+    """
+    state = {}
+
+    def _model_embed(texts):
+        if "available" not in state:
+            state["available"] = False
+            try:
+                from core.embedding import is_available
+                state["available"] = is_available(model_name)
+                if state["available"]:
+                    log.info("嵌入模型可用，将生成向量索引")
+                else:
+                    log.warning("嵌入模型不可用，仅建立 FTS 索引")
+            except Exception as e:
+                log.warning("嵌入模块加载异常: %s", e)
+        if not state["available"]:
+            return [None] * len(texts)
+        from core.embedding import embed_batch
+        return embed_batch(texts, model_name, batch_size) or [None] * len(texts)
+
+    if cache is None:
+        return _model_embed
+    return lambda texts: cache.embed(texts, _model_embed)
+
+
+@tracing.traced("sync_all")
 def sync_all(memory_dir, rebuild=False, project_path=None):
     """
     同步所有记忆源到 SQLite：facts、sessions、daily/*.jsonl、MEMORY.md。
 
     Args:
         memory_dir: 记忆数据根目录
-        rebuild: 若为 True，先删除旧索引再全量重建
+        rebuild: 若为 True，先删除旧索引（含 embeddings.f32 / vectors.ivf）再全量重建
         project_path: 项目根目录，用于读取项目级 config（embedding.model 等）
     Returns:
         本次新增的 chunk 总数
@@ -153,42 +262,67 @@ def sync_all(memory_dir, rebuild=False, project_path=None):
 
     db_path = os.path.join(memory_dir, INDEX_DB)
 
-    if rebuild and os.path.exists(db_path):
-        log.info("重建模式：删除旧索引 %s", db_path)
-        os.remove(db_path)
+    if rebuild:
+        side_files = tuple(INDEX_DB + suffix for suffix in SQLITE_SIDE_FILES)
+        for name in (INDEX_DB,) + side_files + (EMBEDDINGS_FILE, ANN_FILE):
+            path = os.path.join(memory_dir, name)
+            if os.path.exists(path):
+                log.info("重建模式：删除旧索引 %s", path)
+                os.remove(path)
 
     log.info("开始同步 %s", memory_dir)
-    store = SQLiteStore(db_path)
+    store = SQLiteStore(db_path, vector_engine=cfg.get("index.vector_engine"),
+                        ivf_nprobe=cfg.get("index.ivf_nprobe"))
+    batch_size = cfg.get("embedding.batch_size")
+    cache = open_cache(memory_dir, emb_model, cfg.get("embedding.cache_max_entries"))
+    writer = ChunkWriter(store, _get_embed_func(emb_model, batch_size, cache), batch_size)
     total = 0
 
-    facts_path = os.path.join(memory_dir, FACTS_FILE)
-    if os.path.exists(facts_path):
-        total += sync_file(store, memory_dir, FACTS_FILE, facts_path, emb_model)
-
-    sessions_path = os.path.join(memory_dir, SESSIONS_FILE)
-    if os.path.exists(sessions_path):
-        total += sync_file(store, memory_dir, SESSIONS_FILE, sessions_path, emb_model)
-
-    daily_dir = os.path.join(memory_dir, DAILY_DIR_NAME)
-    if os.path.isdir(daily_dir):
-        # 按文件名排序，保证日期顺序
-        for fpath in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl"))):
-            rel = os.path.join(DAILY_DIR_NAME, os.path.basename(fpath))
-            total += sync_file(store, memory_dir, rel, fpath, emb_model)
-
-    total += sync_memory_md(store, memory_dir, emb_model)
+    # 所有文件的新条目跨文件攒批嵌入，连同 sync_state 在同一事务内提交
+    with store.transaction():
+        facts_path = os.path.join(memory_dir, FACTS_FILE)
+        if os.path.exists(facts_path):
+            total += sync_file(store, memory_dir, FACTS_FILE, facts_path, emb_model, writer)
+
+        # 会话封存段 sessions/seg-*.jsonl 与活动段 sessions.jsonl，未变化的段按 sync_state 跳过
+        for sess_path in segment_paths(memory_dir):
+            total += sync_file(store, memory_dir, source_name(memory_dir, sess_path), sess_path,
+                               emb_model, writer)
+
+        daily_dir = os.path.join(memory_dir, DAILY_DIR_NAME)
+        if os.path.isdir(daily_dir):
+            # 按文件名排序，保证日期顺序
+            for fpath in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl"))):
+                rel = os.path.join(DAILY_DIR_NAME, os.path.basename(fpath))
+                total += sync_file(store, memory_dir, rel, fpath, emb_model, writer)
+
+        total += sync_memory_md(store, memory_dir, emb_model, writer,
+                                cfg.get("index.chunk_tokens"), cfg.get("index.chunk_overlap"))
+        writer.flush()
+        # 顺带维护 id → 位置索引（只扫描新增的尾部），供管理命令按 id 定位
+        refresh_locations(store, managed_files(memory_dir))
+
+    tracing.add(new_chunks=total, embedded=writer.embedded)
+    if cache is not None:
+        tracing.add(embed_cache_hits=cache.hits, embed_cache_misses=cache.misses)
+        if cache.hits:
+            log.info("嵌入缓存命中 %d 条, 未命中 %d 条", cache.hits, cache.misses)
+        cache.close()
 
     total_chunks = store.count_chunks()
     store.set_meta("total_chunks", total_chunks)
     store.set_meta("last_sync", iso_now())
-    if embedding_is_available(emb_model):
+    if writer.embedded:
         store.set_meta("embedding_model", emb_model)
+    store.sync_vector_sidecar(store.get_meta("embedding_model") or "")
+    store.sync_ann_index()
 
     store.close()
     log.info("同步完成: 本次新增 %d 条, 总计 %d 条 chunk", total, total_chunks)
     return total
 
 
+@tracing.traced("cli.sync_index")
 def main():
     """CLI 入口：解析 --rebuild、--project-path，执行 sync_all。"""
     parser = argparse.ArgumentParser(description="Sync JSONL → SQLite")
@@ -203,7 +337,13 @@ def main():
         print(f"Memory directory not found: {memory_dir}", file=sys.stderr)
         sys.exit(1)
 
-    total = sync_all(memory_dir, rebuild=args.rebuild, project_path=args.project_path)
+    # 守护进程运行时由其执行（模型常驻），否则进程内同步
+    result = daemon_request(memory_dir, {"op": "sync", "rebuild": args.rebuild}, timeout=600.0)
+    if result is not None:
+        total = result["total"]
+    else:
+        total = sync_all(memory_dir, rebuild=args.rebuild, project_path=args.project_path)
+        maybe_autostart(args.project_path, Config(args.project_path))
     print(f"Sync complete: {total} entries processed, "
           f"DB: {os.path.join(memory_dir, INDEX_DB)}")
 
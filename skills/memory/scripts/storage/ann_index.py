@@ -0,0 +1,217 @@
+"""
+近似最近邻（ANN）索引：IVF-Flat。
+
+以球面 k-means 将 embeddings.f32 的行划分为 nlist 个簇，查询时只对与查询最相近的
+nprobe 个簇内的行打分。索引持久化为 index.sqlite 同目录的 vectors.ivf，通过 tag
+与旁路文件绑定（旁路文件重写后自动失效重训）。
+
+文件布局：
+    [0, 64)   头部：magic(8) + dim(u32) + nlist(u32) + rows(u32) + trained_rows(u32) + tag(u64)
+    [64, …)   nlist × dim 个 float32 质心，随后 rows 个 int32 簇编号
+
+依赖 NumPy；未安装时不构建也不加载，调用方回退暴力检索。
+"""
+import os
+import math
+import random
+import struct
+import time
+
+from storage.vector_index import np
+from storage.embedding_sidecar import load_sidecar
+from service.logger import get_logger
+
+log = get_logger("ann")
+
+HEADER_SIZE = 64
+_MAGIC = b"MEMIVF01"
+_HEADER_FMT = "<8sIIIIQ"
+_TRAIN_SAMPLES_PER_LIST = 64
+_KMEANS_ITERS = 10
+_ASSIGN_BATCH = 8192
+
+
+def _default_nlist(rows):
+    """簇数取 √N，至少 1"""
+    return max(1, int(math.sqrt(rows)))
+
+
+def _assign(matrix, centroids):
+    """分批计算每行最近的质心编号"""
+    out = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], _ASSIGN_BATCH):
+        block = np.asarray(matrix[start:start + _ASSIGN_BATCH], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def _kmeans(samples, nlist, seed=0):
+    """球面 k-means：质心保持单位长度，空簇用随机样本重新播种"""
+    rng = np.random.default_rng(seed)
+    centroids = samples[rng.choice(len(samples), nlist, replace=False)].copy()
+    for _ in range(_KMEANS_ITERS):
+        labels = np.argmax(samples @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, samples)
+        norms = np.linalg.norm(sums, axis=1)
+        empty = norms == 0
+        if empty.any():
+            sums[empty] = samples[rng.choice(len(samples), int(empty.sum()))]
+            norms[empty] = 1.0
+        centroids = (sums / norms[:, None]).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """IVF-Flat 倒排索引：质心矩阵 + 每行所属簇编号"""
+
+    def __init__(self, centroids, assign, tag, trained_rows):
+        self.centroids = centroids
+        self.assign = assign
+        self.tag = tag
+        self.trained_rows = trained_rows
+        self._lists = None
+
+    @property
+    def rows(self):
+        return len(self.assign)
+
+    @classmethod
+    def train(cls, matrix, alive, tag, nlist=None, seed=0):
+        """在有效行上训练质心，并为全部行分配簇编号"""
+        live = np.flatnonzero(np.asarray(alive, dtype=bool))
+        nlist = min(nlist or _default_nlist(len(live)), max(len(live), 1))
+        if len(live):
+            n_samples = min(len(live), nlist * _TRAIN_SAMPLES_PER_LIST)
+            picked = np.sort(np.random.default_rng(seed).choice(live, n_samples, replace=False))
+            samples = np.asarray(matrix[picked], dtype=np.float32)
+            centroids = _kmeans(samples, nlist, seed)
+        else:
+            centroids = np.zeros((1, matrix.shape[1]), dtype=np.float32)
+        return cls(centroids, _assign(matrix, centroids), tag, len(live))
+
+    def extend(self, matrix):
+        """为训练之后追加的行分配簇编号"""
+        if matrix.shape[0] > self.rows:
+            added = _assign(matrix[self.rows:], self.centroids)
+            self.assign = np.concatenate([self.assign, added])
+            self._lists = None
+
+    def candidates(self, query, nprobe):
+        """返回与 query 最相近的 nprobe 个簇内的行号"""
+        if self._lists is None:
+            order = np.argsort(self.assign, kind="stable")
+            bounds = np.searchsorted(self.assign[order], np.arange(len(self.centroids) + 1))
+            self._lists = (order, bounds)
+        order, bounds = self._lists
+        nprobe = min(nprobe, len(self.centroids))
+        sims = self.centroids @ query
+        probes = np.argpartition(-sims, nprobe - 1)[:nprobe]
+        return np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probes])
+
+    # --- 持久化 ---
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        nlist, dim = self.centroids.shape
+        with open(tmp, "wb") as f:
+            head = struct.pack(_HEADER_FMT, _MAGIC, dim, nlist, self.rows, self.trained_rows, self.tag)
+            f.write(head.ljust(HEADER_SIZE, b"\0"))
+            f.write(self.centroids.astype(np.float32).tobytes())
+            f.write(self.assign.astype(np.int32).tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """读取 vectors.ivf，文件缺失、损坏或无 NumPy 时返回 None"""
+        if np is None or not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            raw = f.read()
+        if len(raw) < HEADER_SIZE:
+            return None
+        magic, dim, nlist, rows, trained_rows, tag = struct.unpack_from(_HEADER_FMT, raw)
+        if magic != _MAGIC or len(raw) != HEADER_SIZE + nlist * dim * 4 + rows * 4:
+            return None
+        centroids = np.frombuffer(raw, dtype=np.float32, count=nlist * dim, offset=HEADER_SIZE)
+        assign = np.frombuffer(raw, dtype=np.int32, count=rows, offset=HEADER_SIZE + nlist * dim * 4)
+        return cls(centroids.reshape(nlist, dim), assign, tag, trained_rows)
+
+
+def sync_ivf(store, path):
+    """
+    使 vectors.ivf 与 embeddings.f32 对齐：tag 变化或行数翻倍时重训，
+    否则仅为新追加的行分配簇。无 NumPy 或无旁路文件时跳过。
+
+    Returns:
+        "trained" / "extended" / "unchanged" / "skipped"
+    """
+    if np is None:
+        log.warning("NumPy 未安装，跳过 IVF 索引构建（向量检索回退暴力搜索）")
+        return "skipped"
+    vectors = load_sidecar(store, store.sidecar_path)
+    if vectors is None or not vectors.dim:
+        return "skipped"
+
+    ivf = IVFIndex.load(path)
+    live_rows = len(vectors)
+    if ivf is None or ivf.tag != vectors.source_tag or live_rows > 2 * max(ivf.trained_rows, 1):
+        t0 = time.time()
+        ivf = IVFIndex.train(vectors._matrix, vectors._alive, vectors.source_tag)
+        ivf.save(path)
+        log.info("IVF 索引训练完成 rows=%d nlist=%d (耗时 %.2fs)",
+                 live_rows, len(ivf.centroids), time.time() - t0)
+        return "trained"
+    if vectors._matrix.shape[0] > ivf.rows:
+        ivf.extend(vectors._matrix)
+        ivf.save(path)
+        return "extended"
+    return "unchanged"
+
+
+def evaluate_engine(vectors, k=10, samples=50, noise=0.05, seed=0):
+    """
+    对比 ANN 与精确检索：以带噪声的库内向量为查询，统计 recall@k 与延迟。
+
+    Returns:
+        {"rows", "k", "samples", "recall_at_k", "latency_ms": {"exact": {...}, "engine": {...}}}
+    """
+    vectors._flush()
+    live = sorted(vectors._row_of)
+    rng = random.Random(seed)
+    picked = rng.sample(live, min(samples, len(live)))
+    exact_ms, engine_ms, recalls = [], [], []
+    for cid in picked:
+        row = vectors._row_of[cid]
+        base = list(vectors._matrix[row]) if np is not None else \
+            list(vectors._matrix[row * vectors.dim:(row + 1) * vectors.dim])
+        query = [x + rng.gauss(0, noise / math.sqrt(vectors.dim)) for x in base]
+
+        t0 = time.perf_counter()
+        truth = vectors.search(query, k, exact=True)
+        exact_ms.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        got = vectors.search(query, k)
+        engine_ms.append((time.perf_counter() - t0) * 1000)
+
+        truth_ids = {c for c, _ in truth}
+        if truth_ids:
+            recalls.append(len(truth_ids & {c for c, _ in got}) / len(truth_ids))
+
+    def _summary(values):
+        if not values:
+            return {"p50": 0.0, "p95": 0.0, "mean": 0.0}
+        ordered = sorted(values)
+        return {
+            "p50": round(ordered[len(ordered) // 2], 3),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            "mean": round(sum(ordered) / len(ordered), 3),
+        }
+
+    return {
+        "rows": len(live),
+        "k": k,
+        "samples": len(picked),
+        "recall_at_k": round(sum(recalls) / len(recalls), 4) if recalls else None,
+        "latency_ms": {"exact": _summary(exact_ms), "engine": _summary(engine_ms)},
+    }
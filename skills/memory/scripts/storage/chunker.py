@@ -1,29 +1,96 @@
 """
-文本分块逻辑：将 Markdown 按标题和滑动窗口切分为 chunk。
+文本分块逻辑：将 Markdown 按标题切分，超长段落按句子边界打包为不超过 token 预算的 chunk。
+
+- token 估算：CJK 字符（含全角标点）每字约 1 token，其余文本约 4 字符 1 token
+- 句子边界：换行与中英文句末标点（。！？；.!?;）；单句超出预算时按 token 硬切
+- 块间重叠：下一块以上一块末尾不超过 overlap token 的整句开头
+- chunk ID 由内容哈希得到（core-<sha1 前 16 位>），同一段落未改动时 ID 不变，
+  MEMORY.md 局部修改后只需写入变化的块
 """
+import re
+import hashlib
+
 from service.config import _DEFAULTS
 
 _IDX = _DEFAULTS["index"]
 
+_CJK_RE = re.compile(r"[⺀-鿿가-힯豈-﫿＀-￯　-〿]")
+# 句末标点（中文标点后直接断句，英文标点需后跟空白）或换行之后断开，分隔符保留在前一句
+_SENTENCE_RE = re.compile(r"(?<=[。！？；…])|(?<=[.!?;])(?=\s)|(?<=\n)")
+
+
+def estimate_tokens(text):
+    """近似 token 数：CJK 字符各计 1，其余字符按 4 个计 1（向上取整）"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def chunk_id(content, prefix="core"):
+    """基于内容的 chunk ID：相同文本得到相同 ID"""
+    return f"{prefix}-{hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _split_sentences(text):
+    return [s for s in _SENTENCE_RE.split(text) if s]
+
+
+def _hard_split(sentence, max_tokens):
+    """单句超出预算时按 token 数逐字切开"""
+    pieces, start, used = [], 0, 0
+    for i, ch in enumerate(sentence):
+        cost = 1 if _CJK_RE.match(ch) else 0.25
+        if used + cost > max_tokens and i > start:
+            pieces.append(sentence[start:i])
+            start, used = i, 0
+        used += cost
+    pieces.append(sentence[start:])
+    return pieces
+
+
+def _pack(section, max_tokens, overlap):
+    """把一个段落按句子打包为不超过 max_tokens 的块，相邻块重叠不超过 overlap token 的整句"""
+    units = []
+    for sent in _split_sentences(section):
+        if estimate_tokens(sent) > max_tokens:
+            units.extend(_hard_split(sent, max_tokens))
+        else:
+            units.append(sent)
+
+    chunks = []
+    current, size = [], 0
+    for unit in units:
+        cost = estimate_tokens(unit)
+        if current and size + cost > max_tokens:
+            chunks.append("".join(current))
+            # 从上一块末尾回取整句作为重叠，保证加上新句后仍不超出预算
+            carry, carry_size = [], 0
+            for prev in reversed(current):
+                prev_cost = estimate_tokens(prev)
+                if carry_size + prev_cost > overlap or carry_size + prev_cost + cost > max_tokens:
+                    break
+                carry.insert(0, prev)
+                carry_size += prev_cost
+            current, size = carry, carry_size
+        current.append(unit)
+        size += cost
+    if current:
+        chunks.append("".join(current))
+    return [c.strip() for c in chunks if c.strip()]
+
 
 def chunk_markdown(text, max_tokens=_IDX["chunk_tokens"], overlap=_IDX["chunk_overlap"]):
     """
-    将 Markdown 按 ## 标题切分，超长段落再按 max_chars 滑动窗口切块。
+    将 Markdown 按 ## 标题切分，超出 max_tokens 的段落再按句子边界打包切块。
 
     Args:
         text: 原始 Markdown 文本
-        max_tokens: 每块最大 token 数（近似）
+        max_tokens: 每块最大 token 数（估算，见 estimate_tokens）
         overlap: 块间重叠 token 数
     Returns:
         文本块列表
     """
-    chars_per_token = 4
-    max_chars = max_tokens * chars_per_token
-    overlap_chars = overlap * chars_per_token
-
-    # 先按 ## 二级标题切分
     sections = text.split("\n## ")
-    if len(sections) <= 1 and len(text) <= max_chars:
+    if len(sections) <= 1 and estimate_tokens(text) <= max_tokens:
         return [text.strip()] if text.strip() else []
 
     chunks = []
@@ -33,15 +100,8 @@ def chunk_markdown(text, max_tokens=_IDX["chunk_tokens"], overlap=_IDX["chunk_ov
             continue
         if i > 0:
             sec = "## " + sec
-        if len(sec) <= max_chars:
+        if estimate_tokens(sec) <= max_tokens:
             chunks.append(sec)
         else:
-            # 超长段落按滑动窗口切块，带重叠
-            start = 0
-            while start < len(sec):
-                end = start + max_chars
-                chunk = sec[start:end]
-                if chunk.strip():
-                    chunks.append(chunk.strip())
-                start = end - overlap_chars
+            chunks.extend(_pack(sec, max_tokens, overlap))
     return chunks
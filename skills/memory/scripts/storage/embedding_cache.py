@@ -0,0 +1,134 @@
+"""
+嵌入向量缓存：以 (模型名, 规范化文本哈希) 为键持久化向量，跨同步、跨重建复用。
+
+存放于 memory-data/embedding_cache.sqlite（不随 --rebuild 删除）。
+每条记录带最近使用时间，条数超过上限时按 LRU 淘汰最久未用的记录。
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import unicodedata
+from array import array
+
+from service.config import EMBED_CACHE_DB
+from service.logger import get_logger
+
+log = get_logger("emb_cache")
+
+_INIT_SQL = """
+CREATE TABLE IF NOT EXISTS emb_cache (
+    key TEXT PRIMARY KEY,       -- sha1(模型名 + \\0 + 规范化文本)
+    vector BLOB NOT NULL,       -- float32 数组
+    last_used REAL NOT NULL     -- 最近命中/写入时间，LRU 淘汰依据
+);
+CREATE INDEX IF NOT EXISTS idx_emb_cache_last_used ON emb_cache(last_used);
+"""
+_QUERY_BATCH = 500
+
+
+def normalize_text(text):
+    """NFKC 规范化并折叠空白，使仅有空白/全半角差异的文本共享同一缓存项"""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def cache_key(model, text):
+    return hashlib.sha1(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite 实现的 LRU 嵌入缓存，绑定单个模型"""
+
+    def __init__(self, path, model, max_entries):
+        self.model = model or ""
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        try:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.OperationalError:
+            pass
+        self.conn.executescript(_INIT_SQL)
+
+    def get_many(self, texts):
+        """返回与 texts 对齐的向量列表，未命中为 None；命中项刷新最近使用时间"""
+        keys = [cache_key(self.model, t) for t in texts]
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), _QUERY_BATCH):
+            batch = unique[i:i + _QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for key, blob in self.conn.execute(
+                f"SELECT key, vector FROM emb_cache WHERE key IN ({placeholders})", batch
+            ):
+                vec = array("f")
+                vec.frombytes(blob)
+                found[key] = vec.tolist()
+        if found:
+            now = time.time()
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE emb_cache SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+        result = [found.get(k) for k in keys]
+        hits = sum(1 for v in result if v is not None)
+        self.hits += hits
+        self.misses += len(result) - hits
+        return result
+
+    def put_many(self, texts, vectors):
+        """写入 (text, vector) 对，跳过空向量；超出上限时淘汰最久未用的记录"""
+        now = time.time()
+        rows = [
+            (cache_key(self.model, t), array("f", v).tobytes(), now)
+            for t, v in zip(texts, vectors) if v
+        ]
+        if not rows:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO emb_cache(key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            count = self.conn.execute("SELECT COUNT(*) FROM emb_cache").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self.conn.execute(
+                    "DELETE FROM emb_cache WHERE key IN "
+                    "(SELECT key FROM emb_cache ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                log.debug("嵌入缓存淘汰 %d 条", excess)
+
+    def embed(self, texts, embed_func):
+        """
+        先查缓存，仅将未命中的文本交给 embed_func(texts) → [vector|None]，结果写回缓存。
+
+        Returns:
+            与 texts 对齐的向量列表（embed_func 无法生成的为 None）
+        """
+        vectors = self.get_many(texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            computed = embed_func([texts[i] for i in missing]) or [None] * len(missing)
+            for i, vec in zip(missing, computed):
+                vectors[i] = vec
+            self.put_many([texts[i] for i in missing], computed)
+        return vectors
+
+    def close(self):
+        self.conn.close()
+
+
+def open_cache(memory_dir, model, max_entries):
+    """打开 memory_dir 下的嵌入缓存；max_entries <= 0 表示禁用，返回 None"""
+    if not max_entries or max_entries <= 0:
+        return None
+    try:
+        return EmbeddingCache(os.path.join(memory_dir, EMBED_CACHE_DB), model, max_entries)
+    except sqlite3.Error as e:
+        log.warning("嵌入缓存不可用: %s", e)
+        return None
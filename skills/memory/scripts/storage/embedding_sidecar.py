@@ -0,0 +1,239 @@
+"""
+嵌入向量旁路文件 embeddings.f32：与 index.sqlite 同目录的定长行矩阵。
+
+文件布局：
+    [0, 256)  头部：magic(8) + dim(u32) + rows(u32) + tag(u64) + model_len(u16) + model
+    [256, …)  rows × dim 个 float32（行向量已归一化，行优先）
+
+行号 → chunk 的映射保存在 SQLite 的 vector_rows 表中，与 chunks 同库同事务；
+meta.vector_sidecar_tag 记录当前生效文件的 tag，用于检测文件与映射是否配套；
+meta.vector_sidecar_generation 记录对齐时的索引版本（meta.generation，随 chunks 的写入/删除
+在同一事务内递增），两者不符说明对齐之后 chunks 又有变化，读取方不再使用旁路文件。
+
+写入方（sync_index）调用 sync_sidecar() 按 chunks 差量追加行，失效行过半时整体重写；
+读取方（search_memory）调用 load_sidecar() 将文件 mmap 后零拷贝构建 VectorIndex，
+冷查询只会读取实际访问到的页。
+"""
+import os
+import mmap
+import random
+import struct
+from array import array
+
+from storage.vector_index import VectorIndex, _normalize, np
+from service.logger import get_logger
+
+log = get_logger("sidecar")
+
+HEADER_SIZE = 256
+_MAGIC = b"MEMEMB01"
+_HEADER_FMT = "<8sIIQH"
+_MAX_MODEL_LEN = HEADER_SIZE - struct.calcsize(_HEADER_FMT)
+_TAG_META_KEY = "vector_sidecar_tag"
+_GENERATION_META_KEY = "vector_sidecar_generation"
+_FETCH_BATCH = 500
+
+
+def _read_header(f):
+    """读取文件头，返回 {"dim", "rows", "tag", "model"}，格式不符返回 None"""
+    raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        return None
+    magic, dim, rows, tag, model_len = struct.unpack_from(_HEADER_FMT, raw)
+    if magic != _MAGIC or model_len > _MAX_MODEL_LEN:
+        return None
+    offset = struct.calcsize(_HEADER_FMT)
+    model = raw[offset:offset + model_len].decode("utf-8", errors="replace")
+    return {"dim": dim, "rows": rows, "tag": tag, "model": model}
+
+
+def _pack_header(dim, rows, tag, model):
+    model_bytes = (model or "").encode("utf-8")[:_MAX_MODEL_LEN]
+    head = struct.pack(_HEADER_FMT, _MAGIC, dim, rows, tag, len(model_bytes)) + model_bytes
+    return head.ljust(HEADER_SIZE, b"\0")
+
+
+def _normalized_bytes(blob):
+    """将 BLOB 向量归一化后返回 float32 字节串"""
+    if np is not None:
+        vec = np.frombuffer(blob, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return (vec / norm).astype(np.float32).tobytes() if norm else bytes(blob)
+    row = array("f")
+    row.frombytes(blob)
+    return array("f", _normalize(row)).tobytes()
+
+
+def _current_dim(store):
+    """最新写入的向量维度（更换模型后以新模型为准），无向量返回 0"""
+    row = store.conn.execute(
+        "SELECT length(embedding) FROM chunks WHERE embedding IS NOT NULL "
+        "ORDER BY rowid DESC LIMIT 1"
+    ).fetchone()
+    return (row[0] // 4) if row else 0
+
+
+def _fetch_blobs(store, rowids):
+    """按 chunks.rowid 分批读取 (rowid, id, timestamp, embedding)"""
+    for i in range(0, len(rowids), _FETCH_BATCH):
+        batch = rowids[i:i + _FETCH_BATCH]
+        placeholders = ",".join("?" * len(batch))
+        cur = store.conn.execute(
+            f"SELECT rowid, id, timestamp, embedding FROM chunks "
+            f"WHERE rowid IN ({placeholders}) ORDER BY rowid",
+            batch,
+        )
+        yield from cur
+
+
+def _mark_aligned(store, generation):
+    """在调用方事务内记录旁路文件已与 generation 版本的 chunks 对齐"""
+    store.conn.execute(
+        "INSERT OR REPLACE INTO meta(key,value) VALUES(?,?)", (_GENERATION_META_KEY, str(generation))
+    )
+
+
+def _rewrite(store, path, dim, model, current, generation):
+    """整体重写旁路文件和 vector_rows 映射（首次构建、换模型、压缩）"""
+    tag = random.getrandbits(63)
+    tmp = path + ".tmp"
+    mapping = []
+    rowids = sorted(rowid for rowid, _ in current.values())
+    with open(tmp, "wb") as f:
+        f.write(_pack_header(dim, 0, tag, model))
+        for rowid, chunk_id, timestamp, blob in _fetch_blobs(store, rowids):
+            f.write(_normalized_bytes(blob))
+            mapping.append((len(mapping), chunk_id, rowid, timestamp))
+        f.seek(0)
+        f.write(_pack_header(dim, len(mapping), tag, model))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    with store.conn:
+        store.conn.execute("DELETE FROM vector_rows")
+        store.conn.executemany(
+            "INSERT INTO vector_rows(row, chunk_id, chunk_rowid, timestamp) VALUES (?, ?, ?, ?)",
+            mapping,
+        )
+        store.conn.execute(
+            "INSERT OR REPLACE INTO meta(key,value) VALUES(?,?)", (_TAG_META_KEY, str(tag))
+        )
+        _mark_aligned(store, generation)
+    return len(mapping), 0
+
+
+def sync_sidecar(store, path, model=""):
+    """
+    将旁路文件与 chunks 表对齐。
+
+    以 (chunk_id → rowid, timestamp) 做差量：新增或被覆盖的 chunk 追加新行，
+    已删除/覆盖的旧行从 vector_rows 中移除；失效行超过有效行时整体重写。
+
+    Returns:
+        (追加行数, 失效行数)
+    """
+    # 先取版本再读 chunks：读取期间有并发写入时记下的版本偏旧，读取方会回退而不是用错文件
+    generation = store.generation()
+    dim = _current_dim(store)
+    current = {}
+    if dim:
+        cur = store.conn.execute(
+            "SELECT rowid, id, timestamp FROM chunks "
+            "WHERE embedding IS NOT NULL AND length(embedding) = ?",
+            (dim * 4,),
+        )
+        current = {chunk_id: (rowid, ts) for rowid, chunk_id, ts in cur}
+
+    header = None
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            header = _read_header(f)
+    elif not current:
+        with store.conn:
+            _mark_aligned(store, generation)
+        return 0, 0
+
+    mapped = {
+        chunk_id: (row, chunk_rowid, ts)
+        for row, chunk_id, chunk_rowid, ts in store.conn.execute(
+            "SELECT row, chunk_id, chunk_rowid, timestamp FROM vector_rows"
+        )
+    }
+
+    if (header is None or header["dim"] != dim or header["model"] != (model or "")
+            or str(header["tag"]) != store.get_meta(_TAG_META_KEY)):
+        log.info("重写向量旁路文件 %s (%d 行)", path, len(current))
+        return _rewrite(store, path, dim, model, current, generation)
+
+    stale = [row for chunk_id, (row, chunk_rowid, ts) in mapped.items()
+             if current.get(chunk_id) != (chunk_rowid, ts)]
+    todo = sorted(rowid for chunk_id, (rowid, ts) in current.items()
+                  if chunk_id not in mapped or mapped[chunk_id][1:] != (rowid, ts))
+
+    dead_after = header["rows"] + len(todo) - len(current)
+    if dead_after > len(current):
+        log.info("向量旁路文件失效行 %d 超过有效行 %d，压缩重写", dead_after, len(current))
+        return _rewrite(store, path, dim, model, current, generation)
+    if not stale and not todo:
+        with store.conn:
+            _mark_aligned(store, generation)
+        return 0, 0
+
+    rows = header["rows"]
+    mapping = []
+    with open(path, "r+b") as f:
+        f.seek(HEADER_SIZE + rows * dim * 4)
+        for rowid, chunk_id, timestamp, blob in _fetch_blobs(store, todo):
+            f.write(_normalized_bytes(blob))
+            mapping.append((rows + len(mapping), chunk_id, rowid, timestamp))
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(0)
+        f.write(_pack_header(dim, rows + len(mapping), header["tag"], model))
+        f.flush()
+
+    with store.conn:
+        store.conn.executemany("DELETE FROM vector_rows WHERE row = ?", [(r,) for r in stale])
+        store.conn.executemany(
+            "INSERT INTO vector_rows(row, chunk_id, chunk_rowid, timestamp) VALUES (?, ?, ?, ?)",
+            mapping,
+        )
+        _mark_aligned(store, generation)
+    log.info("向量旁路文件增量更新: 追加 %d 行, 失效 %d 行", len(mapping), len(stale))
+    return len(mapping), len(stale)
+
+
+def load_sidecar(store, path):
+    """
+    mmap 旁路文件并构建 VectorIndex（零拷贝）。
+
+    文件缺失、tag 与 meta 不符、或对齐之后 chunks 又有变化（索引版本不符）时返回 None，
+    由调用方回退到直接从 SQLite 装载。
+    """
+    if not os.path.exists(path):
+        return None
+    if store.get_meta(_GENERATION_META_KEY) != str(store.generation()):
+        log.info("向量旁路文件落后于 chunks，回退 SQLite 装载")
+        return None
+    with open(path, "rb") as f:
+        header = _read_header(f)
+        if header is None or str(header["tag"]) != store.get_meta(_TAG_META_KEY):
+            return None
+        dim, rows = header["dim"], header["rows"]
+        if os.fstat(f.fileno()).st_size < HEADER_SIZE + rows * dim * 4:
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    entries = store.conn.execute("SELECT row, chunk_id, timestamp FROM vector_rows").fetchall()
+    if entries and max(row for row, _, _ in entries) >= rows:
+        return None
+
+    if np is not None:
+        matrix = np.frombuffer(mm, dtype=np.float32, count=rows * dim, offset=HEADER_SIZE)
+        matrix = matrix.reshape(rows, dim)
+    else:
+        matrix = memoryview(mm)[HEADER_SIZE:HEADER_SIZE + rows * dim * 4].cast("f")
+    index = VectorIndex.from_matrix(dim, matrix, entries, rows)
+    index.source_tag = header["tag"]
+    return index
@@ -0,0 +1,319 @@
+"""
+JSONL 条目位置索引：id → (文件, 字节偏移, 行长度)，保存在 index.sqlite 的 entry_locations 表。
+
+软删除/恢复/物理删除按索引定位条目所在的行，只读取并原子重写受影响的文件：
+目标行在内存中替换，其余字节原样拷贝，不再逐个解析全部 daily 文件和会话段。
+写回后就地平移同文件后续行的偏移，索引无需重建。
+改写全程持有追加方共用的文件锁（daily 文件各自的追加锁、会话段的 .sessions.lock），
+持锁后先按 entry_files 复核并补齐索引之后的追加，再定位、改写与平移。
+
+索引按文件增量维护，状态记录在 entry_files 表：
+- 文件未变化（inode/大小/mtime 相同）：只 stat，不读取
+- 同一 inode 上追加（边界摘要一致）：只扫描新增的尾部
+- 被替换、截断或原地改写：整文件重扫
+sync_index 每次同步时顺带刷新；管理命令执行前再刷新一次，未同步的新条目同样可以定位。
+使用前按 id 校验目标行，索引与文件不符时整文件重扫后重试。
+
+扫描时同步累加 entry_stats 计数（按文件、按天：条目数、解析错误、各层摘要的
+session_metrics、各类型 fact），按位置改写时按改前/改后条目增减，manage metrics 与
+doctor 直接查询汇总，不再逐行解析全部文件。
+"""
+import os
+import json
+import glob
+from collections import Counter
+
+from .jsonl import iter_raw_lines, boundary_hash, parse_line, append_lock_path
+from .session_log import segment_paths, source_name, sessions_lock_path
+from core.file_lock import FileLock
+from service.config import DAILY_DIR_NAME
+
+_ID_BATCH = 500
+
+
+def chunk_from_entry(entry: dict, source_file: str, fallback_id: str = None):
+    """
+    JSONL 条目 → upsert_chunks 的参数字典。
+
+    session_start 与无内容的条目不进入搜索索引，返回 None。
+    """
+    if entry.get("type") == "session_start":
+        return None
+    content = entry.get("content") or entry.get("summary", "")
+    if not content:
+        return None
+    return {
+        "chunk_id": entry.get("id", fallback_id),
+        "content": content,
+        "chunk_type": entry.get("type", "fact"),
+        "memory_type": entry.get("memory_type"),
+        "entities": json.dumps(entry.get("entities", []), ensure_ascii=False),
+        "confidence": entry.get("confidence", 0.8),
+        "source_file": source_file,
+        "source_id": entry.get("id"),
+        "timestamp": entry.get("timestamp", ""),
+    }
+
+
+# --- 索引维护 ---
+
+def managed_files(memory_dir: str, daily_dir: str = None) -> dict:
+    """
+    位置索引覆盖的文件 {索引键: 路径}：daily/*.jsonl 与全部会话段。
+
+    索引键与 chunks.source_file 相同（daily/YYYY-MM-DD.jsonl、sessions.jsonl、sessions/seg-*.jsonl）。
+    """
+    daily_dir = daily_dir or os.path.join(memory_dir, DAILY_DIR_NAME)
+    files = {}
+    for fpath in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl"))):
+        files[os.path.join(DAILY_DIR_NAME, os.path.basename(fpath))] = fpath
+    for fpath in segment_paths(memory_dir):
+        files[source_name(memory_dir, fpath)] = fpath
+    return files
+
+
+def _forget(store, key):
+    store.conn.execute("DELETE FROM entry_locations WHERE file=?", (key,))
+    store.conn.execute("DELETE FROM entry_stats WHERE file=?", (key,))
+    store.conn.execute("DELETE FROM entry_files WHERE file=?", (key,))
+
+
+def entry_metrics(entry) -> list:
+    """
+    一行对 entry_stats 的贡献 [(day, metric), ...]；entry 为 None 表示解析失败的行。
+    """
+    if entry is None:
+        return [("", "parse_errors")]
+    ts = entry.get("timestamp")
+    day = ts[:10] if isinstance(ts, str) else ""
+    metrics = [(day, "entries")]
+    if entry.get("type") == "session_metrics":
+        metrics.append((day, f"session:{entry.get('summary_source') or 'none'}"))
+    elif entry.get("type") in ("fact", None) and entry.get("memory_type"):
+        metrics.append((day, f"fact:{entry['memory_type']}"))
+    return metrics
+
+
+def _apply_stats(store, key, counts: Counter):
+    """把计数增量累加到 entry_stats，归零的行随即删除"""
+    rows = [(key, day, metric, n) for (day, metric), n in counts.items() if n]
+    if not rows:
+        return
+    store.conn.executemany(
+        "INSERT INTO entry_stats(file, day, metric, count) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(file, day, metric) DO UPDATE SET count = count + excluded.count",
+        rows,
+    )
+    store.conn.execute("DELETE FROM entry_stats WHERE file=? AND count<=0", (key,))
+
+
+def _save_file_state(store, key, path, size):
+    st = os.stat(path)
+    store.conn.execute(
+        "INSERT OR REPLACE INTO entry_files(file, inode, size, mtime_ns, boundary_hash) VALUES (?, ?, ?, ?, ?)",
+        (key, st.st_ino, size, st.st_mtime_ns, boundary_hash(path, size)),
+    )
+
+
+def refresh_file(store, key: str, path: str, state: dict = None) -> bool:
+    """
+    更新单个文件的位置索引，返回是否读取了文件。
+
+    state 为 entry_files 中的旧状态；传入 None 时整文件重扫。
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        _forget(store, key)
+        return False
+    if state and state["inode"] == st.st_ino and state["size"] == st.st_size \
+            and state["mtime_ns"] == st.st_mtime_ns:
+        return False
+    offset = 0
+    if (state and state["inode"] == st.st_ino and st.st_size > state["size"]
+            and boundary_hash(path, state["size"]) == state["boundary_hash"]):
+        offset = state["size"]
+    else:
+        store.conn.execute("DELETE FROM entry_locations WHERE file=?", (key,))
+        store.conn.execute("DELETE FROM entry_stats WHERE file=?", (key,))
+    rows = []
+    counts = Counter()
+    end = offset
+    for line_offset, raw in iter_raw_lines(path, offset):
+        end = line_offset + len(raw)
+        if not raw.strip():
+            continue
+        entry = parse_line(raw)
+        counts.update(entry_metrics(entry))
+        if entry is not None and isinstance(entry.get("id"), str):
+            rows.append((entry["id"], key, line_offset, len(raw)))
+    store.conn.executemany("INSERT INTO entry_locations(id, file, offset, length) VALUES (?, ?, ?, ?)", rows)
+    _apply_stats(store, key, counts)
+    _save_file_state(store, key, path, end)
+    return True
+
+
+def refresh(store, files: dict) -> int:
+    """
+    按文件增量刷新位置索引，返回实际读取的文件数。
+
+    Args:
+        files: {索引键（相对 memory-data 的路径）: 绝对路径}，须为全部受管文件；
+               不在其中的旧索引记录会被清除
+    """
+    with store.transaction():
+        known = {r["file"]: dict(r) for r in store.conn.execute("SELECT * FROM entry_files")}
+        for key in set(known) - set(files):
+            _forget(store, key)
+        return sum(refresh_file(store, key, path, known.get(key)) for key, path in files.items())
+
+
+def locate(store, ids) -> dict:
+    """查找 ids 所在的位置，返回 {索引键: [(offset, length, id), ...]}（按偏移排序）"""
+    ids = list(ids)
+    found = {}
+    for i in range(0, len(ids), _ID_BATCH):
+        batch = ids[i:i + _ID_BATCH]
+        cur = store.conn.execute(
+            f"SELECT id, file, offset, length FROM entry_locations WHERE id IN ({','.join('?' * len(batch))})",
+            batch,
+        )
+        for row in cur:
+            found.setdefault(row["file"], []).append((row["offset"], row["length"], row["id"]))
+    for locs in found.values():
+        locs.sort()
+    return found
+
+
+# --- 汇总查询 ---
+
+def rollup(store, day_from: str = None, file_prefix: str = None) -> Counter:
+    """
+    汇总 entry_stats 计数 {metric: count}。
+
+    Args:
+        day_from: 只统计该日期（YYYY-MM-DD）及之后的计数；给定时不含无日期的计数
+        file_prefix: 只统计索引键以此开头的文件，如 "daily/"
+    """
+    sql, params = "SELECT metric, SUM(count) AS n FROM entry_stats WHERE 1=1", []
+    if day_from:
+        sql += " AND day >= ?"
+        params.append(day_from)
+    if file_prefix:
+        sql += " AND substr(file, 1, ?) = ?"
+        params += [len(file_prefix), file_prefix]
+    return Counter({r["metric"]: r["n"] for r in store.conn.execute(sql + " GROUP BY metric", params)})
+
+
+def file_counts(store, metric: str) -> dict:
+    """各文件某项计数的合计 {索引键: count}"""
+    cur = store.conn.execute("SELECT file, SUM(count) AS n FROM entry_stats WHERE metric=? GROUP BY file", (metric,))
+    return {r["file"]: r["n"] for r in cur}
+
+
+def id_counts(store):
+    """位置索引中的 (条目数, 不同 ID 数)，即 ID 集合的规模与重复情况"""
+    row = store.conn.execute("SELECT COUNT(*), COUNT(DISTINCT id) FROM entry_locations").fetchone()
+    return row[0], row[1]
+
+
+# --- 按位置改写 ---
+
+def _write_lock_path(key, path):
+    """改写 path 时须持有的锁：daily 文件用自身的追加锁，会话段用 memory-data 下的 .sessions.lock"""
+    if key.startswith(DAILY_DIR_NAME + "/"):
+        return append_lock_path(path)
+    memory_dir = path
+    for _ in range(key.count("/") + 1):
+        memory_dir = os.path.dirname(memory_dir)
+    return sessions_lock_path(memory_dir)
+
+
+def _file_state(store, key):
+    row = store.conn.execute("SELECT * FROM entry_files WHERE file=?", (key,)).fetchone()
+    return dict(row) if row else None
+
+
+def _splice(store, key, path, locs, mutate):
+    """
+    就地改写 locs 指向的行并原子写回，返回 [(改前条目, 改后条目或 None)]。
+
+    调用方须持有 _write_lock_path 锁。目标行与索引不符时返回 None，文件保持不变。
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    pieces, edits, changes = [], [], []
+    counts = Counter()
+    pos = 0
+    for offset, length, entry_id in locs:
+        raw = data[offset:offset + length]
+        entry = parse_line(raw) if raw.endswith(b"\n") else None
+        if entry is None or entry.get("id") != entry_id:
+            return None
+        after = mutate(dict(entry))
+        if after is False:
+            continue
+        new_raw = b"" if after is None else (json.dumps(after, ensure_ascii=False) + "\n").encode("utf-8")
+        pieces += [data[pos:offset], new_raw]
+        pos = offset + length
+        edits.append((offset, length, len(new_raw)))
+        changes.append((entry, after))
+        counts.subtract(entry_metrics(entry))
+        if after is not None:
+            counts.update(entry_metrics(after))
+    if not edits:
+        return []
+    pieces.append(data[pos:])
+    new_data = b"".join(pieces)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(new_data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    # 从后往前平移：每次只移动旧坐标中位于该行之后的记录，已处理的更靠后的行仍在其后
+    for offset, old_len, new_len in reversed(edits):
+        if new_len:
+            store.conn.execute("UPDATE entry_locations SET length=? WHERE file=? AND offset=?",
+                               (new_len, key, offset))
+        else:
+            store.conn.execute("DELETE FROM entry_locations WHERE file=? AND offset=?", (key, offset))
+        if new_len != old_len:
+            store.conn.execute("UPDATE entry_locations SET offset=offset+? WHERE file=? AND offset>?",
+                               (new_len - old_len, key, offset))
+    _apply_stats(store, key, counts)
+    # 末尾未写完的半行不计入已索引范围
+    _save_file_state(store, key, path, new_data.rfind(b"\n") + 1)
+    return changes
+
+
+def update_entries(store, files: dict, ids, mutate) -> list:
+    """
+    对 ids 对应的条目执行 mutate，只重写受影响的文件。
+
+    Args:
+        files: {索引键: 绝对路径}，同 refresh
+        mutate: 接收条目副本，返回改后的条目、None（移除该行）或 False（不修改）
+    Returns:
+        [(索引键, 改前条目, 改后条目或 None), ...]
+    """
+    refresh(store, files)
+    ids = list(ids)
+    changes = []
+    with store.transaction():
+        for key in sorted(locate(store, ids)):
+            path = files.get(key)
+            if path is None:
+                continue
+            with FileLock(_write_lock_path(key, path)):
+                # 持锁后复核：refresh 之后追加的行、或被替换的文件，先纳入索引再定位
+                refresh_file(store, key, path, _file_state(store, key))
+                result = _splice(store, key, path, locate(store, ids).get(key, []), mutate)
+                if result is None:
+                    # 文件在索引之后被改写（如 mtime 与大小均未变的原地修改）：整文件重扫后重试
+                    refresh_file(store, key, path)
+                    result = _splice(store, key, path, locate(store, ids).get(key, []), mutate) or []
+            changes.extend((key, before, after) for before, after in result)
+    return changes
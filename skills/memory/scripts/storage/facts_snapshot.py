@@ -0,0 +1,92 @@
+"""
+近期事实快照：缓存 LOAD_DAYS_MAX 窗口内每个 daily 文件的已筛选事实，供 sessionStart 快速加载。
+
+存放于 memory-data/recent_facts.json，结构：
+    {"version": 1, "files": {"2026-01-01.jsonl": {"mtime_ns", "size", "inode", "facts": [...]}}}
+
+加载时按 (mtime_ns, size, inode) 判断文件是否变化：未变化的文件直接复用快照中的事实，
+只重新解析追加/重写过的文件（通常只有当天的文件），窗口外的文件从快照中剔除。
+衰减策略依赖当前时间，因此不缓存衰减结果，每次加载时对候选事实重新执行 _apply_decay。
+快照损坏或版本不符时视为空快照，整体重建。
+"""
+import os
+import json
+
+from service.config import DAILY_DIR_NAME, FACTS_SNAPSHOT_FILE
+from service.logger import get_logger, tracing
+from storage.jsonl import read_jsonl, is_loadable_fact, daily_files_in_window, _apply_decay
+
+log = get_logger("facts_snapshot")
+
+SNAPSHOT_VERSION = 1
+
+
+def _load(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+        return {}
+    files = data.get("files")
+    return files if isinstance(files, dict) else {}
+
+
+def _save(path, files):
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "files": files}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning("写入近期事实快照失败: %s", e)
+
+
+def collect_window_facts(memory_dir):
+    """
+    返回窗口内所有候选事实（未衰减），必要时更新快照文件。
+
+    返回 (facts, reparsed)：reparsed 为本次重新解析的文件数。
+    """
+    daily_dir = os.path.join(memory_dir, DAILY_DIR_NAME)
+    path = os.path.join(memory_dir, FACTS_SNAPSHOT_FILE)
+    cached = _load(path)
+
+    files = {}
+    reparsed = 0
+    for fpath in daily_files_in_window(daily_dir):
+        try:
+            st = os.stat(fpath)
+        except OSError:
+            continue
+        name = os.path.basename(fpath)
+        fingerprint = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "inode": st.st_ino}
+        item = cached.get(name)
+        if not (isinstance(item, dict) and all(item.get(k) == v for k, v in fingerprint.items())):
+            item = dict(fingerprint, facts=[e for e in read_jsonl(fpath) if is_loadable_fact(e)])
+            reparsed += 1
+            tracing.add(bytes_read=st.st_size)
+        files[name] = item
+
+    if reparsed or files.keys() != cached.keys():
+        _save(path, files)
+    facts = [fact for item in files.values() for fact in item.get("facts", [])]
+    return facts, reparsed
+
+
+def load_recent_facts(memory_dir):
+    """基于快照读取近期事实并应用衰减策略，结果与 read_recent_facts_from_daily 一致"""
+    facts, reparsed = collect_window_facts(memory_dir)
+    log.info("近期事实快照：候选 %d 条，重新解析文件 %d 个", len(facts), reparsed)
+    tracing.add(rows_scanned=len(facts), files_reparsed=reparsed)
+    if not facts:
+        return []
+    facts.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+    return _apply_decay(facts)
+
+
+def refresh_snapshot(memory_dir):
+    """刷新快照（sessionEnd 调用），使下一次 sessionStart 无需解析任何文件"""
+    _, reparsed = collect_window_facts(memory_dir)
+    return reparsed
@@ -6,7 +6,9 @@ JSONL 文件读写工具
 import json
 import os
 import glob
-from datetime import timedelta
+import hashlib
+from datetime import datetime, timedelta
+from core.file_lock import FileLock
 from core.utils import utcnow, parse_iso
 from service.config import _DEFAULTS
 
@@ -19,56 +21,225 @@ LOAD_IMPORTANT_CONFIDENCE: float = _M["important_confidence"]  # type: ignore[as
 LOAD_FACTS_LIMIT: int = _M["facts_limit"]  # type: ignore[assignment]
 
 
-def read_jsonl(filepath: str) -> list:
-    """读取整个 JSONL 文件，跳过空行和解析失败的行"""
+def iter_jsonl(filepath: str):
+    """流式逐行解析 JSONL 文件，跳过空行和解析失败的行；文件不存在时不产出任何条目"""
     if not os.path.exists(filepath):
-        return []
-    entries = []
+        return
     with open(filepath, "r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
             try:
-                entries.append(json.loads(line))
+                yield json.loads(line)
             except json.JSONDecodeError:
                 continue
-    return entries
 
 
-def read_last_entry(filepath: str):
-    """读取 JSONL 文件的最后一条未删除记录"""
+def append_lock_path(filepath: str) -> str:
+    """追加方与按位置改写方（storage/entry_index）共用的单文件锁路径"""
+    return os.path.join(os.path.dirname(filepath), f".{os.path.basename(filepath)}.lock")
+
+
+def append_jsonl(filepath: str, entry: dict, timeout: float = 5.0):
+    """
+    持有该文件的追加锁写入一行 JSON，与按位置改写互斥。
+
+    锁超时（改写长时间未完成）时仍直接追加：宁可与改写竞争，也不丢弃新条目。
+    """
+    lock = FileLock(append_lock_path(filepath), timeout=timeout)
+    lock.acquire()
+    try:
+        with open(filepath, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    finally:
+        lock.release()
+
+
+def read_jsonl(filepath: str) -> list:
+    """读取整个 JSONL 文件，跳过空行和解析失败的行"""
+    return list(iter_jsonl(filepath))
+
+
+_BOUNDARY_BYTES = 64
+
+
+def iter_raw_lines(filepath: str, offset: int = 0):
+    """
+    从字节偏移 offset 起流式产出每个完整行的 (行偏移, 行字节串含换行符)。
+
+    末尾没有换行符的行视为仍在写入，就此停止。
+    """
+    with open(filepath, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            yield offset, raw
+            offset += len(raw)
+
+
+def iter_jsonl_lines(filepath: str, offset: int = 0):
+    """
+    从字节偏移 offset 起流式产出每个完整行的 (行偏移, 行字节长度含换行符, 条目)。
+
+    空行和解析失败的行条目为 None；末尾没有换行符的行视为仍在写入，就此停止。
+    """
+    for line_offset, raw in iter_raw_lines(filepath, offset):
+        yield line_offset, len(raw), parse_line(raw)
+
+
+def read_jsonl_from(filepath: str, offset: int = 0):
+    """
+    从字节偏移 offset 起流式解析追加的完整行，跳过空行和解析失败的行。
+
+    末尾没有换行符的行视为仍在写入，不解析也不前移偏移量。
+
+    Returns:
+        (entries, end_offset)：end_offset 为最后一个完整行之后的字节偏移
+    """
+    entries = []
+    end = offset
+    with open(filepath, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            end += len(raw)
+            entry = parse_line(raw)
+            if entry is not None:
+                entries.append(entry)
+    return entries, end
+
+
+def boundary_hash(filepath: str, offset: int) -> str:
+    """offset 之前最后若干字节的摘要，用于识别同一 inode 上被截断后重写的文件"""
+    start = max(0, offset - _BOUNDARY_BYTES)
+    with open(filepath, "rb") as f:
+        f.seek(start)
+        data = f.read(offset - start)
+    if len(data) != offset - start:
+        return ""
+    return hashlib.sha1(data).hexdigest()
+
+
+def iter_jsonl_reversed(filepath: str, block_size: int = 8192):
+    """
+    从文件末尾按块向前读取，倒序产出解析成功的条目。
+
+    只读取到调用方停止迭代为止，取最后一条记录只需读取末尾的一两个块。
+    """
     if not os.path.exists(filepath):
+        return
+    with open(filepath, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + tail).split(b"\n")
+            # 第一段可能是被块边界截断的半行，留到下一轮拼接
+            tail = lines.pop(0)
+            for raw in reversed(lines):
+                entry = parse_line(raw)
+                if entry is not None:
+                    yield entry
+        entry = parse_line(tail)
+        if entry is not None:
+            yield entry
+
+
+def parse_line(raw: bytes):
+    """解析一行 JSONL 字节串，空行、解析失败或不是对象时返回 None"""
+    raw = raw.strip()
+    if not raw:
         return None
-    last = None
-    with open(filepath, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                try:
-                    entry = json.loads(line)
-                    if not entry.get("deleted_at"):
-                        last = entry
-                except json.JSONDecodeError:
-                    continue
-    return last
+    try:
+        entry = json.loads(raw.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return entry if isinstance(entry, dict) else None
+
+
+def read_last_entry(filepath: str):
+    """读取 JSONL 文件的最后一条未删除记录（从文件末尾反向查找）"""
+    for entry in iter_jsonl_reversed(filepath):
+        if not entry.get("deleted_at"):
+            return entry
+    return None
 
 
-def read_daily_facts(daily_dir: str) -> list:
+def is_loadable_fact(entry: dict) -> bool:
+    """是否为参与加载/蒸馏的有效事实：未删除、type 为 fact（或缺省）且有 content"""
+    return (not entry.get("deleted_at") and entry.get("type") in ("fact", None)
+            and "content" in entry)
+
+
+def daily_file_date(fpath: str):
+    """从 YYYY-MM-DD.jsonl 文件名解析日期字符串，不符合命名的返回 None"""
+    stem = os.path.basename(fpath)[:-len(".jsonl")] if fpath.endswith(".jsonl") else ""
+    if len(stem) == 10 and stem[4] == "-" and stem[7] == "-" and stem.replace("-", "").isdigit():
+        return stem
+    return None
+
+
+def _shift_day(day: str, days: int) -> str:
+    return (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def daily_files_between(daily_dir: str, date_from: str = None, date_to: str = None) -> list:
     """
-    读取 daily/ 目录下所有 .jsonl 文件，合并返回 type=fact 的条目。
-    按时间降序排列。
+    按文件名日期选出可能包含 [date_from, date_to]（YYYY-MM-DD，闭区间）内记录的 daily 文件。
+
+    只比较文件名，不打开文件；两端各多留一天余量以容忍跨零点写入，
+    调用方仍需按条目 timestamp 精确过滤。文件名不是日期的文件总是保留。
     """
     if not os.path.isdir(daily_dir):
         return []
-    all_entries = []
+    lo = _shift_day(date_from, -1) if date_from else None
+    hi = _shift_day(date_to, 1) if date_to else None
+    files = []
     for fpath in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl"))):
-        for entry in read_jsonl(fpath):
-            if entry.get("deleted_at"):
-                continue
-            if entry.get("type") in ("fact", None):
-                if "content" in entry:
-                    all_entries.append(entry)
+        day = daily_file_date(fpath)
+        if day is not None and ((lo and day < lo) or (hi and day > hi)):
+            continue
+        files.append(fpath)
+    return files
+
+
+def iter_daily_entries(daily_dir: str, date_from: str = None, date_to: str = None):
+    """
+    流式产出日期范围内 daily 文件的 (文件路径, 条目)，范围外的文件不会被打开。
+
+    范围按文件名裁剪（见 daily_files_between），条目本身不按 timestamp 过滤。
+    """
+    for fpath in daily_files_between(daily_dir, date_from, date_to):
+        for entry in iter_jsonl(fpath):
+            yield fpath, entry
+
+
+def daily_files_in_window(daily_dir: str, days: int = LOAD_DAYS_MAX) -> list:
+    """返回可能包含最近 days 天记录的 daily 文件（按文件名排序）"""
+    return daily_files_between(daily_dir, date_from=(utcnow() - timedelta(days=days)).strftime("%Y-%m-%d"))
+
+
+def read_daily_facts(daily_dir: str, date_from: str = None, date_to: str = None) -> list:
+    """
+    读取 daily/ 目录下的 .jsonl 文件，合并返回 type=fact 的条目。
+    按时间降序排列。
+
+    给定 date_from/date_to（YYYY-MM-DD）时只打开范围内的文件，并按 timestamp 日期精确过滤。
+    """
+    all_entries = []
+    for _, e in iter_daily_entries(daily_dir, date_from, date_to):
+        if not is_loadable_fact(e):
+            continue
+        day = (e.get("timestamp") or "")[:10]
+        if (date_from and day < date_from) or (date_to and day > date_to):
+            continue
+        all_entries.append(e)
     all_entries.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
     return all_entries
 
@@ -76,11 +247,16 @@ def read_daily_facts(daily_dir: str) -> list:
 def read_recent_facts_from_daily(daily_dir: str) -> list:
     """
     从 daily/ 目录读取事实并应用衰减策略（近多远少）。
-    这是 load_memory.py 的主要事实来源。
+
+    只读取文件名日期落在 LOAD_DAYS_MAX 窗口内的文件；load_memory.py 通过
+    storage.facts_snapshot 在此基础上复用未变化文件的解析结果。
     """
-    all_facts = read_daily_facts(daily_dir)
+    cutoff = (utcnow() - timedelta(days=LOAD_DAYS_MAX)).strftime("%Y-%m-%d")
+    all_facts = [e for _, e in iter_daily_entries(daily_dir, date_from=cutoff) if is_loadable_fact(e)]
     if not all_facts:
         return []
+    # 与 read_daily_facts 一致按时间降序，_apply_decay 的按天截取依赖这一顺序
+    all_facts.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
     return _apply_decay(all_facts)
 
 
@@ -1,32 +1,61 @@
 """
 JSONL 管理操作：读取全部、筛选、软删除、恢复、物理删除、统计、审计
+
+软删除/恢复/物理删除通过 storage/entry_index.py 的 id → 位置索引只改写受影响的文件，
+并在同一事务内更新 index.sqlite 的 chunks 表，无需再跑一次全量同步。
 """
 import json
 import os
-import glob
-from .jsonl import read_jsonl
-from core.utils import iso_now
+from contextlib import contextmanager
+from datetime import timedelta
+from .jsonl import iter_daily_entries
+from .session_log import iter_sessions, source_name, resolve_source
+from .entry_index import managed_files, update_entries, chunk_from_entry
+from .sqlite_store import SQLiteStore
+from core.utils import iso_now, utcnow
+from service.config import INDEX_DB
+
+
+def iter_entries(daily_dir: str, sessions_path: str, scope: str = "all",
+                 include_deleted: bool = False, date_from: str = None, date_to: str = None):
+    """
+    流式产出指定 scope 内的条目，每条带 _source_file。
+    scope: "daily" | "sessions" | "all"
+
+    date_from/date_to（YYYY-MM-DD）按文件名日期跳过范围外的 daily 文件、按段索引
+    跳过范围外的会话封存段，只用于缩小读取范围，精确的日期过滤仍由 filter_entries 完成。
+    会话条目的 _source_file 为相对 memory-data 的段路径（sessions.jsonl 或 sessions/seg-*.jsonl）。
+    """
+    if scope in ("daily", "all"):
+        for fpath, e in iter_daily_entries(daily_dir, date_from, date_to):
+            if include_deleted or not e.get("deleted_at"):
+                e["_source_file"] = os.path.basename(fpath)
+                yield e
+    if scope in ("sessions", "all"):
+        memory_dir = os.path.dirname(sessions_path)
+        for fpath, e in iter_sessions(memory_dir, date_from, date_to):
+            if include_deleted or not e.get("deleted_at"):
+                e["_source_file"] = source_name(memory_dir, fpath)
+                yield e
 
 
 def read_all_entries(daily_dir: str, sessions_path: str, scope: str = "all",
-                     include_deleted: bool = False) -> list:
+                     include_deleted: bool = False, date_from: str = None, date_to: str = None) -> list:
     """
     读取指定 scope 内的全部条目。
     scope: "daily" | "sessions" | "all"
     """
-    entries = []
-    if scope in ("daily", "all") and os.path.isdir(daily_dir):
-        for fpath in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl"))):
-            for e in read_jsonl(fpath):
-                e["_source_file"] = os.path.basename(fpath)
-                entries.append(e)
-    if scope in ("sessions", "all") and os.path.isfile(sessions_path):
-        for e in read_jsonl(sessions_path):
-            e["_source_file"] = os.path.basename(sessions_path)
-            entries.append(e)
-    if not include_deleted:
-        entries = [e for e in entries if not e.get("deleted_at")]
-    return entries
+    return list(iter_entries(daily_dir, sessions_path, scope, include_deleted, date_from, date_to))
+
+
+def date_bounds(date_from: str = None, date_to: str = None, before: str = None, days: int = None):
+    """合并 --from/--to/--before/--days 为单个闭区间 (date_from, date_to)，用于下推到读取层"""
+    if days:
+        cutoff = (utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+        date_from = max(date_from, cutoff) if date_from else cutoff
+    if before:
+        date_to = min(date_to, before) if date_to else before
+    return date_from, date_to
 
 
 def filter_entries(entries: list, keyword: str = None, entry_id: str = None,
@@ -63,102 +92,87 @@ def _rewrite_jsonl(filepath: str, entries: list):
     os.replace(tmp, filepath)
 
 
+def _file_label(sessions_path: str, key: str) -> str:
+    """索引键 → affected_files 中的名字：daily 文件取文件名，会话段保留相对路径"""
+    return key if resolve_source(os.path.dirname(sessions_path), key) else os.path.basename(key)
+
+
+@contextmanager
+def _index_store(sessions_path: str, store=None):
+    """使用调用方的 SQLiteStore，或临时打开 memory-data 下的 index.sqlite"""
+    if store is not None:
+        yield store
+        return
+    store = SQLiteStore(os.path.join(os.path.dirname(sessions_path), INDEX_DB))
+    try:
+        yield store
+    finally:
+        store.close()
+
+
+def _update_by_id(daily_dir: str, sessions_path: str, ids: set, mutate, on_changes, store=None) -> list:
+    """
+    按位置索引改写 ids 对应的条目，并在同一事务内由 on_changes 更新 chunks 表。
+
+    只读取和重写包含目标条目的文件，返回 [(索引键, 改前条目, 改后条目或 None)]。
+    提交后同 sync_index 一样对齐向量旁路文件与 IVF 索引，搜索无需回退 SQLite 装载。
+    """
+    with _index_store(sessions_path, store) as st:
+        with st.transaction():
+            changes = update_entries(st, managed_files(os.path.dirname(sessions_path), daily_dir), ids, mutate)
+            on_changes(st, changes)
+        if changes:
+            st.sync_vector_sidecar(st.get_meta("embedding_model") or "")
+            st.sync_ann_index()
+    return changes
+
+
+def _affected(sessions_path: str, changes: list) -> list:
+    return sorted({_file_label(sessions_path, key) for key, _, _ in changes})
+
+
 def soft_delete_entries(daily_dir: str, sessions_path: str,
-                        ids_to_delete: set, actor: str = "agent") -> dict:
-    """软删除：为匹配 ID 的条目添加 deleted_at / deleted_by 标记"""
-    affected_files = []
-    deleted = 0
+                        ids_to_delete: set, actor: str = "agent", store=None) -> dict:
+    """软删除：为匹配 ID 的条目添加 deleted_at / deleted_by 标记，并移出搜索索引"""
     now = iso_now()
 
-    if os.path.isdir(daily_dir):
-        for fpath in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl"))):
-            entries = read_jsonl(fpath)
-            changed = False
-            for e in entries:
-                if e.get("id") in ids_to_delete and not e.get("deleted_at"):
-                    e["deleted_at"] = now
-                    e["deleted_by"] = actor
-                    changed = True
-                    deleted += 1
-            if changed:
-                _rewrite_jsonl(fpath, entries)
-                affected_files.append(os.path.basename(fpath))
-
-    if os.path.isfile(sessions_path):
-        entries = read_jsonl(sessions_path)
-        changed = False
-        for e in entries:
-            if e.get("id") in ids_to_delete and not e.get("deleted_at"):
-                e["deleted_at"] = now
-                e["deleted_by"] = actor
-                changed = True
-                deleted += 1
-        if changed:
-            _rewrite_jsonl(sessions_path, entries)
-            affected_files.append(os.path.basename(sessions_path))
-
-    return {"deleted": deleted, "affected_files": affected_files}
-
-
-def restore_entries(daily_dir: str, sessions_path: str, ids_to_restore: set) -> dict:
-    """移除 deleted_at / deleted_by 标记，恢复软删除的条目"""
-    restored = 0
-
-    if os.path.isdir(daily_dir):
-        for fpath in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl"))):
-            entries = read_jsonl(fpath)
-            changed = False
-            for e in entries:
-                if e.get("id") in ids_to_restore and e.get("deleted_at"):
-                    e.pop("deleted_at", None)
-                    e.pop("deleted_by", None)
-                    changed = True
-                    restored += 1
-            if changed:
-                _rewrite_jsonl(fpath, entries)
-
-    if os.path.isfile(sessions_path):
-        entries = read_jsonl(sessions_path)
-        changed = False
-        for e in entries:
-            if e.get("id") in ids_to_restore and e.get("deleted_at"):
-                e.pop("deleted_at", None)
-                e.pop("deleted_by", None)
-                changed = True
-                restored += 1
-        if changed:
-            _rewrite_jsonl(sessions_path, entries)
-
-    return {"restored": restored}
-
-
-def purge_entries(daily_dir: str, sessions_path: str, ids_to_purge: set) -> dict:
-    """物理删除：从 JSONL 文件中移除匹配 ID 的条目"""
-    purged = 0
-    affected_files = []
-
-    if os.path.isdir(daily_dir):
-        for fpath in sorted(glob.glob(os.path.join(daily_dir, "*.jsonl"))):
-            entries = read_jsonl(fpath)
-            before_count = len(entries)
-            entries = [e for e in entries if e.get("id") not in ids_to_purge]
-            removed = before_count - len(entries)
-            if removed:
-                _rewrite_jsonl(fpath, entries)
-                purged += removed
-                affected_files.append(os.path.basename(fpath))
-
-    if os.path.isfile(sessions_path):
-        entries = read_jsonl(sessions_path)
-        before_count = len(entries)
-        entries = [e for e in entries if e.get("id") not in ids_to_purge]
-        removed = before_count - len(entries)
-        if removed:
-            _rewrite_jsonl(sessions_path, entries)
-            purged += removed
-            affected_files.append(os.path.basename(sessions_path))
-
-    return {"purged": purged, "affected_files": affected_files}
+    def mark(e):
+        if e.get("deleted_at"):
+            return False
+        e["deleted_at"] = now
+        e["deleted_by"] = actor
+        return e
+
+    changes = _update_by_id(daily_dir, sessions_path, ids_to_delete, mark,
+                            lambda st, ch: st.delete_chunks({b.get("id") for _, b, _ in ch}), store)
+    return {"deleted": len(changes), "affected_files": _affected(sessions_path, changes)}
+
+
+def restore_entries(daily_dir: str, sessions_path: str, ids_to_restore: set, store=None) -> dict:
+    """
+    移除 deleted_at / deleted_by 标记，恢复软删除的条目。
+
+    恢复的条目立即以无向量的形式写回搜索索引（FTS 可检索），向量由下次 sync_index 补齐。
+    """
+    def unmark(e):
+        if not e.get("deleted_at"):
+            return False
+        e.pop("deleted_at", None)
+        e.pop("deleted_by", None)
+        return e
+
+    def reindex(st, changes):
+        st.upsert_chunks(c for c in (chunk_from_entry(after, key) for key, _, after in changes) if c)
+
+    changes = _update_by_id(daily_dir, sessions_path, ids_to_restore, unmark, reindex, store)
+    return {"restored": len(changes)}
+
+
+def purge_entries(daily_dir: str, sessions_path: str, ids_to_purge: set, store=None) -> dict:
+    """物理删除：从 JSONL 文件中移除匹配 ID 的条目，并移出搜索索引"""
+    changes = _update_by_id(daily_dir, sessions_path, ids_to_purge, lambda e: None,
+                            lambda st, ch: st.delete_chunks({b.get("id") for _, b, _ in ch}), store)
+    return {"purged": len(changes), "affected_files": _affected(sessions_path, changes)}
 
 
 def count_by_type(daily_dir: str, sessions_path: str) -> dict:
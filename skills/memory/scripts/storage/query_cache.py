@@ -0,0 +1,105 @@
+"""
+检索结果缓存：同一索引版本下的重复查询直接返回上次的结果，跳过查询向量生成（模型加载）与打分。
+
+存放于 index.sqlite 的 query_cache 表（随 --rebuild 一并删除）。
+- 键：规范化查询 + 检索方式 + 时间窗口 + 结果数 + 是否含阶段摘要 + 嵌入模型/向量引擎
+- 每条记录带写入时的索引版本；SQLiteStore 在 chunks 每次变化时递增版本，
+  版本不同的记录视为未命中，写入新结果时一并清除
+- 命中/未命中次数累计在 meta（query_cache_hits / query_cache_misses）
+- 缓存与计数的写入都是尽力而为：写锁被同步占用时立即放弃，不等待 busy timeout
+- 条数超过 search.cache_max_entries 时按最近使用时间淘汰
+"""
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+
+from core.utils import today_str
+from .embedding_cache import normalize_text
+from service.logger import get_logger
+
+log = get_logger("query_cache")
+
+_HITS_KEY = "query_cache_hits"
+_MISSES_KEY = "query_cache_misses"
+
+
+def normalize_query(query):
+    """NFKC 规范化、折叠空白并忽略大小写"""
+    return normalize_text(query).casefold()
+
+
+def cache_key(query, method, max_results, include_stage=False, days=None,
+              from_date=None, to_date=None, model="", engine=""):
+    """
+    结果缓存键。
+
+    days 为相对今天的窗口，键中带上当天日期，跨天后不会命中前一天的结果。
+    """
+    window = [days, today_str() if days else None, from_date, to_date]
+    raw = json.dumps([normalize_query(query), method, max_results, bool(include_stage),
+                      window, model or "", engine or ""], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _count(store, meta_key):
+    store.conn.execute(
+        "INSERT INTO meta(key,value) VALUES(?, '1') "
+        "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+        (meta_key,),
+    )
+
+
+@contextmanager
+def _no_wait(store):
+    """块内写事务不等待写锁（busy_timeout=0），退出后恢复连接原有的等待时间"""
+    timeout = store.conn.execute("PRAGMA busy_timeout").fetchone()[0]
+    store.conn.execute("PRAGMA busy_timeout=0")
+    try:
+        with store.transaction():
+            yield
+    finally:
+        store.conn.execute(f"PRAGMA busy_timeout={int(timeout)}")
+
+
+def stats(store) -> dict:
+    """累计命中/未命中次数"""
+    return {"hits": int(store.get_meta(_HITS_KEY) or 0), "misses": int(store.get_meta(_MISSES_KEY) or 0)}
+
+
+def lookup(store, key, generation):
+    """
+    查找当前索引版本下的缓存结果，命中返回 run_search 的输出 dict，未命中返回 None。
+
+    同时累加命中/未命中计数；写锁被占用（如同步进行中）时跳过计数，不阻塞检索。
+    """
+    row = store.conn.execute(
+        "SELECT output FROM query_cache WHERE key=? AND generation=?", (key, generation)
+    ).fetchone()
+    try:
+        with _no_wait(store):
+            if row:
+                store.conn.execute("UPDATE query_cache SET last_used=? WHERE key=?", (time.time(), key))
+            _count(store, _HITS_KEY if row else _MISSES_KEY)
+    except sqlite3.OperationalError as e:
+        log.debug("跳过检索缓存统计更新: %s", e)
+    return json.loads(row["output"]) if row else None
+
+
+def save(store, key, generation, output, max_entries):
+    """写入检索结果，清除旧版本记录并淘汰超出上限的最久未用记录；写锁被占用时放弃写入"""
+    try:
+        with _no_wait(store):
+            store.conn.execute("DELETE FROM query_cache WHERE generation<>?", (generation,))
+            store.conn.execute(
+                "INSERT OR REPLACE INTO query_cache(key, generation, output, last_used) VALUES (?, ?, ?, ?)",
+                (key, generation, json.dumps(output, ensure_ascii=False), time.time()),
+            )
+            store.conn.execute(
+                "DELETE FROM query_cache WHERE key IN "
+                "(SELECT key FROM query_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (max_entries,),
+            )
+    except sqlite3.OperationalError as e:
+        log.debug("跳过检索缓存写入: %s", e)
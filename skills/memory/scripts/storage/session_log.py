@@ -0,0 +1,311 @@
+"""
+会话摘要分段存储：sessions.jsonl 为活动段，写满后整文件封存到 sessions/ 目录。
+
+- 活动段：memory-data/sessions.jsonl，新摘要只追加到这里（路径与旧版一致）
+- 封存段：活动段达到 sessions.segment_entries 条后，下一次追加前整文件改名为
+  sessions/seg-NNNNNN.jsonl，之后不再追加
+- 段索引：sessions/segments.json 记录每段的条目数、字节数与首末时间戳；
+  段文件大小与记录不符（被管理命令改写过）时重新计数
+- 保留：按段整体删除最旧的封存段，剩余条目数不少于 keep_last，不重写任何数据；
+  删除段文件前先从 index.sqlite 中删掉该段的 chunk，淘汰的摘要不会再被搜到
+
+读取方通过 iter_sessions / read_sessions 按时间顺序遍历全部段；
+last_session 从活动段末尾反向查找，活动段为空时再依次查较新的封存段。
+写入方（append_session / rotate / enforce_retention）由调用方持有 sessions_lock_path() 文件锁。
+"""
+import os
+import json
+import glob
+
+from .jsonl import iter_jsonl, read_jsonl, read_last_entry
+from service.config import _DEFAULTS, INDEX_DB, SESSIONS_FILE, SESSIONS_DIR_NAME, SESSIONS_INDEX_FILE
+
+SEGMENT_ENTRIES: int = _DEFAULTS["sessions"]["segment_entries"]  # type: ignore[assignment]
+KEEP_LAST: int = _DEFAULTS["sessions"]["keep_last"]  # type: ignore[assignment]
+INDEX_VERSION = 1
+_SEG_PREFIX = "seg-"
+
+
+def sessions_dir(memory_dir: str) -> str:
+    return os.path.join(memory_dir, SESSIONS_DIR_NAME)
+
+
+def sessions_lock_path(memory_dir: str) -> str:
+    """会话段写入方共用的文件锁路径"""
+    return os.path.join(memory_dir, ".sessions.lock")
+
+
+def active_path(memory_dir: str) -> str:
+    return os.path.join(memory_dir, SESSIONS_FILE)
+
+
+def sealed_segments(memory_dir: str) -> list:
+    """封存段文件路径，按序号从旧到新"""
+    return sorted(glob.glob(os.path.join(sessions_dir(memory_dir), f"{_SEG_PREFIX}*.jsonl")))
+
+
+def segment_paths(memory_dir: str) -> list:
+    """全部段文件路径（封存段 + 活动段），按时间从旧到新"""
+    paths = sealed_segments(memory_dir)
+    active = active_path(memory_dir)
+    if os.path.isfile(active):
+        paths.append(active)
+    return paths
+
+
+def source_name(memory_dir: str, path: str) -> str:
+    """段文件相对 memory_dir 的路径，用作条目的 _source_file / 索引的 source_file"""
+    return os.path.relpath(path, memory_dir).replace(os.sep, "/")
+
+
+def resolve_source(memory_dir: str, source_file: str):
+    """把 source_name 还原为绝对路径；不是会话段文件时返回 None"""
+    if source_file == SESSIONS_FILE:
+        return active_path(memory_dir)
+    prefix = SESSIONS_DIR_NAME + "/"
+    name = source_file[len(prefix):] if source_file.startswith(prefix) else ""
+    if name.startswith(_SEG_PREFIX) and name.endswith(".jsonl") and "/" not in name:
+        return os.path.join(sessions_dir(memory_dir), name)
+    return None
+
+
+# --- 段索引 ---
+
+def _index_path(memory_dir: str) -> str:
+    return os.path.join(sessions_dir(memory_dir), SESSIONS_INDEX_FILE)
+
+
+def _load_index(memory_dir: str) -> dict:
+    try:
+        with open(_index_path(memory_dir), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if isinstance(index, dict) and index.get("version") == INDEX_VERSION:
+            index.setdefault("segments", {})
+            index.setdefault("active", {})
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": INDEX_VERSION, "segments": {}, "active": {}}
+
+
+def _save_index(memory_dir: str, index: dict):
+    os.makedirs(sessions_dir(memory_dir), exist_ok=True)
+    path = _index_path(memory_dir)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _scan(path: str) -> dict:
+    """统计段文件的条目数、字节数与首末时间戳"""
+    entries, first_ts, last_ts = 0, "", ""
+    for e in iter_jsonl(path):
+        entries += 1
+        ts = e.get("timestamp") or ""
+        if ts:
+            first_ts = first_ts or ts
+            last_ts = ts
+    return {"entries": entries, "bytes": os.path.getsize(path), "first_ts": first_ts, "last_ts": last_ts}
+
+
+def _fresh(meta, path: str) -> bool:
+    try:
+        return bool(meta) and meta.get("bytes") == os.path.getsize(path)
+    except OSError:
+        return False
+
+
+def segment_stats(memory_dir: str) -> list:
+    """
+    各封存段的统计信息（从旧到新），每项含 name/path/entries/bytes/first_ts/last_ts。
+
+    索引缺失或与文件大小不符的段重新计数，并回写索引。
+    """
+    index = _load_index(memory_dir)
+    segments = {}
+    stats = []
+    changed = False
+    for path in sealed_segments(memory_dir):
+        name = os.path.basename(path)
+        meta = index["segments"].get(name)
+        if not _fresh(meta, path):
+            meta = _scan(path)
+            changed = True
+        segments[name] = meta
+        stats.append(dict(meta, name=name, path=path))
+    if changed or set(segments) != set(index["segments"]):
+        index["segments"] = segments
+        _save_index(memory_dir, index)
+    return stats
+
+
+def _active_entries(memory_dir: str, index: dict) -> int:
+    path = active_path(memory_dir)
+    if not os.path.isfile(path):
+        return 0
+    meta = index.get("active")
+    if _fresh(meta, path):
+        return meta["entries"]
+    return sum(1 for _ in iter_jsonl(path))
+
+
+# --- 读取（兼容层）---
+
+def iter_sessions(memory_dir: str, date_from: str = None, date_to: str = None):
+    """
+    按时间顺序流式产出 (段文件路径, 条目)。
+
+    给定 date_from/date_to（YYYY-MM-DD）时跳过首末时间戳完全落在范围外的封存段，
+    条目本身不按 timestamp 过滤。
+    """
+    for seg in segment_stats(memory_dir):
+        if date_from and seg["last_ts"] and seg["last_ts"][:10] < date_from:
+            continue
+        if date_to and seg["first_ts"] and seg["first_ts"][:10] > date_to:
+            continue
+        for entry in iter_jsonl(seg["path"]):
+            yield seg["path"], entry
+    active = active_path(memory_dir)
+    for entry in iter_jsonl(active):
+        yield active, entry
+
+
+def read_sessions(memory_dir: str) -> list:
+    """读取全部段的会话摘要（旧版 read_jsonl(sessions.jsonl) 的替代）"""
+    return [e for _, e in iter_sessions(memory_dir)]
+
+
+def last_session(memory_dir: str):
+    """最后一条未删除的会话摘要：活动段末尾反向查找，找不到时再查较新的封存段"""
+    entry = read_last_entry(active_path(memory_dir))
+    if entry is not None:
+        return entry
+    for path in reversed(sealed_segments(memory_dir)):
+        entry = read_last_entry(path)
+        if entry is not None:
+            return entry
+    return None
+
+
+def count_sessions(memory_dir: str) -> int:
+    """全部段的条目总数，封存段从段索引读取"""
+    return (sum(s["entries"] for s in segment_stats(memory_dir))
+            + _active_entries(memory_dir, _load_index(memory_dir)))
+
+
+# --- 写入（调用方持有 .sessions.lock）---
+
+def _next_segment_path(memory_dir: str) -> str:
+    existing = sealed_segments(memory_dir)
+    seq = int(os.path.basename(existing[-1])[len(_SEG_PREFIX):-len(".jsonl")]) + 1 if existing else 1
+    return os.path.join(sessions_dir(memory_dir), f"{_SEG_PREFIX}{seq:06d}.jsonl")
+
+
+def _write_entries(path: str, entries: list):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for e in entries:
+            f.write(json.dumps(e, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def rotate(memory_dir: str, segment_entries: int = SEGMENT_ENTRIES) -> int:
+    """
+    把活动段中已写满的部分封存，返回新封存的段数。
+
+    活动段正好写满时整文件改名，不复制数据；超出一个段（旧版单文件迁移）时
+    按 segment_entries 切分为多个封存段，余下不足一段的条目留在活动段。
+    """
+    index = _load_index(memory_dir)
+    count = _active_entries(memory_dir, index)
+    if count < segment_entries:
+        return 0
+    os.makedirs(sessions_dir(memory_dir), exist_ok=True)
+    path = active_path(memory_dir)
+    sealed = 0
+    if count == segment_entries:
+        os.replace(path, _next_segment_path(memory_dir))
+        sealed = 1
+    else:
+        entries = read_jsonl(path)
+        keep = len(entries) % segment_entries or segment_entries
+        for start in range(0, len(entries) - keep, segment_entries):
+            _write_entries(_next_segment_path(memory_dir), entries[start:start + segment_entries])
+            sealed += 1
+        _write_entries(path, entries[len(entries) - keep:])
+    index["active"] = {}
+    _save_index(memory_dir, index)
+    segment_stats(memory_dir)
+    return sealed
+
+
+def append_session(memory_dir: str, entry: dict, segment_entries: int = SEGMENT_ENTRIES):
+    """追加一条会话摘要；活动段已写满时先封存再追加"""
+    rotate(memory_dir, segment_entries)
+    index = _load_index(memory_dir)
+    count = _active_entries(memory_dir, index)
+    path = active_path(memory_dir)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    index["active"] = {"entries": count + 1, "bytes": os.path.getsize(path)}
+    _save_index(memory_dir, index)
+
+
+def _drop_from_index(memory_dir: str, paths: list) -> int:
+    """
+    从 index.sqlite 删除这些段的 chunk 与同步状态，返回删除的 chunk 数；索引不存在时不创建。
+
+    按来源路径匹配；封存后尚未重新同步的条目来源仍是活动段，再按段内条目 id 补齐。
+    """
+    db_path = os.path.join(memory_dir, INDEX_DB)
+    if not os.path.exists(db_path):
+        return 0
+    from .sqlite_store import SQLiteStore
+
+    store = SQLiteStore(db_path)
+    try:
+        unsynced = set(store.chunk_ids_by_source(SESSIONS_FILE))
+        ids = set()
+        with store.transaction():
+            for path in paths:
+                name = source_name(memory_dir, path)
+                ids.update(store.chunk_ids_by_source(name))
+                ids.update(e["id"] for e in iter_jsonl(path) if e.get("id") in unsynced)
+                store.conn.execute("DELETE FROM sync_state WHERE file_path=?", (name,))
+            removed = store.delete_chunks(ids)
+        if removed:
+            store.sync_vector_sidecar(store.get_meta("embedding_model") or "")
+            store.sync_ann_index()
+        return removed
+    finally:
+        store.close()
+
+
+def enforce_retention(memory_dir: str, keep_last: int = KEEP_LAST) -> int:
+    """
+    整段删除最旧的封存段，删除后剩余条目数仍不少于 keep_last。
+
+    段内摘要先从搜索索引中删除，再删段文件（中途退出最多留下未被索引的旧段，不会留下搜得到的已删摘要）。
+
+    Returns:
+        删除的条目数
+    """
+    stats = segment_stats(memory_dir)
+    total = sum(s["entries"] for s in stats) + _active_entries(memory_dir, _load_index(memory_dir))
+    dropped = []
+    removed = 0
+    for seg in stats:
+        if total - removed - seg["entries"] < keep_last:
+            break
+        dropped.append(seg["path"])
+        removed += seg["entries"]
+    if not dropped:
+        return 0
+    _drop_from_index(memory_dir, dropped)
+    for path in dropped:
+        os.remove(path)
+    segment_stats(memory_dir)
+    return removed
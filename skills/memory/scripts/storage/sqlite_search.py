@@ -8,6 +8,8 @@ import struct
 import math
 from datetime import datetime, timedelta
 
+from service.logger import tracing
+
 
 def deserialize_embedding(blob):
     """将二进制 BLOB 反序列化为浮点元组"""
@@ -42,6 +44,7 @@ def _build_time_filter(days=None, from_date=None, to_date=None):
     return conditions, params
 
 
+@tracing.traced("search_fts")
 def search_fts(store, query, limit=10, days=None, from_date=None, to_date=None):
     """FTS5 全文搜索，按 BM25 相关性排序，支持时间过滤"""
     try:
@@ -59,33 +62,57 @@ def search_fts(store, query, limit=10, days=None, from_date=None, to_date=None):
             ORDER BY rank
             LIMIT ?
         """, (query, *time_params, limit))
-        return [dict(r) for r in cur.fetchall()]
+        rows = [dict(r) for r in cur.fetchall()]
+        tracing.add(rows=len(rows))
+        return rows
     except sqlite3.OperationalError:
         return []
 
 
+def _time_bounds(days=None, from_date=None, to_date=None):
+    """将时间过滤参数折算为 (下界, 上界) 字符串，供向量索引做行掩码"""
+    lower = None
+    upper = None
+    if days:
+        lower = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%S")
+    if from_date:
+        lower = max(lower or "", from_date + "T00:00:00")
+    if to_date:
+        upper = to_date + "T23:59:59"
+    return lower, upper
+
+
+@tracing.traced("search_vector")
 def search_vector(store, query_embedding, limit=10, days=None, from_date=None, to_date=None):
-    """向量相似度搜索，支持时间过滤"""
-    time_conds, time_params = _build_time_filter(days, from_date, to_date)
-    where = "embedding IS NOT NULL"
-    if time_conds:
-        where += " AND " + " AND ".join(c.replace("c.", "") for c in time_conds)
+    """
+    向量相似度搜索，支持时间过滤。
+
+    打分在 store.vector_index() 的内存矩阵上完成，仅对 Top-K 命中回表读取元数据。
+    """
+    lower, upper = _time_bounds(days, from_date, to_date)
+    index = store.vector_index()
+    hits = index.search(query_embedding, limit, lower=lower, upper=upper)
+    tracing.add(vectors=len(index), rows=len(hits))
+    if not hits:
+        return []
+    placeholders = ",".join("?" * len(hits))
     cur = store.conn.execute(
         f"SELECT id, content, type, memory_type, entities, confidence, "
-        f"source_file, timestamp, embedding FROM chunks WHERE {where}",
-        time_params,
+        f"source_file, timestamp FROM chunks WHERE id IN ({placeholders})",
+        [chunk_id for chunk_id, _ in hits],
     )
-    scored = []
-    for row in cur.fetchall():
-        row_dict = dict(row)
-        emb = deserialize_embedding(row_dict.pop("embedding"))
-        score = cosine_similarity(query_embedding, emb)
-        row_dict["score"] = score
-        scored.append(row_dict)
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    return scored[:limit]
+    rows = {r["id"]: dict(r) for r in cur.fetchall()}
+    results = []
+    for chunk_id, score in hits:
+        row = rows.get(chunk_id)
+        if row is None:
+            continue
+        row["score"] = score
+        results.append(row)
+    return results
 
 
+@tracing.traced("hybrid_search")
 def hybrid_search(store, query, query_embedding=None, limit=10, days=None, from_date=None, to_date=None):
     """
     混合搜索：结合 FTS5 和向量搜索，使用 RRF(Reciprocal Rank Fusion) 融合排名
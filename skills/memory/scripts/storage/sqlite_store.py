@@ -8,10 +8,15 @@ import sqlite3
 import struct
 import os
 import time
+from contextlib import contextmanager
 
 from storage.sqlite_search import search_fts as _search_fts
 from storage.sqlite_search import search_vector as _search_vector
 from storage.sqlite_search import hybrid_search as _hybrid_search
+from storage.vector_index import VectorIndex
+from storage.embedding_sidecar import load_sidecar, sync_sidecar
+from storage.ann_index import IVFIndex, sync_ivf
+from service.config import EMBEDDINGS_FILE, ANN_FILE, _DEFAULTS
 
 
 SCHEMA_VERSION = "1"
@@ -20,7 +25,7 @@ SCHEMA_VERSION = "1"
 _INIT_SQL = """
 -- chunks: 存储文本块及其元数据和嵌入向量
 CREATE TABLE IF NOT EXISTS chunks (
-    id TEXT PRIMARY KEY,          -- 唯一标识，如 log-143005 或 core-0
+    id TEXT PRIMARY KEY,          -- 唯一标识，如 log-143005 或 core-<内容哈希>
     content TEXT NOT NULL,        -- 文本内容
     type TEXT,                    -- 类型：fact / core / summary
     memory_type TEXT,             -- 记忆分类：W=客观事实 / B=经历 / O=偏好
@@ -71,8 +76,86 @@ CREATE TABLE IF NOT EXISTS sync_state (
     last_line INTEGER DEFAULT 0,  -- 上次同步到第几行
     last_id TEXT,                 -- 上次同步的最后一条 ID
     mtime INTEGER,                -- 文件修改时间戳（秒）
-    synced_at INTEGER             -- 同步执行时间戳（秒）
+    synced_at INTEGER,            -- 同步执行时间戳（秒）
+    byte_offset INTEGER,          -- 已解析到的字节偏移（最后一个完整行之后）
+    inode INTEGER,                -- 同步时文件的 inode，变化说明文件被原子替换
+    size INTEGER,                 -- 同步时文件大小
+    boundary_hash TEXT            -- byte_offset 前若干字节的摘要，识别原地截断重写
 );
+
+-- vector_rows: embeddings.f32 旁路文件的行号 → chunk 映射（见 storage/embedding_sidecar.py）
+CREATE TABLE IF NOT EXISTS vector_rows (
+    row INTEGER PRIMARY KEY,      -- 旁路文件中的行号
+    chunk_id TEXT NOT NULL,       -- 对应 chunks.id
+    chunk_rowid INTEGER NOT NULL, -- 写入时 chunks 的 rowid，用于差量比对
+    timestamp TEXT                -- 冗余的时间戳，供时间过滤掩码使用
+);
+
+-- entry_locations: JSONL 条目 id → 所在文件与字节范围（见 storage/entry_index.py）
+CREATE TABLE IF NOT EXISTS entry_locations (
+    id TEXT NOT NULL,             -- 条目 ID（不同文件中可能重复）
+    file TEXT NOT NULL,           -- 相对 memory-data 的文件路径
+    offset INTEGER NOT NULL,      -- 行首字节偏移
+    length INTEGER NOT NULL       -- 行字节长度（含换行符）
+);
+CREATE INDEX IF NOT EXISTS idx_entry_locations_id ON entry_locations(id);
+CREATE INDEX IF NOT EXISTS idx_entry_locations_file ON entry_locations(file, offset);
+
+-- entry_files: 已建立位置索引的文件及其状态，判断文件是否被追加或替换
+CREATE TABLE IF NOT EXISTS entry_files (
+    file TEXT PRIMARY KEY,        -- 相对 memory-data 的文件路径
+    inode INTEGER,                -- 建索引时文件的 inode
+    size INTEGER,                 -- 已建索引的字节数（最后一个完整行之后）
+    mtime_ns INTEGER,             -- 建索引时文件的 mtime（纳秒）
+    boundary_hash TEXT            -- size 前若干字节的摘要
+);
+
+-- entry_stats: 按文件、按天汇总的计数（随位置索引增量维护，供 manage metrics / doctor 查询）
+CREATE TABLE IF NOT EXISTS entry_stats (
+    file TEXT NOT NULL,           -- 相对 memory-data 的文件路径
+    day TEXT NOT NULL,            -- 条目 timestamp 的日期 YYYY-MM-DD，无时间戳或解析失败为空串
+    metric TEXT NOT NULL,         -- entries / parse_errors / session:<summary_source> / fact:<memory_type>
+    count INTEGER NOT NULL,
+    PRIMARY KEY (file, day, metric)
+);
+
+-- query_cache: search_memory 的结果缓存（见 storage/query_cache.py）
+CREATE TABLE IF NOT EXISTS query_cache (
+    key TEXT PRIMARY KEY,         -- sha1(规范化查询 + 检索参数)
+    generation INTEGER NOT NULL,  -- 写入时的索引版本（meta.generation）
+    output TEXT NOT NULL,         -- run_search 输出的 JSON
+    last_used REAL NOT NULL       -- 最近命中/写入时间，淘汰依据
+);
+CREATE INDEX IF NOT EXISTS idx_query_cache_last_used ON query_cache(last_used);
+"""
+
+
+# 连接级 PRAGMA：WAL 让同步写入与搜索读取互不阻塞；WAL 下 synchronous=NORMAL 仅在
+# checkpoint 时 fsync，仍保证崩溃一致性；cache_size 为负数表示 KiB
+_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+)
+
+# 后续版本新增的 sync_state 列，旧库在打开时 ALTER TABLE 补齐
+_SYNC_STATE_COLUMNS = (
+    ("byte_offset", "INTEGER"),
+    ("inode", "INTEGER"),
+    ("size", "INTEGER"),
+    ("boundary_hash", "TEXT"),
+)
+
+# WAL 模式下与数据库同生共死的附属文件，删除/重建索引时需一并清理
+SQLITE_SIDE_FILES = ("-wal", "-shm")
+
+_UPSERT_SQL = """
+    INSERT OR REPLACE INTO chunks
+    (id, content, type, memory_type, entities, confidence,
+     source_file, source_id, timestamp, embedding)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
 """
 
 
@@ -84,16 +167,43 @@ def serialize_embedding(vec):
 class SQLiteStore:
     """SQLite 存储操作封装"""
 
-    def __init__(self, db_path):
+    def __init__(self, db_path, vector_engine=_DEFAULTS["index"]["vector_engine"],
+                 ivf_nprobe=_DEFAULTS["index"]["ivf_nprobe"]):
         self.db_path = db_path
+        self.sidecar_path = os.path.join(os.path.dirname(db_path), EMBEDDINGS_FILE)
+        self.ann_path = os.path.join(os.path.dirname(db_path), ANN_FILE)
+        self.vector_engine = (vector_engine or "brute").lower()  # brute / ivf，见 index.vector_engine
+        self.ivf_nprobe = ivf_nprobe
         os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
         self.conn = sqlite3.connect(db_path)
         self.conn.row_factory = sqlite3.Row  # 查询结果以字典形式返回
+        self._configure()
+        self._vectors = None          # 惰性构建的向量矩阵，见 vector_index()
+        self._vectors_version = None  # 构建时的 PRAGMA data_version
+        self._tx_depth = 0            # transaction() 嵌套层数，>0 时写操作不逐条提交
         self._init_schema()
 
+    def _configure(self):
+        """应用连接级 PRAGMA；只读目录等无法切换 WAL 时保持默认日志模式"""
+        for name, value in _PRAGMAS:
+            try:
+                self.conn.execute(f"PRAGMA {name}={value}")
+            except sqlite3.OperationalError:
+                pass
+
     def _init_schema(self):
-        """执行建表 SQL，并记录 schema 版本"""
+        """执行建表 SQL，补齐旧库缺失的列，并记录 schema 版本"""
+        has_stats = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='entry_stats'").fetchone()
         self.conn.executescript(_INIT_SQL)
+        if not has_stats:
+            # 旧库的位置索引没有对应的计数：清空文件状态，下次刷新时整文件重扫
+            self.conn.execute("DELETE FROM entry_files")
+            self.conn.commit()
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(sync_state)")}
+        for name, decl in _SYNC_STATE_COLUMNS:
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE sync_state ADD COLUMN {name} {decl}")
         cur = self.conn.execute("SELECT value FROM meta WHERE key='schema_version'")
         row = cur.fetchone()
         if not row:
@@ -108,15 +218,102 @@ class SQLiteStore:
                      source_file=None, source_id=None, timestamp=None,
                      embedding=None):
         """插入或更新一个文本块（INSERT OR REPLACE）"""
-        emb_blob = serialize_embedding(embedding) if embedding else None
-        self.conn.execute("""
-            INSERT OR REPLACE INTO chunks
-            (id, content, type, memory_type, entities, confidence,
-             source_file, source_id, timestamp, embedding)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (chunk_id, content, chunk_type, memory_type, entities,
-              confidence, source_file, source_id, timestamp, emb_blob))
-        self.conn.commit()
+        self.upsert_chunks([{
+            "chunk_id": chunk_id, "content": content, "chunk_type": chunk_type,
+            "memory_type": memory_type, "entities": entities, "confidence": confidence,
+            "source_file": source_file, "source_id": source_id, "timestamp": timestamp,
+            "embedding": embedding,
+        }])
+
+    def upsert_chunks(self, chunks):
+        """
+        批量插入或更新文本块：executemany 单事务写入，FTS 触发器在同一事务内执行。
+
+        Args:
+            chunks: 可迭代的 dict，键同 upsert_chunk 的参数（chunk_id、content 必填）
+        Returns:
+            写入条数
+        """
+        params = []
+        vectors = []
+        for c in chunks:
+            embedding = c.get("embedding")
+            params.append((
+                c["chunk_id"], c["content"], c.get("chunk_type"), c.get("memory_type"),
+                c.get("entities"), c.get("confidence", 0.8), c.get("source_file"),
+                c.get("source_id"), c.get("timestamp"),
+                serialize_embedding(embedding) if embedding else None,
+            ))
+            vectors.append((c["chunk_id"], c.get("timestamp"), embedding))
+        if not params:
+            return 0
+        with self.transaction():
+            self.conn.executemany(_UPSERT_SQL, params)
+            self.bump_generation()
+        if self._vectors is not None:
+            for chunk_id, timestamp, embedding in vectors:
+                self._vectors.upsert(chunk_id, timestamp, embedding)
+        return len(params)
+
+    @contextmanager
+    def transaction(self):
+        """
+        将块内的写操作合并为一个事务：正常退出时统一提交，异常时回滚。
+
+        可嵌套，仅最外层提交/回滚。
+        """
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if not self._tx_depth:
+                self.conn.rollback()
+                self._vectors = None  # 已合并的增量随事务作废
+            raise
+        self._tx_depth -= 1
+        if not self._tx_depth:
+            self.conn.commit()
+
+    def _commit(self):
+        if not self._tx_depth:
+            self.conn.commit()
+
+    def _data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def vector_index(self):
+        """
+        返回当前库的内存向量矩阵（VectorIndex）。
+
+        首次调用时优先 mmap 旁路文件 embeddings.f32，不可用时从 chunks 一次性装载；
+        vector_engine=ivf 且 vectors.ivf 与旁路文件 tag 一致时挂载 IVF 索引。
+        本连接的 upsert 增量合并，其他连接写入（PRAGMA data_version 变化）时重新装载。
+        """
+        version = self._data_version()
+        if self._vectors is None or version != self._vectors_version:
+            self._vectors = load_sidecar(self, self.sidecar_path)
+            if self._vectors is not None and self.vector_engine == "ivf":
+                ivf = IVFIndex.load(self.ann_path)
+                if ivf is not None and ivf.tag == self._vectors.source_tag:
+                    self._vectors.attach_ann(ivf, self.ivf_nprobe)
+            if self._vectors is None:
+                cur = self.conn.execute(
+                    "SELECT id, timestamp, embedding FROM chunks WHERE embedding IS NOT NULL"
+                )
+                self._vectors = VectorIndex.from_rows(cur)
+            self._vectors_version = version
+        return self._vectors
+
+    def sync_vector_sidecar(self, model=""):
+        """将 embeddings.f32 旁路文件与 chunks 对齐，返回 (追加行数, 失效行数)"""
+        return sync_sidecar(self, self.sidecar_path, model)
+
+    def sync_ann_index(self):
+        """vector_engine=ivf 时维护 vectors.ivf，返回 trained/extended/unchanged/skipped"""
+        if self.vector_engine != "ivf":
+            return "skipped"
+        return sync_ivf(self, self.ann_path)
 
     def search_fts(self, query, limit=10, **kwargs):
         return _search_fts(self, query, limit, **kwargs)
@@ -135,20 +332,23 @@ class SQLiteStore:
         row = cur.fetchone()
         return dict(row) if row else None
 
-    def update_sync_state(self, file_path, last_line, last_id, mtime):
-        """更新某文件的同步状态"""
+    def update_sync_state(self, file_path, last_line, last_id, mtime,
+                          byte_offset=None, inode=None, size=None, boundary_hash=None):
+        """更新某文件的同步状态；byte_offset 等为空时下次同步将整文件重读"""
         self.conn.execute("""
-            INSERT OR REPLACE INTO sync_state(file_path, last_line, last_id, mtime, synced_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, (file_path, last_line, last_id, mtime, int(time.time())))
-        self.conn.commit()
+            INSERT OR REPLACE INTO sync_state(file_path, last_line, last_id, mtime, synced_at,
+                                              byte_offset, inode, size, boundary_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (file_path, last_line, last_id, mtime, int(time.time()),
+              byte_offset, inode, size, boundary_hash))
+        self._commit()
 
     def set_meta(self, key, value):
         """设置元数据键值对"""
         self.conn.execute(
             "INSERT OR REPLACE INTO meta(key,value) VALUES(?,?)", (key, str(value))
         )
-        self.conn.commit()
+        self._commit()
 
     def get_meta(self, key):
         """获取元数据值"""
@@ -156,6 +356,35 @@ class SQLiteStore:
         row = cur.fetchone()
         return row["value"] if row else None
 
+    def generation(self):
+        """索引版本号：chunks 每次变化时递增，供结果缓存判断是否过期"""
+        return int(self.get_meta("generation") or 0)
+
+    def bump_generation(self):
+        """递增索引版本号（在调用方事务内执行，随 chunks 的修改一起提交）"""
+        self.conn.execute(
+            "INSERT INTO meta(key,value) VALUES('generation','1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+        self._commit()
+
+    def chunk_ids_by_source(self, source_file):
+        """来源文件对应的全部 chunk id"""
+        return [r[0] for r in self.conn.execute("SELECT id FROM chunks WHERE source_file=?", (source_file,))]
+
+    def delete_chunks(self, chunk_ids):
+        """按 id 批量删除文本块（FTS 由触发器同步），返回删除条数"""
+        ids = [(cid,) for cid in chunk_ids]
+        if not ids:
+            return 0
+        with self.transaction():
+            removed = self.conn.executemany("DELETE FROM chunks WHERE id=?", ids).rowcount
+            if removed:
+                self.bump_generation()
+        if removed:
+            self._vectors = None  # 内存向量矩阵下次使用时重新装载
+        return removed
+
     def count_chunks(self):
         """统计 chunk 总数"""
         cur = self.conn.execute("SELECT COUNT(*) as cnt FROM chunks")
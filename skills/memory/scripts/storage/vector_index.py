@@ -0,0 +1,302 @@
+"""
+向量检索引擎：将 chunks 表中的嵌入向量装入连续 float32 矩阵，单次矩阵-向量乘法完成打分。
+
+- 优先使用 NumPy（矩阵乘 + argpartition 部分排序）；
+  未安装时降级为 array('f') 连续缓冲区 + 纯 Python 点积 + heapq。
+- 时间过滤以行掩码的形式作用于矩阵，不再逐行反序列化 BLOB；精确检索按过滤条件缓存命中行号，
+  挂载 ANN 索引时只对候选簇内的行检查过滤条件，代价随 nprobe 而非总行数增长。
+- 行向量在装载时归一化，打分即为余弦相似度。
+- upsert/remove 先记入待合并队列，下一次查询前批量合并，支持增量更新。
+"""
+import heapq
+import math
+import operator
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_FILTER_CACHE_SIZE = 16
+
+
+def _normalize(vec):
+    """返回归一化后的 float 列表，零向量原样返回"""
+    norm = math.sqrt(sum(x * x for x in vec))
+    if norm == 0:
+        return [float(x) for x in vec]
+    return [x / norm for x in vec]
+
+
+class VectorIndex:
+    """内存中的向量矩阵，按行对应 chunks 中的一条记录"""
+
+    def __init__(self, dim=0):
+        self.dim = dim
+        self.ids = []           # 行号 → chunk id
+        self.timestamps = []    # 行号 → 时间戳（None 表示无时间戳）
+        self._alive = []        # 行号 → 是否有效（被覆盖/删除的行置 False）
+        self._row_of = {}       # chunk id → 行号
+        self._matrix = None     # np.ndarray(n, dim) 或 array('f')（行优先展开）
+        self._pending = {}      # chunk id → (timestamp, vec|None)，待合并的增量
+        self._ts_arrays = None  # NumPy 模式下缓存的 (时间戳数组, 是否有时间戳数组)
+        self._alive_np = None   # NumPy 模式下缓存的有效行掩码
+        self._filtered = {}     # NumPy 模式下 (lower, upper) → 满足条件的行号数组
+        self._ann = None        # 可选的 ANN 索引（IVFIndex），行号与本矩阵一致
+        self._nprobe = 0
+        self.source_tag = None  # 来自 embeddings.f32 时为其 tag，用于绑定 ANN 索引
+
+    # --- 构建 ---
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        从 (id, timestamp, embedding_blob) 迭代器构建索引。
+
+        维度取第一条有效向量的长度，维度不一致的行（如更换模型后未重建）被忽略。
+        """
+        index = cls()
+        blobs = []
+        for chunk_id, timestamp, blob in rows:
+            if not blob:
+                continue
+            if not index.dim:
+                index.dim = len(blob) // 4
+            if len(blob) != index.dim * 4:
+                continue
+            index._row_of[chunk_id] = len(index.ids)
+            index.ids.append(chunk_id)
+            index.timestamps.append(timestamp)
+            index._alive.append(True)
+            blobs.append(blob)
+
+        if np is not None:
+            if blobs:
+                mat = np.frombuffer(b"".join(blobs), dtype=np.float32)
+                mat = mat.reshape(len(blobs), index.dim)
+                norms = np.linalg.norm(mat, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                index._matrix = (mat / norms).astype(np.float32)
+            else:
+                index._matrix = np.zeros((0, index.dim), dtype=np.float32)
+        else:
+            buf = array("f")
+            for blob in blobs:
+                row = array("f")
+                row.frombytes(blob)
+                buf.extend(_normalize(row))
+            index._matrix = buf
+        return index
+
+    @classmethod
+    def from_matrix(cls, dim, matrix, entries, rows):
+        """
+        基于已归一化的外部矩阵构建索引（如 embeddings.f32 的 mmap 视图，零拷贝）。
+
+        Args:
+            dim: 向量维度
+            matrix: np.ndarray(rows, dim) 或 float32 memoryview（行优先展开）
+            entries: [(行号, chunk_id, timestamp), ...]，未出现的行视为失效
+            rows: 矩阵总行数
+        """
+        index = cls(dim)
+        index.ids = [None] * rows
+        index.timestamps = [None] * rows
+        index._alive = [False] * rows
+        for row, chunk_id, timestamp in entries:
+            index.ids[row] = chunk_id
+            index.timestamps[row] = timestamp
+            index._alive[row] = True
+            index._row_of[chunk_id] = row
+        index._matrix = matrix
+        return index
+
+    def attach_ann(self, ann, nprobe):
+        """挂载 ANN 索引；之后的查询只对候选簇内的行（及索引之后追加的行）打分"""
+        self._ann = ann
+        self._nprobe = nprobe
+
+    def __len__(self):
+        self._flush()
+        return len(self._row_of)
+
+    # --- 增量更新 ---
+
+    def upsert(self, chunk_id, timestamp, embedding):
+        """登记一条新增/更新；embedding 为空等同于删除"""
+        self._pending[chunk_id] = (timestamp, embedding)
+
+    def remove(self, chunk_id):
+        """登记一条删除"""
+        self._pending[chunk_id] = (None, None)
+
+    def _flush(self):
+        """将待合并的增量写入矩阵：旧行标记失效，新行追加到末尾"""
+        if not self._pending:
+            return
+        new_rows = []
+        for chunk_id, (timestamp, vec) in self._pending.items():
+            old = self._row_of.pop(chunk_id, None)
+            if old is not None:
+                self._alive[old] = False
+            if not vec:
+                continue
+            if not self.dim:
+                self.dim = len(vec)
+            if len(vec) != self.dim:
+                continue
+            self._row_of[chunk_id] = len(self.ids)
+            self.ids.append(chunk_id)
+            self.timestamps.append(timestamp)
+            self._alive.append(True)
+            new_rows.append(_normalize(vec))
+        self._pending = {}
+        self._reset_filters()
+
+        if np is not None:
+            if self._matrix is None or self._matrix.shape[1] != self.dim:
+                self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            if new_rows:
+                added = np.asarray(new_rows, dtype=np.float32)
+                self._matrix = np.vstack([self._matrix, added])
+        else:
+            if not isinstance(self._matrix, array):
+                self._matrix = array("f", self._matrix or [])
+            for row in new_rows:
+                self._matrix.extend(row)
+
+        # 失效行过半时压缩，避免矩阵无限增长
+        dead = len(self.ids) - len(self._row_of)
+        if dead and dead * 2 > len(self.ids):
+            self._compact()
+
+    def _compact(self):
+        keep = [i for i, alive in enumerate(self._alive) if alive]
+        if np is not None:
+            self._matrix = self._matrix[keep]
+        else:
+            d = self.dim
+            buf = array("f")
+            for i in keep:
+                buf.extend(self._matrix[i * d:(i + 1) * d])
+            self._matrix = buf
+        self.ids = [self.ids[i] for i in keep]
+        self.timestamps = [self.timestamps[i] for i in keep]
+        self._alive = [True] * len(keep)
+        self._row_of = {cid: i for i, cid in enumerate(self.ids)}
+        self._reset_filters()
+        self._ann = None  # 行号已变化，ANN 索引失效
+
+    # --- 检索 ---
+
+    def _reset_filters(self):
+        """行集合或时间戳变化后清空过滤缓存"""
+        self._ts_arrays = None
+        self._alive_np = None
+        self._filtered = {}
+
+    def _ts_np(self):
+        if self._ts_arrays is None:
+            ts = np.asarray([t or "" for t in self.timestamps], dtype=str)
+            has_ts = np.asarray([t is not None for t in self.timestamps], dtype=bool)
+            self._ts_arrays = (ts, has_ts)
+        return self._ts_arrays
+
+    def _filter_np(self, rows, lower, upper):
+        """NumPy 模式：从 rows 中保留有效且落在时间范围内的行，代价与 len(rows) 成正比"""
+        if self._alive_np is None:
+            self._alive_np = np.asarray(self._alive, dtype=bool)
+        rows = rows[self._alive_np[rows]]
+        if lower is None and upper is None:
+            return rows
+        ts, has_ts = self._ts_np()
+        keep = has_ts[rows]
+        if lower is not None:
+            keep &= ts[rows] >= lower
+        if upper is not None:
+            keep &= ts[rows] <= upper
+        return rows[keep]
+
+    def _rows_np(self, lower, upper):
+        """NumPy 模式：满足过滤条件的全部行号，按 (lower, upper) 缓存到矩阵下次变化"""
+        key = (lower, upper)
+        rows = self._filtered.get(key)
+        if rows is None:
+            if len(self._filtered) >= _FILTER_CACHE_SIZE:
+                self._filtered.clear()
+            rows = self._filter_np(np.arange(len(self.ids)), lower, upper)
+            self._filtered[key] = rows
+        return rows
+
+    def _row_matches(self, i, lower, upper):
+        if not self._alive[i]:
+            return False
+        if lower is None and upper is None:
+            return True
+        ts = self.timestamps[i]
+        if ts is None:
+            return False
+        if lower is not None and ts < lower:
+            return False
+        if upper is not None and ts > upper:
+            return False
+        return True
+
+    def search(self, query, limit=10, lower=None, upper=None, exact=False):
+        """
+        返回与 query 余弦相似度最高的 [(chunk_id, score), ...]，按分数降序。
+
+        Args:
+            query: 查询向量
+            limit: 返回条数
+            lower / upper: 时间戳下界/上界（字符串比较，与 SQL 过滤语义一致）
+            exact: 为 True 时忽略已挂载的 ANN 索引，做精确检索
+        """
+        self._flush()
+        if not self.dim or len(query) != self.dim or limit <= 0:
+            return []
+
+        if np is not None:
+            q = np.asarray(query, dtype=np.float32)
+            qn = float(np.linalg.norm(q))
+            if qn:
+                q = q / qn
+            rows = None
+            if self._ann is not None and not exact:
+                # 只对候选簇内的行（及训练之后追加的行）检查过滤条件
+                candidates = np.sort(np.concatenate([
+                    self._ann.candidates(q, self._nprobe),
+                    np.arange(self._ann.rows, len(self.ids)),
+                ]))
+                rows = self._filter_np(candidates, lower, upper)
+                # 候选不足时（时间过滤较窄）退回精确检索，避免漏召回
+                if rows.size < limit:
+                    rows = None
+            if rows is None:
+                rows = self._rows_np(lower, upper)
+            if not rows.size:
+                return []
+            if rows.size == len(self.ids):
+                scores = self._matrix @ q
+            else:
+                scores = self._matrix[rows] @ q
+            k = min(limit, rows.size)
+            if k < rows.size:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(rows.size)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self.ids[rows[i]], float(scores[i])) for i in top]
+
+        q = _normalize(query)
+        d = self.dim
+        mat = self._matrix
+        mul = operator.mul
+        scored = (
+            (sum(map(mul, q, mat[i * d:(i + 1) * d])), i)
+            for i in range(len(self.ids))
+            if self._row_matches(i, lower, upper)
+        )
+        top = heapq.nlargest(limit, scored, key=operator.itemgetter(0))
+        return [(self.ids[i], score) for score, i in top]
@@ -0,0 +1,128 @@
+"""run catalog：list 走 sqlite 索引、过滤分页、缺失重建与已删除 run 的清理。"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "skills" / "agent-workflow"))
+
+from lib import catalog, engine, store  # noqa: E402
+
+WORKFLOW = """
+name: {name}
+executors:
+  mock: {{ kind: mock }}
+nodes:
+  - {{ alias: only, type: agent_call, executor: mock, prompt: p, output: out }}
+"""
+
+
+class CatalogTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp(prefix="aw-cat-"))
+        self._cwd = Path.cwd()
+        (self.tmp / "pyproject.toml").write_text("[project]\nname='ut'\n", "utf-8")
+        os.chdir(self.tmp)
+        self._base = store.GLOBAL_BASE
+        store.GLOBAL_BASE = self.tmp / ".agent-workflow"
+        os.environ["AGENT_WORKFLOW_ENABLE_MOCK"] = "1"
+
+    def tearDown(self) -> None:
+        store.GLOBAL_BASE = self._base
+        os.chdir(self._cwd)
+        os.environ.pop("AGENT_WORKFLOW_ENABLE_MOCK", None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _start(self, name: str) -> str:
+        out = engine.start_action({"workflow": WORKFLOW.format(name=name), "caller": "ut"})
+        self.assertEqual(out["action"], "completed", out)
+        return out["run_id"]
+
+    def _waiting(self, name: str) -> str:
+        run_id, run_dir = store.create_run(
+            workflow={"name": name, "nodes": []}, workflow_source=None, initial_vars={}, caller="ut",
+        )
+        with store.StateTransaction(run_dir) as state:
+            state["status"] = "waiting_user"
+        return run_id
+
+    def test_list_reads_catalog_not_state_files(self) -> None:
+        done = self._start("alpha")
+        waiting = self._waiting("beta")
+        with mock.patch.object(store, "read_state", side_effect=AssertionError("parsed state.json")):
+            runs = engine.list_action({})
+            self.assertEqual([r["run_id"] for r in runs["runs"]], [waiting, done])
+            row = runs["runs"][1]
+            self.assertEqual((row["status"], row["history_count"], row["last_alias"]), ("completed", 1, "only"))
+            self.assertEqual(
+                [r["run_id"] for r in engine.list_action({"status": "waiting_user"})["runs"]], [waiting]
+            )
+            self.assertEqual(
+                [r["run_id"] for r in engine.list_action({"workflow_name": "alpha"})["runs"]], [done]
+            )
+
+    def test_pagination(self) -> None:
+        ids = [self._start(f"wf-{i}") for i in range(5)]
+        first = engine.list_action({"limit": 2})
+        second = engine.list_action({"limit": 2, "offset": 2})
+        rest = engine.list_action({"limit": 2, "offset": 4})
+        paged = [r["run_id"] for page in (first, second, rest) for r in page["runs"]]
+        self.assertEqual(paged, list(reversed(ids)))
+        self.assertEqual(second["offset"], 2)
+
+    def test_missing_catalog_is_rebuilt_from_disk(self) -> None:
+        ids = {self._start("alpha"), self._start("beta")}
+        catalog_file = catalog.catalog_path(store.runs_root())
+        self.assertTrue(catalog_file.exists())
+        catalog._discard(store.runs_root())
+
+        self.assertEqual({r["run_id"] for r in store.list_runs()}, ids)
+        self.assertEqual(engine.list_action({"rebuild": True})["rebuilt"], 2)
+
+    def test_deleted_run_dir_is_pruned(self) -> None:
+        keep = self._start("alpha")
+        gone = self._start("beta")
+        shutil.rmtree(store.get_run_dir(gone))  # 绕过 purge_run 直接删目录
+        self.assertEqual([r["run_id"] for r in store.list_runs(limit=1)], [keep])
+
+        store.purge_run(store.get_run_dir(keep))
+        self.assertEqual(store.list_runs(), [])
+
+    def test_corrupt_catalog_does_not_break_runs(self) -> None:
+        self._start("alpha")
+        catalog.catalog_path(store.runs_root()).write_bytes(b"not a sqlite database" * 64)
+        run_id = self._start("beta")  # upsert 失败时丢弃 catalog，run 本身照常完成
+        self.assertIn(run_id, {r["run_id"] for r in store.list_runs()})
+
+    def test_locked_catalog_is_kept_and_list_scans_disk(self) -> None:
+        import sqlite3
+
+        first = self._start("alpha")
+        catalog_file = catalog.catalog_path(store.runs_root())
+        inode = catalog_file.stat().st_ino
+        holder = sqlite3.connect(str(catalog_file), isolation_level=None)
+        self.addCleanup(holder.close)
+        holder.execute("BEGIN IMMEDIATE")  # 另一进程长时间持有写锁
+        with mock.patch.object(catalog, "BUSY_TIMEOUT_S", 0.05):
+            second = self._start("beta")  # upsert 因锁竞争跳过，不丢弃 catalog
+            self.assertEqual(catalog_file.stat().st_ino, inode)
+            runs = engine.list_action({"workflow_name": "beta"})["runs"]
+            self.assertEqual([r["run_id"] for r in runs], [second])
+            self.assertEqual([r["run_id"] for r in store.list_runs(limit=1, offset=1)], [first])
+            with store.StateTransaction(store.get_run_dir(first)) as state:
+                state["status"] = "cancelled"  # 同样因锁竞争没写进 catalog
+        holder.execute("ROLLBACK")
+
+        # 锁释放后按 state.json mtime 对账，不再返回过期的行
+        with mock.patch.object(store, "read_state", wraps=store.read_state) as read_state:
+            runs = store.list_runs()
+        self.assertEqual([(r["run_id"], r["status"]) for r in runs], [(first, "cancelled"), (second, "completed")])
+        self.assertEqual(read_state.call_count, 2)
+        self.assertFalse(catalog._dirty_path(store.runs_root()).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""history 追加日志：state.json 不含 history、按偏移分页读取、retry 截断、残留尾巴与旧格式迁移。"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "skills" / "agent-workflow"))
+
+from lib import engine, store  # noqa: E402
+
+THREE_STEP_YAML = """
+name: t-history
+executors:
+  mock: { kind: mock }
+nodes:
+  - { alias: step_a, type: agent_call, executor: mock, prompt: a, output: a_out }
+  - { alias: step_b, type: agent_call, executor: mock, prompt: b, output: b_out }
+  - { alias: step_c, type: agent_call, executor: mock, prompt: c, output: c_out }
+"""
+
+
+def _entry(alias: str, status: str = "completed") -> dict:
+    return {"alias": alias, "type": "agent_call", "status": status, "duration_ms": 10}
+
+
+class HistoryLogTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp(prefix="aw-hist-"))
+        self._cwd = Path.cwd()
+        (self.tmp / "pyproject.toml").write_text("[project]\nname='ut'\n", "utf-8")
+        os.chdir(self.tmp)
+        self._base = store.GLOBAL_BASE
+        store.GLOBAL_BASE = self.tmp / ".agent-workflow"
+        os.environ["AGENT_WORKFLOW_ENABLE_MOCK"] = "1"
+
+    def tearDown(self) -> None:
+        store.GLOBAL_BASE = self._base
+        os.chdir(self._cwd)
+        for key in [k for k in os.environ if k.startswith("AGENT_WORKFLOW_")]:
+            os.environ.pop(key, None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _run(self) -> Path:
+        _, run_dir = store.create_run(
+            workflow={"name": "t", "nodes": []}, workflow_source=None, initial_vars={}, caller="ut",
+        )
+        return run_dir
+
+    def test_state_holds_only_summary(self) -> None:
+        run_dir = self._run()
+        sizes = []
+        for _ in range(30):
+            with store.StateTransaction(run_dir) as state:
+                store.append_history(state, {**_entry("step"), "result": "x" * 500}, run_dir=run_dir)
+            sizes.append((run_dir / "state.json").stat().st_size)
+        self.assertLess(sizes[-1] - sizes[1], 50)  # state.json 只有计数位数变化，不随 history 增长
+        state = store.read_state(run_dir)
+        self.assertNotIn("history", state)
+        summary = store.history_summary(state)
+        self.assertEqual((summary["count"], summary["by_alias"]["step"]["duration_ms"]), (30, 300))
+        self.assertEqual(len((run_dir / store.HISTORY_FILE).read_text("utf-8").splitlines()), 30)
+
+    def test_read_history_pages_by_offset(self) -> None:
+        run_dir = self._run()
+        with store.StateTransaction(run_dir) as state:
+            for i in range(10):
+                store.append_history(state, _entry(f"n{i}"), run_dir=run_dir)
+        state = store.read_state(run_dir)
+        aliases = lambda rows: [r["alias"] for r in rows]  # noqa: E731
+        self.assertEqual(aliases(store.read_history(run_dir, state, offset=3, limit=2)), ["n3", "n4"])
+        self.assertEqual(aliases(store.read_history(run_dir, state, offset=-2)), ["n8", "n9"])
+        self.assertEqual(store.read_history(run_dir, state, offset=10), [])
+
+    def test_status_returns_full_history_without_paging(self) -> None:
+        run_dir = self._run()
+        with store.StateTransaction(run_dir) as state:
+            for i in range(150):
+                store.append_history(state, _entry(f"n{i}"), run_dir=run_dir)
+        run_id = store.read_state(run_dir)["run_id"]
+        full = engine.status_action({"run_id": run_id})
+        self.assertEqual(len(full["history"]), 150)
+        self.assertEqual(full["history"][-1]["alias"], "n149")
+        latest = engine.status_action({"run_id": run_id, "history_offset": -2})
+        self.assertEqual([h["alias"] for h in latest["history"]], ["n148", "n149"])
+
+    def test_aborted_transaction_tail_is_dropped(self) -> None:
+        run_dir = self._run()
+        with store.StateTransaction(run_dir) as state:
+            store.append_history(state, _entry("kept"), run_dir=run_dir)
+        with self.assertRaises(RuntimeError):
+            with store.StateTransaction(run_dir) as state:
+                store.append_history(state, _entry("lost"), run_dir=run_dir)
+                raise RuntimeError("boom")  # state.json 未写回，日志里留下一条孤儿记录
+        state = store.read_state(run_dir)
+        self.assertEqual([h["alias"] for h in store.read_history(run_dir, state)], ["kept"])
+        with store.StateTransaction(run_dir) as state:
+            store.append_history(state, _entry("next"), run_dir=run_dir)
+        lines = (run_dir / store.HISTORY_FILE).read_text("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["alias"] for line in lines], ["kept", "next"])
+
+    def test_legacy_state_is_migrated(self) -> None:
+        run_dir = self._run()
+        state = json.loads((run_dir / "state.json").read_text("utf-8"))
+        state.pop("history_summary")
+        state["history"] = [_entry("old_a"), _entry("old_b", "failed")]
+        (run_dir / "state.json").write_text(json.dumps(state), "utf-8")
+
+        state = store.read_state(run_dir)
+        self.assertEqual(store.history_summary(state)["last_failed_alias"], "old_b")
+        self.assertEqual([h["alias"] for h in store.read_history(run_dir, state)], ["old_a", "old_b"])
+        # 读路径不加锁，不能改写 state.json 或生成日志文件
+        self.assertIn("history", json.loads((run_dir / "state.json").read_text("utf-8")))
+        self.assertFalse((run_dir / store.HISTORY_FILE).exists())
+        self.assertFalse((run_dir / store.HISTORY_INDEX_FILE).exists())
+        with store.StateTransaction(run_dir) as state:
+            store.append_history(state, _entry("new"), run_dir=run_dir)
+        self.assertNotIn("history", json.loads((run_dir / "state.json").read_text("utf-8")))
+        self.assertEqual(store.history_summary(store.read_state(run_dir))["count"], 3)
+
+    def test_retry_truncates_log_and_status_pages(self) -> None:
+        os.environ["AGENT_WORKFLOW_MOCK_STEP_C_EXIT"] = "1"
+        out = engine.start_action({"workflow": THREE_STEP_YAML, "caller": "ut"})
+        run_dir = store.get_run_dir(out["run_id"])
+        log = run_dir / store.HISTORY_FILE
+        keep = len(log.read_bytes().splitlines(keepends=True)[0])
+
+        os.environ.pop("AGENT_WORKFLOW_MOCK_STEP_C_EXIT")
+        os.environ["AGENT_WORKFLOW_MOCK_STEP_B_EXIT"] = "1"
+        out = engine.retry_action({"run_id": out["run_id"], "alias": "step_b"})
+        self.assertEqual(out["action"], "failed")
+        # 从 step_b 截断后只追加了新的 step_b 失败记录
+        self.assertEqual((run_dir / store.HISTORY_INDEX_FILE).stat().st_size, 16)
+        self.assertEqual(log.read_bytes()[:keep].count(b"\n"), 1)
+
+        s = engine.status_action({"run_id": out["run_id"], "history_offset": 1, "history_limit": 5})
+        self.assertEqual(s["history_count"], 2)
+        self.assertEqual([(h["alias"], h["status"]) for h in s["history"]], [("step_b", "failed")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""read_events：尾部倒读 + limit 下推、跨块切行、类型 / 时间范围过滤。"""
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "skills" / "agent-workflow"))
+
+from lib import logger  # noqa: E402
+from lib.logger import read_events  # noqa: E402
+
+
+class ReadEventsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.run_dir = Path(tempfile.mkdtemp(prefix="aw-log-"))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+
+    def _write(self, events: list[dict], tail: str = "") -> None:
+        lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events)
+        (self.run_dir / "events.ndjson").write_text(lines + tail, "utf-8")
+
+    def test_limit_parses_only_tail(self) -> None:
+        self._write([{"ts": "2026-01-01T00:00:00Z", "type": "node_end", "n": i} for i in range(5000)])
+        with mock.patch.object(logger.json, "loads", wraps=json.loads) as loads:
+            events = read_events(self.run_dir, limit=5)
+        self.assertEqual([e["n"] for e in events], [4995, 4996, 4997, 4998, 4999])
+        self.assertEqual(loads.call_count, 5)
+        self.assertEqual(len(read_events(self.run_dir)), 5000)
+        self.assertEqual(read_events(self.run_dir, limit=0), [])
+
+    def test_lines_split_across_blocks(self) -> None:
+        self._write(
+            [{"ts": "2026-01-01T00:00:00Z", "type": "note", "text": "中文" * i} for i in range(20)],
+            tail='\n{"ts": "2026-01-01T00:00:00Z", "type": "torn"',  # 写了一半的行
+        )
+        path = self.run_dir / "events.ndjson"
+        lines = list(logger._iter_lines_reversed(path, block_size=7))
+        self.assertEqual(lines, list(reversed([line for line in path.read_bytes().split(b"\n") if line])))
+        events = read_events(self.run_dir)
+        self.assertEqual([len(e["text"]) for e in events], [2 * i for i in range(20)])
+
+    def test_type_and_time_filters(self) -> None:
+        self._write([
+            {"ts": f"2026-01-01T00:00:{sec:02d}Z", "type": "error" if sec % 10 == 0 else "node_end", "s": sec}
+            for sec in range(60)
+        ])
+        errors = read_events(self.run_dir, types=["error"])
+        self.assertEqual([e["s"] for e in errors], [0, 10, 20, 30, 40, 50])
+        window = read_events(self.run_dir, since="2026-01-01T00:00:20Z", until="2026-01-01T00:00:23Z")
+        self.assertEqual([e["s"] for e in window], [20, 21, 22, 23])
+        latest = read_events(self.run_dir, limit=2, types=["error"], since="2026-01-01T00:00:05Z")
+        self.assertEqual([e["s"] for e in latest], [40, 50])
+
+    def test_since_stops_scan_early(self) -> None:
+        self._write([{"ts": f"2026-01-01T{h:02d}:00:00Z", "type": "node_end"} for h in range(24)])
+        with mock.patch.object(logger.json, "loads", wraps=json.loads) as loads:
+            events = read_events(self.run_dir, since="2026-01-01T22:00:00Z")
+        self.assertEqual(len(events), 2)
+        self.assertEqual(loads.call_count, 3)  # 第一条早于 since - 容差的事件即停止
+
+
+if __name__ == "__main__":
+    unittest.main()
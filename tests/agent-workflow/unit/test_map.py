@@ -0,0 +1,174 @@
+"""map 节点：逐元素并发、有序收集、逐元素 history，以及中断 / 失败 retry 后只重跑缺失元素。"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "skills" / "agent-workflow"))
+
+from lib import engine, store  # noqa: E402
+from lib.errors import ErrorCode, WorkflowError  # noqa: E402
+from lib.nodes import map as map_node  # noqa: E402
+from lib.parser import validate_action  # noqa: E402
+
+# 记录每次调用的 prompt；prompt 含 "bad" 时以非零码退出，否则输出大写 prompt
+WORKER = (
+    "import sys, time; p = sys.stdin.read().strip(); time.sleep(float(sys.argv[2])); "
+    "open(sys.argv[1], 'a').write(p + '\\n'); "
+    "sys.exit(3) if 'bad' in p else print(p.upper())"
+)
+
+
+class MapNodeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp(prefix="aw-map-"))
+        self._cwd = Path.cwd()
+        (self.tmp / "pyproject.toml").write_text("[project]\nname='ut'\n", "utf-8")
+        os.chdir(self.tmp)
+        self._base = store.GLOBAL_BASE
+        store.GLOBAL_BASE = self.tmp / ".agent-workflow"
+        self.calls = self.tmp / "calls.log"
+
+    def tearDown(self) -> None:
+        store.GLOBAL_BASE = self._base
+        os.chdir(self._cwd)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _yaml(self, items: str, *, delay: float = 0.0, concurrency: int = 4, config: str = "") -> str:
+        return f"""
+name: t-map
+{config}
+vars:
+  files: {items}
+executors:
+  worker: {{ cmd: [{json.dumps(sys.executable)}, '-c', {json.dumps(WORKER)}, {json.dumps(str(self.calls))}, '{delay}'] }}
+nodes:
+  - alias: each
+    type: map
+    items: "{{{{files}}}}"
+    as: f
+    max_concurrency: {concurrency}
+    output: summaries
+    body:
+      alias: summarize
+      executor: worker
+      prompt: "sum {{{{f_index}}}} {{{{f}}}}"
+"""
+
+    def _calls(self) -> list[str]:
+        return self.calls.read_text("utf-8").split("\n")[:-1] if self.calls.exists() else []
+
+    def _state(self, run_id: str) -> dict:
+        return store.read_state(store.get_run_dir(run_id))
+
+    def test_items_run_concurrently_in_order(self) -> None:
+        started = time.monotonic()
+        out = engine.start_action({"workflow": self._yaml("[a, b, c, d]", delay=0.5), "caller": "ut"})
+        self.assertEqual(out["action"], "completed", out)
+        self.assertLess(time.monotonic() - started, 1.6)  # 串行至少 2s
+        self.assertEqual(out["vars"]["summaries"], ["SUM 0 A", "SUM 1 B", "SUM 2 C", "SUM 3 D"])
+
+        state = self._state(out["run_id"])
+        history = store.read_history(store.get_run_dir(out["run_id"]), state)
+        items = [h for h in history if h.get("map") == "each"]
+        self.assertEqual(sorted(h["item_index"] for h in items), [0, 1, 2, 3])
+        self.assertEqual(history[-1]["type"], "map")
+        self.assertNotIn("map_progress", state)
+
+    def test_json_string_items_and_empty_list(self) -> None:
+        out = engine.start_action({"workflow": self._yaml("'[\"x\", \"y\"]'"), "caller": "ut"})
+        self.assertEqual(out["vars"]["summaries"], ["SUM 0 X", "SUM 1 Y"])
+        out = engine.start_action({"workflow": self._yaml("[]"), "caller": "ut"})
+        self.assertEqual((out["action"], out["vars"]["summaries"]), ("completed", []))
+
+    def test_failed_item_retry_reuses_completed_results(self) -> None:
+        out = engine.start_action({"workflow": self._yaml("[a, bad, c]", concurrency=1), "caller": "ut"})
+        self.assertEqual(out["action"], "failed")
+        self.assertEqual(out["error"]["code"], ErrorCode.EXECUTOR_NONZERO_EXIT)
+        self.assertEqual(out["error"]["location"]["item_index"], 1)
+        self.assertEqual(self._calls(), ["sum 0 a", "sum 1 bad"])  # 失败后不再派发 c
+        self.assertEqual(list(self._state(out["run_id"])["map_progress"].values())[0]["done"].keys(), {"0"})
+
+        out = engine.retry_action({"run_id": out["run_id"], "vars_patch": {"files": ["a", "good", "c"]}})
+        self.assertEqual(out["action"], "completed", out)
+        self.assertEqual(out["vars"]["summaries"], ["SUM 0 A", "SUM 1 GOOD", "SUM 2 C"])
+        self.assertEqual(self._calls(), ["sum 0 a", "sum 1 bad", "sum 1 good", "sum 2 c"])
+
+    def test_interrupted_advance_keeps_checkpointed_items(self) -> None:
+        real = map_node.execute_item
+
+        def flaky(node, vars_, *args, **kwargs):
+            if vars_["f_index"] == 2:
+                raise KeyboardInterrupt  # 模拟 advance 进程中途被杀
+            return real(node, vars_, *args, **kwargs)
+
+        with mock.patch.object(map_node, "execute_item", flaky):
+            with self.assertRaises(KeyboardInterrupt):
+                engine.start_action({"workflow": self._yaml("[a, b, c, d]", concurrency=1), "caller": "ut"})
+        run_id = store.list_runs()[0]["run_id"]
+        progress = list(self._state(run_id)["map_progress"].values())[0]
+        self.assertEqual(sorted(progress["done"]), ["0", "1"])
+
+        out = engine.advance_action({"run_id": run_id})
+        self.assertEqual(out["action"], "completed", out)
+        self.assertEqual(out["vars"]["summaries"], ["SUM 0 A", "SUM 1 B", "SUM 2 C", "SUM 3 D"])
+        self.assertEqual(self._calls(), ["sum 0 a", "sum 1 b", "sum 2 c", "sum 3 d"])
+
+    def test_chain_timeout_defers_remaining_items(self) -> None:
+        wf = self._yaml("[a, b, c]", delay=0.05, concurrency=1, config="config:\n  chain_timeout_ms: 1")
+        out = engine.start_action({"workflow": wf, "caller": "ut"})
+        self.assertEqual((out["action"], out["reason"]), ("continue", "chain_timeout"))
+        for _ in range(5):
+            if out["action"] == "completed":
+                break
+            out = engine.advance_action({"run_id": out["run_id"]})
+        self.assertEqual(out["vars"]["summaries"], ["SUM 0 A", "SUM 1 B", "SUM 2 C"])
+        self.assertEqual(len(self._calls()), 3)
+
+
+class MapValidationTest(unittest.TestCase):
+    def _violations(self, node: str) -> list[dict]:
+        wf = f"""
+name: t-map-v
+vars:
+  files: [a]
+executors:
+  mock: {{ kind: mock }}
+nodes:
+{node}
+  - {{ alias: after, type: agent_call, executor: mock, prompt: "{{{{out}}}}", output: final }}
+"""
+        try:
+            validate_action({"workflow": wf, "allow_missing_executors": True})
+        except WorkflowError as exc:
+            return exc.extras["violations"]
+        return []
+
+    def test_item_vars_in_scope_and_output_visible(self) -> None:
+        node = """  - alias: each
+    type: map
+    items: "{{files}}"
+    output: out
+    body: { executor: mock, prompt: "{{item_index}}: {{item}}" }"""
+        self.assertEqual(self._violations(node), [])
+
+    def test_rejects_caller_body_and_unknown_items(self) -> None:
+        node = """  - alias: each
+    type: map
+    items: "{{missing}}"
+    output: out
+    body: { prompt: "{{item}} {{other}}" }"""
+        violations = self._violations(node)
+        self.assertEqual(violations[0]["level"], "L2")  # body 缺 executor
+        node = node.replace('{ prompt:', '{ executor: caller, prompt:')
+        refs = sorted(v["location"].get("ref", "") for v in self._violations(node))
+        self.assertEqual(refs, ["", "missing", "other"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+"""parallel 节点：并发 spawn、join 策略、取消、chain_timeout 分波续跑与 L3 校验。"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "skills" / "agent-workflow"))
+
+from lib import engine, store  # noqa: E402
+from lib.nodes import parallel as parallel_node  # noqa: E402
+from lib.errors import ErrorCode, WorkflowError  # noqa: E402
+from lib.logger import read_events  # noqa: E402
+from lib.parser import validate_action  # noqa: E402
+
+SLEEPER = "import sys, time; sys.stdin.read(); time.sleep(float(sys.argv[1])); print('slept', sys.argv[1])"
+
+
+def _spawn_yaml(join: str, seconds: list[float]) -> str:
+    branches = "\n".join(
+        f"      - {{ alias: b{i}, type: agent_call, executor: s{i}, prompt: 'p {{{{topic}}}}', output: out{i} }}"
+        for i in range(len(seconds))
+    )
+    executors = "\n".join(
+        f"  s{i}: {{ cmd: [{json.dumps(sys.executable)}, '-c', {json.dumps(SLEEPER)}, '{sec}'] }}"
+        for i, sec in enumerate(seconds)
+    )
+    return f"""
+name: t-parallel
+vars:
+  topic: fan-out
+executors:
+{executors}
+nodes:
+  - alias: fan
+    type: parallel
+    join: {join}
+    output: results
+    branches:
+{branches}
+  - {{ alias: after, type: agent_call, executor: mock, prompt: "{{{{out0}}}}", output: final }}
+"""
+
+
+class ParallelNodeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp(prefix="aw-par-"))
+        self._cwd = Path.cwd()
+        (self.tmp / "pyproject.toml").write_text("[project]\nname='ut'\n", "utf-8")
+        os.chdir(self.tmp)
+        self._base = store.GLOBAL_BASE
+        store.GLOBAL_BASE = self.tmp / ".agent-workflow"
+        os.environ["AGENT_WORKFLOW_ENABLE_MOCK"] = "1"
+
+    def tearDown(self) -> None:
+        store.GLOBAL_BASE = self._base
+        os.chdir(self._cwd)
+        for key in [k for k in os.environ if k.startswith("AGENT_WORKFLOW_")]:
+            os.environ.pop(key, None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _state(self, run_id: str) -> dict:
+        return store.read_state(store.get_run_dir(run_id))
+
+    def _history(self, run_id: str) -> list[dict]:
+        run_dir = store.get_run_dir(run_id)
+        return store.read_history(run_dir, store.read_state(run_dir))
+
+    def test_spawn_branches_run_concurrently(self) -> None:
+        started = time.monotonic()
+        out = engine.start_action({"workflow": _spawn_yaml("all", [0.6, 0.6, 0.6]), "caller": "ut"})
+        elapsed = time.monotonic() - started
+        self.assertEqual(out["action"], "completed", out)
+        self.assertLess(elapsed, 1.5)  # 串行至少 1.8s
+        self.assertEqual(out["vars"]["out1"], "slept 0.6")
+        self.assertEqual(out["vars"]["results"], {f"out{i}": "slept 0.6" for i in range(3)})
+
+        state = self._state(out["run_id"])
+        history = self._history(out["run_id"])
+        branches = [h for h in history if h.get("parallel") == "fan"]
+        self.assertEqual(sorted(h["alias"] for h in branches), ["b0", "b1", "b2"])
+        self.assertTrue(all(h["status"] == "completed" for h in branches))
+        summary = next(h for h in history if h["type"] == "parallel")
+        self.assertEqual((summary["status"], summary["join"], summary["required"]), ("completed", "all", 3))
+        self.assertNotIn("parallel_progress", state)
+
+        events = read_events(store.get_run_dir(out["run_id"]))
+        branch_ends = [e for e in events if e["type"] == "node_end" and e.get("parallel") == "fan"]
+        self.assertEqual(len(branch_ends), 3)
+
+    def test_any_cancels_slow_branch(self) -> None:
+        started = time.monotonic()
+        out = engine.start_action({"workflow": _spawn_yaml("any", [0.1, 30]), "caller": "ut"})
+        self.assertEqual(out["action"], "completed", out)
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual(out["vars"]["results"], {"out0": "slept 0.1"})
+        self.assertNotIn("out1", out["vars"])
+
+        history = self._history(out["run_id"])
+        slow = next(h for h in history if h.get("alias") == "b1")
+        self.assertEqual(slow["status"], "cancelled")
+        self.assertEqual(slow["error"]["code"], ErrorCode.NODE_CANCELLED)
+        summary = next(h for h in history if h["type"] == "parallel")
+        self.assertEqual(summary["cancelled"], ["b1"])
+
+    def test_branch_crash_cancels_siblings(self) -> None:
+        real_execute = parallel_node.execute_branch
+
+        def crashing(branch, *args, **kwargs):
+            if branch.get("alias") == "b0":
+                time.sleep(0.1)
+                raise RuntimeError("boom")
+            return real_execute(branch, *args, **kwargs)
+
+        started = time.monotonic()
+        with mock.patch.object(parallel_node, "execute_branch", side_effect=crashing):
+            out = engine.start_action({"workflow": _spawn_yaml("all", [0, 30]), "caller": "ut"})
+        self.assertLess(time.monotonic() - started, 10)  # 兄弟分支被终止，不等满 30s
+        self.assertEqual(out["action"], "failed", out)
+        self.assertEqual(out["error"]["code"], ErrorCode.PARALLEL_JOIN_FAILED)
+        self.assertEqual(out["error"]["branch_errors"], {"b0": ErrorCode.INTERNAL})
+
+        history = self._history(out["run_id"])
+        crashed = next(h for h in history if h.get("alias") == "b0")
+        self.assertEqual((crashed["status"], crashed["error"]["code"]), ("failed", ErrorCode.INTERNAL))
+        self.assertIn("RuntimeError: boom", crashed["error"]["message"])
+        self.assertEqual(next(h for h in history if h.get("alias") == "b1")["status"], "cancelled")
+        self.assertNotIn("parallel_progress", self._state(out["run_id"]))
+
+    def test_join_all_failure_and_quorum(self) -> None:
+        wf = """
+name: t-parallel-mock
+executors:
+  mock: { kind: mock }
+nodes:
+  - alias: fan
+    type: parallel
+    join: %s
+    quorum: 2
+    max_concurrency: 1
+    branches:
+      - { alias: a, type: agent_call, executor: mock, prompt: p, output: va }
+      - { alias: b, type: agent_call, executor: mock, prompt: p, output: vb }
+      - { alias: c, type: agent_call, executor: mock, prompt: p, output: vc }
+"""
+        os.environ["AGENT_WORKFLOW_MOCK_A_EXIT"] = "1"
+        out = engine.start_action({"workflow": wf % "quorum", "caller": "ut"})
+        self.assertEqual(out["action"], "completed", out)
+        self.assertEqual((out["vars"]["vb"], out["vars"]["vc"]), ("mock-b", "mock-c"))
+
+        out = engine.start_action({"workflow": wf % "all", "caller": "ut"})
+        self.assertEqual(out["action"], "failed")
+        self.assertEqual(out["error"]["code"], ErrorCode.PARALLEL_JOIN_FAILED)
+        self.assertEqual(out["error"]["branch_errors"], {"a": ErrorCode.EXECUTOR_NONZERO_EXIT})
+        history = self._history(out["run_id"])
+        # 串行并发度下 a 失败即决出，b / c 不再派发
+        self.assertEqual([h["alias"] for h in history], ["a", "fan"])
+        self.assertEqual(history[-1]["cancelled"], ["b", "c"])
+
+        # retry 从 parallel 重跑：父节点与分支记录一并裁掉
+        os.environ.pop("AGENT_WORKFLOW_MOCK_A_EXIT")
+        out = engine.retry_action({"run_id": out["run_id"]})
+        self.assertEqual(out["action"], "completed", out)
+        history = self._history(out["run_id"])
+        self.assertEqual([h["alias"] for h in history], ["a", "b", "c", "fan"])
+
+    def test_chain_timeout_defers_remaining_branches(self) -> None:
+        wf = f"""
+name: t-parallel-ct
+config:
+  chain_timeout_ms: 1
+executors:
+  nap: {{ cmd: [{json.dumps(sys.executable)}, '-c', {json.dumps(SLEEPER)}, '0.05'] }}
+nodes:
+  - alias: fan
+    type: parallel
+    max_concurrency: 1
+    branches:
+      - {{ alias: a, type: agent_call, executor: nap, prompt: p, output: va }}
+      - {{ alias: b, type: agent_call, executor: nap, prompt: p, output: vb }}
+      - {{ alias: c, type: agent_call, executor: nap, prompt: p, output: vc }}
+"""
+        out = engine.start_action({"workflow": wf, "caller": "ut"})
+        self.assertEqual((out["action"], out["reason"]), ("continue", "chain_timeout"))
+        state = self._state(out["run_id"])
+        progress = next(iter(state["parallel_progress"].values()))
+        self.assertEqual(len(progress["branches"]), 1)
+        self.assertEqual(state["vars"]["va"], "slept 0.05")
+
+        for _ in range(5):
+            if out["action"] == "completed":
+                break
+            out = engine.advance_action({"run_id": out["run_id"]})
+        self.assertEqual(out["action"], "completed")
+        history = self._history(out["run_id"])
+        self.assertEqual([h["alias"] for h in history], ["a", "b", "c", "fan"])
+        self.assertEqual(history[-1]["succeeded"], ["a", "b", "c"])
+
+
+class ParallelValidationTest(unittest.TestCase):
+    def _violations(self, branches: str, extra: str = "") -> list[dict]:
+        wf = f"""
+name: t-parallel-v
+executors:
+  mock: {{ kind: mock }}
+nodes:
+  - alias: fan
+    type: parallel
+{extra}
+    branches:
+{branches}
+  - {{ alias: after, type: agent_call, executor: mock, prompt: "{{{{va}}}} {{{{vb}}}}", output: final }}
+"""
+        try:
+            validate_action({"workflow": wf, "allow_missing_executors": True})
+        except WorkflowError as exc:
+            return exc.extras["violations"]
+        return []
+
+    def test_valid_branches_feed_downstream(self) -> None:
+        branches = """      - { alias: a, type: agent_call, executor: mock, prompt: p, output: va }
+      - { alias: b, type: agent_call, executor: mock, prompt: p, output: vb }"""
+        self.assertEqual(self._violations(branches), [])
+
+    def test_rejects_caller_sibling_refs_and_bad_quorum(self) -> None:
+        branches = """      - { alias: a, type: agent_call, prompt: p, output: va }
+      - { alias: b, type: agent_call, executor: mock, prompt: "{{va}}", output: vb }"""
+        violations = self._violations(branches, "    join: quorum\n    quorum: 3")
+        messages = " | ".join(v["message"] for v in violations)
+        self.assertIn("caller executor", messages)
+        self.assertIn("quorum=3", messages)
+        self.assertTrue(any(v["code"] == ErrorCode.VAR_NOT_IN_SCOPE for v in violations))
+
+        missing_quorum = self._violations(
+            "      - { alias: a, type: agent_call, executor: mock, prompt: p, output: va }",
+            "    join: quorum",
+        )
+        self.assertEqual(missing_quorum[0]["level"], "L2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,4 @@
 """T20.8 secrets：$ENV 展开 + events/audit/history 脱敏。"""
-import json
 import os
 import shutil
 import sys
@@ -101,13 +100,10 @@ class SecretsE2ETest(unittest.TestCase):
 
     def test_secret_is_redacted_in_history(self) -> None:
         out = engine.start_action({"workflow": SECRET_YAML, "caller": "ut"})
-        state_file = self.tmp / ".agent-workflow" / "runs" / out["run_id"] / "state.json"
-        state = json.loads(state_file.read_text("utf-8"))
-        history = state.get("history") or []
+        run_dir = self.tmp / ".agent-workflow" / "runs" / out["run_id"]
+        history = (run_dir / "history.ndjson").read_text("utf-8")
         self.assertGreater(len(history), 0)
-        for entry in history:
-            blob = json.dumps(entry, ensure_ascii=False)
-            self.assertNotIn("sk-supersecret-XYZ", blob)
+        self.assertNotIn("sk-supersecret-XYZ", history)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+记忆系统基准测试：在不同历史规模下测量 load_memory / sync_index / search_memory / distill_to_memory。
+
+每个规模先用 src/synthetic_history.py 生成合成数据（假嵌入，无需下载模型），
+再为每个操作启动独立子进程执行 --repeat 次，统计 p50/p95 延迟、吞吐与该进程的峰值 RSS。
+结果写入 reports/YYYY-MM-DD-NN-benchmark.json；给定 --baseline 时与上次结果对比 p95，
+超出 --threshold 的操作视为回归，退出码为 1。
+
+    python run_benchmarks.py --scales 1k,10k --repeat 20
+    python run_benchmarks.py --scales 1k --baseline reports/2026-03-01-01-benchmark.json
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+THIS_DIR = Path(__file__).resolve().parent
+SRC_DIR = THIS_DIR / "src"
+REPORTS_DIR = THIS_DIR / "reports"
+RUNTIME_DIR = THIS_DIR / "testdata" / "runtime"
+
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+RESULT_VERSION = 1
+# 执行顺序即依赖顺序：全量同步建立索引后，其余操作在该索引上运行
+OPERATIONS = ("sync_index_full", "sync_index_incremental", "search_fts", "search_vector",
+              "search_hybrid", "load_memory", "distill_to_memory")
+INCREMENTAL_FACTS = 50
+NOISE_FLOOR_MS = 1.0
+
+
+# --- 统计 ---
+
+def percentile(values, pct):
+    """最近秩百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies, items, peak_rss_mb):
+    total = sum(latencies)
+    ms = [v * 1000 for v in latencies]
+    return {
+        "runs": len(latencies),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "mean_ms": round(total * 1000 / max(len(latencies), 1), 3),
+        "max_ms": round(max(ms, default=0.0), 3),
+        "items": items,
+        "throughput_per_s": round(items / total, 1) if total else None,
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KiB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# --- 子进程：执行单个操作 ---
+
+def _time_runs(repeat, fn, before=None):
+    latencies, items = [], 0
+    for i in range(repeat):
+        if before:
+            before(i)
+        t0 = time.perf_counter()
+        items += fn(i)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, items
+
+
+def run_operation(op, workspace, repeat):
+    """在当前进程执行 op 共 repeat 次（全量同步固定 1 次），返回统计结果"""
+    from unittest import mock
+    import synthetic_history as synth
+    from service.config import Config, get_memory_dir, INDEX_DB
+    from service.memory import sync_index, search_memory
+
+    memory_dir = get_memory_dir(workspace)
+
+    if op.startswith("sync_index"):
+        daily = os.path.join(memory_dir, "daily", f"{dt.datetime.now(dt.timezone.utc):%Y-%m-%d}.jsonl")
+
+        def append(i):
+            with open(daily, "a", encoding="utf-8") as f:
+                for j in range(INCREMENTAL_FACTS):
+                    f.write(json.dumps({"id": f"bench-{uuid.uuid4().hex[:12]}", "type": "fact",
+                                        "memory_type": "W", "content": f"增量事实 {i}-{j}",
+                                        "timestamp": f"{dt.datetime.now(dt.timezone.utc):%Y-%m-%dT%H:%M:%SZ}"},
+                                       ensure_ascii=False) + "\n")
+
+        full = op == "sync_index_full"
+        with mock.patch.object(sync_index, "_get_embed_func", synth.fake_embed_func):
+            latencies, items = _time_runs(1 if full else repeat,
+                                          lambda i: sync_index.sync_all(memory_dir, rebuild=full,
+                                                                        project_path=workspace),
+                                          None if full else append)
+
+    elif op.startswith("search_"):
+        from storage.sqlite_store import SQLiteStore
+
+        cfg = Config(workspace)
+        method = op[len("search_"):]
+        queries = synth.sample_queries(repeat)
+        store = SQLiteStore(os.path.join(memory_dir, INDEX_DB), vector_engine=cfg.get("index.vector_engine"),
+                            ivf_nprobe=cfg.get("index.ivf_nprobe"))
+        try:
+            with mock.patch.object(search_memory, "embed_query", synth.fake_embed_query):
+                latencies, items = _time_runs(repeat, lambda i: (search_memory.run_search(
+                    store, memory_dir, cfg, queries[i], method=method), 1)[1])
+        finally:
+            store.close()
+
+    elif op == "load_memory":
+        from service.hooks.load_memory import load_context
+
+        latencies, items = _time_runs(repeat, lambda i: (load_context(workspace), 1)[1])
+
+    elif op == "distill_to_memory":
+        from service.memory.distill_to_memory import distill
+
+        md_path = os.path.join(memory_dir, "MEMORY.md")
+        with open(md_path, "rb") as f:
+            original = f.read()
+
+        def restore(i):
+            with open(md_path, "wb") as f:
+                f.write(original)
+
+        latencies, items = _time_runs(repeat, lambda i: (distill(workspace), 1)[1], restore)
+        restore(0)
+
+    else:
+        raise ValueError(f"未知操作: {op}")
+
+    return summarize(latencies, items, _peak_rss_mb())
+
+
+def _spawn(op, workspace, repeat):
+    env = dict(os.environ, MEMORY_LOG_DIR=os.path.join(workspace, "logs"))
+    proc = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--worker", op, "--workspace", workspace,
+         "--repeat", str(repeat)],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{op} 执行失败:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# --- 主进程：生成数据、调度、对比 ---
+
+def run_suite(scales, repeat=20, ops=OPERATIONS, keep_data=False, log=print):
+    """
+    依次在每个规模上生成数据并执行各操作。
+
+    Args:
+        scales: 规模名或条数列表，如 ["1k", "10k"] / [2500]
+    Returns:
+        结果 dict（即写入 JSON 的内容）
+    """
+    import synthetic_history as synth
+
+    results = {
+        "version": RESULT_VERSION,
+        "created_at": dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "scales": {},
+    }
+    RUNTIME_DIR.mkdir(parents=True, exist_ok=True)
+    for scale in scales:
+        name = str(scale)
+        workspace = tempfile.mkdtemp(prefix=f"bench-{name}-", dir=str(RUNTIME_DIR))
+        try:
+            memory_dir = os.path.join(workspace, ".cursor", "skills", "memory-data")
+            os.makedirs(memory_dir)
+            # 基准测量的是检索本身，关闭结果缓存避免重复查询直接命中
+            with open(os.path.join(memory_dir, "config.json"), "w", encoding="utf-8") as f:
+                json.dump({"search": {"cache_max_entries": 0}}, f)
+            t0 = time.perf_counter()
+            dataset = synth.generate(memory_dir, synth.parse_scale(scale))
+            entry = {"dataset": dataset, "generate_s": round(time.perf_counter() - t0, 3), "ops": {}}
+            log(f"[{name}] 生成 {dataset['facts']} 条事实 / {dataset['sessions']} 条会话摘要 "
+                f"({dataset['bytes'] / 1e6:.1f} MB, {entry['generate_s']}s)")
+            for op in ops:
+                stats = _spawn(op, workspace, repeat)
+                entry["ops"][op] = stats
+                log(f"[{name}] {op:<24} p50={stats['p50_ms']:>10.2f}ms  p95={stats['p95_ms']:>10.2f}ms  "
+                    f"thr={stats['throughput_per_s']}/s  rss={stats['peak_rss_mb']}MB")
+            results["scales"][name] = entry
+        finally:
+            if keep_data:
+                log(f"[{name}] 数据保留在 {workspace}")
+            else:
+                shutil.rmtree(workspace, ignore_errors=True)
+    return results
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    对比两次结果的 p95 延迟，返回回归列表 [{"scale", "op", "baseline_ms", "current_ms", "ratio"}]。
+
+    变慢超过 threshold（比例）且绝对差超过 NOISE_FLOOR_MS 才计为回归。
+    """
+    regressions = []
+    for scale, entry in current.get("scales", {}).items():
+        base_ops = baseline.get("scales", {}).get(scale, {}).get("ops", {})
+        for op, stats in entry["ops"].items():
+            base = base_ops.get(op)
+            if not base or not base.get("p95_ms"):
+                continue
+            ratio = stats["p95_ms"] / base["p95_ms"]
+            if ratio > 1 + threshold and stats["p95_ms"] - base["p95_ms"] > NOISE_FLOOR_MS:
+                regressions.append({"scale": scale, "op": op, "baseline_ms": base["p95_ms"],
+                                    "current_ms": stats["p95_ms"], "ratio": round(ratio, 2)})
+    return regressions
+
+
+def _next_report_path() -> Path:
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    today = dt.datetime.now().strftime("%Y-%m-%d")
+    seqs = [int(p.stem.split("-")[3]) for p in REPORTS_DIR.glob(f"{today}-*-benchmark.json")
+            if p.stem.split("-")[3].isdigit()]
+    return REPORTS_DIR / f"{today}-{max(seqs, default=0) + 1:02d}-benchmark.json"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Memory benchmark harness")
+    parser.add_argument("--scales", default="1k,10k", help="逗号分隔：1k,10k,100k,1m 或具体条数")
+    parser.add_argument("--repeat", type=int, default=20, help="每个操作的执行次数（全量同步固定 1 次）")
+    parser.add_argument("--ops", default=",".join(OPERATIONS), help="逗号分隔的操作子集（按依赖顺序执行）")
+    parser.add_argument("--output", help="结果 JSON 路径，默认 reports/YYYY-MM-DD-NN-benchmark.json")
+    parser.add_argument("--baseline", help="对比的上次结果 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 变慢超过该比例视为回归")
+    parser.add_argument("--keep-data", action="store_true", help="保留生成的合成数据目录")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--workspace", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_operation(args.worker, args.workspace, args.repeat)))
+        return 0
+
+    ops = [op for op in OPERATIONS if op in args.ops.split(",")]
+    results = run_suite([s for s in args.scales.split(",") if s], args.repeat, ops, args.keep_data)
+    output = Path(args.output) if args.output else _next_report_path()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print(f"结果已写入 {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(baseline, results, args.threshold)
+        for r in regressions:
+            print(f"回归 [{r['scale']}] {r['op']}: p95 {r['baseline_ms']}ms → {r['current_ms']}ms (x{r['ratio']})")
+        if regressions:
+            return 1
+        print(f"与基线相比无回归（阈值 {args.threshold:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
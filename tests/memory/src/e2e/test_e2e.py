@@ -71,6 +71,10 @@ class E2EFlowTests(IsolatedWorkspaceCase):
         )
         proc_end = run_script("service/hooks/sync_and_cleanup.py", self.workspace, stdin_data=end_event)
         self.assertEqual(proc_end.returncode, 0, msg=proc_end.stderr)
+        # 索引同步由后台 worker 异步完成
+        proc_wait = run_script("service/memory/job_queue.py", self.workspace,
+                               args=["wait", "--timeout", "120", "--project-path", self.workspace])
+        self.assertEqual(proc_wait.returncode, 0, msg=proc_wait.stdout + proc_wait.stderr)
 
         proc_before = run_script(
             "service/memory/search_memory.py",
@@ -78,6 +78,7 @@ class DetailSyncAndSearchTests(IsolatedWorkspaceCase):
             args=["x", "--project-path", self.workspace + "-not-exist"],
         )
         self.assertEqual(missing.returncode, 2)
+        self.assertFalse(os.path.exists(self.workspace + "-not-exist"))
 
 
 if __name__ == "__main__":
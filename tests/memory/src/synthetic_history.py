@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+基准测试用的合成记忆数据：按规模生成 daily/*.jsonl、sessions.jsonl（含封存段）与 MEMORY.md，
+以及不依赖模型下载的确定性假嵌入函数。
+
+同一 (facts, seed) 生成的数据逐字节一致，便于不同运行之间对比。
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import struct
+from datetime import timedelta
+
+from test_common import SCRIPTS_DIR  # noqa: F401  确保 scripts 目录在 sys.path 中
+from core.utils import utcnow
+from storage import session_log
+
+FAKE_DIM = 64
+FACTS_PER_DAY = 200
+MAX_DAYS = 3650
+SESSIONS_PER_FACTS = 20      # 每 20 条事实对应一条会话摘要
+MEMORY_MD_MAX_ITEMS = 2000
+
+_SUBJECTS = ["用户", "项目", "团队", "服务", "数据库", "前端", "构建脚本", "测试套件", "部署流程", "缓存层"]
+_VERBS = ["决定使用", "偏好", "迁移到", "放弃了", "正在评估", "修复了", "重构了", "引入了", "升级到", "记录了"]
+_OBJECTS = ["SQLite WAL 模式", "FastAPI", "React 18", "Redis 缓存", "pytest 夹具", "Docker 镜像", "Rust 扩展",
+            "向量检索", "按天分片日志", "增量同步", "GraphQL 网关", "Kafka 消费者", "中文分词", "类型注解"]
+_REASONS = ["因为延迟更低", "为了减少依赖", "以便离线运行", "因为团队更熟悉", "为了兼容旧数据",
+            "因为内存占用更小", "以便横向扩展", "为了简化部署"]
+_ENTITIES = ["sqlite", "fastapi", "react", "redis", "pytest", "docker", "rust", "kafka", "graphql"]
+_MEMORY_TYPES = ["W", "W", "W", "B", "B", "O", "S"]
+_LAYERS = ["layer1_rules", "layer1_rules", "layer2_precompact", "layer3_auto", "layer4_stop"]
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def parse_scale(value):
+    """"10k" / "1m" / "2500" → 事实条数"""
+    value = str(value).strip().lower()
+    return SCALES[value] if value in SCALES else int(value)
+
+
+def _sentence(rng):
+    return (f"{rng.choice(_SUBJECTS)}{rng.choice(_VERBS)}{rng.choice(_OBJECTS)}，"
+            f"{rng.choice(_REASONS)}（#{rng.randrange(100000)}）")
+
+
+def sample_queries(count, seed=0):
+    """与合成数据同分布的查询词"""
+    rng = random.Random(seed + 1)
+    pool = _OBJECTS + _SUBJECTS + [f"{s}{v}" for s in _SUBJECTS[:3] for v in _VERBS[:3]]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def generate(memory_dir, facts, seed=0):
+    """
+    在 memory_dir 下生成 facts 条事实及对应的会话摘要与 MEMORY.md。
+
+    事实按每天 FACTS_PER_DAY 条（天数不超过 MAX_DAYS）分布在截至今天的 daily 文件中，
+    会话摘要写成旧版单文件后经 session_log.rotate 切分为封存段。
+
+    Returns:
+        {"facts", "days", "sessions", "memory_md_items", "bytes"}
+    """
+    rng = random.Random(seed)
+    daily_dir = os.path.join(memory_dir, "daily")
+    os.makedirs(daily_dir, exist_ok=True)
+    days = min(MAX_DAYS, max(1, math.ceil(facts / FACTS_PER_DAY)))
+    per_day, extra = divmod(facts, days)
+    today = utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    written = 0
+    for d in range(days):
+        day = today - timedelta(days=days - 1 - d)
+        day_str = day.strftime("%Y-%m-%d")
+        n = per_day + (1 if d < extra else 0)
+        with open(os.path.join(daily_dir, f"{day_str}.jsonl"), "w", encoding="utf-8") as f:
+            for i in range(n):
+                ts = (day + timedelta(seconds=i * 86400 // max(n, 1))).strftime("%Y-%m-%dT%H:%M:%SZ")
+                f.write(json.dumps({
+                    "id": f"log-{day_str}-{i:06d}", "type": "fact",
+                    "memory_type": rng.choice(_MEMORY_TYPES), "content": _sentence(rng),
+                    "entities": rng.sample(_ENTITIES, 2), "confidence": round(rng.uniform(0.6, 1.0), 2),
+                    "timestamp": ts, "session_id": f"sess-{day_str}-{i // SESSIONS_PER_FACTS}",
+                }, ensure_ascii=False) + "\n")
+                if i % SESSIONS_PER_FACTS == SESSIONS_PER_FACTS - 1:
+                    f.write(json.dumps({
+                        "id": f"log-{day_str}-m{i:06d}", "type": "session_metrics",
+                        "session_id": f"sess-{day_str}-{i // SESSIONS_PER_FACTS}",
+                        "summary_source": rng.choice(_LAYERS), "timestamp": ts,
+                    }) + "\n")
+        written += n
+
+    sessions = max(1, facts // SESSIONS_PER_FACTS)
+    with open(os.path.join(memory_dir, "sessions.jsonl"), "w", encoding="utf-8") as f:
+        for i in range(sessions):
+            day = today - timedelta(days=(days - 1) * (sessions - 1 - i) // max(sessions - 1, 1))
+            f.write(json.dumps({
+                "id": f"sum-{i:07d}", "session_id": f"sess-{i}", "topic": rng.choice(_OBJECTS),
+                "summary": "；".join(_sentence(rng) for _ in range(3)),
+                "decisions": [_sentence(rng)], "todos": [], "source": rng.choice(_LAYERS),
+                "timestamp": day.strftime("%Y-%m-%dT12:00:00Z"),
+            }, ensure_ascii=False) + "\n")
+    session_log.rotate(memory_dir)
+
+    items = min(MEMORY_MD_MAX_ITEMS, max(10, facts // 100))
+    sections = ["用户偏好", "项目背景", "重要决策"]
+    lines = ["# 核心记忆", ""]
+    for s, name in enumerate(sections):
+        lines += [f"## {name}"] + [f"- {_sentence(rng)}" for _ in range(s, items, len(sections))] + [""]
+    with open(os.path.join(memory_dir, "MEMORY.md"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+    total_bytes = sum(os.path.getsize(os.path.join(root, name))
+                      for root, _, names in os.walk(memory_dir) for name in names)
+    return {"facts": written, "days": days, "sessions": sessions, "memory_md_items": items, "bytes": total_bytes}
+
+
+def fake_vector(text, dim=FAKE_DIM):
+    """文本 → 确定性的单位向量（sha256 扩展为 dim 个 [-1, 1) 浮点数）"""
+    raw = b""
+    counter = 0
+    while len(raw) < dim * 4:
+        raw += hashlib.sha256(f"{counter}\0{text}".encode("utf-8")).digest()
+        counter += 1
+    values = [v / 2 ** 31 for v in struct.unpack(f"{dim}i", raw[:dim * 4])]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+def fake_embed_func(model_name=None, batch_size=32, cache=None):
+    """替换 sync_index._get_embed_func：不加载模型，也不使用嵌入缓存"""
+    return lambda texts: [fake_vector(t) for t in texts]
+
+
+def fake_embed_query(memory_dir, cfg, query):
+    """替换 search_memory.embed_query"""
+    return fake_vector(query)
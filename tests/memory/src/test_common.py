@@ -59,6 +59,11 @@ class IsolatedWorkspaceCase(unittest.TestCase):
             "# 核心记忆\n\n## 用户偏好\n- 语言：中文\n\n## 项目背景\n- 项目：standalone-test\n\n## 重要决策\n",
             encoding="utf-8",
         )
+        # 后台 worker 会活过 tearDown 的 rmtree；默认在 hook 进程内同步执行任务
+        (self.memory_dir / "config.json").write_text(
+            json.dumps({"version": 1, "jobs": {"background": False}}) + "\n",
+            encoding="utf-8",
+        )
 
     def tearDown(self):
         shutil.rmtree(self.workspace, ignore_errors=True)
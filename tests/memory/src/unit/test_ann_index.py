@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""IVF 近似检索测试：训练、增量分簇、持久化、召回评估、无 NumPy 降级。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import random
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from test_common import IsolatedWorkspaceCase
+from storage import ann_index
+from storage.ann_index import IVFIndex, evaluate_engine
+from storage.sqlite_store import SQLiteStore
+from storage.sqlite_search import search_vector
+
+
+def _clustered(n, dim=16, centers=8, seed=1):
+    """生成 n 条围绕若干中心分布的向量"""
+    rng = random.Random(seed)
+    bases = [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(centers)]
+    return [[x + rng.gauss(0, 0.1) for x in bases[i % centers]] for i in range(n)]
+
+
+@unittest.skipIf(ann_index.np is None, "需要 NumPy")
+class IVFIndexTests(IsolatedWorkspaceCase):
+    def setUp(self):
+        super().setUp()
+        self.db_path = str(Path(self.workspace) / "index.sqlite")
+
+    def _seed(self, store, vectors, start=0):
+        for i, vec in enumerate(vectors, start):
+            store.upsert_chunk(f"c{i}", f"chunk {i}", embedding=vec,
+                               timestamp=f"2026-01-{1 + i % 28:02d}T00:00:00Z")
+        store.sync_vector_sidecar("m")
+
+    def test_train_extend_and_search(self):
+        store = SQLiteStore(self.db_path, vector_engine="ivf", ivf_nprobe=4)
+        try:
+            self._seed(store, _clustered(400))
+            self.assertEqual(store.sync_ann_index(), "trained")
+            self.assertEqual(store.sync_ann_index(), "unchanged")
+
+            self._seed(store, _clustered(20, seed=2), start=400)
+            self.assertEqual(store.sync_ann_index(), "extended")
+            ivf = IVFIndex.load(store.ann_path)
+            self.assertEqual(ivf.rows, 420)
+            self.assertEqual(ivf.trained_rows, 400)
+        finally:
+            store.close()
+
+        reader = SQLiteStore(self.db_path, vector_engine="ivf", ivf_nprobe=4)
+        try:
+            vectors = reader.vector_index()
+            self.assertIsNotNone(vectors._ann)
+            target = _clustered(20, seed=2)[5]
+            self.assertEqual(search_vector(reader, target, limit=1)[0]["id"], "c405")
+
+            report = evaluate_engine(vectors, k=10, samples=20)
+            self.assertEqual(report["rows"], 420)
+            self.assertGreaterEqual(report["recall_at_k"], 0.9)
+            self.assertIn("p95", report["latency_ms"]["engine"])
+        finally:
+            reader.close()
+
+    def test_date_filter_only_checks_candidates(self):
+        store = SQLiteStore(self.db_path, vector_engine="ivf", ivf_nprobe=2)
+        try:
+            self._seed(store, _clustered(400))
+            store.sync_ann_index()
+            vectors = store.vector_index()
+            query = _clustered(400)[7]
+            lower, upper = "2026-01-05", "2026-01-20"
+            # 候选足够时不为全表构建过滤结果
+            with mock.patch.object(vectors, "_rows_np", side_effect=AssertionError("全表过滤")):
+                hits = vectors.search(query, limit=5, lower=lower, upper=upper)
+            self.assertEqual(len(hits), 5)
+            for chunk_id, _ in hits:
+                ts = vectors.timestamps[vectors._row_of[chunk_id]]
+                self.assertTrue(lower <= ts <= upper, ts)
+            self.assertEqual(hits[0][0], vectors.search(query, limit=1, lower=lower, upper=upper, exact=True)[0][0])
+
+            # 精确检索按过滤条件缓存命中行号，矩阵变化后失效
+            cached = vectors._rows_np(lower, upper)
+            self.assertIs(vectors._rows_np(lower, upper), cached)
+            fresh = [1.0] * 16
+            store.upsert_chunk("late", "late", embedding=fresh, timestamp="2026-01-10T00:00:00Z")
+            self.assertEqual(vectors.search(fresh, limit=1, lower=lower, upper=upper)[0][0], "late")
+            self.assertIsNot(vectors._rows_np(lower, upper), cached)
+        finally:
+            store.close()
+
+    def test_brute_engine_ignores_ivf_file(self):
+        store = SQLiteStore(self.db_path, vector_engine="ivf")
+        try:
+            self._seed(store, _clustered(100))
+            store.sync_ann_index()
+        finally:
+            store.close()
+        brute = SQLiteStore(self.db_path)
+        try:
+            self.assertEqual(brute.sync_ann_index(), "skipped")
+            self.assertIsNone(brute.vector_index()._ann)
+        finally:
+            brute.close()
+
+    def test_retrain_when_sidecar_rewritten(self):
+        store = SQLiteStore(self.db_path, vector_engine="ivf")
+        try:
+            self._seed(store, _clustered(100))
+            self.assertEqual(store.sync_ann_index(), "trained")
+            # 换模型导致旁路文件重写，tag 变化后 IVF 必须重训
+            store.sync_vector_sidecar("other-model")
+            self.assertIsNone(store.vector_index()._ann)
+            self.assertEqual(store.sync_ann_index(), "trained")
+        finally:
+            store.close()
+
+    def test_corrupt_file_and_missing_numpy(self):
+        store = SQLiteStore(self.db_path, vector_engine="ivf")
+        try:
+            self._seed(store, _clustered(50))
+            Path(store.ann_path).write_bytes(b"garbage")
+            self.assertIsNone(IVFIndex.load(store.ann_path))
+            self.assertEqual(store.sync_ann_index(), "trained")
+            with mock.patch.object(ann_index, "np", None):
+                self.assertEqual(store.sync_ann_index(), "skipped")
+                self.assertIsNone(IVFIndex.load(store.ann_path))
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
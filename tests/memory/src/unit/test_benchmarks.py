@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""基准测试工具测试：合成数据确定性、假嵌入、小规模完整运行与基线回归判定。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import importlib.util
+import math
+import unittest
+from pathlib import Path
+
+from test_common import IsolatedWorkspaceCase
+import synthetic_history as synth
+from storage import session_log
+
+_spec = importlib.util.spec_from_file_location(
+    "run_benchmarks", Path(__file__).resolve().parents[2] / "run_benchmarks.py")
+bench = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench)
+
+
+class SyntheticHistoryTests(IsolatedWorkspaceCase):
+    def _snapshot(self, root):
+        return {str(p.relative_to(root)): p.read_bytes() for p in sorted(Path(root).rglob("*")) if p.is_file()}
+
+    def test_generate_is_deterministic(self):
+        # 两个空目录对比（memory_dir 里已有夹具写入的 config.json）
+        first = Path(self.workspace) / "first"
+        other = os.path.join(self.workspace, "other")
+        stats = synth.generate(str(first), 450)
+        self.assertEqual(synth.generate(other, 450), stats)
+        self.assertEqual(self._snapshot(first), self._snapshot(other))
+
+        self.assertEqual(stats["facts"], 450)
+        self.assertEqual(stats["days"], 3)
+        self.assertEqual(stats["sessions"], 22)
+        self.assertEqual(session_log.count_sessions(str(first)), 22)
+        self.assertTrue((first / "MEMORY.md").read_text(encoding="utf-8").startswith("# 核心记忆"))
+
+    def test_scale_and_fake_vectors(self):
+        self.assertEqual(synth.parse_scale("10k"), 10_000)
+        self.assertEqual(synth.parse_scale("1M"), 1_000_000)
+        self.assertEqual(synth.parse_scale("2500"), 2500)
+        vec = synth.fake_vector("SQLite WAL 模式")
+        self.assertEqual(vec, synth.fake_vector("SQLite WAL 模式"))
+        self.assertNotEqual(vec, synth.fake_vector("Redis 缓存"))
+        self.assertAlmostEqual(math.sqrt(sum(v * v for v in vec)), 1.0, places=6)
+        self.assertEqual(synth.sample_queries(5), synth.sample_queries(5))
+
+
+class BenchmarkHarnessTests(unittest.TestCase):
+    def test_small_run_reports_every_operation(self):
+        results = bench.run_suite([300], repeat=3, log=lambda *_: None)
+        entry = results["scales"]["300"]
+        self.assertEqual(entry["dataset"]["facts"], 300)
+        self.assertEqual(list(entry["ops"]), list(bench.OPERATIONS))
+        for op, stats in entry["ops"].items():
+            self.assertEqual(stats["runs"], 1 if op == "sync_index_full" else 3, op)
+            self.assertLessEqual(stats["p50_ms"], stats["p95_ms"], op)
+            self.assertGreater(stats["throughput_per_s"], 0, op)
+        self.assertEqual(entry["ops"]["sync_index_incremental"]["items"] % bench.INCREMENTAL_FACTS, 0)
+        self.assertEqual(list(bench.RUNTIME_DIR.glob("bench-300-*")), [])
+
+    def test_percentile_and_compare(self):
+        self.assertEqual(bench.percentile([5, 1, 3, 2, 4], 50), 3)
+        self.assertEqual(bench.percentile(list(range(1, 101)), 95), 95)
+
+        def result(p95):
+            return {"scales": {"1k": {"ops": {"search_fts": {"p95_ms": p95}, "load_memory": {"p95_ms": 10.0}}}}}
+
+        self.assertEqual(bench.compare(result(10.0), result(11.5)), [])
+        regressions = bench.compare(result(10.0), result(13.0))
+        self.assertEqual([(r["op"], r["ratio"]) for r in regressions], [("search_fts", 1.3)])
+        # 绝对差低于噪声下限不计回归；基线缺失的规模忽略
+        self.assertEqual(bench.compare(result(0.5), result(1.0)), [])
+        self.assertEqual(bench.compare({"scales": {}}, result(99.0)), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -3,7 +3,7 @@
 import sys, os
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from test_common import IsolatedWorkspaceCase
-from storage.chunker import chunk_markdown
+from storage.chunker import chunk_markdown, estimate_tokens, chunk_id
 
 
 class DetailChunkTests(IsolatedWorkspaceCase):
@@ -22,6 +22,30 @@ class DetailChunkTests(IsolatedWorkspaceCase):
         self.assertGreaterEqual(len(heading_chunks), 3)
         self.assertTrue(heading_chunks[1].startswith("## "))
 
+    def test_cjk_chunks_respect_token_budget_and_sentences(self):
+        sentences = [f"第{i}句讲的是记忆系统的分块策略，需要按照句子边界切开。" for i in range(60)]
+        text = "## 中文段落\n" + "".join(sentences)
+        self.assertGreater(estimate_tokens(text), len(text) * 0.9)
+
+        chunks = chunk_markdown(text, max_tokens=100, overlap=30)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(estimate_tokens(c) <= 100 for c in chunks))
+        # 除首块的标题外，块都以完整句子结束
+        self.assertTrue(all(c.endswith("。") for c in chunks))
+        # 相邻块有整句重叠
+        self.assertTrue(any(chunks[1].startswith(s) for s in sentences))
+        self.assertIn(chunks[1].split("。")[0] + "。", chunks[0])
+
+    def test_oversized_sentence_is_hard_split(self):
+        chunks = chunk_markdown("## A\n" + "无标点的超长句子" * 100, max_tokens=60, overlap=10)
+        self.assertTrue(all(estimate_tokens(c) <= 60 for c in chunks))
+        self.assertEqual("".join(chunks).replace("## A", ""), "无标点的超长句子" * 100)
+
+    def test_chunk_id_is_content_addressed(self):
+        self.assertEqual(chunk_id("## A\n内容"), chunk_id("## A\n内容"))
+        self.assertNotEqual(chunk_id("## A\n内容"), chunk_id("## A\n内容。"))
+        self.assertTrue(chunk_id("x").startswith("core-"))
+
 
 if __name__ == "__main__":
     import unittest
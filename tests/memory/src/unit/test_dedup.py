@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""core/dedup.py 近似重复索引测试：精确/子串/模糊/语义判定，与旧版线性扫描结果一致。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import random
+import unittest
+
+from test_common import IsolatedWorkspaceCase
+from core.dedup import DedupIndex, shingles, jaccard
+
+
+def _linear_is_duplicate(content, existing_set):
+    """旧版 distill_to_memory._is_duplicate 的实现，作为子串判定的参照"""
+    normalized = content.strip().lower()
+    if normalized in existing_set:
+        return True
+    for existing in existing_set:
+        if len(existing) > 20 and (normalized in existing or existing in normalized):
+            return True
+    return False
+
+
+class DedupIndexTests(IsolatedWorkspaceCase):
+    def test_exact_and_containment(self):
+        long_item = "测试文件必须放在 tests/ 目录下对应的 skill 子目录中"
+        index = DedupIndex(["语言：中文", long_item], jaccard_threshold=0)
+        self.assertTrue(index.is_duplicate("  语言：中文 "))
+        self.assertTrue(index.is_duplicate(long_item + "，不能放在 skills/ 目录内部"))
+        self.assertTrue(index.is_duplicate("tests/ 目录下"))
+        self.assertTrue(index.is_duplicate("目"))
+        # 短条目不参与子串判定
+        self.assertFalse(index.is_duplicate("语言：中文和英文"))
+        self.assertFalse(index.is_duplicate("新的事实"))
+
+    def test_containment_matches_linear_scan(self):
+        rng = random.Random(7)
+        alphabet = "abcdefgh 数据库缓存索引"
+        existing = {"".join(rng.choice(alphabet) for _ in range(rng.randint(5, 40))) for _ in range(200)}
+        index = DedupIndex(existing, jaccard_threshold=0)
+        items = sorted(existing)
+        queries = []
+        for _ in range(300):
+            base = rng.choice(items)
+            i = rng.randint(0, len(base))
+            queries.append(rng.choice([base[i:i + rng.randint(1, 30)], "xx" + base + "yy",
+                                       "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 45)))]))
+        for q in queries:
+            if not q.strip():
+                continue
+            self.assertEqual(index.is_duplicate(q), _linear_is_duplicate(q, existing), msg=q)
+
+    def test_fuzzy_duplicate_via_lsh(self):
+        base = "项目决定使用 PostgreSQL 作为主数据库，Redis 作为缓存层"
+        index = DedupIndex([base])
+        near = "项目决定使用 PostgreSQL 作为主数据库，Redis 作为缓存"
+        self.assertGreaterEqual(jaccard(shingles(near.lower()), shingles(base.lower())), 0.8)
+        self.assertTrue(index.is_duplicate(near.replace("缓存", "缓存层。")))
+        self.assertFalse(index.is_duplicate("前端框架采用 React 与 TypeScript"))
+        self.assertFalse(DedupIndex([base], jaccard_threshold=0).is_duplicate(base.replace("主", "核心")))
+        self.assertTrue(DedupIndex([base]).is_duplicate(base.replace("主", "核心")))
+
+    def test_semantic_duplicate_with_embed_func(self):
+        vectors = {"用户喜欢中文回答": [1.0, 0.0], "请用中文回复用户": [0.99, 0.141], "数据库使用 mysql": [0.0, 1.0]}
+        calls = []
+
+        def embed(texts):
+            calls.append(list(texts))
+            return [vectors.get(t, [0.6, 0.8]) for t in texts]
+
+        index = DedupIndex(["用户喜欢中文回答"], embed_func=embed, embed_threshold=0.95)
+        self.assertTrue(index.is_duplicate("请用中文回复用户"))
+        self.assertFalse(index.is_duplicate("数据库使用 MySQL"))
+        self.assertEqual(calls[0], ["用户喜欢中文回答"])
+
+        failing = DedupIndex(["a"], embed_func=lambda texts: None)
+        self.assertFalse(failing.is_duplicate("b"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -127,6 +127,26 @@ class TestDistillCandidates(IsolatedWorkspaceCase):
         candidates = select_candidates(daily_dir, existing, {"min_confidence": 0.85, "min_age_days": 0, "max_items_per_run": 10})
         self.assertEqual(len(candidates), 0)
 
+    def test_skips_near_duplicates_and_in_batch_repeats(self):
+        ts = (datetime.now(timezone.utc) - timedelta(days=2)).isoformat()
+        self._write_facts([
+            {"type": "fact", "content": "项目决定使用 PostgreSQL 作为主数据库。", "confidence": 0.9,
+             "timestamp": ts, "memory_type": "W"},
+            {"type": "fact", "content": "统一使用 ruff 做代码格式化与静态检查", "confidence": 0.9,
+             "timestamp": ts, "memory_type": "W"},
+            {"type": "fact", "content": "统一使用 ruff 做代码格式化与静态检查！", "confidence": 0.9,
+             "timestamp": ts, "memory_type": "W"},
+        ])
+        daily_dir = str(self.memory_dir / "daily")
+        existing = {"项目决定使用 postgresql 作为主数据库"}
+        config = {"min_confidence": 0.85, "min_age_days": 0, "max_items_per_run": 10}
+        candidates = select_candidates(daily_dir, existing, config)
+        self.assertEqual(len(candidates), 1)
+        self.assertTrue(candidates[0]["content"].startswith("统一使用 ruff"))
+
+        candidates = select_candidates(daily_dir, existing, dict(config, near_dup_threshold=0))
+        self.assertEqual(len(candidates), 1)
+
     def test_opinion_sorted_first(self):
         ts = (datetime.now(timezone.utc) - timedelta(days=2)).isoformat()
         self._write_facts([
@@ -10,7 +10,7 @@ from test_common import IsolatedWorkspaceCase, SCRIPTS_DIR
 
 sys.path.insert(0, str(SCRIPTS_DIR))
 
-from service.memory.distill_refined import build_memory_md
+from service.memory.distill_refined import build_memory_md, dedupe_sections
 from service.memory.session_state import read_session_state
 
 
@@ -76,11 +76,25 @@ class TestBuildMemoryMd(unittest.TestCase):
         for section in sections:
             self.assertIn(f"## {section}", md)
 
+    def test_dedupe_sections_keeps_first_occurrence(self):
+        sections = {
+            "重要决策": ["项目决定使用 PostgreSQL 作为主数据库", "引入 Redis"],
+            "用户偏好": ["中文回答", "中文回答 "],
+            "项目背景": ["项目决定使用 PostgreSQL 作为主数据库。", "其他", ""],
+            "备注": "非列表值",
+        }
+        result, dropped = dedupe_sections(sections)
+        self.assertEqual(dropped, 2)
+        self.assertEqual(result["用户偏好"], ["中文回答"])
+        self.assertEqual(result["项目背景"], ["项目决定使用 PostgreSQL 作为主数据库。", "其他", ""])
+        self.assertEqual(result["重要决策"], ["引入 Redis"])
+        self.assertEqual(result["备注"], "非列表值")
+
 
 class TestDistillRefinedIntegration(IsolatedWorkspaceCase):
 
     def test_writes_memory_md_and_creates_backup(self):
-        from service.memory.distill_refined import build_memory_md
+        from service.memory.distill_refined import build_memory_md, dedupe_sections
         from service.config import MEMORY_MD
         import shutil
 
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""嵌入缓存测试：规范化键、模型隔离、LRU 淘汰、同步与重建复用缓存。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import json
+import time
+from pathlib import Path
+from unittest import mock
+
+from test_common import IsolatedWorkspaceCase
+from core import embedding
+from service.memory import sync_index
+from storage.embedding_cache import EmbeddingCache, open_cache, cache_key
+from storage.sqlite_store import SQLiteStore
+
+
+class EmbeddingCacheTests(IsolatedWorkspaceCase):
+    def setUp(self):
+        super().setUp()
+        self.path = str(Path(self.workspace) / "cache.sqlite")
+
+    def test_normalized_key_and_model_isolation(self):
+        self.assertEqual(cache_key("m", "a  b\n"), cache_key("m", " a b"))
+        self.assertEqual(cache_key("m", "ＡＢＣ"), cache_key("m", "ABC"))
+        self.assertNotEqual(cache_key("m1", "a"), cache_key("m2", "a"))
+
+        cache = EmbeddingCache(self.path, "m1", 10)
+        try:
+            cache.put_many(["hello  world"], [[0.5, 0.25]])
+            self.assertEqual(cache.get_many(["hello world", "other"]), [[0.5, 0.25], None])
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+        finally:
+            cache.close()
+        other = EmbeddingCache(self.path, "m2", 10)
+        try:
+            self.assertEqual(other.get_many(["hello world"]), [None])
+        finally:
+            other.close()
+
+    def test_lru_eviction_keeps_recently_used(self):
+        cache = EmbeddingCache(self.path, "m", 3)
+        try:
+            cache.put_many(["a", "b", "c"], [[1.0], [2.0], [3.0]])
+            time.sleep(0.01)
+            cache.get_many(["a"])
+            time.sleep(0.01)
+            cache.put_many(["d"], [[4.0]])
+            self.assertEqual(cache.get_many(["a", "b", "c", "d"]), [[1.0], None, [3.0], [4.0]])
+        finally:
+            cache.close()
+
+    def test_embed_only_computes_misses(self):
+        cache = EmbeddingCache(self.path, "m", 100)
+        seen = []
+
+        def fake(texts):
+            seen.append(list(texts))
+            return [[float(len(t))] for t in texts]
+
+        try:
+            self.assertEqual(cache.embed(["aa", "b"], fake), [[2.0], [1.0]])
+            self.assertEqual(cache.embed(["aa", "ccc"], fake), [[2.0], [3.0]])
+            self.assertEqual(seen, [["aa", "b"], ["ccc"]])
+        finally:
+            cache.close()
+        self.assertIsNone(open_cache(self.workspace, "m", 0))
+
+    def test_rebuild_reuses_cached_embeddings(self):
+        with open(self.memory_dir / "daily" / "2026-01-01.jsonl", "w", encoding="utf-8") as f:
+            for i in range(5):
+                f.write(json.dumps({"id": f"f{i}", "type": "fact", "content": f"fact {i}",
+                                    "timestamp": "2026-01-01T00:00:00Z"}) + "\n")
+        calls = []
+
+        def fake_batch(texts, model_name=None, batch_size=32):
+            calls.append(len(texts))
+            return [[1.0, float(len(t)), 0.5] for t in texts]
+
+        with mock.patch.object(embedding, "is_available", return_value=True) as available, \
+                mock.patch.object(embedding, "embed_batch", fake_batch):
+            total = sync_index.sync_all(str(self.memory_dir), project_path=self.workspace)
+            self.assertEqual(sum(calls), total)
+
+            calls.clear()
+            available.reset_mock()
+            self.assertEqual(sync_index.sync_all(str(self.memory_dir), rebuild=True,
+                                                 project_path=self.workspace), total)
+            self.assertEqual(calls, [])
+            available.assert_not_called()
+
+        store = SQLiteStore(str(self.memory_dir / "index.sqlite"))
+        try:
+            self.assertEqual(len(store.vector_index()), total)
+            self.assertTrue(store.get_meta("embedding_model"))
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main(verbosity=2)
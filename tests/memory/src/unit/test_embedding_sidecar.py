@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""embeddings.f32 旁路文件测试：构建、增量追加、失效行、压缩、降级装载、管理命令后重新对齐。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import json
+from pathlib import Path
+from unittest import mock
+
+from test_common import IsolatedWorkspaceCase
+from storage import vector_index, embedding_sidecar
+from storage.sqlite_store import SQLiteStore
+from storage.sqlite_search import search_vector
+from storage.embedding_sidecar import load_sidecar, HEADER_SIZE
+from storage.jsonl_manage import soft_delete_entries, restore_entries, purge_entries
+
+
+class EmbeddingSidecarTests(IsolatedWorkspaceCase):
+    def setUp(self):
+        super().setUp()
+        self.db_path = str(Path(self.workspace) / "index.sqlite")
+
+    def _seed(self, store):
+        store.upsert_chunk("a", "alpha", embedding=[1.0, 0.0, 0.0], timestamp="2026-01-10T00:00:00Z")
+        store.upsert_chunk("b", "beta", embedding=[0.0, 3.0, 0.0], timestamp="2026-02-10T00:00:00Z")
+        store.upsert_chunk("c", "gamma", timestamp="2026-03-10T00:00:00Z")
+
+    def _search_ids(self, query, **kwargs):
+        store = SQLiteStore(self.db_path)
+        try:
+            return [r["id"] for r in search_vector(store, query, limit=5, **kwargs)]
+        finally:
+            store.close()
+
+    def _check_lifecycle(self):
+        store = SQLiteStore(self.db_path)
+        try:
+            self._seed(store)
+            self.assertEqual(store.sync_vector_sidecar("m"), (2, 0))
+            self.assertEqual(store.sync_vector_sidecar("m"), (0, 0))
+            self.assertEqual(os.path.getsize(store.sidecar_path), HEADER_SIZE + 2 * 3 * 4)
+
+            reader = SQLiteStore(self.db_path)
+            try:
+                index = load_sidecar(reader, reader.sidecar_path)
+                self.assertIsNotNone(index)
+                self.assertEqual(len(index), 2)
+            finally:
+                reader.close()
+            self.assertEqual(self._search_ids([0.0, 1.0, 0.0])[0], "b")
+
+            # 覆盖 + 新增 → 追加两行，旧行失效
+            store.upsert_chunk("b", "beta2", embedding=[0.0, 0.0, 1.0], timestamp="2026-02-11T00:00:00Z")
+            store.upsert_chunk("d", "delta", embedding=[0.0, 1.0, 0.0], timestamp="2026-03-01T00:00:00Z")
+            self.assertEqual(store.sync_vector_sidecar("m"), (2, 1))
+            self.assertEqual(self._search_ids([0.0, 0.0, 1.0])[0], "b")
+            self.assertEqual(self._search_ids([0.0, 1.0, 0.0], from_date="2026-02-15"), ["d"])
+
+            # 物理删除后失效行超过有效行 → 压缩重写
+            store.conn.execute("DELETE FROM chunks WHERE id IN ('a', 'b')")
+            store.conn.commit()
+            store.sync_vector_sidecar("m")
+            self.assertEqual(os.path.getsize(store.sidecar_path), HEADER_SIZE + 1 * 3 * 4)
+            self.assertEqual(self._search_ids([1.0, 0.0, 0.0]), ["d"])
+
+            # 更换模型 → 整体重写
+            store.upsert_chunk("e", "eps", embedding=[1.0, 1.0, 0.0], timestamp="2026-03-02T00:00:00Z")
+            self.assertEqual(store.sync_vector_sidecar("m2"), (2, 0))
+        finally:
+            store.close()
+
+    def test_lifecycle(self):
+        self._check_lifecycle()
+
+    def test_lifecycle_without_numpy(self):
+        with mock.patch.object(vector_index, "np", None), mock.patch.object(embedding_sidecar, "np", None):
+            self._check_lifecycle()
+
+    def test_stale_sidecar_falls_back_to_sqlite(self):
+        store = SQLiteStore(self.db_path)
+        try:
+            self._seed(store)
+            store.sync_vector_sidecar("m")
+            # 未经同步直接写入的新行：映射与 chunks 不一致，读取方回退
+            store.upsert_chunk("z", "zeta", embedding=[0.0, 0.0, 1.0], timestamp="2026-03-03T00:00:00Z")
+            self.assertIsNone(load_sidecar(store, store.sidecar_path))
+            store.set_meta("vector_sidecar_tag", "0")
+            self.assertIsNone(load_sidecar(store, store.sidecar_path))
+        finally:
+            store.close()
+        self.assertEqual(self._search_ids([0.0, 0.0, 1.0])[0], "z")
+
+    def test_delete_then_insert_reusing_rowid_is_detected(self):
+        store = SQLiteStore(self.db_path)
+        try:
+            self._seed(store)
+            store.sync_vector_sidecar("m")
+            top = store.conn.execute("SELECT MAX(rowid) FROM chunks WHERE embedding IS NOT NULL").fetchone()[0]
+            # 删掉 rowid 最大的带向量行再插入新行：行数与最大 rowid 均不变，内容已不同
+            store.delete_chunks(["c", "b"])
+            store.upsert_chunk("x", "chi", embedding=[0.0, 1.0, 0.0], timestamp="2026-03-04T00:00:00Z")
+            self.assertEqual(store.conn.execute("SELECT MAX(rowid) FROM chunks").fetchone()[0], top)
+            self.assertIsNone(load_sidecar(store, store.sidecar_path))
+        finally:
+            store.close()
+        self.assertEqual(self._search_ids([0.0, 1.0, 0.0])[0], "x")
+
+    def test_manage_commands_resync_sidecar(self):
+        memory_dir = str(self.memory_dir)
+        daily_dir = os.path.join(memory_dir, "daily")
+        sessions_path = os.path.join(memory_dir, "sessions.jsonl")
+        os.makedirs(daily_dir, exist_ok=True)
+        entries = [{"id": cid, "type": "fact", "memory_type": "W", "content": cid,
+                    "timestamp": f"2026-03-01T00:00:0{i}Z"} for i, cid in enumerate("abc")]
+        with open(os.path.join(daily_dir, "2026-03-01.jsonl"), "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(e) + "\n" for e in entries)
+
+        store = SQLiteStore(self.db_path)
+        try:
+            for i, e in enumerate(entries):
+                store.upsert_chunk(e["id"], e["content"], embedding=[float(i == j) for j in range(3)],
+                                   source_file="daily/2026-03-01.jsonl", timestamp=e["timestamp"])
+            store.sync_vector_sidecar("m")
+
+            def sidecar_ids():
+                index = load_sidecar(store, store.sidecar_path)
+                self.assertIsNotNone(index)
+                return set(index._row_of)
+
+            soft_delete_entries(daily_dir, sessions_path, {"a"}, store=store)
+            self.assertEqual(sidecar_ids(), {"b", "c"})
+            restore_entries(daily_dir, sessions_path, {"a"}, store=store)
+            self.assertEqual(sidecar_ids(), {"b", "c"})  # 恢复的条目暂无向量，由下次 sync_index 补齐
+            purge_entries(daily_dir, sessions_path, {"b"}, store=store)
+            self.assertEqual(sidecar_ids(), {"c"})
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main(verbosity=2)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""id → 位置索引测试：只改写受影响文件、偏移平移正确、同事务更新 chunks、索引过期自愈。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import json
+import threading
+
+from test_common import IsolatedWorkspaceCase, run_script
+from storage import entry_index
+from storage.jsonl import iter_jsonl_lines, read_jsonl, append_jsonl
+from storage.jsonl_manage import soft_delete_entries, restore_entries, purge_entries
+from storage.sqlite_store import SQLiteStore
+from service.memory.sync_index import sync_all
+
+
+class EntryIndexTests(IsolatedWorkspaceCase):
+    def setUp(self):
+        super().setUp()
+        self.mdir = str(self.memory_dir)
+        self.daily_dir = os.path.join(self.mdir, "daily")
+        self.sessions_path = os.path.join(self.mdir, "sessions.jsonl")
+        for day in ("2026-03-01", "2026-03-02", "2026-03-03"):
+            self._write(os.path.join(self.daily_dir, f"{day}.jsonl"), [
+                {"id": f"{day}-{i}", "type": "fact", "memory_type": "W",
+                 "content": f"{day} 事实 {i} " + "填充" * i, "timestamp": f"{day}T00:00:{i:02d}Z"}
+                for i in range(6)
+            ])
+        self._write(self.sessions_path, [{"id": "sum-1", "topic": "话题", "summary": "会话摘要 SESSTOKEN",
+                                          "timestamp": "2026-03-03T01:00:00Z"}])
+        self.store = SQLiteStore(os.path.join(self.mdir, "index.sqlite"))
+        self.addCleanup(self.store.close)
+
+    def _write(self, path, entries, mode="w"):
+        with open(path, mode, encoding="utf-8") as f:
+            for e in entries:
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+
+    def _assert_locations_match_files(self):
+        files = entry_index.managed_files(self.mdir)
+        expected = sorted((e["id"], key, off, length) for key, path in files.items()
+                          for off, length, e in iter_jsonl_lines(path) if e)
+        got = sorted(tuple(r) for r in self.store.conn.execute(
+            "SELECT id, file, offset, length FROM entry_locations"))
+        self.assertEqual(got, expected)
+
+    def _fts_ids(self, query):
+        return {r["id"] for r in self.store.search_fts(query, limit=50)}
+
+    def test_only_affected_files_are_rewritten(self):
+        entry_index.refresh(self.store, entry_index.managed_files(self.mdir))
+        inodes = {p: os.stat(p).st_ino for p in entry_index.managed_files(self.mdir).values()}
+
+        result = soft_delete_entries(self.daily_dir, self.sessions_path, {"2026-03-02-1", "2026-03-02-4"},
+                                     store=self.store)
+        self.assertEqual(result, {"deleted": 2, "affected_files": ["2026-03-02.jsonl"]})
+        for path, ino in inodes.items():
+            changed = os.stat(path).st_ino != ino
+            self.assertEqual(changed, path.endswith("2026-03-02.jsonl"), msg=path)
+        self._assert_locations_match_files()
+
+        # 已定位的文件未变化时只 stat 不读取
+        self.assertEqual(entry_index.refresh(self.store, entry_index.managed_files(self.mdir)), 0)
+
+        purge_entries(self.daily_dir, self.sessions_path, {"2026-03-02-0", "2026-03-02-5", "sum-1"}, store=self.store)
+        restore_entries(self.daily_dir, self.sessions_path, {"2026-03-02-4"}, store=self.store)
+        self._assert_locations_match_files()
+        ids = [e["id"] for e in read_jsonl(os.path.join(self.daily_dir, "2026-03-02.jsonl"))]
+        self.assertEqual(ids, ["2026-03-02-1", "2026-03-02-2", "2026-03-02-3", "2026-03-02-4"])
+        self.assertEqual(read_jsonl(self.sessions_path), [])
+
+    def test_chunks_updated_in_same_step(self):
+        sync_all(self.mdir)
+        self.assertIn("sum-1", self._fts_ids("SESSTOKEN"))
+        self.assertIn("2026-03-01-2", self._fts_ids("事实"))
+
+        soft_delete_entries(self.daily_dir, self.sessions_path, {"2026-03-01-2", "sum-1"}, store=self.store)
+        self.assertNotIn("sum-1", self._fts_ids("SESSTOKEN"))
+        self.assertNotIn("2026-03-01-2", self._fts_ids("事实"))
+
+        restore_entries(self.daily_dir, self.sessions_path, {"sum-1"}, store=self.store)
+        self.assertIn("sum-1", self._fts_ids("SESSTOKEN"))
+
+        # 后续增量同步整文件重读被改写的文件，不会把软删除的条目加回索引
+        sync_all(self.mdir)
+        self.assertNotIn("2026-03-01-2", self._fts_ids("事实"))
+        self.assertIn("sum-1", self._fts_ids("SESSTOKEN"))
+
+        purge_entries(self.daily_dir, self.sessions_path, {"sum-1"})
+        self.assertNotIn("sum-1", self._fts_ids("SESSTOKEN"))
+
+    def test_unsynced_appends_and_external_rewrites_are_located(self):
+        entry_index.refresh(self.store, entry_index.managed_files(self.mdir))
+        day = os.path.join(self.daily_dir, "2026-03-03.jsonl")
+        self._write(day, [{"id": "late", "type": "fact", "content": "后来追加", "timestamp": "2026-03-03T09:00:00Z"}],
+                    mode="a")
+        self.assertEqual(purge_entries(self.daily_dir, self.sessions_path, {"late"}, store=self.store)["purged"], 1)
+
+        # 外部原地改写且大小不变：按 id 校验失败后整文件重扫
+        st = os.stat(day)
+        entries = read_jsonl(day)
+        entries.reverse()
+        self._write(day, entries)
+        os.utime(day, ns=(st.st_atime_ns, st.st_mtime_ns))
+        result = soft_delete_entries(self.daily_dir, self.sessions_path, {"2026-03-03-5"}, store=self.store)
+        self.assertEqual(result["deleted"], 1)
+        deleted = [e["id"] for e in read_jsonl(day) if e.get("deleted_at")]
+        self.assertEqual(deleted, ["2026-03-03-5"])
+        self._assert_locations_match_files()
+
+    def test_append_during_splice_waits_for_lock(self):
+        day = os.path.join(self.daily_dir, "2026-03-02.jsonl")
+        files = entry_index.managed_files(self.mdir)
+        late = {"id": "late", "type": "fact", "content": "改写期间追加", "timestamp": "2026-03-02T09:00:00Z"}
+        appender = threading.Thread(target=append_jsonl, args=(day, late))
+
+        def mutate(entry):
+            # 已读出整个文件、尚未写回：此时的追加必须等改写结束，不能被 os.replace 覆盖
+            appender.start()
+            appender.join(0.3)
+            self.assertTrue(appender.is_alive())
+            return {**entry, "deleted_at": "2026-03-02T10:00:00Z"}
+
+        changes = entry_index.update_entries(self.store, files, {"2026-03-02-1"}, mutate)
+        appender.join(5)
+        self.assertEqual(len(changes), 1)
+        self.assertEqual([e["id"] for e in read_jsonl(day)][-1], "late")
+        self.assertEqual(entry_index.refresh(self.store, files), 1)  # 写回后的追加按增量读入
+        self._assert_locations_match_files()
+
+        # 持锁后按 entry_files 复核：refresh 之后追加的行也能被定位和改写
+        self.assertEqual(len(entry_index.update_entries(self.store, files, {"late"}, lambda e: None)), 1)
+        self.assertNotIn("late", [e["id"] for e in read_jsonl(day)])
+        self._assert_locations_match_files()
+
+    def _assert_stats_match_rescan(self):
+        fresh = SQLiteStore(":memory:")
+        self.addCleanup(fresh.close)
+        entry_index.refresh(fresh, entry_index.managed_files(self.mdir))
+        query = "SELECT file, day, metric, count FROM entry_stats ORDER BY file, day, metric"
+        self.assertEqual([tuple(r) for r in self.store.conn.execute(query)],
+                         [tuple(r) for r in fresh.conn.execute(query)])
+
+    def test_rollups_follow_appends_and_rewrites(self):
+        entry_index.refresh(self.store, entry_index.managed_files(self.mdir))
+        day = os.path.join(self.daily_dir, "2026-03-03.jsonl")
+        self._write(day, [
+            {"id": "m-1", "type": "session_metrics", "summary_source": "layer1_rules", "timestamp": "2026-03-03T10:00:00Z"},
+            {"id": "m-2", "type": "session_metrics", "summary_source": "layer4_stop", "timestamp": "2026-03-03T11:00:00Z"},
+            {"id": "2026-03-01-0", "type": "fact", "memory_type": "B", "content": "重复 ID", "timestamp": "2026-03-03T12:00:00Z"},
+        ], mode="a")
+        with open(day, "a", encoding="utf-8") as f:
+            f.write("{broken\n\n")
+        self.assertEqual(entry_index.refresh(self.store, entry_index.managed_files(self.mdir)), 1)
+
+        counts = entry_index.rollup(self.store, day_from="2026-03-03", file_prefix="daily/")
+        self.assertEqual(counts["session:layer1_rules"], 1)
+        self.assertEqual(counts["session:layer4_stop"], 1)
+        self.assertEqual(counts["fact:W"], 6)
+        self.assertEqual(counts["fact:B"], 1)
+        self.assertEqual(entry_index.rollup(self.store)["parse_errors"], 1)
+        self.assertEqual(entry_index.id_counts(self.store), (22, 21))
+        self._assert_stats_match_rescan()
+
+        soft_delete_entries(self.daily_dir, self.sessions_path, {"m-1"}, store=self.store)
+        purge_entries(self.daily_dir, self.sessions_path, {"m-2", "2026-03-02-3", "sum-1"}, store=self.store)
+        self.assertEqual(entry_index.rollup(self.store)["session:layer4_stop"], 0)
+        self.assertEqual(entry_index.file_counts(self.store, "entries")["daily/2026-03-02.jsonl"], 5)
+        self._assert_stats_match_rescan()
+
+    def test_metrics_and_doctor_read_rollups(self):
+        from core.utils import today_str
+
+        self._write(os.path.join(self.daily_dir, f"{today_str()}.jsonl"), [
+            {"id": "m-today", "type": "session_metrics", "summary_source": "layer3_auto",
+             "timestamp": f"{today_str()}T00:00:00Z"},
+            {"id": "f-today", "type": "fact", "memory_type": "W", "content": "今天", "timestamp": f"{today_str()}T00:00:01Z"},
+        ])
+        sync_all(self.mdir)
+        manage = os.path.join("service", "manage", "index.py")
+        project = ["--project-path", self.workspace]
+
+        out = json.loads(run_script(manage, self.workspace, args=project + ["metrics", "--days", "3"]).stdout)["data"]
+        self.assertEqual(out["total_sessions"], 1)
+        self.assertEqual(out["layers"]["layer3_auto"], 1)
+        self.assertEqual(out["facts"], {"W": 1})
+
+        with open(os.path.join(self.daily_dir, "2026-03-01.jsonl"), "a", encoding="utf-8") as f:
+            f.write("not json\n")
+        checks = {c["name"]: c for c in json.loads(
+            run_script(manage, self.workspace, args=project + ["doctor"]).stdout)["data"]["checks"]}
+        self.assertEqual(checks["JSONL 可解析性"]["detail"], "22 条, 1 解析错误")
+        self.assertEqual(checks["ID 唯一性"]["detail"], "21 个 ID 无重复")
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main(verbosity=2)
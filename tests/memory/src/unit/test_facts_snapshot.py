@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""近期事实快照测试：结果与全量读取一致、未变化文件复用、修改失效、窗口外裁剪。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import json
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from test_common import IsolatedWorkspaceCase
+from storage import facts_snapshot
+from storage.jsonl import read_recent_facts_from_daily, daily_files_in_window
+
+
+class FactsSnapshotTests(IsolatedWorkspaceCase):
+    def setUp(self):
+        super().setUp()
+        self.daily = self.memory_dir / "daily"
+        self.now = datetime.now(timezone.utc)
+        self.reads = []
+        real = facts_snapshot.read_jsonl
+
+        def tracking(path):
+            self.reads.append(os.path.basename(path))
+            return real(path)
+
+        patcher = mock.patch.object(facts_snapshot, "read_jsonl", tracking)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _write_day(self, days_ago, count, mode="w"):
+        ts = self.now - timedelta(days=days_ago)
+        name = f"{ts:%Y-%m-%d}.jsonl"
+        with open(self.daily / name, mode, encoding="utf-8") as f:
+            for i in range(count):
+                f.write(json.dumps({
+                    "id": f"f-{days_ago}-{i}-{mode}", "type": "fact", "memory_type": "W",
+                    "content": f"day {days_ago} item {i}", "confidence": 0.9,
+                    "timestamp": (ts - timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                }, ensure_ascii=False) + "\n")
+            f.write(json.dumps({"id": f"log-{days_ago}", "type": "session_start",
+                                "timestamp": ts.strftime("%Y-%m-%dT%H:%M:%SZ")}) + "\n")
+        return name
+
+    def test_matches_full_read_and_reuses_unchanged_files(self):
+        for days_ago in (0, 1, 3, 5):
+            self._write_day(days_ago, 4)
+        expected = read_recent_facts_from_daily(str(self.daily))
+        self.assertTrue(expected)
+
+        self.assertEqual(facts_snapshot.load_recent_facts(str(self.memory_dir)), expected)
+        self.assertEqual(len(self.reads), 4)
+
+        self.reads.clear()
+        self.assertEqual(facts_snapshot.load_recent_facts(str(self.memory_dir)), expected)
+        self.assertEqual(self.reads, [])
+
+        today = self._write_day(0, 2, mode="a")
+        got = facts_snapshot.load_recent_facts(str(self.memory_dir))
+        self.assertEqual(self.reads, [today])
+        self.assertEqual(got, read_recent_facts_from_daily(str(self.daily)))
+        self.assertIn("f-0-0-a", [f["id"] for f in got])
+
+    def test_partial_day_keeps_oldest_per_day(self):
+        # 部分加载区间内的一天写 8 条（按时间追加）：与旧版全量读取一致，保留当天最早的 N 条
+        day = (self.now - timedelta(days=3)).replace(hour=12, minute=0, second=0, microsecond=0)
+        with open(self.daily / f"{day:%Y-%m-%d}.jsonl", "w", encoding="utf-8") as f:
+            for i in range(8):
+                f.write(json.dumps({
+                    "id": f"f{i}", "type": "fact", "memory_type": "W", "content": f"item {i}",
+                    "confidence": 0.5,
+                    "timestamp": (day + timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                }) + "\n")
+        expected = ["f0", "f1", "f2"]
+        self.assertEqual([f["id"] for f in read_recent_facts_from_daily(str(self.daily))], expected)
+        self.assertEqual([f["id"] for f in facts_snapshot.load_recent_facts(str(self.memory_dir))], expected)
+
+    def test_window_prunes_old_files(self):
+        old = self._write_day(60, 3)
+        recent = self._write_day(2, 3)
+        (self.daily / "notes.jsonl").write_text("", encoding="utf-8")
+        names = [os.path.basename(p) for p in daily_files_in_window(str(self.daily))]
+        self.assertNotIn(old, names)
+        self.assertIn(recent, names)
+        self.assertIn("notes.jsonl", names)
+
+        facts_snapshot.refresh_snapshot(str(self.memory_dir))
+        self.assertNotIn(old, self.reads)
+        with open(self.memory_dir / "recent_facts.json", encoding="utf-8") as f:
+            snap = json.load(f)
+        self.assertEqual(set(snap["files"]), {recent, "notes.jsonl"})
+
+    def test_corrupt_snapshot_is_rebuilt(self):
+        self._write_day(1, 2)
+        (self.memory_dir / "recent_facts.json").write_text("{broken", encoding="utf-8")
+        self.assertEqual(len(facts_snapshot.load_recent_facts(str(self.memory_dir))), 2)
+        self.reads.clear()
+        facts_snapshot.load_recent_facts(str(self.memory_dir))
+        self.assertEqual(self.reads, [])
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main(verbosity=2)
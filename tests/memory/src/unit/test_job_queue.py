@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""后台任务队列测试：去重、lane 内顺序、锁互斥、崩溃恢复、sessionEnd 异步同步。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import json
+import threading
+from unittest import mock
+
+from test_common import IsolatedWorkspaceCase, run_script
+from core.file_lock import FileLock
+from service.memory import job_queue
+from storage.sqlite_store import SQLiteStore
+
+
+class JobQueueTests(IsolatedWorkspaceCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        self.lock = threading.Lock()
+
+        def recorder(kind):
+            def handler(project_path, memory_dir, payload):
+                with self.lock:
+                    self.calls.append((kind, payload))
+                return kind
+            return handler
+
+        jobs = {kind: (lane, order, recorder(kind)) for kind, (lane, order, _) in job_queue.JOBS.items()}
+        patcher = mock.patch.dict(job_queue.JOBS, jobs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mdir = str(self.memory_dir)
+
+    def test_enqueue_dedups_by_key_and_lane_order(self):
+        for _ in range(5):
+            job_queue.enqueue(self.mdir, "sync_index")
+        job_queue.enqueue(self.mdir, "truncate_sessions")
+        job_queue.enqueue(self.mdir, "clean_logs", payload={"n": 1}, key="clean-a")
+        job_queue.enqueue(self.mdir, "clean_logs", payload={"n": 2}, key="clean-b")
+        self.assertEqual(len(job_queue.pending(self.mdir)), 4)
+        with self.assertRaises(ValueError):
+            job_queue.enqueue(self.mdir, "nope")
+
+        results = job_queue.drain(self.workspace, max_workers=2)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(r["ok"] for r in results))
+        kinds = [k for k, _ in self.calls]
+        self.assertEqual(kinds.count("sync_index"), 1)
+        self.assertLess(kinds.index("sync_index"), kinds.index("truncate_sessions"))
+        self.assertEqual(sorted(p["n"] for k, p in self.calls if k == "clean_logs"), [1, 2])
+        self.assertEqual(job_queue.pending(self.mdir) + job_queue.running(self.mdir), [])
+        self.assertTrue(job_queue.wait_idle(self.mdir, timeout=1))
+
+    def test_failed_job_is_reported_and_removed(self):
+        def boom(project_path, memory_dir, payload):
+            raise RuntimeError("boom")
+
+        job_queue.JOBS["refresh_snapshot"] = ("snapshot", 0, boom)
+        job_queue.enqueue(self.mdir, "refresh_snapshot")
+        job_queue.enqueue(self.mdir, "sync_index")
+        results = {r["kind"]: r for r in job_queue.drain(self.workspace)}
+        self.assertFalse(results["refresh_snapshot"]["ok"])
+        self.assertIn("boom", results["refresh_snapshot"]["error"])
+        self.assertTrue(results["sync_index"]["ok"])
+        self.assertEqual(job_queue.pending(self.mdir), [])
+
+    def test_lock_excludes_second_worker_and_recovers_crashed_jobs(self):
+        job_queue.enqueue(self.mdir, "sync_index")
+        lock = FileLock(os.path.join(job_queue.jobs_dir(self.mdir), job_queue.LOCK_NAME), timeout=0)
+        self.assertTrue(lock.acquire())
+        try:
+            self.assertIsNone(job_queue.run_pending(self.workspace))
+            self.assertEqual(job_queue.drain(self.workspace), [])
+        finally:
+            lock.release()
+        self.assertEqual(self.calls, [])
+
+        # 模拟 worker 在执行中崩溃：running 文件残留
+        path = job_queue.pending(self.mdir)[0]
+        os.replace(path, path + ".running")
+        self.assertFalse(job_queue.wait_idle(self.mdir, timeout=0.2))
+        results = job_queue.drain(self.workspace)
+        self.assertEqual([r["kind"] for r in results], ["sync_index"])
+        self.assertEqual(job_queue.running(self.mdir), [])
+
+    def test_wait_idle_waits_for_worker_lock_and_skips_missing_spool(self):
+        lock = FileLock(os.path.join(job_queue.jobs_dir(self.mdir), job_queue.LOCK_NAME), timeout=0)
+        self.assertTrue(lock.acquire())
+        try:
+            self.assertFalse(job_queue.wait_idle(self.mdir, timeout=0.2))  # 队列已空但 worker 未退出
+        finally:
+            lock.release()
+        self.assertTrue(job_queue.wait_idle(self.mdir, timeout=1))
+
+        gone = os.path.join(self.workspace, "deleted-project")
+        self.assertEqual(job_queue.run_pending(gone), [])
+        self.assertFalse(os.path.exists(gone))
+
+    def test_submit_inline_when_background_disabled(self):
+        with open(self.memory_dir / "config.json", "w", encoding="utf-8") as f:
+            json.dump({"jobs": {"background": False}}, f)
+        self.assertEqual(job_queue.submit(self.workspace, ["sync_index", "clean_logs"]), "inline")
+        self.assertEqual(sorted(k for k, _ in self.calls), ["clean_logs", "sync_index"])
+
+
+class SessionEndJobsTests(IsolatedWorkspaceCase):
+    def tearDown(self):
+        # 后台 worker 必须在删除工作区前退出，否则会在已删除的目录里留下锁文件
+        job_queue.wait_idle(str(self.memory_dir), timeout=120)
+        super().tearDown()
+
+    def test_session_end_syncs_index_in_background(self):
+        with open(self.memory_dir / "config.json", "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "jobs": {"background": True}}, f)
+        save = run_script(
+            "service/memory/save_fact.py", self.workspace,
+            args=["--project-path", self.workspace, "--content", "JOBQ_TOKEN 后台同步", "--type", "W"],
+        )
+        self.assertEqual(save.returncode, 0, msg=save.stderr)
+        event = json.dumps({"conversation_id": "jobq-1", "workspace_roots": [self.workspace],
+                            "reason": "completed"})
+        for _ in range(3):
+            end = run_script("service/hooks/sync_and_cleanup.py", self.workspace, stdin_data=event)
+            self.assertEqual(end.returncode, 0, msg=end.stderr)
+        self.assertTrue(job_queue.wait_idle(str(self.memory_dir), timeout=120))
+
+        store = SQLiteStore(str(self.memory_dir / "index.sqlite"))
+        try:
+            rows = store.conn.execute("SELECT COUNT(*) FROM chunks WHERE content LIKE '%JOBQ_TOKEN%'").fetchone()
+            self.assertEqual(rows[0], 1)
+        finally:
+            store.close()
+        self.assertTrue((self.memory_dir / "recent_facts.json").exists())
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main(verbosity=2)
@@ -6,13 +6,15 @@ import json
 import tempfile
 import shutil
 import unittest
+import unittest.mock
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "skills", "memory", "scripts"))
 
 from storage.jsonl_manage import (
     read_all_entries, filter_entries, soft_delete_entries,
-    restore_entries, purge_entries, count_by_type, write_audit_entry,
+    restore_entries, purge_entries, count_by_type, write_audit_entry, date_bounds,
 )
+from storage import jsonl as jsonl_mod
 
 
 def _write_jsonl(path, entries):
@@ -143,6 +145,37 @@ class JsonlManageTests(unittest.TestCase):
         self.assertEqual(len(with_deleted), 3)
         self.assertEqual(len(without_deleted), 2)
 
+    def test_date_range_skips_files_by_name(self):
+        _write_jsonl(os.path.join(self.daily_dir, "2026-01-01.jsonl"),
+                     [{"id": "old", "type": "fact", "content": "old", "timestamp": "2026-01-01T00:00:00Z"}])
+        _write_jsonl(os.path.join(self.daily_dir, "2026-02-20.jsonl"),
+                     [{"id": "late", "type": "fact", "content": "late", "timestamp": "2026-02-20T00:00:00Z"}])
+        opened = []
+        real = jsonl_mod.iter_jsonl
+
+        def tracking(path):
+            opened.append(os.path.basename(path))
+            return real(path)
+
+        with unittest.mock.patch.object(jsonl_mod, "iter_jsonl", tracking):
+            entries = read_all_entries(self.daily_dir, self.sessions_path, scope="daily",
+                                       date_from="2026-02-18", date_to="2026-02-18")
+        self.assertEqual(opened, ["2026-02-18.jsonl"])
+        self.assertEqual({e["id"] for e in entries}, {"f-1", "f-2", "f-3"})
+
+        # 文件名外的一天余量：相邻日期的文件会被读取，由 filter_entries 精确过滤
+        entries = read_all_entries(self.daily_dir, self.sessions_path, scope="daily", date_to="2026-02-19")
+        self.assertEqual({e["id"] for e in filter_entries(entries, date_to="2026-02-19")}, {"old", "f-1", "f-2", "f-3"})
+        facts = jsonl_mod.read_daily_facts(self.daily_dir, date_from="2026-02-19")
+        self.assertEqual([e["id"] for e in facts], ["late"])
+
+    def test_date_bounds_merges_filters(self):
+        self.assertEqual(date_bounds("2026-01-01", "2026-03-01", before="2026-02-01"), ("2026-01-01", "2026-02-01"))
+        self.assertEqual(date_bounds(), (None, None))
+        lo, hi = date_bounds("2000-01-01", days=3)
+        self.assertGreater(lo, "2000-01-01")
+        self.assertIsNone(hi)
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
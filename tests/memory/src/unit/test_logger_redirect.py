@@ -135,7 +135,7 @@ class TestRedirectToProject(_LoggerTestBase):
         logger_mod._LOG_DIR = initial_dir
 
         project_path = os.path.join(self.tmpdir, "project")
-        os.makedirs(project_path, exist_ok=True)
+        os.makedirs(os.path.join(project_path, ".cursor", "skills", "memory-data"), exist_ok=True)
 
         logger_mod.redirect_to_project(project_path)
 
@@ -143,6 +143,14 @@ class TestRedirectToProject(_LoggerTestBase):
         self.assertEqual(logger_mod._LOG_DIR, expected)
         self.assertTrue(os.path.isdir(expected))
 
+    def test_redirect_to_missing_data_dir_creates_nothing(self):
+        project_path = os.path.join(self.tmpdir, "deleted_project")
+        logger_mod.redirect_to_project(project_path)
+
+        log = logger_mod.get_logger("test_lr_missing_project")
+        log.warning("project gone")
+        self.assertFalse(os.path.exists(project_path))
+
     def test_redirect_noop_when_same_dir(self):
         project_path = os.path.join(self.tmpdir, "project")
         expected = os.path.join(project_path, ".cursor", "skills", "memory-data", "logs")
@@ -181,7 +189,7 @@ class TestRedirectToProject(_LoggerTestBase):
         self.assertEqual(len(wrong_files), 0, "No log file should be created before emit")
 
         project_path = os.path.join(self.tmpdir, "correct_project")
-        os.makedirs(project_path, exist_ok=True)
+        os.makedirs(os.path.join(project_path, ".cursor", "skills", "memory-data"), exist_ok=True)
         logger_mod.redirect_to_project(project_path)
 
         log = logger_mod.get_logger("test_lr_no_wrong_file")
@@ -318,8 +326,13 @@ class TestInitHookContext(_LoggerTestBase):
 
     def test_falls_back_to_cwd_when_no_roots(self):
         from service.config import init_hook_context
-        result = init_hook_context({})
-        self.assertEqual(result, os.getcwd())
+        old_cwd = os.getcwd()
+        try:
+            os.chdir(self.tmpdir)  # 回退到 cwd 时会初始化记忆目录，不能落在测试目录里
+            result = init_hook_context({})
+            self.assertEqual(result, os.getcwd())
+        finally:
+            os.chdir(old_cwd)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""常驻守护进程测试：JSON 协议、瘦客户端转发、回退、空闲退出、启动互斥、sync 不阻塞搜索。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+from test_common import IsolatedWorkspaceCase, run_script
+from service.memory import memory_daemon
+from service.memory.memory_daemon import MemoryDaemon, request, socket_path, lock_path
+from core.file_lock import FileLock
+
+
+@unittest.skipUnless(hasattr(memory_daemon.socket, "AF_UNIX"), "需要 Unix socket")
+class MemoryDaemonTests(IsolatedWorkspaceCase):
+    def setUp(self):
+        super().setUp()
+        save = run_script(
+            "service/memory/save_fact.py", self.workspace,
+            args=["--project-path", self.workspace, "--content", "DAEMON_TOKEN 使用 SQLite", "--type", "W"],
+        )
+        self.assertEqual(save.returncode, 0, msg=save.stderr)
+        self.memory_dir = str(self.memory_dir)
+
+    def _start(self, idle_timeout=None):
+        daemon = MemoryDaemon(self.workspace, idle_timeout)
+        thread = threading.Thread(target=daemon.serve, daemon=True)
+        thread.start()
+        deadline = time.time() + 10
+        while request(self.memory_dir, {"op": "ping"}, timeout=1.0) is None:
+            self.assertLess(time.time(), deadline, "守护进程未就绪")
+            time.sleep(0.05)
+        return daemon, thread
+
+    def test_protocol_and_thin_clients(self):
+        self.assertIsNone(request(self.memory_dir, {"op": "ping"}))
+        daemon, thread = self._start()
+        try:
+            self.assertEqual(request(self.memory_dir, {"op": "ping"})["pid"], os.getpid())
+            self.assertGreater(request(self.memory_dir, {"op": "sync"})["total"], 0)
+
+            result = request(self.memory_dir, {"op": "search", "query": "DAEMON_TOKEN", "method": "fts"})
+            self.assertEqual(result["method"], "fts")
+            self.assertEqual(result["total"], 1)
+
+            # 后台任务交给守护进程线程消费
+            from service.memory import job_queue
+            job_queue.enqueue(self.memory_dir, "refresh_snapshot")
+            self.assertTrue(request(self.memory_dir, {"op": "jobs"})["started"])
+            self.assertTrue(job_queue.wait_idle(self.memory_dir, timeout=30))
+            self.assertTrue(os.path.exists(os.path.join(self.memory_dir, "recent_facts.json")))
+
+            embedded = request(self.memory_dir, {"op": "embed", "texts": ["a", "b"]})
+            self.assertEqual(len(embedded["vectors"]), 2)
+            self.assertIsNone(request(self.memory_dir, {"op": "nope"}))
+
+            # CLI 脚本转发给守护进程，输出与进程内执行一致；重复查询命中结果缓存
+            via_daemon = run_script(
+                "service/memory/search_memory.py", self.workspace,
+                args=["DAEMON_TOKEN", "--method", "fts", "--project-path", self.workspace],
+            )
+            self.assertEqual(via_daemon.returncode, 0, msg=via_daemon.stderr)
+            output = json.loads(via_daemon.stdout)
+            self.assertEqual(output.pop("cache"), {"hit": True, "hits": 1, "misses": 1})
+            self.assertFalse(result.pop("cache")["hit"])
+            self.assertEqual(output, result)
+
+            sync = run_script("service/memory/sync_index.py", self.workspace,
+                              args=["--rebuild", "--project-path", self.workspace])
+            self.assertEqual(sync.returncode, 0, msg=sync.stderr)
+            again = request(self.memory_dir, {"op": "search", "query": "DAEMON_TOKEN", "method": "fts"})
+            self.assertEqual(again["total"], 1)
+            self.assertFalse(again["cache"]["hit"])
+        finally:
+            request(self.memory_dir, {"op": "shutdown"})
+            thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(os.path.exists(socket_path(self.memory_dir)))
+
+        # 守护进程退出后回退进程内执行
+        local = run_script(
+            "service/memory/search_memory.py", self.workspace,
+            args=["DAEMON_TOKEN", "--method", "fts", "--project-path", self.workspace],
+        )
+        output = json.loads(local.stdout)
+        self.assertTrue(output.pop("cache")["hit"])  # 结果缓存存于 index.sqlite，进程内执行同样命中
+        self.assertEqual(output, result)
+
+    def test_idle_timeout_and_stale_socket(self):
+        path = socket_path(self.memory_dir)
+        open(path, "w").close()  # 崩溃残留的 socket 文件
+        self.assertIsNone(request(self.memory_dir, {"op": "ping"}))
+
+        daemon, thread = self._start(idle_timeout=1)
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(os.path.exists(path))
+
+    def test_startup_lock_keeps_socket_of_starting_daemon(self):
+        path = socket_path(self.memory_dir)
+        open(path, "w").close()  # 另一个守护进程已持锁、尚未开始 accept
+        holder = FileLock(lock_path(self.memory_dir), timeout=0)
+        self.assertTrue(holder.acquire())
+        try:
+            self.assertFalse(MemoryDaemon(self.workspace).serve())
+            self.assertTrue(os.path.exists(path))
+        finally:
+            holder.release()
+
+        daemon, thread = self._start()
+        try:
+            self.assertFalse(MemoryDaemon(self.workspace).serve())
+            self.assertIsNotNone(request(self.memory_dir, {"op": "ping"}))
+        finally:
+            request(self.memory_dir, {"op": "shutdown"})
+            thread.join(timeout=10)
+        self.assertTrue(FileLock(lock_path(self.memory_dir), timeout=0).acquire())
+
+    def test_sync_runs_off_the_serving_thread(self):
+        from service.memory import sync_index
+
+        release = threading.Event()
+        real_sync = sync_index.sync_all
+
+        def slow_sync(*args, **kwargs):
+            release.wait(10)
+            return real_sync(*args, **kwargs)
+
+        daemon, thread = self._start()
+        try:
+            self.assertIsNotNone(request(self.memory_dir, {"op": "sync"}))
+            with mock.patch.object(sync_index, "sync_all", side_effect=slow_sync):
+                synced = []
+                client = threading.Thread(
+                    target=lambda: synced.append(request(self.memory_dir, {"op": "sync"}, timeout=30)))
+                client.start()
+                # sync 阻塞期间搜索照常返回
+                t0 = time.time()
+                result = request(self.memory_dir, {"op": "search", "query": "DAEMON_TOKEN", "method": "fts"},
+                                 timeout=5)
+                self.assertLess(time.time() - t0, 5)
+                self.assertIsNotNone(result)
+                self.assertTrue(client.is_alive())
+                release.set()
+                client.join(timeout=30)
+            self.assertEqual(synced, [{"total": 0}])
+        finally:
+            release.set()
+            request(self.memory_dir, {"op": "shutdown"})
+            thread.join(timeout=10)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""检索结果缓存测试：重复查询命中且不生成查询向量、索引版本变化后失效、规范化与容量淘汰。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import json
+from unittest import mock
+
+from test_common import IsolatedWorkspaceCase
+from service.config import Config
+from service.memory import search_memory
+from service.memory.sync_index import sync_all
+from storage.jsonl_manage import soft_delete_entries
+from storage.sqlite_store import SQLiteStore
+
+
+class _Cfg:
+    """覆盖部分配置项的 Config 包装"""
+
+    def __init__(self, base, **overrides):
+        self.base = base
+        self.overrides = overrides
+
+    def get(self, key):
+        return self.overrides[key] if key in self.overrides else self.base.get(key)
+
+
+class QueryCacheTests(IsolatedWorkspaceCase):
+    def setUp(self):
+        super().setUp()
+        self.mdir = str(self.memory_dir)
+        self.daily = os.path.join(self.mdir, "daily", "2026-03-01.jsonl")
+        self._append({"id": "q-1", "type": "fact", "memory_type": "W", "content": "缓存测试 CACHETOKEN 第一条",
+                      "timestamp": "2026-03-01T00:00:00Z"})
+        sync_all(self.mdir)
+        self.cfg = Config(self.workspace)
+        self.store = SQLiteStore(os.path.join(self.mdir, "index.sqlite"))
+        self.addCleanup(self.store.close)
+
+    def _append(self, entry):
+        os.makedirs(os.path.dirname(self.daily), exist_ok=True)
+        with open(self.daily, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _search(self, query, cfg=None, **kwargs):
+        return search_memory.run_search(self.store, self.mdir, cfg or self.cfg, query, **kwargs)
+
+    def test_repeat_query_skips_embedding_and_scoring(self):
+        with mock.patch.object(search_memory, "embed_query", return_value=None) as embed:
+            first = self._search("CACHETOKEN", method="vector")
+            self.assertEqual(embed.call_count, 1)
+        # 模型不可用时的降级结果不缓存
+        self.assertEqual(first["cache"], {"hit": False, "hits": 0, "misses": 1})
+
+        first = self._search("CACHETOKEN", method="fts")
+        with mock.patch.object(search_memory, "embed_query") as embed, \
+                mock.patch.object(SQLiteStore, "search_fts") as fts:
+            again = self._search("  cachetoken ", method="fts")
+            embed.assert_not_called()
+            fts.assert_not_called()
+        self.assertEqual(again["cache"], {"hit": True, "hits": 1, "misses": 2})
+        self.assertEqual(again["results"], first["results"])
+
+        # 参数不同不共享缓存
+        self.assertFalse(self._search("CACHETOKEN", method="fts", max_results=3)["cache"]["hit"])
+
+    def test_index_changes_invalidate_cache(self):
+        self.assertEqual(self._search("CACHETOKEN", method="fts")["total"], 1)
+        generation = self.store.generation()
+
+        self._append({"id": "q-2", "type": "fact", "memory_type": "W", "content": "CACHETOKEN 第二条",
+                      "timestamp": "2026-03-01T00:00:01Z"})
+        sync_all(self.mdir)
+        self.assertGreater(self.store.generation(), generation)
+        result = self._search("CACHETOKEN", method="fts")
+        self.assertFalse(result["cache"]["hit"])
+        self.assertEqual(result["total"], 2)
+
+        # 管理命令删除条目同样使缓存失效
+        soft_delete_entries(os.path.dirname(self.daily), os.path.join(self.mdir, "sessions.jsonl"), {"q-1"})
+        result = self._search("CACHETOKEN", method="fts")
+        self.assertFalse(result["cache"]["hit"])
+        self.assertEqual([r["id"] for r in result["results"]], ["q-2"])
+
+        # 文件未变化的同步不递增版本（先消化管理命令改写后的整文件重读）
+        sync_all(self.mdir)
+        self._search("CACHETOKEN", method="fts")
+        generation = self.store.generation()
+        sync_all(self.mdir)
+        self.assertEqual(self.store.generation(), generation)
+        self.assertTrue(self._search("CACHETOKEN", method="fts")["cache"]["hit"])
+
+    def test_capacity_and_disable(self):
+        small = _Cfg(self.cfg, **{"search.cache_max_entries": 2})
+        for q in ("第一条", "缓存测试", "CACHETOKEN"):
+            self._search(q, cfg=small, method="fts")
+        self.assertEqual(self.store.conn.execute("SELECT COUNT(*) FROM query_cache").fetchone()[0], 2)
+        self.assertFalse(self._search("第一条", cfg=small, method="fts")["cache"]["hit"])
+        self.assertTrue(self._search("CACHETOKEN", cfg=small, method="fts")["cache"]["hit"])
+
+        off = _Cfg(self.cfg, **{"search.cache_max_entries": 0})
+        self._search("CACHETOKEN", cfg=off, method="fts")
+        self.assertEqual(self._search("CACHETOKEN", cfg=off, method="fts")["cache"],
+                         {"hit": False, "hits": 0, "misses": 0})
+
+    def test_locked_index_does_not_block_search(self):
+        import sqlite3
+        import time
+
+        first = self._search("CACHETOKEN", method="fts")
+        writer = sqlite3.connect(os.path.join(self.mdir, "index.sqlite"), isolation_level=None)
+        self.addCleanup(writer.close)
+        writer.execute("BEGIN IMMEDIATE")  # 模拟同步持有写锁
+        try:
+            started = time.monotonic()
+            hit = self._search("CACHETOKEN", method="fts")
+            miss = self._search("第一条", method="fts")
+            self.assertLess(time.monotonic() - started, 1.0)
+        finally:
+            writer.execute("ROLLBACK")
+        self.assertTrue(hit["cache"]["hit"])
+        self.assertEqual(hit["results"], first["results"])
+        self.assertEqual(miss["total"], 1)
+        self.assertNotEqual(self.store.conn.execute("PRAGMA busy_timeout").fetchone()[0], 0)
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main(verbosity=2)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""会话摘要分段存储测试：封存、按段淘汰、反向查找最后一条、兼容读取与管理命令。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import json
+
+from test_common import IsolatedWorkspaceCase
+from storage import session_log
+from storage.jsonl import read_jsonl, read_last_entry, iter_jsonl_reversed
+from storage.jsonl_manage import read_all_entries, soft_delete_entries, purge_entries
+
+
+class SessionLogTests(IsolatedWorkspaceCase):
+    def setUp(self):
+        super().setUp()
+        self.mdir = str(self.memory_dir)
+        self.sessions_path = os.path.join(self.mdir, "sessions.jsonl")
+
+    def _append(self, start, count, segment_entries=5):
+        for i in range(start, start + count):
+            session_log.append_session(self.mdir, {
+                "id": f"sum-{i}", "session_id": f"s-{i}", "topic": f"话题{i}",
+                "summary": f"摘要 {i}", "timestamp": f"2026-03-{1 + i // 5:02d}T00:00:{i % 60:02d}Z",
+            }, segment_entries)
+
+    def test_append_seals_full_segments_without_rewrite(self):
+        self._append(0, 12)
+        segments = session_log.sealed_segments(self.mdir)
+        self.assertEqual([os.path.basename(p) for p in segments], ["seg-000001.jsonl", "seg-000002.jsonl"])
+        self.assertEqual([e["id"] for e in read_jsonl(segments[0])], [f"sum-{i}" for i in range(5)])
+        self.assertEqual(len(read_jsonl(self.sessions_path)), 2)
+        self.assertEqual([e["id"] for e in session_log.read_sessions(self.mdir)], [f"sum-{i}" for i in range(12)])
+        self.assertEqual(session_log.count_sessions(self.mdir), 12)
+
+        stats = session_log.segment_stats(self.mdir)
+        self.assertEqual([s["entries"] for s in stats], [5, 5])
+        self.assertEqual(stats[1]["first_ts"], "2026-03-02T00:00:05Z")
+
+    def test_retention_drops_whole_segments(self):
+        self._append(0, 23)
+        inode = os.stat(session_log.sealed_segments(self.mdir)[-1]).st_ino
+        removed = session_log.enforce_retention(self.mdir, keep_last=10)
+        self.assertEqual(removed, 10)
+        ids = [e["id"] for e in session_log.read_sessions(self.mdir)]
+        self.assertEqual(ids, [f"sum-{i}" for i in range(10, 23)])
+        # 保留下来的段原样保留，没有被重写
+        self.assertEqual(os.stat(session_log.sealed_segments(self.mdir)[-1]).st_ino, inode)
+        self.assertEqual(session_log.enforce_retention(self.mdir, keep_last=10), 0)
+
+    def test_retention_removes_dropped_segments_from_index(self):
+        from service.memory.sync_index import sync_all
+        from storage.sqlite_store import SQLiteStore
+
+        self._append(0, 23)
+        sync_all(self.mdir)
+        store = SQLiteStore(os.path.join(self.mdir, "index.sqlite"))
+        self.addCleanup(store.close)
+        summaries = lambda: {r["id"] for r in store.search_fts("摘要", limit=50) if r["id"].startswith("sum-")}
+        self.assertEqual(summaries(), {f"sum-{i}" for i in range(23)})
+
+        self.assertEqual(session_log.enforce_retention(self.mdir, keep_last=10), 10)
+        self.assertEqual(summaries(), {f"sum-{i}" for i in range(10, 23)})
+        self.assertIsNone(store.get_sync_state("sessions/seg-000001.jsonl"))
+        # 之后的增量同步不会把已淘汰的摘要加回来
+        sync_all(self.mdir)
+        self.assertEqual(summaries(), {f"sum-{i}" for i in range(10, 23)})
+
+    def test_last_session_skips_deleted_and_falls_back_to_sealed(self):
+        self.assertIsNone(session_log.last_session(self.mdir))
+        self._append(0, 6)
+        self.assertEqual(session_log.last_session(self.mdir)["id"], "sum-5")
+        soft_delete_entries(os.path.join(self.mdir, "daily"), self.sessions_path, {"sum-5"})
+        self.assertEqual(session_log.last_session(self.mdir)["id"], "sum-4")
+
+    def test_read_last_entry_reverse_seek_matches_forward_scan(self):
+        path = os.path.join(self.mdir, "big.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(2000):
+                f.write(json.dumps({"id": f"e-{i}", "content": "长文本" * (i % 50)}, ensure_ascii=False) + "\n")
+            f.write(json.dumps({"id": "gone", "deleted_at": "2026-03-01T00:00:00Z"}) + "\n")
+            f.write("{broken\n\n")
+        self.assertEqual(read_last_entry(path)["id"], "e-1999")
+        # 块边界落在多字节字符和行中间时，倒序结果与正向读取一致
+        self.assertEqual(list(iter_jsonl_reversed(path, block_size=7)), list(reversed(read_jsonl(path))))
+
+    def test_manage_reads_and_purges_across_segments(self):
+        self._append(0, 8)
+        daily_dir = os.path.join(self.mdir, "daily")
+        entries = read_all_entries(daily_dir, self.sessions_path, scope="sessions")
+        self.assertEqual(len(entries), 8)
+        self.assertEqual(entries[0]["_source_file"], "sessions/seg-000001.jsonl")
+        self.assertEqual(entries[-1]["_source_file"], "sessions.jsonl")
+        self.assertEqual(session_log.resolve_source(self.mdir, "sessions/seg-000001.jsonl"),
+                         session_log.sealed_segments(self.mdir)[0])
+        self.assertIsNone(session_log.resolve_source(self.mdir, "2026-03-01.jsonl"))
+
+        late = read_all_entries(daily_dir, self.sessions_path, scope="sessions", date_from="2026-03-02")
+        self.assertEqual([e["id"] for e in late], ["sum-5", "sum-6", "sum-7"])
+
+        result = purge_entries(daily_dir, self.sessions_path, {"sum-1", "sum-6"})
+        self.assertEqual(result["purged"], 2)
+        self.assertEqual(sorted(result["affected_files"]), ["sessions.jsonl", "sessions/seg-000001.jsonl"])
+        self.assertEqual(session_log.count_sessions(self.mdir), 6)
+
+    def test_legacy_file_is_split_on_rotate(self):
+        with open(self.sessions_path, "w", encoding="utf-8") as f:
+            for i in range(12):
+                f.write(json.dumps({"id": f"old-{i}", "timestamp": "2026-01-01T00:00:00Z"}) + "\n")
+        self.assertEqual(session_log.rotate(self.mdir, segment_entries=5), 2)
+        self.assertEqual([e["id"] for e in read_jsonl(self.sessions_path)], ["old-10", "old-11"])
+        self.assertEqual([e["id"] for e in session_log.read_sessions(self.mdir)], [f"old-{i}" for i in range(12)])
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main(verbosity=2)
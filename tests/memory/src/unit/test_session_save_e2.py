@@ -14,6 +14,7 @@ sys.path.insert(0, str(SCRIPTS_DIR))
 
 from service.config import SESSIONS_FILE
 from core.utils import iso_now, today_str, ts_id, utcnow
+from service.memory.session_state import read_session_state, update_session_state, mark_summary_saved
 
 
 class TestSaveFactTypeS(IsolatedWorkspaceCase):
@@ -54,9 +55,7 @@ class TestSaveFactTypeS(IsolatedWorkspaceCase):
             ],
         )
 
-        state_path = self.memory_dir / "session_state" / "test-conv-002.json"
-        self.assertTrue(state_path.exists())
-        state = json.loads(state_path.read_text(encoding="utf-8"))
+        state = read_session_state(str(self.memory_dir), "test-conv-002")
         self.assertEqual(state["fact_count"], 1)
 
     def test_save_fact_type_s_updates_stage_count(self):
@@ -71,8 +70,7 @@ class TestSaveFactTypeS(IsolatedWorkspaceCase):
             ],
         )
 
-        state_path = self.memory_dir / "session_state" / "test-conv-003.json"
-        state = json.loads(state_path.read_text(encoding="utf-8"))
+        state = read_session_state(str(self.memory_dir), "test-conv-003")
         self.assertEqual(state.get("stage_summary_count"), 1)
         self.assertEqual(state.get("fact_count", 0), 0)
 
@@ -254,6 +252,29 @@ class TestAutoGenerateSummary(IsolatedWorkspaceCase):
         sessions_path = self.memory_dir / "sessions.jsonl"
         self.assertFalse(sessions_path.exists())
 
+    def test_lock_timeout_skips_without_raising(self):
+        from unittest import mock
+        from core.file_lock import FileLock
+        from service.hooks import sync_and_cleanup
+        from storage.session_log import sessions_lock_path
+
+        daily_file = self.memory_dir / "daily" / f"{today_str()}.jsonl"
+        daily_file.write_text(json.dumps({"id": "f1", "type": "fact", "content": "锁超时",
+                                          "source": {"session": "busy-conv"}, "timestamp": iso_now()},
+                                         ensure_ascii=False) + "\n", encoding="utf-8")
+        holder = FileLock(sessions_lock_path(str(self.memory_dir)), timeout=0)
+        self.assertTrue(holder.acquire())  # 另一个写入方长时间持锁
+        try:
+            with mock.patch.object(sync_and_cleanup, "FileLock",
+                                   lambda path, timeout: FileLock(path, timeout=0.1)):
+                sync_and_cleanup.truncate_sessions(str(self.memory_dir))
+                sync_and_cleanup.auto_generate_summary(str(self.memory_dir), {"conversation_id": "busy-conv"})
+        finally:
+            holder.release()
+
+        self.assertFalse((self.memory_dir / "sessions.jsonl").exists())
+        self.assertEqual(read_session_state(str(self.memory_dir), "busy-conv"), {})
+
     def test_skips_when_no_facts(self):
         from service.hooks.sync_and_cleanup import auto_generate_summary
 
@@ -300,13 +321,15 @@ class TestTruncateSessions(IsolatedWorkspaceCase):
                 entry = {"id": f"sum-{i}", "topic": f"话题{i}", "timestamp": iso_now()}
                 f.write(json.dumps(entry, ensure_ascii=False) + "\n")
 
-        truncate_sessions(str(self.memory_dir), keep_last=10)
+        # 旧版单文件先按段切分，再整段淘汰最旧的封存段
+        truncate_sessions(str(self.memory_dir), keep_last=10, segment_entries=5)
 
-        from storage.jsonl import read_jsonl
-        entries = read_jsonl(str(sessions_path))
+        from storage.session_log import read_sessions, sealed_segments
+        entries = read_sessions(str(self.memory_dir))
         self.assertEqual(len(entries), 10)
         self.assertEqual(entries[0]["id"], "sum-10")
         self.assertEqual(entries[-1]["id"], "sum-19")
+        self.assertEqual(len(sealed_segments(str(self.memory_dir))), 1)
 
     def test_noop_when_under_limit(self):
         from service.hooks.sync_and_cleanup import truncate_sessions
@@ -331,58 +354,43 @@ class TestTruncateSessions(IsolatedWorkspaceCase):
 class TestCleanOldSessionStates(IsolatedWorkspaceCase):
     """sync_and_cleanup.py 的 clean_old_session_states 测试"""
 
-    def test_removes_old_state_files(self):
+    def test_removes_old_states(self):
         from service.hooks.sync_and_cleanup import clean_old_session_states
 
-        state_dir = self.memory_dir / "session_state"
-        state_dir.mkdir(parents=True, exist_ok=True)
-
         old_time = (utcnow() - timedelta(days=10)).strftime("%Y-%m-%dT%H:%M:%SZ")
-        (state_dir / "old-session.json").write_text(
-            json.dumps({"session_id": "old", "created_at": old_time}),
-            encoding="utf-8",
-        )
-
-        recent_time = iso_now()
-        (state_dir / "recent-session.json").write_text(
-            json.dumps({"session_id": "recent", "created_at": recent_time}),
-            encoding="utf-8",
-        )
+        update_session_state(str(self.memory_dir), "old-session", {"created_at": old_time})
+        mark_summary_saved(str(self.memory_dir), "recent-session", "layer1_rules")
 
         clean_old_session_states(str(self.memory_dir), retain_days=7)
 
-        self.assertFalse((state_dir / "old-session.json").exists())
-        self.assertTrue((state_dir / "recent-session.json").exists())
+        self.assertEqual(read_session_state(str(self.memory_dir), "old-session"), {})
+        self.assertTrue(read_session_state(str(self.memory_dir), "recent-session")["summary_saved"])
 
-    def test_noop_when_no_state_dir(self):
-        from service.hooks.sync_and_cleanup import clean_old_session_states
-        clean_old_session_states(str(self.memory_dir), retain_days=7)
-
-    def test_cleans_orphan_lock_files(self):
+    def test_noop_when_no_state(self):
         from service.hooks.sync_and_cleanup import clean_old_session_states
-
-        state_dir = self.memory_dir / "session_state"
-        state_dir.mkdir(parents=True, exist_ok=True)
-        (state_dir / ".some-lock.lock").write_text("lock", encoding="utf-8")
-
         clean_old_session_states(str(self.memory_dir), retain_days=7)
-        self.assertFalse((state_dir / ".some-lock.lock").exists())
+        self.assertFalse((self.memory_dir / "session_state.sqlite").exists())
 
-    def test_keeps_lock_for_active_session(self):
+    def test_migrates_legacy_state_dir(self):
         from service.hooks.sync_and_cleanup import clean_old_session_states
 
         state_dir = self.memory_dir / "session_state"
         state_dir.mkdir(parents=True, exist_ok=True)
-        recent_time = iso_now()
+        old_time = (utcnow() - timedelta(days=10)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        (state_dir / "old-session.json").write_text(
+            json.dumps({"session_id": "old", "created_at": old_time}), encoding="utf-8",
+        )
         (state_dir / "active-session.json").write_text(
-            json.dumps({"session_id": "active", "created_at": recent_time}),
-            encoding="utf-8",
+            json.dumps({"session_id": "active", "created_at": iso_now(), "fact_count": 4}), encoding="utf-8",
         )
         (state_dir / ".active-session.lock").write_text("lock", encoding="utf-8")
+        (state_dir / ".orphan.lock").write_text("lock", encoding="utf-8")
 
         clean_old_session_states(str(self.memory_dir), retain_days=7)
-        self.assertTrue((state_dir / "active-session.json").exists())
-        self.assertTrue((state_dir / ".active-session.lock").exists())
+
+        self.assertFalse(state_dir.exists())
+        self.assertEqual(read_session_state(str(self.memory_dir), "old-session"), {})
+        self.assertEqual(read_session_state(str(self.memory_dir), "active-session")["fact_count"], 4)
 
 
 class TestLogSessionMetrics(IsolatedWorkspaceCase):
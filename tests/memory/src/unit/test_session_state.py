@@ -18,7 +18,7 @@ from service.memory.session_state import (
     update_fact_count,
     save_summary_atomic,
     SaveResult,
-    _state_path,
+    delete_states_before,
     _sessions_lock_path,
 )
 
@@ -28,6 +28,8 @@ class TestReadSessionState(IsolatedWorkspaceCase):
     def test_returns_empty_dict_when_no_file(self):
         state = read_session_state(str(self.memory_dir), "nonexistent-session")
         self.assertEqual(state, {})
+        self.assertFalse(is_summary_saved(str(self.memory_dir), "nonexistent-session"))
+        self.assertFalse((self.memory_dir / "session_state.sqlite").exists())
 
     def test_reads_existing_state_file(self):
         state_dir = self.memory_dir / "session_state"
@@ -83,10 +85,7 @@ class TestMarkSummarySaved(IsolatedWorkspaceCase):
     def test_creates_state_file(self):
         mark_summary_saved(str(self.memory_dir), "new-session", "layer1_rules")
 
-        state_path = self.memory_dir / "session_state" / "new-session.json"
-        self.assertTrue(state_path.exists())
-
-        state = json.loads(state_path.read_text(encoding="utf-8"))
+        state = read_session_state(str(self.memory_dir), "new-session")
         self.assertTrue(state["summary_saved"])
         self.assertEqual(state["summary_source"], "layer1_rules")
         self.assertEqual(state["session_id"], "new-session")
@@ -106,7 +105,7 @@ class TestMarkSummarySaved(IsolatedWorkspaceCase):
 
         mark_summary_saved(str(self.memory_dir), "existing-session", "layer4_stop")
 
-        state = json.loads((state_dir / "existing-session.json").read_text(encoding="utf-8"))
+        state = read_session_state(str(self.memory_dir), "existing-session")
         self.assertTrue(state["summary_saved"])
         self.assertEqual(state["summary_source"], "layer4_stop")
         self.assertEqual(state["fact_count"], 5)
@@ -117,16 +116,14 @@ class TestUpdateFactCount(IsolatedWorkspaceCase):
     def test_creates_state_and_increments_fact_count(self):
         update_fact_count(str(self.memory_dir), "fact-session", "W")
 
-        state_path = self.memory_dir / "session_state" / "fact-session.json"
-        state = json.loads(state_path.read_text(encoding="utf-8"))
+        state = read_session_state(str(self.memory_dir), "fact-session")
         self.assertEqual(state["fact_count"], 1)
         self.assertFalse(state["summary_saved"])
 
     def test_increments_stage_summary_count_for_type_s(self):
         update_fact_count(str(self.memory_dir), "stage-session", "S")
 
-        state_path = self.memory_dir / "session_state" / "stage-session.json"
-        state = json.loads(state_path.read_text(encoding="utf-8"))
+        state = read_session_state(str(self.memory_dir), "stage-session")
         self.assertEqual(state.get("stage_summary_count"), 1)
         self.assertEqual(state.get("fact_count", 0), 0)
 
@@ -136,16 +133,13 @@ class TestUpdateFactCount(IsolatedWorkspaceCase):
         update_fact_count(str(self.memory_dir), sid, "W")
         update_fact_count(str(self.memory_dir), sid, "S")
 
-        state_path = self.memory_dir / "session_state" / f"{sid}.json"
-        state = json.loads(state_path.read_text(encoding="utf-8"))
+        state = read_session_state(str(self.memory_dir), sid)
         self.assertEqual(state["fact_count"], 2)
         self.assertEqual(state["stage_summary_count"], 1)
 
     def test_noop_when_no_session_id(self):
         update_fact_count(str(self.memory_dir), "", "W")
-        state_dir = self.memory_dir / "session_state"
-        if state_dir.exists():
-            self.assertEqual(len(list(state_dir.glob("*.json"))), 0)
+        self.assertEqual(read_session_state(str(self.memory_dir), ""), {})
 
 
 class TestSaveSummaryAtomic(IsolatedWorkspaceCase):
@@ -207,6 +201,20 @@ class TestSaveSummaryAtomic(IsolatedWorkspaceCase):
         self.assertEqual(r2.status, SaveResult.EXISTS)
         self.assertEqual(len(written), 1)
 
+    def test_non_lock_operational_error_is_io_error(self):
+        import sqlite3
+        from unittest import mock
+
+        with mock.patch("service.memory.session_state._connect",
+                        side_effect=sqlite3.OperationalError("disk I/O error")):
+            r = save_summary_atomic(str(self.memory_dir), "io-session", "layer1_rules", lambda: None)
+        self.assertTrue(r.reason.startswith("io_error"), r.reason)
+
+        with mock.patch("service.memory.session_state._connect",
+                        side_effect=sqlite3.OperationalError("database is locked")):
+            r = save_summary_atomic(str(self.memory_dir), "io-session", "layer1_rules", lambda: None)
+        self.assertTrue(r.reason.startswith("lock_timeout"), r.reason)
+
     def test_result_to_dict(self):
         r = SaveResult(SaveResult.ERROR, "lock_timeout: test")
         d = r.to_dict()
@@ -214,5 +222,46 @@ class TestSaveSummaryAtomic(IsolatedWorkspaceCase):
         self.assertEqual(d["reason"], "lock_timeout: test")
 
 
+class TestSqliteStore(IsolatedWorkspaceCase):
+
+    def test_concurrent_increments_are_not_lost(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        sid = "busy-session"
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: update_fact_count(str(self.memory_dir), sid, "S" if i % 4 == 0 else "W"),
+                          range(40)))
+
+        state = read_session_state(str(self.memory_dir), sid)
+        self.assertEqual(state["fact_count"], 30)
+        self.assertEqual(state["stage_summary_count"], 10)
+        self.assertFalse((self.memory_dir / "session_state").exists())
+
+    def test_delete_states_before_uses_created_at(self):
+        mark_summary_saved(str(self.memory_dir), "recent", "layer1_rules")
+        state_dir = self.memory_dir / "session_state"
+        state_dir.mkdir(parents=True, exist_ok=True)
+        (state_dir / "old.json").write_text(json.dumps({"created_at": "2026-01-01T00:00:00Z"}), encoding="utf-8")
+        (state_dir / "undated.json").write_text(json.dumps({"fact_count": 2}), encoding="utf-8")
+        (state_dir / ".old.lock").write_text("", encoding="utf-8")
+
+        self.assertEqual(delete_states_before(str(self.memory_dir), "2026-02-01T00:00:00Z"), 2)
+        self.assertFalse(state_dir.exists())
+        self.assertTrue(is_summary_saved(str(self.memory_dir), "recent"))
+        self.assertEqual(read_session_state(str(self.memory_dir), "old"), {})
+
+    def test_extra_fields_round_trip(self):
+        from service.memory.session_state import update_session_state
+
+        update_fact_count(str(self.memory_dir), "extra-session", "W")
+        update_session_state(str(self.memory_dir), "extra-session", {"distilled": True, "tags": ["a"]})
+        update_fact_count(str(self.memory_dir), "extra-session", "W")
+
+        state = read_session_state(str(self.memory_dir), "extra-session")
+        self.assertEqual(state["fact_count"], 2)
+        self.assertTrue(state["distilled"])
+        self.assertEqual(state["tags"], ["a"])
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -33,6 +33,37 @@ class DetailSqliteTests(IsolatedWorkspaceCase):
         finally:
             store.close()
 
+    def test_bulk_upsert_wal_and_rollback(self):
+        db_path = Path(self.workspace) / "bulk.sqlite"
+        store = SQLiteStore(str(db_path))
+        reader = SQLiteStore(str(db_path))
+        try:
+            self.assertEqual(store.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            rows = [
+                {"chunk_id": f"b{i}", "content": f"bulk token{i}", "chunk_type": "fact",
+                 "timestamp": "2026-02-19T00:00:00Z", "embedding": [1.0, float(i)]}
+                for i in range(200)
+            ]
+            self.assertEqual(store.upsert_chunks(iter(rows)), 200)
+            self.assertEqual(store.upsert_chunks([]), 0)
+            self.assertEqual(reader.count_chunks(), 200)
+            self.assertEqual(len(reader.search_fts("token7", limit=5)), 1)
+
+            # 写事务未提交时读连接不被阻塞，看到的是提交前的快照
+            with store.transaction():
+                store.upsert_chunks([{"chunk_id": "x", "content": "pending"}])
+                self.assertEqual(reader.count_chunks(), 200)
+            self.assertEqual(reader.count_chunks(), 201)
+
+            with self.assertRaises(RuntimeError):
+                with store.transaction():
+                    store.upsert_chunks([{"chunk_id": "y", "content": "rolled back"}])
+                    raise RuntimeError("abort")
+            self.assertEqual(store.count_chunks(), 201)
+        finally:
+            reader.close()
+            store.close()
+
     def test_cosine_similarity_edges(self):
         self.assertAlmostEqual(cosine_similarity([1, 0, 0], [1, 0, 0]), 1.0, places=3)
         self.assertAlmostEqual(cosine_similarity([1, 0, 0], [0, 1, 0]), 0.0, places=3)
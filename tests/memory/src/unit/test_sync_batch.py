@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""sync_index 批量嵌入测试：跨文件攒批、单事务提交、失败回滚。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import json
+from unittest import mock
+
+from test_common import IsolatedWorkspaceCase
+from service.memory import sync_index
+from storage.sqlite_store import SQLiteStore
+
+
+def _write_daily(memory_dir, day, n):
+    path = memory_dir / "daily" / f"{day}.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({
+                "id": f"{day}-{i}", "type": "fact", "content": f"{day} fact {i}",
+                "timestamp": f"{day}T00:00:{i:02d}Z",
+            }, ensure_ascii=False) + "\n")
+
+
+class SyncBatchEmbeddingTests(IsolatedWorkspaceCase):
+    def _sync(self, calls, fail_on=None):
+        def fake_embed_func(model_name=None, batch_size=32, cache=None):
+            def embed(texts):
+                calls.append(len(texts))
+                if fail_on is not None and len(calls) == fail_on:
+                    raise RuntimeError("boom")
+                return [[1.0, float(len(t)), 0.0] for t in texts]
+            return embed
+
+        with mock.patch.object(sync_index, "_get_embed_func", fake_embed_func):
+            return sync_index.sync_all(str(self.memory_dir), project_path=self.workspace)
+
+    def test_entries_embedded_in_batches_across_files(self):
+        _write_daily(self.memory_dir, "2026-01-01", 3)
+        _write_daily(self.memory_dir, "2026-01-02", 4)
+        (self.memory_dir / "config.json").write_text(
+            json.dumps({"embedding": {"batch_size": 4}}), encoding="utf-8")
+
+        calls = []
+        total = self._sync(calls)
+        md_chunks = total - 7
+        self.assertGreater(md_chunks, 0)
+        # 7 条 daily + MEMORY.md 分块，按 4 条一批跨文件合并
+        self.assertEqual(sum(calls), total)
+        self.assertEqual(calls[:-1], [4] * (len(calls) - 1))
+        self.assertLessEqual(calls[-1], 4)
+
+        store = SQLiteStore(str(self.memory_dir / "index.sqlite"))
+        try:
+            self.assertEqual(len(store.vector_index()), total)
+            self.assertEqual(store.get_sync_state("daily/2026-01-02.jsonl")["last_line"], 4)
+        finally:
+            store.close()
+
+        # 无新增内容时不调用嵌入
+        calls.clear()
+        self.assertEqual(self._sync(calls), 0)
+        self.assertEqual(calls, [])
+
+    def test_failed_batch_rolls_back_whole_sync(self):
+        _write_daily(self.memory_dir, "2026-01-01", 40)
+        calls = []
+        with self.assertRaises(RuntimeError):
+            self._sync(calls, fail_on=2)
+
+        store = SQLiteStore(str(self.memory_dir / "index.sqlite"))
+        try:
+            self.assertEqual(store.count_chunks(), 0)
+            self.assertIsNone(store.get_sync_state("daily/2026-01-01.jsonl"))
+        finally:
+            store.close()
+
+        # 重跑可完整补齐
+        self.assertEqual(self._sync([]), 40 + self._md_chunks())
+
+    def test_memory_md_edit_only_reembeds_changed_sections(self):
+        md = self.memory_dir / "MEMORY.md"
+        md.write_text("# 核心记忆\n\n## 用户偏好\n喜欢简洁\n\n## 项目背景\nPython 项目\n\n## 重要决策\n使用 SQLite",
+                      encoding="utf-8")
+        store = SQLiteStore(str(self.memory_dir / "index.sqlite"))
+        store.upsert_chunk("core-0", "旧版按序号命名的块", chunk_type="core", source_file="MEMORY.md")
+        store.close()
+
+        self.assertEqual(self._sync([]), 4)
+        store = SQLiteStore(str(self.memory_dir / "index.sqlite"))
+        try:
+            before = set(store.chunk_ids_by_source("MEMORY.md"))
+        finally:
+            store.close()
+        self.assertEqual(len(before), 4)
+        self.assertNotIn("core-0", before)
+
+        md.write_text(md.read_text(encoding="utf-8").replace("Python 项目", "Python 3.11 项目"), encoding="utf-8")
+        os.utime(md, (0, 1))
+        calls = []
+        self.assertEqual(self._sync(calls), 1)
+        self.assertEqual(calls, [1])
+        store = SQLiteStore(str(self.memory_dir / "index.sqlite"))
+        try:
+            after = set(store.chunk_ids_by_source("MEMORY.md"))
+            self.assertEqual(len(after), 4)
+            self.assertEqual(len(before & after), 3)
+            contents = [r[0] for r in store.conn.execute("SELECT content FROM chunks WHERE source_file='MEMORY.md'")]
+            self.assertIn("## 项目背景\nPython 3.11 项目", contents)
+        finally:
+            store.close()
+
+    def _md_chunks(self):
+        from storage.chunker import chunk_markdown
+        return len(chunk_markdown((self.memory_dir / "MEMORY.md").read_text(encoding="utf-8").strip()))
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main(verbosity=2)
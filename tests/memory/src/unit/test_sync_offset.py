@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""sync_index 字节偏移增量读取测试：续读、半行、原地截断、原子重写、旧版状态。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import json
+from unittest import mock
+
+from test_common import IsolatedWorkspaceCase
+from service.memory import sync_index
+from storage.jsonl_manage import _rewrite_jsonl
+from storage.sqlite_store import SQLiteStore
+
+REL = "daily/2026-01-01.jsonl"
+
+
+def _line(i, content=None):
+    return json.dumps({"id": f"f{i}", "type": "fact", "content": content or f"fact {i}",
+                       "timestamp": "2026-01-01T00:00:00Z"}) + "\n"
+
+
+class SyncOffsetTests(IsolatedWorkspaceCase):
+    def setUp(self):
+        super().setUp()
+        self.path = str(self.memory_dir / "daily" / "2026-01-01.jsonl")
+        self.store = SQLiteStore(str(self.memory_dir / "index.sqlite"))
+        self.offsets = []
+        real = sync_index.read_jsonl_from
+
+        def tracking(path, offset=0):
+            self.offsets.append(offset)
+            return real(path, offset)
+
+        patcher = mock.patch.object(sync_index, "read_jsonl_from", tracking)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.store.close)
+
+    def _write(self, text, mode="a"):
+        with open(self.path, mode, encoding="utf-8") as f:
+            f.write(text)
+
+    def _sync(self):
+        # mtime 精度为秒，清除 mtime 以免同秒内的修改被跳过
+        self.store.conn.execute("UPDATE sync_state SET mtime = -1")
+        return sync_index.sync_file(self.store, str(self.memory_dir), REL, self.path)
+
+    def _content(self, chunk_id):
+        row = self.store.conn.execute("SELECT content FROM chunks WHERE id=?", (chunk_id,)).fetchone()
+        return row["content"] if row else None
+
+    def test_append_resumes_from_offset_and_waits_for_partial_line(self):
+        self._write(_line(0) + _line(1))
+        self.assertEqual(self._sync(), 2)
+        size = os.path.getsize(self.path)
+
+        self._write(_line(2) + _line(3)[:10])  # 末尾半行仍在写入
+        self.assertEqual(self._sync(), 1)
+        self.assertEqual(self.offsets[-1], size)
+        self.assertIsNone(self._content("f3"))
+
+        self._write(_line(3)[10:])
+        self.assertEqual(self._sync(), 1)
+        self.assertEqual(self._content("f3"), "fact 3")
+        state = self.store.get_sync_state(REL)
+        self.assertEqual((state["last_line"], state["byte_offset"]), (4, os.path.getsize(self.path)))
+
+        # 文件未变化时不读取
+        calls = len(self.offsets)
+        sync_index.sync_file(self.store, str(self.memory_dir), REL, self.path)
+        self.assertEqual(len(self.offsets), calls)
+
+    def test_in_place_truncate_and_regrow_triggers_full_reread(self):
+        self._write(_line(0) + _line(1))
+        self._sync()
+        # 同一 inode 上截断并写入更长的新内容（如 truncate_sessions）
+        self._write(_line(5, "rewritten five") + _line(6) + _line(7), mode="w")
+        self.assertEqual(self._sync(), 3)
+        self.assertEqual(self.offsets[-1], 0)
+        self.assertEqual(self._content("f5"), "rewritten five")
+
+    def test_atomic_rewrite_and_legacy_state_reread(self):
+        self._write(_line(0) + _line(1))
+        self._sync()
+        _rewrite_jsonl(self.path, [json.loads(_line(0, "edited zero")), json.loads(_line(1))])
+        self.assertEqual(self._sync(), 2)
+        self.assertEqual(self.offsets[-1], 0)
+        self.assertEqual(self._content("f0"), "edited zero")
+
+        # 旧版本只记录 last_line 的状态：整文件重读一次后转为偏移续读
+        self.store.conn.execute("UPDATE sync_state SET byte_offset = NULL, inode = NULL")
+        self._write(_line(2))
+        self.assertEqual(self._sync(), 3)
+        self.assertEqual(self.offsets[-1], 0)
+        self._write(_line(3))
+        self.assertEqual(self._sync(), 1)
+        self.assertGreater(self.offsets[-1], 0)
+
+    def test_old_schema_gains_offset_columns(self):
+        self.store.close()
+        db = str(self.memory_dir / "old.sqlite")
+        import sqlite3
+        conn = sqlite3.connect(db)
+        conn.execute("CREATE TABLE sync_state (file_path TEXT PRIMARY KEY, last_line INTEGER DEFAULT 0, "
+                     "last_id TEXT, mtime INTEGER, synced_at INTEGER)")
+        conn.execute("INSERT INTO sync_state VALUES ('x', 3, 'id', 1, 1)")
+        conn.commit()
+        conn.close()
+        self.store = SQLiteStore(db)
+        self.addCleanup(self.store.close)
+        state = self.store.get_sync_state("x")
+        self.assertEqual(state["last_line"], 3)
+        self.assertIsNone(state["byte_offset"])
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main(verbosity=2)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""计时 span 测试：嵌套与属性、整批写入、开关、日志清理，以及 Hook/CLI 埋点与 manage spans 汇总。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import json
+import glob
+from unittest import mock
+
+from test_common import IsolatedWorkspaceCase, run_script
+import service.logger.logger as logger_mod
+from service.logger import tracing
+from service.manage.commands.cmd_spans import aggregate
+
+
+class SpanRecordingTests(IsolatedWorkspaceCase):
+    def setUp(self):
+        super().setUp()
+        self.log_dir = os.path.join(self.workspace, "span-logs")
+        patcher = mock.patch.object(logger_mod, "_LOG_DIR", self.log_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        state = mock.patch.dict(tracing._state, {"enabled": True})
+        state.start()
+        self.addCleanup(state.stop)
+
+    def _records(self):
+        records = []
+        for path in sorted(glob.glob(os.path.join(self.log_dir, "*" + tracing.SPANS_SUFFIX))):
+            with open(path, encoding="utf-8") as f:
+                records += [json.loads(line) for line in f]
+        return records
+
+    def test_nested_spans_flush_once_with_attrs(self):
+        @tracing.traced()
+        def scan():
+            tracing.add(rows_scanned=3, bytes_read=100)
+            tracing.add(rows_scanned=2)
+
+        with tracing.span("outer", kind="test") as sp:
+            scan()
+            self.assertEqual(self._records(), [])  # 最外层结束前不写文件
+            sp.set(cache_hit=True)
+
+        inner, outer = self._records()
+        self.assertEqual(inner["name"], "scan")
+        self.assertEqual(inner["parent"], "outer")
+        self.assertEqual(inner["attrs"], {"rows_scanned": 5, "bytes_read": 100})
+        self.assertEqual(outer["name"], "outer")
+        self.assertNotIn("parent", outer)
+        self.assertEqual(outer["attrs"], {"kind": "test", "cache_hit": True})
+        self.assertGreaterEqual(outer["ms"], inner["ms"])
+        self.assertEqual(outer["pid"], os.getpid())
+
+        # span 外的 add 为空操作
+        tracing.add(rows_scanned=1)
+        self.assertEqual(len(self._records()), 2)
+
+    def test_error_and_disabled(self):
+        with self.assertRaises(ValueError):
+            with tracing.span("boom"):
+                raise ValueError("x")
+        self.assertEqual(self._records()[0]["attrs"], {"error": "ValueError"})
+
+        tracing._state["enabled"] = False
+        with tracing.span("quiet"):
+            pass
+        self.assertEqual([r["name"] for r in self._records()], ["boom"])
+
+    def test_missing_data_dir_is_not_created(self):
+        project = os.path.join(self.workspace, "deleted-project")
+        gone = os.path.join(project, ".cursor", "skills", "memory-data", "logs")
+        with mock.patch.object(logger_mod, "_LOG_DIR", gone), \
+                mock.patch.object(logger_mod, "_file_handler", None):
+            log = logger_mod.get_logger("tracing-missing-dir")
+            self.addCleanup(log.handlers.clear)
+            log.warning("项目目录不存在")  # 日志文件先于 span 写入，也不能建出数据目录
+            with tracing.span("orphan"):
+                pass
+        self.assertFalse(os.path.exists(project))
+        self.assertEqual(self._records(), [])
+
+    def test_old_span_files_are_cleaned(self):
+        os.makedirs(self.log_dir)
+        old = os.path.join(self.log_dir, "2000-01-01" + tracing.SPANS_SUFFIX)
+        open(old, "w").close()
+        with tracing.span("fresh"):
+            pass
+        logger_mod._cleanup_old_logs()
+        self.assertFalse(os.path.exists(old))
+        self.assertEqual([r["name"] for r in self._records()], ["fresh"])
+
+    def test_aggregate_histogram(self):
+        records = [{"name": "search", "ms": ms, "attrs": {"cache_hit": ms < 1, "rows": 2}}
+                   for ms in (0.5, 3, 4, 40, 2500)]
+        records += [{"name": "hook.load_memory", "ms": 1.0, "attrs": {"error": "OSError"}}, {"bad": 1}]
+        ops = aggregate(records)
+        self.assertEqual([op["name"] for op in ops], ["search", "hook.load_memory"])
+        search = ops[0]
+        self.assertEqual((search["count"], search["p50_ms"], search["p95_ms"], search["max_ms"]), (5, 4, 2500, 2500))
+        self.assertEqual(search["histogram"], {"<=1ms": 1, "<=5ms": 2, "<=50ms": 1, "<=5000ms": 1})
+        self.assertEqual(search["attrs"], {"cache_hit": 1, "rows": 10})
+        self.assertEqual(ops[1]["errors"], 1)
+        self.assertEqual([op["name"] for op in aggregate(records, "hook.")], ["hook.load_memory"])
+
+
+class HookInstrumentationTests(IsolatedWorkspaceCase):
+    def _run(self, script, args=None, stdin=None):
+        result = run_script(script, self.workspace, stdin_data=stdin, args=args)
+        self.assertEqual(result.returncode, 0, msg=result.stderr)
+        return result
+
+    def test_spans_cover_hooks_and_manage_aggregates(self):
+        ws = ["--project-path", self.workspace]
+        self._run("service/memory/save_fact.py", ws + ["--content", "TRACE_TOKEN 使用 SQLite", "--type", "W"])
+        self._run("service/memory/sync_index.py", ws)
+        self._run("service/memory/search_memory.py", ["TRACE_TOKEN", "--method", "fts"] + ws)
+        self._run("service/hooks/load_memory.py",
+                  stdin=json.dumps({"workspace_roots": [self.workspace], "conversation_id": "c-trace"}))
+
+        out = json.loads(self._run("service/manage/index.py", ws + ["spans"]).stdout)
+        ops = {op["name"]: op for op in out["data"]["operations"]}
+        for name in ("cli.save_fact", "cli.sync_index", "sync_all", "cli.search_memory", "search",
+                     "search_fts", "hook.load_memory", "load_context"):
+            self.assertIn(name, ops)
+        self.assertGreaterEqual(ops["sync_all"]["attrs"]["rows_scanned"], 1)
+        self.assertGreater(ops["sync_all"]["attrs"]["bytes_read"], 0)
+        self.assertEqual(ops["search"]["attrs"]["results"], 1)
+        self.assertEqual(ops["search_fts"]["attrs"]["rows"], 1)
+        self.assertGreater(ops["load_context"]["attrs"]["bytes_read"], 0)
+        self.assertEqual(sum(ops["load_context"]["histogram"].values()), 1)
+
+        filtered = json.loads(self._run("service/manage/index.py", ws + ["spans", "--name", "hook."]).stdout)
+        self.assertEqual([op["name"] for op in filtered["data"]["operations"]], ["hook.load_memory"])
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main(verbosity=2)
@@ -74,10 +74,7 @@ class TestUpdateSessionState(IsolatedWorkspaceCase):
     def test_update_noop_for_empty_session_id(self):
         from service.memory.session_state import update_session_state
         update_session_state(str(self.memory_dir), "", {"distilled": True})
-        state_dir = self.memory_dir / "session_state"
-        if state_dir.exists():
-            json_files = list(state_dir.glob("*.json"))
-            self.assertEqual(len(json_files), 0)
+        self.assertFalse((self.memory_dir / "session_state.sqlite").exists())
 
 
 if __name__ == "__main__":
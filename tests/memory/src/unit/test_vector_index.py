@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""向量检索引擎测试：矩阵打分、时间掩码、增量更新、NumPy 降级路径。"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pathlib import Path
+from unittest import mock
+
+from test_common import IsolatedWorkspaceCase
+from storage import vector_index
+from storage.sqlite_store import SQLiteStore
+from storage.sqlite_search import search_vector, hybrid_search
+
+
+class VectorIndexSearchTests(IsolatedWorkspaceCase):
+    def _store(self):
+        store = SQLiteStore(str(Path(self.workspace) / "vec.sqlite"))
+        store.upsert_chunk("a", "alpha", embedding=[1.0, 0.0, 0.0], timestamp="2026-01-10T00:00:00Z")
+        store.upsert_chunk("b", "beta", embedding=[0.7, 0.7, 0.0], timestamp="2026-02-10T00:00:00Z")
+        store.upsert_chunk("c", "gamma", embedding=[0.0, 0.0, 2.0], timestamp="2026-03-10T00:00:00Z")
+        store.upsert_chunk("d", "no-embedding", timestamp="2026-03-11T00:00:00Z")
+        return store
+
+    def _check_search(self):
+        store = self._store()
+        try:
+            results = search_vector(store, [1.0, 0.0, 0.0], limit=2)
+            self.assertEqual([r["id"] for r in results], ["a", "b"])
+            self.assertAlmostEqual(results[0]["score"], 1.0, places=4)
+            self.assertEqual(results[0]["content"], "alpha")
+            self.assertNotIn("embedding", results[0])
+
+            ranged = search_vector(store, [1.0, 0.0, 0.0], limit=5,
+                                   from_date="2026-02-01", to_date="2026-03-31")
+            self.assertEqual([r["id"] for r in ranged], ["b", "c"])
+
+            # 索引构建后的 upsert 增量合并：覆盖、新增、清空向量
+            store.upsert_chunk("c", "gamma2", embedding=[1.0, 0.1, 0.0], timestamp="2026-03-10T00:00:00Z")
+            store.upsert_chunk("e", "eps", embedding=[0.0, 1.0, 0.0], timestamp="2026-03-12T00:00:00Z")
+            store.upsert_chunk("a", "alpha", timestamp="2026-01-10T00:00:00Z")
+            results = search_vector(store, [1.0, 0.0, 0.0], limit=10)
+            self.assertEqual([r["id"] for r in results], ["c", "b", "e"])
+            self.assertEqual(len(store.vector_index()), 3)
+        finally:
+            store.close()
+
+    def test_numpy_or_default_backend(self):
+        self._check_search()
+
+    def test_array_fallback_backend(self):
+        with mock.patch.object(vector_index, "np", None):
+            self._check_search()
+
+    def test_rebuild_when_other_connection_writes(self):
+        store = self._store()
+        other = SQLiteStore(store.db_path)
+        try:
+            self.assertEqual(len(store.vector_index()), 3)
+            other.upsert_chunk("z", "zeta", embedding=[0.0, 1.0, 0.0], timestamp="2026-03-20T00:00:00Z")
+            ids = [r["id"] for r in search_vector(store, [0.0, 1.0, 0.0], limit=1)]
+            self.assertEqual(ids, ["z"])
+        finally:
+            other.close()
+            store.close()
+
+    def test_dimension_mismatch_and_hybrid(self):
+        store = self._store()
+        try:
+            self.assertEqual(search_vector(store, [1.0, 0.0], limit=5), [])
+            results = hybrid_search(store, "alpha", [1.0, 0.0, 0.0], limit=3)
+            self.assertEqual(results[0]["id"], "a")
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main(verbosity=2)